@@ -0,0 +1,67 @@
+"""
+Benchmark sequential rest_query calls against the asynchronous request engine
+(gget.utils.run_async + async_rest_query) using a local stub server that
+emulates the latency of a remote REST API.
+
+Usage: python benchmarks/async_requests.py [n_ids] [latency_ms]
+"""
+
+import sys
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from gget.utils import rest_query, async_rest_query, run_async
+
+LATENCY = 0.05
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        time.sleep(LATENCY)
+        body = b'{"id": "%s", "seq": "ATG"}' % self.path.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    global LATENCY
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    LATENCY = (float(sys.argv[2]) if len(sys.argv) > 2 else 50) / 1000
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+    queries = [f"sequence/id/ENST{i:011d}?" for i in range(n)]
+
+    try:
+        start = time.perf_counter()
+        sequential = [rest_query(url, q, "application/json") for q in queries]
+        t_seq = time.perf_counter() - start
+        print(f"sequential  {t_seq:>8.2f} s")
+
+        start = time.perf_counter()
+        concurrent = run_async(
+            async_rest_query(url, q, "application/json") for q in queries
+        )
+        t_async = time.perf_counter() - start
+        print(f"run_async   {t_async:>8.2f} s")
+
+        assert sequential == concurrent
+        print(f"Speedup: {t_seq / t_async:.1f}x")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
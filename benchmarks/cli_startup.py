@@ -0,0 +1,89 @@
+"""
+Enforce a startup-time budget for the gget command line interface.
+
+Runs `python -X importtime -m gget --help`, reports the cumulative import
+time of gget and the slowest imported packages, and exits with status 1 if
+the budget is exceeded or if a heavy dependency is imported eagerly.
+
+Usage: python benchmarks/cli_startup.py [budget_ms] [repeats]
+"""
+
+import re
+import subprocess
+import sys
+
+# Dependencies only the modules themselves need; none of them may be imported by `gget --help`
+HEAVY_MODULES = (
+    "pandas",
+    "numpy",
+    "matplotlib",
+    "bs4",
+    "mysql",
+    "tqdm",
+    "IPython",
+    "requests",
+)
+
+IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def importtime(args):
+    """
+    Returns {module: cumulative import time in microseconds} of the top-level imports
+    and the set of all imported modules.
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "gget"] + args,
+        capture_output=True,
+        text=True,
+    )
+    times = {}
+    modules = set()
+    for line in process.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        modules.add(match.group(4))
+        # Only time the imports triggered directly by the interpreter or gget
+        if len(match.group(3)) <= 3:
+            times[match.group(4)] = int(match.group(2))
+    return times, modules
+
+
+def main():
+    budget_ms = float(sys.argv[1]) if len(sys.argv) > 1 else 150
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    # Keep the fastest run to reduce noise from the file system cache
+    runs = [importtime(["--help"]) for _ in range(repeats)]
+    times = min(
+        (t for t, _ in runs), key=lambda t: t.get("gget", 0) + t.get("gget.main", 0)
+    )
+
+    gget_ms = (times.get("gget", 0) + times.get("gget.main", 0)) / 1000
+    print(f"gget --help import time: {gget_ms:.1f} ms (budget {budget_ms:.0f} ms)")
+    for module, us in sorted(times.items(), key=lambda x: -x[1])[:10]:
+        print(f"  {module:<30} {us / 1000:>8.1f} ms")
+
+    eager = sorted(
+        {
+            module.split(".")[0]
+            for _, modules in runs
+            for module in modules
+            if module.split(".")[0] in HEAVY_MODULES
+        }
+    )
+
+    failed = False
+    if eager:
+        print(f"FAIL: heavy dependencies imported at startup: {', '.join(eager)}")
+        failed = True
+    if gget_ms > budget_ms:
+        print(f"FAIL: import time exceeds the budget of {budget_ms:.0f} ms")
+        failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
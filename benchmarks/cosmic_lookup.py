@@ -0,0 +1,105 @@
+"""
+Benchmark searching a local COSMIC Cancer Mutation Census file with gget.cosmic
+(gget.gget_cosmic.query_local_cosmic): the previous search, which read the whole tsv file
+and compared lowercased copies of the search columns on every call, against building the
+SQLite index of the file once (load_cosmic_index) and searching through it, on a synthetic
+file with the columns of the Cancer Mutation Census.
+
+Usage: python benchmarks/cosmic_lookup.py [n_rows]
+(default: 1000000 rows)
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from gget.gget_cosmic import (
+    COSMIC_CANCER_SEARCH_COLUMNS,
+    COSMIC_ACCESSION_COLUMNS,
+    load_cosmic_index,
+    query_local_cosmic,
+)
+
+SEARCHES = 100
+
+
+def generate_cmc(path, n, rng):
+    genes = np.array([f"GENE{i}" for i in range(20000)])
+    chosen = rng.integers(0, len(genes), n)
+    pd.DataFrame(
+        {
+            "GENE_NAME": genes[chosen],
+            "ACCESSION_NUMBER": [f"ENST{i:011d}.{i % 5 + 1}" for i in chosen],
+            "ONC_TSG": rng.choice(["oncogene", "TSG", None], n),
+            "CGC_TIER": rng.integers(1, 3, n),
+            "MUTATION_URL": [f"https://cancer.sanger.ac.uk/cosmic/mutation/overview?genome=37&id={i}" for i in range(n)],
+            "LEGACY_MUTATION_ID": [f"COSM{i}" for i in range(n)],
+            "Mutation CDS": [f"c.{p}G>C" for p in rng.integers(1, 5000, n)],
+            "Mutation AA": [f"p.E{p}Q" for p in rng.integers(1, 1700, n)],
+            "AA_MUT_START": rng.integers(1, 1700, n),
+            "Mutation Description AA": rng.choice(["Substitution - Missense", "Substitution - coding silent"], n),
+            "GENOMIC_MUTATION_ID": [f"COSV{i}" for i in range(n)],
+            "Mutation genome position GRCh37": [f"{i % 22 + 1}:{p}-{p}" for i, p in enumerate(rng.integers(1, 200000000, n))],
+            "COSMIC_SAMPLE_TESTED": rng.integers(1000, 200000, n),
+            "COSMIC_SAMPLE_MUTATED": rng.integers(1, 100, n),
+            "EXAC_AF": np.where(rng.random(n) < 0.7, np.nan, rng.random(n)),
+        }
+    ).to_csv(path, sep="\t", index=False)
+
+
+def legacy_query(path, searchterm, limit):
+    # Previous search: whole file read and lowercased on every call
+    df = pd.read_csv(path, sep="\t", low_memory=False)
+    searchterm = searchterm.lower()
+    mask = np.zeros(len(df), dtype=bool)
+    for col in COSMIC_CANCER_SEARCH_COLUMNS:
+        values = df[col].astype(str).str.lower()
+        mask |= values == searchterm
+        if col in COSMIC_ACCESSION_COLUMNS:
+            mask |= values.str.split(".").str[0] == searchterm
+    return [
+        {col.replace(" ", "_"): row[col] for col in row.index}
+        for _, row in df[mask].head(limit).iterrows()
+    ]
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    rng = np.random.default_rng(0)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "CancerMutationCensus_AllData_v1_GRCh37.tsv")
+        print(f"Generating COSMIC tsv file with {n} rows...")
+        generate_cmc(path, n, rng)
+        terms = [f"GENE{i}" for i in rng.integers(0, 20000, SEARCHES // 2)]
+        terms += [f"cosv{i}" for i in rng.integers(0, n, SEARCHES // 2)]
+
+        start = time.perf_counter()
+        expected = legacy_query(path, terms[0], 100)
+        legacy = time.perf_counter() - start
+
+        start = time.perf_counter()
+        load_cosmic_index(path).close()
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for term in terms:
+            result = query_local_cosmic(path, "cancer", term, 100)
+            if term == terms[0]:
+                assert pd.DataFrame(result).to_json() == pd.DataFrame(expected).to_json()
+        search = (time.perf_counter() - start) / len(terms)
+
+        print(
+            f"{os.path.getsize(path) / 1024**2:.0f} MB tsv file, {os.path.getsize(path + '.sqlite') / 1024**2:.0f} MB index\n"
+            f"previous search     {legacy:>9.3f} s\n"
+            f"build index (once)  {build:>9.3f} s\n"
+            f"indexed search      {search * 1000:>9.3f} ms (mean of {len(terms)} searches)"
+        )
+
+
+if __name__ == "__main__":
+    main()
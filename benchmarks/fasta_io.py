@@ -0,0 +1,109 @@
+"""
+Benchmark the throughput (MB/s) of gget.utils.FastaIO parse and write against
+the previous line-by-line text implementation on a synthetic FASTA file of
+virus-sized records (~30 kb, 70 characters per line).
+
+The file is generated in a temporary directory and deleted afterwards.
+
+Usage: python benchmarks/fasta_io.py [size_mb] [record_length]
+(default: 5000 MB, as for a full NCBI virus download)
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+
+from gget.utils import FastaIO, FastaRecord
+
+
+def legacy_parse(filename):
+    # Line-by-line text parser replaced by the block-buffered FastaIO.parse
+    with open(filename, "r", encoding="utf-8") as handle:
+        current_id = None
+        current_description = ""
+        current_seq = []
+        for line in handle:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith(">"):
+                if current_id is not None:
+                    yield FastaRecord("".join(current_seq), current_id, current_description)
+                header = line[1:]
+                if " " in header:
+                    current_id = header.split(" ", 1)[0]
+                    current_description = header.split(" ", 1)[1]
+                else:
+                    current_id = header
+                    current_description = ""
+                current_seq = []
+            else:
+                current_seq.append(line)
+        if current_id is not None:
+            yield FastaRecord("".join(current_seq), current_id, current_description)
+
+
+def legacy_write(records, filename):
+    # One write per 70 character line
+    with open(filename, "w", encoding="utf-8") as handle:
+        for record in records:
+            if record.description:
+                handle.write(f">{record.id} {record.description}\n")
+            else:
+                handle.write(f">{record.id}\n")
+            seq_str = str(record.seq)
+            for i in range(0, len(seq_str), 70):
+                handle.write(seq_str[i : i + 70] + "\n")
+
+
+def generate(path, size_mb, record_length):
+    random.seed(0)
+    # Reuse a pool of random sequences so generation is not the bottleneck
+    pool = ["".join(random.choices("ACGT", k=record_length)) for _ in range(64)]
+    target = size_mb * 1024**2
+    written = 0
+    i = 0
+
+    def records():
+        nonlocal written, i
+        while written < target:
+            seq = pool[i % len(pool)]
+            record = FastaRecord(seq, f"OQ{i:07d}.1", "Severe acute respiratory syndrome coronavirus 2 isolate")
+            written += len(seq) + len(seq) // 70 + 80
+            i += 1
+            yield record
+
+    FastaIO.write(records(), path)
+    return os.path.getsize(path)
+
+
+def timed(label, size, func):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<20} {elapsed:>8.2f} s  {size / 1024**2 / elapsed:>8.1f} MB/s")
+    return result
+
+
+def main():
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    record_length = int(sys.argv[2]) if len(sys.argv) > 2 else 30000
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "synthetic.fa")
+        print(f"Generating {size_mb} MB FASTA file...")
+        size = generate(path, size_mb, record_length)
+
+        n_legacy = timed("parse (legacy)", size, lambda: sum(1 for _ in legacy_parse(path)))
+        n_new = timed("parse (FastaIO)", size, lambda: sum(1 for _ in FastaIO.parse(path)))
+        assert n_legacy == n_new
+
+        out = os.path.join(tmp_dir, "copy.fa")
+        timed("copy (legacy)", size, lambda: legacy_write(legacy_parse(path), out))
+        timed("copy (FastaIO)", size, lambda: FastaIO.write(FastaIO.parse(path), out))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark cold vs. warm runs of the persistent HTTP response cache
+(gget.utils.configure_cache) against a local stub server that emulates
+the latency of a remote REST API.
+
+Usage: python benchmarks/http_cache.py [n_ids] [latency_ms]
+"""
+
+import sys
+import time
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from gget.constants import HTTP_CACHE_TTL
+from gget.utils import http_request, configure_cache, cache_info
+
+LATENCY = 0.05
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        time.sleep(LATENCY)
+        body = b'{"id": "%s", "object_type": "Gene"}' % self.path.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def run(label, url, ids):
+    start = time.perf_counter()
+    for id_ in ids:
+        http_request("GET", url + id_).json()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<6} {elapsed:>8.2f} s  ({len(ids) / elapsed:>10.1f} lookups/sec)")
+    return elapsed
+
+
+def main():
+    global LATENCY
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    LATENCY = (float(sys.argv[2]) if len(sys.argv) > 2 else 50) / 1000
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/lookup/id/"
+    ids = [f"ENSG{i:011d}" for i in range(n)]
+
+    HTTP_CACHE_TTL["127.0.0.1"] = 3600
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        configure_cache(path=tmp_dir)
+        try:
+            cold = run("cold", url, ids)
+            warm = run("warm", url, ids)
+            print(f"Speedup: {cold / warm:.1f}x")
+            print(cache_info())
+        finally:
+            configure_cache(enabled=False)
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
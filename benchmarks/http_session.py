@@ -0,0 +1,61 @@
+"""
+Benchmark the shared HTTP session (gget.utils.http_request) against bare
+requests.get calls using a local keep-alive stub server.
+
+Usage: python benchmarks/http_session.py [n_requests]
+"""
+
+import sys
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import requests
+
+from gget.utils import http_request
+
+PAYLOAD = b'{"id": "ENSG00000034713", "display_name": "GABARAPL2"}'
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(PAYLOAD)))
+        self.end_headers()
+        self.wfile.write(PAYLOAD)
+
+    def log_message(self, *args):
+        pass
+
+
+def run(label, func, url, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        r = func(url)
+        r.content
+    elapsed = time.perf_counter() - start
+    print(f"{label:<30} {n / elapsed:>10.1f} requests/sec")
+    return n / elapsed
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/lookup/id/ENSG00000034713"
+
+    try:
+        bare = run("requests.get (no keep-alive)", requests.get, url, n)
+        shared = run("gget.utils.http_request", lambda u: http_request("GET", u), url, n)
+        print(f"Speedup: {shared / bare:.2f}x")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark the flank extraction of gget.mutate: the grouped bulk extraction
+(gget.gget_mutate.extract_regions) against the previous row-wise DataFrame.apply
+callbacks, for 1e4 to 1e7 random mutations on a synthetic genome (see read_fasta.py).
+
+Both are timed for sequences held as Python strings (sequences passed as a list) and
+for the memory-mapped, indexed FASTA file (sequences passed as a path).
+The row-wise implementation is only run up to legacy_max mutations, as it takes
+about 20 s per million mutations.
+
+Usage: python benchmarks/mutate_flanks.py [size_mb] [legacy_max]
+(default: 200 MB, 1000000)
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from read_fasta import generate
+from gget.utils import IndexedFasta
+from gget.gget_mutate import extract_regions
+
+K = 30
+
+
+def legacy_flanks(mutations, seq_dict):
+    # Row-wise extraction replaced by extract_regions
+    left = mutations.apply(
+        lambda row: seq_dict[row["seq_ID"]][row["start_kmer_position"] : row["start_mutation_position"]],
+        axis=1,
+    )
+    right = mutations.apply(
+        lambda row: seq_dict[row["seq_ID"]][row["end_mutation_position"] + 1 : row["end_kmer_position"] + 1],
+        axis=1,
+    )
+    return left.tolist(), right.tolist()
+
+
+def flanks(mutations, seq_dict):
+    seq_ids = mutations["seq_ID"].values
+    left = extract_regions(
+        seq_dict,
+        seq_ids,
+        mutations["start_kmer_position"].values,
+        mutations["start_mutation_position"].values,
+    )
+    right = extract_regions(
+        seq_dict,
+        seq_ids,
+        mutations["end_mutation_position"].values + 1,
+        mutations["end_kmer_position"].values + 1,
+    )
+    return left.tolist(), right.tolist()
+
+
+def random_mutations(n, lengths, rng):
+    seq_ids = np.array(list(lengths))
+    chosen = rng.integers(0, len(seq_ids), n)
+    sequence_length = np.array(list(lengths.values()))[chosen]
+    start = (rng.random(n) * sequence_length).astype(np.int64)
+    end = np.minimum(start + rng.integers(0, 3, n), sequence_length - 1)
+    return pd.DataFrame(
+        {
+            "seq_ID": seq_ids[chosen],
+            "start_mutation_position": start,
+            "end_mutation_position": end,
+            "start_kmer_position": np.maximum(start - K, 0),
+            "end_kmer_position": np.minimum(end + K, sequence_length),
+        }
+    )
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    legacy_max = int(sys.argv[2]) if len(sys.argv) > 2 else 1000000
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "genome.fa")
+        print(f"Generating {size_mb} MB genome FASTA file...")
+        generate(path, size_mb)
+
+        indexed = IndexedFasta(path, save_index=False, key=lambda name: name.split()[0])
+        strings = {seq_id: str(indexed[seq_id]) for seq_id in indexed}
+        lengths = {seq_id: indexed.length(seq_id) for seq_id in indexed}
+        rng = np.random.default_rng(0)
+
+        print(f"{'mutations':>10} {'store':<8} {'row-wise':>10} {'grouped':>10} {'speedup':>8}")
+        for n in (10**4, 10**5, 10**6, 10**7):
+            mutations = random_mutations(n, lengths, rng)
+            for store, seq_dict in (("str", strings), ("indexed", indexed)):
+                elapsed, result = timed(flanks, mutations, seq_dict)
+                if n <= legacy_max:
+                    legacy_elapsed, legacy_result = timed(legacy_flanks, mutations, seq_dict)
+                    assert legacy_result == result
+                    print(
+                        f"{n:>10} {store:<8} {legacy_elapsed:>9.2f}s {elapsed:>9.2f}s "
+                        f"{legacy_elapsed / elapsed:>7.0f}x"
+                    )
+                else:
+                    print(f"{n:>10} {store:<8} {'-':>10} {elapsed:>9.2f}s {'-':>8}")
+
+        indexed.close()
+
+
+if __name__ == "__main__":
+    main()
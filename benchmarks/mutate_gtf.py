@@ -0,0 +1,71 @@
+"""
+Benchmark reading the transcript locations of a GTF file in gget.mutate (mutate with gtf=...):
+parsing the GTF file (gget.gget_mutate.read_gtf_transcript_locations, previously done on every
+call) against reading the table cached next to it by load_gtf_transcript_locations, on a
+synthetic annotation with a transcript line and several exon lines per transcript.
+
+Usage: python benchmarks/mutate_gtf.py [n_transcripts]
+(default: 250000 transcripts with 10 exons each)
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+import numpy as np
+
+from gget.gget_mutate import read_gtf_transcript_locations, load_gtf_transcript_locations
+
+EXONS = 10
+
+
+def generate_gtf(path, n, rng):
+    starts = rng.integers(1, 200000000, n)
+    lengths = rng.integers(1000, 100000, n)
+    strands = rng.choice(["+", "-"], n)
+    with open(path, "w") as f:
+        f.write("#!genome-build GRCh38.p14\n")
+        for i in range(n):
+            attributes = f'gene_id "ENSG{i:011d}"; gene_version "1"; transcript_id "ENST{i:011d}"; transcript_version "1"; gene_biotype "protein_coding";'
+            chromosome = i % 22 + 1
+            start, end = starts[i], starts[i] + lengths[i]
+            f.write(f"{chromosome}\tensembl\ttranscript\t{start}\t{end}\t.\t{strands[i]}\t.\t{attributes}\n")
+            for exon in range(EXONS):
+                exon_start = start + exon * lengths[i] // EXONS
+                f.write(
+                    f"{chromosome}\tensembl\texon\t{exon_start}\t{exon_start + 100}\t.\t{strands[i]}\t.\t"
+                    f'{attributes} exon_number "{exon + 1}";\n'
+                )
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 250000
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "annotation.gtf")
+        print(f"Generating gtf file with {n} transcripts...")
+        generate_gtf(path, n, np.random.default_rng(0))
+
+        parse, expected = timed(read_gtf_transcript_locations, path, "transcript_ID")
+        first, _ = timed(load_gtf_transcript_locations, path, "transcript_ID")
+        cached, result = timed(load_gtf_transcript_locations, path, "transcript_ID")
+        assert result.values.tolist() == expected.values.tolist()
+
+        print(
+            f"gtf file {os.path.getsize(path) / 1024**2:.0f} MB, "
+            f"cached table {os.path.getsize(path + '.transcripts.npy') / 1024**2:.1f} MB\n"
+            f"parse gtf            {parse:>8.2f} s\n"
+            f"parse and save table {first:>8.2f} s\n"
+            f"read cached table    {cached:>8.2f} s ({parse / cached:.0f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
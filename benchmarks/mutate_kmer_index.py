@@ -0,0 +1,85 @@
+"""
+Benchmark the (k+1)-mer index of gget.mutate (remove_seqs_with_reference_kmers, see
+gget.gget_mutate.KmerIndex) on a synthetic transcriptome of random transcripts:
+time to build and save the index, to reuse it from disk in a later run, and to look up
+the k-mers of random mutant fragments (k=30, i.e. 31-mers).
+
+Usage: python benchmarks/mutate_kmer_index.py [size_mb] [n_fragments]
+(default: 50 MB, 1000000 fragments)
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+import numpy as np
+
+from gget.utils import IndexedFasta
+from gget.gget_mutate import KmerIndex, load_kmer_index
+
+K = 31
+
+
+def generate_transcriptome(path, size_mb, rng):
+    bases = np.frombuffer(b"ACGT", dtype=np.uint8)
+    remaining = size_mb * 1024**2
+    with open(path, "w") as f:
+        i = 0
+        while remaining > 0:
+            length = int(min(rng.integers(500, 5000), remaining))
+            f.write(f">ENST{i:011d}\n")
+            seq = bases[rng.integers(0, 4, length)].tobytes().decode()
+            f.write("\n".join(seq[j : j + 60] for j in range(0, length, 60)) + "\n")
+            remaining -= length
+            i += 1
+
+
+def main():
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    n_fragments = int(sys.argv[2]) if len(sys.argv) > 2 else 1000000
+    rng = np.random.default_rng(0)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "transcriptome.fa")
+        print(f"Generating {size_mb} MB transcriptome FASTA file...")
+        generate_transcriptome(path, size_mb, rng)
+        seq_dict = IndexedFasta(path)
+        index_path = f"{path}.{K}mers.npy"
+
+        start = time.perf_counter()
+        index = load_kmer_index(seq_dict, K, index_path, sequences_path=path)
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index = load_kmer_index(seq_dict, K, index_path, sequences_path=path)
+        reuse = time.perf_counter() - start
+
+        # Fragments of 61 bases: half are copied from the transcriptome, half are random
+        keys = list(seq_dict)
+        chosen = rng.integers(0, len(keys), n_fragments)
+        fragments = []
+        for i, key in enumerate(chosen):
+            if i % 2:
+                fragments.append(bytes(np.frombuffer(b"ACGT", np.uint8)[rng.integers(0, 4, 61)]).decode())
+            else:
+                seq = seq_dict[keys[key]]
+                position = int(rng.integers(0, len(seq) - 61))
+                fragments.append(seq[position : position + 61])
+
+        start = time.perf_counter()
+        found = index.contains_any(fragments)
+        query = time.perf_counter() - start
+        assert found[::2].all()
+
+        print(
+            f"{len(index)} {K}-mers ({os.path.getsize(index_path) / 1024**2:.0f} MB)\n"
+            f"build and save  {build:>8.2f} s\n"
+            f"reuse from disk {reuse:>8.4f} s\n"
+            f"look up {n_fragments} fragments {query:>8.2f} s ({found[1::2].mean():.1%} of the random fragments found)"
+        )
+        seq_dict.close()
+
+
+if __name__ == "__main__":
+    main()
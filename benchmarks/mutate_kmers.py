@@ -0,0 +1,101 @@
+"""
+Benchmark the k-mer checks of gget.mutate (remove_seqs_with_wt_kmers and optimize_flanking_regions):
+the column-wise rolling-hash engine (gget.gget_mutate.fragments_share_kmer and
+calculate_mutation_overlaps_with_flanks) against the previous row-wise functions,
+for k=31 and k=51 on random mutations of random sequences with short tandem repeats
+(so some mutant fragments share k-mers with their wildtype fragments).
+
+Usage: python benchmarks/mutate_kmers.py [n_mutations]
+(default: 100000)
+"""
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from gget.gget_mutate import (
+    wt_fragment_and_mutant_fragment_share_kmer,
+    calculate_beginning_mutation_overlap_with_right_flank,
+    calculate_end_mutation_overlap_with_left_flank,
+    fragments_share_kmer,
+    calculate_mutation_overlaps_with_flanks,
+)
+
+
+def random_strings(rng, n, min_length, max_length):
+    # Random bases with some short tandem repeats
+    units = np.array(["A", "C", "G", "T", "CA", "GGC", "ATAT"])
+    lengths = rng.integers(min_length, max_length + 1, n)
+    return ["".join(rng.choice(units, length))[:length] for length in lengths]
+
+
+def random_mutations(n, k, rng):
+    mutation_type = rng.choice(["deletion", "insertion", "duplication", "delins", "inversion"], n)
+    return pd.DataFrame(
+        {
+            "mutation_type": mutation_type,
+            "wt_nucleotides_ensembl": random_strings(rng, n, 1, 10),
+            "mut_nucleotides": random_strings(rng, n, 1, 10),
+            "left_flank_region": random_strings(rng, n, k - 5, k),
+            "right_flank_region": random_strings(rng, n, k - 5, k),
+        }
+    )
+
+
+def legacy(mutations, k):
+    overlaps = (
+        mutations.apply(calculate_beginning_mutation_overlap_with_right_flank, axis=1).values,
+        mutations.apply(calculate_end_mutation_overlap_with_left_flank, axis=1).values,
+    )
+    shared = mutations.apply(
+        lambda row: wt_fragment_and_mutant_fragment_share_kmer(
+            mutated_fragment=row["mutant_sequence"],
+            wildtype_fragment=row["wt_sequence"],
+            k=k + 1,
+        ),
+        axis=1,
+    ).values
+    return overlaps, shared
+
+
+def batched(mutations, k):
+    overlaps = calculate_mutation_overlaps_with_flanks(mutations)
+    shared = fragments_share_kmer(mutations["mutant_sequence"], mutations["wt_sequence"], k + 1)
+    return overlaps, shared
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rng = np.random.default_rng(0)
+
+    print(f"{'k':>4} {'mutations':>10} {'row-wise':>10} {'batched':>10} {'speedup':>8} {'shared':>8}")
+    for k in (31, 51):
+        mutations = random_mutations(n, k, rng)
+        mutations["wt_sequence"] = (
+            mutations["left_flank_region"] + mutations["wt_nucleotides_ensembl"] + mutations["right_flank_region"]
+        )
+        mutations["mutant_sequence"] = (
+            mutations["left_flank_region"] + mutations["mut_nucleotides"] + mutations["right_flank_region"]
+        )
+
+        legacy_elapsed, (legacy_overlaps, legacy_shared) = timed(legacy, mutations, k)
+        elapsed, (overlaps, shared) = timed(batched, mutations, k)
+        assert (legacy_shared == shared).all()
+        assert all((a == b).all() for a, b in zip(legacy_overlaps, overlaps))
+
+        print(
+            f"{k:>4} {n:>10} {legacy_elapsed:>9.2f}s {elapsed:>9.2f}s "
+            f"{legacy_elapsed / elapsed:>7.0f}x {shared.mean():>7.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark the parsing of HGVS mutation strings in gget.mutate: gget.gget_mutate.parse_mutations,
+which parses each distinct string once, against the previous pandas string operations on every
+row (the regular expressions of add_mutation_type and apply_mutations). The mutations are drawn
+from a pool of distinct strings, as the same mutations recur across transcripts in COSMIC.
+
+Usage: python benchmarks/mutate_parse.py [n_mutations] [n_distinct]
+(default: 1000000 mutations, 50000 distinct strings)
+"""
+
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from gget.gget_mutate import parse_mutations, mutation_pattern
+
+
+def random_mutations(n, n_distinct, rng):
+    positions = rng.integers(1, 5000, n_distinct)
+    kinds = rng.integers(0, 6, n_distinct)
+    pool = np.array(
+        [
+            [
+                f"c.{p}G>A",
+                f"c.{p}_{p + 2}del",
+                f"c.{p}_{p + 1}insTG",
+                f"c.{p}_{p + 3}delinsTT",
+                f"c.{p}dup",
+                f"c.{p}+1G>T",
+            ][kind]
+            for p, kind in zip(positions, kinds)
+        ],
+        dtype=object,
+    )
+    return pd.Series(pool[rng.integers(0, n_distinct, n)])
+
+
+def legacy(mutations):
+    # The string operations previously run on every row
+    actual_mutation = mutations.str.extract(mutation_pattern)[1]
+    conditions = [
+        actual_mutation.str.contains(">", na=False),
+        actual_mutation.str.contains("delins", na=False),
+        actual_mutation.str.contains("del", na=False) & ~actual_mutation.str.contains("delins", na=False),
+        actual_mutation.str.contains("ins", na=False) & ~actual_mutation.str.contains("delins", na=False),
+        actual_mutation.str.contains("dup", na=False),
+        actual_mutation.str.contains("inv", na=False),
+    ]
+    mutation_type = np.select(
+        conditions,
+        ["substitution", "delins", "deletion", "insertion", "duplication", "inversion"],
+        default="unknown",
+    )
+    bad = mutations.str.contains(re.compile(r"(?:\?|\(|\)|\+|\-|\*)"))
+    good = mutations[~bad]
+    groups = good.str.extract(mutation_pattern)
+    positions = groups[0].str.split("_", expand=True)
+    starts = positions[0].astype(int)
+    ends = positions[1].fillna(positions[0]).astype(int)
+    inserted = groups[1].str.extract(r"ins([A-Z]+)")[0]
+    return mutation_type, starts, ends, inserted
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    n_distinct = int(sys.argv[2]) if len(sys.argv) > 2 else 50000
+    mutations = random_mutations(n, n_distinct, np.random.default_rng(0))
+
+    legacy_elapsed, (mutation_type, starts, ends, _) = timed(legacy, mutations)
+    elapsed, parsed = timed(parse_mutations, mutations)
+    assert (parsed["mutation_type"].values == mutation_type).all()
+    assert (parsed["start_position"][starts.index] == starts).all()
+    assert (parsed["end_position"][ends.index] == ends).all()
+
+    print(f"{'mutations':>10} {'distinct':>9} {'per row':>9} {'parsed once':>12} {'speedup':>8}")
+    print(
+        f"{n:>10} {n_distinct:>9} {legacy_elapsed:>8.2f}s {elapsed:>11.2f}s "
+        f"{legacy_elapsed / elapsed:>7.0f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
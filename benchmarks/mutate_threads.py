@@ -0,0 +1,81 @@
+"""
+Benchmark gget.mutate with threads=1 (a single process) against worker processes
+(threads=2, 4, ... up to the number of CPUs) on random mutations of a synthetic genome
+(see read_fasta.py). Each run writes the mutated sequences to a fasta file, and the
+files of all runs are checked to be identical.
+
+Usage: python benchmarks/mutate_threads.py [size_mb] [n_mutations]
+(default: 200 MB, 1000000 mutations)
+"""
+
+import os
+import sys
+import time
+import filecmp
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from read_fasta import generate
+from gget.utils import IndexedFasta
+from gget.gget_mutate import mutate
+
+
+def random_mutations(path, n, rng):
+    with IndexedFasta(path, key=lambda name: name.split()[0]) as fasta:
+        lengths = {seq_id: fasta.length(seq_id) for seq_id in fasta}
+
+    seq_ids = np.array(list(lengths))
+    chosen = rng.integers(0, len(seq_ids), n)
+    positions = (rng.random(n) * (np.array(list(lengths.values()))[chosen] - 2)).astype(np.int64) + 1
+    kinds = rng.integers(0, 3, n)
+    mutations = np.where(
+        kinds == 0,
+        [f"c.{p}del" for p in positions],
+        np.where(kinds == 1, [f"c.{p}_{p + 1}insA" for p in positions], [f"c.{p}dup" for p in positions]),
+    )
+    return pd.DataFrame(
+        {
+            "mutation": mutations,
+            "mut_ID": [f"mut{i}" for i in range(n)],
+            "seq_ID": seq_ids[chosen],
+        }
+    )
+
+
+def main():
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    n_mutations = int(sys.argv[2]) if len(sys.argv) > 2 else 1000000
+
+    threads = [1]
+    while threads[-1] * 2 <= (os.cpu_count() or 1):
+        threads.append(threads[-1] * 2)
+    if threads[-1] == 1:
+        threads.append(2)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "genome.fa")
+        print(f"Generating {size_mb} MB genome FASTA file...")
+        generate(path, size_mb)
+
+        mutations_path = os.path.join(tmp_dir, "mutations.csv")
+        random_mutations(path, n_mutations, np.random.default_rng(0)).to_csv(mutations_path, index=False)
+
+        print(f"{'threads':>8} {'time':>9} {'speedup':>8}")
+        reference = None
+        for n in threads:
+            out = os.path.join(tmp_dir, f"mutated_{n}.fa")
+            start = time.perf_counter()
+            mutate(path, mutations_path, out=out, k=30, verbose=False, threads=n)
+            elapsed = time.perf_counter() - start
+
+            if reference is None:
+                reference = (out, elapsed)
+            else:
+                assert filecmp.cmp(reference[0], out, shallow=False)
+            print(f"{n:>8} {elapsed:>8.2f}s {reference[1] / elapsed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
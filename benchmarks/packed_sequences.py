@@ -0,0 +1,104 @@
+"""
+Benchmark the memory use and fetch speed of gget.utils.PackedSequences (2 bits per base)
+against a dictionary of Python strings on a synthetic genome FASTA file (see read_fasta.py).
+
+Each store is built in its own process so its resident memory (after building) and peak
+resident memory can be reported.
+Fetching reads n_windows random windows of 61 bases, one at a time (fetch / string slicing)
+and, for PackedSequences, all at once (fetch_many).
+
+Usage: python benchmarks/packed_sequences.py [size_mb] [n_windows]
+(default: 500 MB, 1000000 windows)
+"""
+
+import os
+import sys
+import time
+import tempfile
+import subprocess
+
+import numpy as np
+
+from read_fasta import generate
+
+
+def resident_mb():
+    # Resident pages of this process (Linux)
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024**2
+
+
+def run(store, path, n_windows):
+    from gget.utils import iter_fasta, PackedSequences
+
+    before = resident_mb()
+    start = time.perf_counter()
+    if store == "dict":
+        seqs = {title.split()[0]: seq for title, seq in iter_fasta(path)}
+    else:
+        seqs = PackedSequences((title.split()[0], seq) for title, seq in iter_fasta(path))
+    build = time.perf_counter() - start
+    store_mb = resident_mb() - before
+
+    rng = np.random.default_rng(0)
+    key = max(seqs, key=lambda k: len(seqs[k]))
+    starts = rng.integers(0, len(seqs[key]) - 61, n_windows)
+    ends = starts + 61
+
+    start = time.perf_counter()
+    if store == "dict":
+        seq = seqs[key]
+        windows = [seq[a:b] for a, b in zip(starts.tolist(), ends.tolist())]
+    else:
+        windows = [seqs.fetch(key, a, b) for a, b in zip(starts.tolist(), ends.tolist())]
+    fetch = time.perf_counter() - start
+
+    if store == "dict":
+        fetch_many = fetch
+    else:
+        start = time.perf_counter()
+        assert seqs.fetch_many(key, starts, ends) == windows
+        fetch_many = time.perf_counter() - start
+
+    print(f"{build} {fetch} {fetch_many} {store_mb}")
+
+
+def measure(store, path, n_windows):
+    process = subprocess.Popen(
+        [sys.executable, __file__, "--run", store, path, str(n_windows)],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    output = process.stdout.read()
+    _, status, usage = os.wait4(process.pid, 0)
+    if status != 0:
+        raise RuntimeError(f"{store} failed with status {status}.")
+    build, fetch, fetch_many, store_mb = (float(value) for value in output.split())
+    # ru_maxrss is reported in kilobytes on Linux
+    return build, fetch, fetch_many, store_mb, usage.ru_maxrss / 1024
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--run":
+        run(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+        return
+
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    n_windows = int(sys.argv[2]) if len(sys.argv) > 2 else 1000000
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "genome.fa")
+        print(f"Generating {size_mb} MB genome FASTA file...")
+        generate(path, size_mb)
+
+        for store in ("dict", "PackedSequences"):
+            build, fetch, fetch_many, store_mb, peak_mb = measure(store, path, n_windows)
+            print(
+                f"{store:<16} build {build:>6.2f} s  fetch {fetch:>6.2f} s  "
+                f"fetch_many {fetch_many:>6.2f} s  memory {store_mb:>6.0f} MB  "
+                f"peak memory {peak_mb:>6.0f} MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
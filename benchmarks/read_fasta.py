@@ -0,0 +1,124 @@
+"""
+Benchmark the run time and peak memory of gget.utils.read_fasta and iter_fasta against
+the previous line-by-line implementation (which grew each sequence by string
+concatenation) on a synthetic multi-line genome FASTA file (60 characters per line,
+24 chromosomes with human-like relative lengths).
+
+Each implementation runs in its own process so its peak resident memory can be
+reported. The file is generated in a temporary directory and deleted afterwards.
+
+Usage: python benchmarks/read_fasta.py [size_mb]
+(default: 3000 MB, the size of a human genome assembly)
+"""
+
+import os
+import sys
+import time
+import random
+import subprocess
+import tempfile
+
+# Relative lengths of the human chromosomes 1-22, X and Y (Mb)
+CHROMOSOME_MB = [
+    248, 242, 198, 190, 181, 171, 159, 145, 138, 134, 135, 133,
+    114, 107, 102, 90, 83, 80, 59, 64, 47, 51, 156, 57,
+]
+
+
+def legacy_read_fasta(fasta):
+    # Implementation replaced by the streaming parser
+    titles = []
+    seqs = []
+    title_last = False
+    new_seq = False
+    with open(fasta) as fasta_file:
+        for i, line in enumerate(fasta_file):
+            if i == 0 and line[0] != ">":
+                raise ValueError("Expected FASTA file to start with a '>' character. ")
+            elif line[0] == ">":
+                if title_last:
+                    raise ValueError("Missing sequence line.")
+                if new_seq:
+                    seqs.append(new_seq)
+                titles.append(line.strip().replace(">", ""))
+                title_last = True
+            else:
+                if title_last:
+                    new_seq = line.strip()
+                else:
+                    new_seq = new_seq + line.strip()
+                title_last = False
+        seqs.append(new_seq)
+
+    return titles, seqs
+
+
+def run(implementation, path):
+    from gget.utils import read_fasta, iter_fasta
+
+    start = time.perf_counter()
+    if implementation == "legacy":
+        titles, seqs = legacy_read_fasta(path)
+        total = sum(len(seq) for seq in seqs)
+    elif implementation == "read_fasta":
+        titles, seqs = read_fasta(path)
+        total = sum(len(seq) for seq in seqs)
+    else:
+        # One pass without keeping the sequences
+        total = sum(len(seq) for _, seq in iter_fasta(path))
+    print(f"{time.perf_counter() - start} {total}")
+
+
+def generate(path, size_mb):
+    random.seed(0)
+    # Reuse a pool of random lines so generation is not the bottleneck
+    pool = ["".join(random.choices("ACGTN", weights=[30, 20, 20, 30, 1], k=60)) for _ in range(4096)]
+    scale = size_mb * 1024**2 / (sum(CHROMOSOME_MB) * 1024**2)
+
+    with open(path, "w") as f:
+        for i, mb in enumerate(CHROMOSOME_MB):
+            n_lines = max(1, int(mb * 1024**2 * scale / 61))
+            f.write(f">chr{i + 1} dna:chromosome\n")
+            for j in range(0, n_lines, len(pool)):
+                f.write("\n".join(pool[: min(len(pool), n_lines - j)]) + "\n")
+
+    return os.path.getsize(path)
+
+
+def measure(implementation, path):
+    process = subprocess.Popen(
+        [sys.executable, __file__, "--run", implementation, path],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    output = process.stdout.read()
+    _, status, usage = os.wait4(process.pid, 0)
+    if status != 0:
+        raise RuntimeError(f"{implementation} failed with status {status}.")
+    elapsed, total = output.split()
+    # ru_maxrss is reported in kilobytes on Linux
+    return float(elapsed), int(total), usage.ru_maxrss / 1024
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--run":
+        run(sys.argv[2], sys.argv[3])
+        return
+
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "genome.fa")
+        print(f"Generating {size_mb} MB genome FASTA file...")
+        generate(path, size_mb)
+
+        totals = set()
+        for implementation in ("legacy", "read_fasta", "iter_fasta"):
+            elapsed, total, peak_mb = measure(implementation, path)
+            totals.add(total)
+            print(f"{implementation:<12} {elapsed:>8.2f} s  peak memory {peak_mb:>8.0f} MB")
+        assert len(totals) == 1
+
+
+if __name__ == "__main__":
+    main()
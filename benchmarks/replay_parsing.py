@@ -0,0 +1,81 @@
+"""
+Benchmark gget's own parsing and DataFrame-building overhead by replaying
+recorded HTTP responses from a cassette (gget.utils.configure_cassette).
+
+The first run records the cassette (requires network access), later runs
+replay it offline, so the timings exclude network latency.
+
+Usage: python benchmarks/replay_parsing.py [cassette] [repeats] [--record]
+"""
+
+import os
+import sys
+import time
+import logging
+
+from gget.constants import NCBI_EUTILS_BASE_EFETCH
+from gget.utils import configure_cassette, http_request, set_up_logger
+from gget.gget_info import info
+from gget.gget_opentargets import opentargets
+from gget.gget_virus import _parse_genbank_xml
+
+CASSETTE = os.path.join(os.path.dirname(__file__), "cassettes", "parsing.jsonl.gz")
+
+ENS_IDS = ["ENSG00000034713", "ENSG00000104853", "ENSG00000170296"]
+GENBANK_ACCESSIONS = ["MN908947.3", "OQ291490.1", "OQ291491.1", "OQ291492.1"]
+
+
+def parse_genbank():
+    r = http_request(
+        "GET",
+        NCBI_EUTILS_BASE_EFETCH,
+        params={
+            "db": "nuccore",
+            "id": ",".join(GENBANK_ACCESSIONS),
+            "rettype": "gb",
+            "retmode": "xml",
+        },
+    )
+    return _parse_genbank_xml(r.text)
+
+
+WORKLOADS = {
+    "info": lambda: info(ENS_IDS, verbose=False),
+    "opentargets diseases": lambda: opentargets(
+        "ENSG00000169194", resource="diseases", verbose=False
+    ),
+    "opentargets drugs": lambda: opentargets(
+        "ENSG00000169194", resource="drugs", verbose=False
+    ),
+    "virus GenBank XML": parse_genbank,
+}
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    path = args[0] if args else CASSETTE
+    repeats = int(args[1]) if len(args) > 1 else 20
+    record = "--record" in sys.argv or not os.path.exists(path)
+
+    # Silence progress logging so it does not dominate the timings
+    set_up_logger().setLevel(logging.ERROR)
+
+    if record:
+        print(f"Recording cassette {path} (network access required)")
+        configure_cassette(path, mode="record")
+        for workload in WORKLOADS.values():
+            workload()
+
+    configure_cassette(path, mode="replay")
+    print(f"Replaying cassette {path}, best of {repeats} runs")
+    for label, workload in WORKLOADS.items():
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            workload()
+            best = min(best, time.perf_counter() - start)
+        print(f"{label:<22} {best * 1000:>9.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,4 @@
-from .gget_ref import ref
-from .gget_search import search
-from .gget_info import info
-from .gget_seq import seq
-from .gget_muscle import muscle
-from .gget_blast import blast
-from .gget_blat import blat
-from .gget_enrichr import enrichr
-from .gget_archs4 import archs4
-from .gget_alphafold import alphafold
-from .gget_setup import setup
-from .gget_pdb import pdb
-from .gget_gpt import gpt
-from .gget_cellxgene import cellxgene
-from .gget_elm import elm
-from .gget_diamond import diamond
-from .gget_cosmic import cosmic
-from .gget_mutate import mutate
-from .gget_opentargets import opentargets
-from .gget_cbio import cbio_plot, cbio_search
-from .gget_bgee import bgee
-from .gget_8cube import specificity, psi_block, gene_expression
-from .gget_virus import virus
-
+import importlib
 import logging
 
 # Mute numexpr threads info
@@ -42,3 +19,62 @@ except PackageNotFoundError:
 
 __author__ = "Laura Luebbert"
 __email__ = "lauralubbert@gmail.com"
+
+
+# Module functions are imported on first access (PEP 562) so that "import gget" and the
+# command line interface do not pay for loading every module and its dependencies
+_LAZY_ATTRIBUTES = {
+    "ref": ".gget_ref",
+    "search": ".gget_search",
+    "info": ".gget_info",
+    "seq": ".gget_seq",
+    "muscle": ".gget_muscle",
+    "blast": ".gget_blast",
+    "blat": ".gget_blat",
+    "enrichr": ".gget_enrichr",
+    "archs4": ".gget_archs4",
+    "alphafold": ".gget_alphafold",
+    "setup": ".gget_setup",
+    "pdb": ".gget_pdb",
+    "gpt": ".gget_gpt",
+    "cellxgene": ".gget_cellxgene",
+    "elm": ".gget_elm",
+    "diamond": ".gget_diamond",
+    "cosmic": ".gget_cosmic",
+    "mutate": ".gget_mutate",
+    "opentargets": ".gget_opentargets",
+    "cbio_plot": ".gget_cbio",
+    "cbio_search": ".gget_cbio",
+    "bgee": ".gget_bgee",
+    "specificity": ".gget_8cube",
+    "psi_block": ".gget_8cube",
+    "gene_expression": ".gget_8cube",
+    "virus": ".gget_virus",
+    "serve": ".gget_serve",
+    "batch": ".gget_batch",
+    "stats": ".utils",
+    "reset_stats": ".utils",
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+    elif name.startswith("gget_") or name in ("utils", "constants", "compile"):
+        # Submodules, e.g. gget.gget_mutate
+        try:
+            value = importlib.import_module(f".{name}", __name__)
+        except ModuleNotFoundError:
+            raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    # Cache the attribute so __getattr__ is only called on first access
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
@@ -7,6 +7,80 @@ ENSEMBL_FTP_URL_GRCH37 = "http://ftp.ensembl.org/pub/grch37/"
 # Non-vertebrate server
 ENSEMBL_FTP_URL_NV = "http://ftp.ensemblgenomes.org/pub/"
 
+# Shared HTTP session configuration (see utils.get_session)
+# Number of per-host keep-alive connection pools cached by the session
+HTTP_POOL_CONNECTIONS = 32
+# Default number of keep-alive connections kept open per host
+HTTP_POOL_MAXSIZE = 10
+# Per-host overrides of the number of keep-alive connections
+HTTP_HOST_POOL_MAXSIZE = {
+    "rest.ensembl.org": 15,
+    "rest.uniprot.org": 20,
+    "www.ebi.ac.uk": 20,
+    "api.platform.opentargets.org": 10,
+    "eutils.ncbi.nlm.nih.gov": 10,
+    "api.ncbi.nlm.nih.gov": 10,
+}
+# Maximum number of requests per second per host, enforced process-wide by a token bucket
+# rate limiter (see utils.acquire_rate_limit). Hosts not listed here are not rate limited.
+HTTP_RATE_LIMITS = {
+    "rest.ensembl.org": 15,
+    "rest.uniprot.org": 25,
+    "www.ebi.ac.uk": 20,
+    "eutils.ncbi.nlm.nih.gov": 3,
+    "api.ncbi.nlm.nih.gov": 5,
+    "www.ncbi.nlm.nih.gov": 3,
+    # NCBI BLAST: do not contact the server more often than once every 10 seconds
+    "blast.ncbi.nlm.nih.gov": 0.1,
+}
+# NCBI rate limits when an API key is provided (argument or NCBI_API_KEY environment variable)
+HTTP_RATE_LIMITS_NCBI_API_KEY = {
+    "eutils.ncbi.nlm.nih.gov": 10,
+    "api.ncbi.nlm.nih.gov": 10,
+}
+# Maximum number of worker threads used by the asynchronous request engine (see utils.run_async)
+HTTP_ASYNC_MAX_WORKERS = 64
+
+# Persistent HTTP response cache (see utils.configure_cache)
+# Maximum size of the on-disk cache in bytes (least recently used entries are evicted first)
+HTTP_CACHE_MAX_SIZE = 2 * 1024**3
+# Time to live (in seconds) of cached responses per host/path prefix (longest matching prefix wins)
+# Only responses from prefixes listed here are cached
+HTTP_CACHE_TTL = {
+    "rest.ensembl.org": 30 * 86400,
+    "ftp.ensembl.org/pub/VERSION": 86400,
+    "rest.uniprot.org": 7 * 86400,
+    "www.ebi.ac.uk/pdbe/": 30 * 86400,
+    "data.rcsb.org": 90 * 86400,
+    "files.rcsb.org": 90 * 86400,
+    "files.wwpdb.org": 90 * 86400,
+    "bgee.org/api": 30 * 86400,
+    "api.platform.opentargets.org": 7 * 86400,
+    "maayanlab.cloud/matrixapi": 30 * 86400,
+    "maayanlab.cloud/archs4": 30 * 86400,
+}
+# Prefixes whose cached responses are only valid for the Ensembl release they were fetched from
+HTTP_CACHE_ENSEMBL_RELEASE_SCOPED = ("rest.ensembl.org",)
+
+# Upper bounds (seconds) of the latency histogram buckets reported by gget.stats()
+STATS_LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+# Seconds the latest Ensembl release and species lists are kept in memory (see utils.memoize)
+MEMO_TTL = 3600
+
+# Size of the blocks (bytes) read and written by utils.FastaIO
+FASTA_IO_BUFFER_SIZE = 8 * 1024**2
+
+# Uncompressed size (bytes) and zlib compression level of the blocks of bgzip (BGZF) files written by gget
+BGZF_BLOCK_SIZE = 0xFF00
+BGZF_COMPRESSION_LEVEL = 6
+
+# Name of the Unix socket of the gget serve daemon in the user's runtime directory
+# ($XDG_RUNTIME_DIR, or a private directory in the temporary directory), and the
+# TCP address used instead on platforms without Unix sockets
+SERVE_SOCKET_NAME = "gget.sock"
+SERVE_DEFAULT_TCP_ADDRESS = "127.0.0.1:8765"
+
 # NCBI URL for gget info
 NCBI_URL = "https://www.ncbi.nlm.nih.gov"
 
@@ -72,6 +146,7 @@ COSMIC_RELEASE_URL = "https://cancer.sanger.ac.uk/cosmic/release_notes"
 
 # OpenTargets API endpoint
 OPENTARGETS_GRAPHQL_API = "https://api.platform.opentargets.org/api/v4/graphql"
+OPENTARGETS_RESOURCES = {"diseases", "drugs", "tractability", "pharmacogenetics", "expression", "depmap", "interactions"}
 
 # CBIO data
 CBIO_CANCER_TYPE_TO_TISSUE_DICTIONARY = {
@@ -330,3 +405,13 @@ CBIO_CANCER_TYPE_ACRONYM_TO_TISSUE_DICTIONARY = {
     "vsc": "cervix",
     "wt": "kidney",
 }
+
+# Number of files the mutated sequences of gget mutate are split into (by sequence hash)
+# to merge identical sequences across chunks (mutate with chunk_size)
+MUTATE_MERGE_BUCKETS = 64
+
+# Number of characters of the k-mer overlap checks of gget mutate processed at a time
+MUTATE_KMER_BATCH_SIZE = 2**20
+
+# Number of k-mer hashes collected before they are deduplicated while building the k-mer index of gget mutate
+MUTATE_KMER_INDEX_MERGE_SIZE = 2**24
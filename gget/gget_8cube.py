@@ -1,9 +1,8 @@
-import requests
 import pandas as pd
 import json as json_package
 import io
 
-from .utils import set_up_logger
+from .utils import set_up_logger, http_request
 
 logger = set_up_logger()
 
@@ -100,7 +99,7 @@ def specificity(
     if verbose:
         logger.info(f"Fetching specificity for {len(processed)} genes…")
 
-    r = requests.get(SPECIFICITY_URL, params=params)
+    r = http_request("GET", SPECIFICITY_URL, params=params)
     if not r.ok:
         raise RuntimeError(f"Specificity request failed ({r.status_code}): {r.text}")
 
@@ -170,7 +169,7 @@ def psi_block(
             f"({analysis_level}, {analysis_type})…"
         )
 
-    r = requests.get(PSI_BLOCK_URL, params=params)
+    r = http_request("GET", PSI_BLOCK_URL, params=params)
     if not r.ok:
         raise RuntimeError(f"ψ-block request failed ({r.status_code}): {r.text}")
 
@@ -241,7 +240,7 @@ def gene_expression(
             f"({analysis_level}, {analysis_type})…"
         )
 
-    r = requests.get(GENE_EXPR_URL, params=params)
+    r = http_request("GET", GENE_EXPR_URL, params=params)
     if not r.ok:
         raise RuntimeError(
             f"Gene expression request failed ({r.status_code}): {r.text}"
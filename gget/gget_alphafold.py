@@ -31,7 +31,7 @@ from IPython import display
 from ipywidgets import GridspecLayout
 from ipywidgets import Output
 
-from .utils import set_up_logger
+from .utils import set_up_logger, track_subprocess, iter_fasta
 
 logger = set_up_logger()
 
@@ -144,7 +144,11 @@ def get_msa(fasta_path, msa_databases, total_jackhmmer_chunks):
                 z_value=db_config["z_value"],
             )
             # Group the results by database name.
-            raw_msa_results[db_name].extend(jackhmmer_runner.query(fasta_path))
+            with track_subprocess(
+                f"jackhmmer {db_name}", inputs=[fasta_path]
+            ) as call:
+                raw_msa_results[db_name].extend(jackhmmer_runner.query(fasta_path))
+                call["status"] = 0
 
     return raw_msa_results
 
@@ -390,28 +394,8 @@ def alphafold(
                         seqs.append(line.strip())
 
         elif ".fa" in sequence:
-            # Read the FASTA
-            titles = []
-            seqs = []
-            with open(sequence) as fasta_file:
-                for i, line in enumerate(fasta_file):
-                    # Each second line will be a title line
-                    if i % 2 == 0:
-                        if line[0] != ">":
-                            raise ValueError(
-                                "Expected FASTA to start with a '>' character. "
-                            )
-                        else:
-                            # Append title line to titles list
-                            titles.append(line.strip())
-                    else:
-                        if line[0] == ">":
-                            raise ValueError(
-                                "FASTA contains two lines starting with '>' in a row -> missing sequence line. "
-                            )
-                        # Append sequences line to seqs list
-                        else:
-                            seqs.append(line.strip())
+            # Read the FASTA (sequences may span multiple lines)
+            seqs = [seq for _, seq in iter_fasta(sequence)]
         else:
             raise ValueError(
                 "File format not recognized. gget alphafold only supports '.txt' or '.fa' files. "
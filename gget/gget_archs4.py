@@ -1,9 +1,8 @@
-import requests
 import pandas as pd
 import json as json_package
 import io
 
-from .utils import set_up_logger
+from .utils import set_up_logger, http_request
 
 logger = set_up_logger()
 
@@ -101,7 +100,7 @@ def archs4(
         # Dictionary with arguments
         json_dict = {"id": gene, "count": gene_count}
 
-        r = requests.post(url=GENECORR_URL, json=json_dict)
+        r = http_request("POST", url=GENECORR_URL, json=json_dict)
 
         if not r.ok:
             raise RuntimeError(
@@ -164,7 +163,9 @@ def archs4(
         url = EXPRESSION_URL + query
 
         # Submit API query
-        r = requests.post(url=url, headers={"Content-Type": "application/json"})
+        r = http_request(
+            "POST", url=url, headers={"Content-Type": "application/json"}
+        )
 
         if not r.ok:
             raise RuntimeError(
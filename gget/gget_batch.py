@@ -0,0 +1,152 @@
+import json as json_package
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from tqdm import tqdm
+
+from .utils import set_up_logger, get_gget_function, json_compatible
+
+logger = set_up_logger()
+
+
+def read_jobs(jobs_file):
+    """
+    Read a JSON lines jobs file.
+
+    Args:
+    - jobs_file   Path to the jobs file. Each line is a JSON object naming the gget function in
+                  "command" and its arguments in "args" (list of positional arguments or dictionary
+                  of keyword arguments) and/or "kwargs", plus an optional unique "id".
+                  Empty lines and lines starting with "#" are skipped.
+
+    Returns a list of job dictionaries with ids assigned ("job_<line number>" by default).
+    """
+    jobs = []
+    with open(jobs_file, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                job = json_package.loads(line)
+            except ValueError as e:
+                raise ValueError(f"Line {line_number} of {jobs_file} is not valid JSON: {e}")
+            if not isinstance(job, dict) or "command" not in job:
+                raise ValueError(
+                    f"Line {line_number} of {jobs_file} must be a JSON object with a 'command' key."
+                )
+            job.setdefault("id", f"job_{line_number}")
+            jobs.append(job)
+
+    ids = [str(job["id"]) for job in jobs]
+    if len(set(ids)) != len(ids):
+        raise ValueError(f"Job ids in {jobs_file} must be unique.")
+
+    return jobs
+
+
+def run_job(job):
+    """
+    Run one job and return its result record
+    {"id", "command", "ok", "result" or "error", "elapsed"}.
+    """
+    start = time.perf_counter()
+    record = {"id": job["id"], "command": job["command"]}
+    try:
+        function = get_gget_function(job["command"])
+        args = job.get("args", [])
+        kwargs = dict(job.get("kwargs", {}))
+        if isinstance(args, dict):
+            kwargs.update(args)
+            args = []
+        record["result"] = json_compatible(function(*args, **kwargs))
+        record["ok"] = True
+    except Exception as e:
+        record["ok"] = False
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["elapsed"] = round(time.perf_counter() - start, 3)
+
+    return record
+
+
+def batch(jobs, workers=4, out=None, out_dir=None, verbose=True):
+    """
+    Run many gget queries concurrently from a jobs file.
+
+    Args:
+    - jobs      Path to a JSON lines jobs file or list of job dictionaries. Each job names the gget
+                function in "command" and its arguments in "args" (list of positional arguments or
+                dictionary of keyword arguments) and/or "kwargs", plus an optional unique "id", e.g.
+                {"id": "q1", "command": "info", "args": {"ens_ids": ["ENSG00000034713"], "verbose": false}}
+    - workers   Number of jobs run at the same time. Default: 4.
+                Requests of all workers share the per-host rate limits of the process, so
+                additional workers never exceed the request rate allowed by a server.
+    - out       Path to a JSON lines file the result records are streamed to as the jobs finish.
+                Default: None -> standard out (unless out_dir is set).
+    - out_dir   Path to a folder in which the result record of each job is saved as <id>.json.
+                Default: None.
+    - verbose   True/False whether to show a progress bar with the estimated time remaining. Default: True.
+
+    Returns a summary dictionary with the number of jobs, succeeded and failed jobs, and the run time.
+    Each result record contains "id", "command", "ok", "result" (or "error") and "elapsed" (seconds).
+    """
+    if isinstance(jobs, str):
+        jobs = read_jobs(jobs)
+    else:
+        jobs = [dict(job, id=job.get("id", f"job_{i}")) for i, job in enumerate(jobs, start=1)]
+
+    if workers < 1:
+        raise ValueError(f"'workers' argument specified as {workers}. Expected a positive integer.")
+
+    if out_dir is not None:
+        os.makedirs(out_dir, exist_ok=True)
+
+    if out is not None:
+        directory = os.path.dirname(os.path.abspath(out))
+        os.makedirs(directory, exist_ok=True)
+        out_handle = open(out, "w", encoding="utf-8")
+    elif out_dir is None:
+        out_handle = sys.stdout
+    else:
+        out_handle = None
+
+    failed = 0
+    start = time.perf_counter()
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gget_batch") as executor, tqdm(
+            total=len(jobs), desc="gget batch", unit="job", disable=not verbose, file=sys.stderr
+        ) as pbar:
+            futures = [executor.submit(run_job, job) for job in jobs]
+            for future in as_completed(futures):
+                record = future.result()
+                failed += not record["ok"]
+                line = json_package.dumps(record, ensure_ascii=False, default=str)
+
+                # Results are written by this thread only, as the jobs finish
+                if out_handle is not None:
+                    out_handle.write(line + "\n")
+                    out_handle.flush()
+                if out_dir is not None:
+                    file_name = str(record["id"]).replace("/", "_").replace(os.sep, "_")
+                    with open(
+                        os.path.join(out_dir, f"{file_name}.json"), "w", encoding="utf-8"
+                    ) as f:
+                        f.write(line + "\n")
+
+                if not record["ok"] and verbose:
+                    logger.warning(f"Job {record['id']} ({record['command']}) failed: {record['error']}")
+                pbar.set_postfix(failed=failed, refresh=False)
+                pbar.update(1)
+    finally:
+        if out is not None:
+            out_handle.close()
+
+    return {
+        "jobs": len(jobs),
+        "succeeded": len(jobs) - failed,
+        "failed": failed,
+        "elapsed": round(time.perf_counter() - start, 3),
+    }
@@ -1,9 +1,7 @@
 import pandas as pd
 import json as json_
 
-import requests
-
-from .utils import set_up_logger, json_list_to_df
+from .utils import set_up_logger, json_list_to_df, http_request
 
 logger = set_up_logger()
 
@@ -19,7 +17,8 @@ def _bgee_species(gene_id: str, verbose=True):
     if verbose:
         logger.info(f"Getting species ID for gene {gene_id} from Bgee")
 
-    response = requests.get(
+    response = http_request(
+        "GET",
         "https://bgee.org/api/",
         params={
             "display_type": "json",
@@ -68,7 +67,8 @@ def _bgee_orthologs(gene_id, json=False, verbose=True):
         logger.info(f"Getting orthologs for gene {gene_id} from Bgee")
 
     # then obtain homologs
-    response = requests.get(
+    response = http_request(
+        "GET",
         f"https://bgee.org/api/",
         params={
             "display_type": "json",
@@ -136,7 +136,8 @@ def _bgee_expression(gene_id, json=False, verbose=True):
         logger.info(f"Getting expression data for gene {', '.join(gene_ids)} from Bgee")
 
     # then obtain expression data
-    response = requests.get(
+    response = http_request(
+        "GET",
         "https://bgee.org/api/",
         params={
             "display_type": "json",
@@ -11,7 +11,14 @@ from urllib.request import urlopen, Request
 from urllib.parse import urlencode
 
 # Custom functions
-from .utils import parse_blast_ref_page, wrap_cols_func, read_fasta, set_up_logger
+from .utils import (
+    parse_blast_ref_page,
+    wrap_cols_func,
+    iter_fasta,
+    set_up_logger,
+    acquire_rate_limit,
+    track_io,
+)
 
 logger = set_up_logger()
 
@@ -88,16 +95,16 @@ def blast(
     # read the file and extract the first sequence
     if "." in sequence:
         if ".txt" in sequence or ".fa" in sequence:
-            _, seqs = read_fasta(sequence)
+            fasta_records = iter_fasta(sequence)
 
         else:
             raise ValueError(
                 "File format not recognized. gget BLAST currently only supports '.txt' or '.fa' files. "
             )
 
-        # Set the first sequence from the fasta file as 'sequence'
-        sequence = seqs[0]
-        if len(seqs) > 1:
+        # Set the first sequence from the fasta file as 'sequence' (only the first two records are read)
+        _, sequence = next(fasta_records)
+        if next(fasta_records, None) is not None:
             logger.warning(
                 "File contains more than one sequence. Only the first sequence will be submitted to BLAST."
             )
@@ -236,7 +243,11 @@ def blast(
 
     # Submit search to server
     request = Request(url, put_message, {"User-Agent": client})
-    handle = urlopen(request)
+    with track_io("http", "blast.ncbi.nlm.nih.gov/Blast.cgi") as call:
+        call["throttle"] = acquire_rate_limit(url)
+        handle = urlopen(request)
+        call["status"] = handle.status
+        call["bytes_out"] = len(put_message)
 
     ## Fetch Request ID (RID) and estimated time to completion (RTOE)
     RID, RTOE = parse_blast_ref_page(handle)
@@ -280,8 +291,13 @@ def blast(
 
         # Query for search status
         request = Request(url, get_message, {"User-Agent": client})
-        handle = urlopen(request)
-        results = handle.read().decode()
+        with track_io("http", "blast.ncbi.nlm.nih.gov/Blast.cgi") as call:
+            call["throttle"] = acquire_rate_limit(url)
+            handle = urlopen(request)
+            results = handle.read().decode()
+            call["status"] = handle.status
+            call["bytes_out"] = len(get_message)
+            call["bytes_in"] = len(results)
 
         # Fetch search status
         i = results.index("Status=")
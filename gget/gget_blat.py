@@ -3,7 +3,7 @@ from json.decoder import JSONDecodeError
 import pandas as pd
 from urllib import request
 
-from .utils import set_up_logger, read_fasta
+from .utils import set_up_logger, iter_fasta, track_io
 
 logger = set_up_logger()
 
@@ -38,16 +38,16 @@ def blat(
     # read the file and extract the first sequence
     if "." in sequence:
         if ".txt" in sequence or ".fa" in sequence:
-            _, seqs = read_fasta(sequence)
+            fasta_records = iter_fasta(sequence)
 
         else:
             raise ValueError(
                 "File format not recognized. gget BLAT currently only supports '.txt' or '.fa' files. "
             )
 
-        # Set the first sequence from the fasta file as 'sequence'
-        sequence = seqs[0]
-        if len(seqs) > 1:
+        # Set the first sequence from the fasta file as 'sequence' (only the first two records are read)
+        _, sequence = next(fasta_records)
+        if next(fasta_records, None) is not None:
             if verbose:
                 logger.info(
                     "File contains more than one sequence. Only the first sequence will be submitted to BLAT."
@@ -128,12 +128,14 @@ def blat(
                 "User-Agent": "gget"
             }
         )
-    r = request.urlopen(req)
-
-    # Get status code (in a way that is stable across Python versions)
-    code = getattr(r, "status", None)
-    if code is None:
-        code = r.getcode()
+    with track_io("http", "genome.ucsc.edu/cgi-bin") as call:
+        r = request.urlopen(req)
+
+        # Get status code (in a way that is stable across Python versions)
+        code = getattr(r, "status", None)
+        if code is None:
+            code = r.getcode()
+        call["status"] = code
 
     if code != 200:
         raise RuntimeError(
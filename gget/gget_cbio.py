@@ -11,7 +11,7 @@ from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from collections import defaultdict, OrderedDict
 
-from .utils import set_up_logger
+from .utils import set_up_logger, http_request
 
 import matplotlib.pyplot as plt
 from matplotlib.colors import ListedColormap, BoundaryNorm, TwoSlopeNorm
@@ -375,7 +375,9 @@ def cbio_search(key_words):
 def _get_ensembl_gene_id(transcript_id: str, verbose=False):
     try:
         url = f"https://rest.ensembl.org/lookup/id/{transcript_id}?expand=1"
-        response = requests.get(url, headers={"Content-Type": "application/json"})
+        response = http_request(
+            "GET", url, headers={"Content-Type": "application/json"}
+        )
 
         if not response.ok:
             response.raise_for_status()
@@ -395,7 +397,8 @@ def _get_ensembl_gene_id_bulk(transcript_ids):
 
     try:
         url = f"https://rest.ensembl.org/lookup/id/"
-        response = requests.post(
+        response = http_request(
+            "POST",
             url,
             json={"ids": transcript_ids},
             headers={"Content-Type": "application/json"},
@@ -422,8 +425,11 @@ def _get_ensembl_gene_name_bulk(gene_ids):
 
     try:
         url = f"https://rest.ensembl.org/lookup/id/"
-        response = requests.post(
-            url, json={"ids": gene_ids}, headers={"Content-Type": "application/json"}
+        response = http_request(
+            "POST",
+            url,
+            json={"ids": gene_ids},
+            headers={"Content-Type": "application/json"},
         )
 
         if not response.ok:
@@ -1,5 +1,6 @@
 import requests
 import pandas as pd
+import numpy as np
 import subprocess
 import os
 import re
@@ -9,10 +10,13 @@ import shutil
 import tarfile
 import gzip
 import getpass
+import io
+import itertools
+import sqlite3
 
 # Constants
 from .constants import COSMIC_GET_URL
-from .utils import set_up_logger, get_latest_cosmic
+from .utils import set_up_logger, get_latest_cosmic, combine_dtypes
 
 logger = set_up_logger()
 
@@ -207,111 +211,226 @@ def select_reference(
     return file_path, overwrite
 
 
-def make_exact_match_mask(df, searchterm_lower, cols_to_check):
+# Columns searched for the search term, depending on the cosmic_project
+COSMIC_CANCER_SEARCH_COLUMNS = [
+    "GENE_NAME",
+    "ACCESSION_NUMBER",
+    "LEGACY_MUTATION_ID",
+    "Mutation CDS",
+    "Mutation AA",
+    "GENOMIC_MUTATION_ID",
+]
+COSMIC_SEARCH_COLUMNS = [
+    "GENE_SYMBOL",
+    "TRANSCRIPT_ACCESSION",
+    "COSMIC_GENE_ID",
+    "COSMIC_SAMPLE_ID",
+    "COSMIC_PHENOTYPE_ID",
+    "GENOMIC_MUTATION_ID",
+    "LEGACY_MUTATION_ID",
+    "SAMPLE_NAME",
+    "MUTATION_CDS",
+    "MUTATION_AA",
+    "MUTATION_ID",
+    "COSMIC_STUDY_ID",
+]
+# Ensembl accessions also match without their version number
+COSMIC_ACCESSION_COLUMNS = ("ACCESSION_NUMBER", "TRANSCRIPT_ACCESSION")
+
+# Number of lines of the COSMIC tsv file parsed at a time when building its index
+COSMIC_INDEX_BATCH_SIZE = 100000
+
+
+def build_cosmic_index(cosmic_tsv_path, con, batch_size=COSMIC_INDEX_BATCH_SIZE):
     """
-    Build a boolean mask for rows where any of the specified columns match the search term exactly.
-    Handles special case for ACCESSION_NUMBER to match both with and without version.
-    Allows for columns in cols_to_check to be missing from the DataFrame.
+    Builds the search index of a COSMIC tsv file in the SQLite database con (see load_cosmic_index).
+    Raises a ValueError if a record of the file spans several lines.
     """
-    temp_cols = []
-    conditions = []
-
-    for col in cols_to_check:
-        if col not in df.columns:
-            continue
-
-        if col in ("ACCESSION_NUMBER", "TRANSCRIPT_ACCESSION"):
-            # Lowercased full Ensembl accession
-            acc_col = "__accession_number"
-            df[acc_col] = df[col].astype(str).str.lower()
-            conditions.append(df[acc_col] == searchterm_lower)
-            temp_cols.append(acc_col)
-
-            # Lowercased Ensembl accession without version number
-            acc_nov_col = "__accession_number_no_version"
-            df[acc_nov_col] = df[col].astype(str).str.split(".").str[0].str.lower()
-            conditions.append(df[acc_nov_col] == searchterm_lower)
-            temp_cols.append(acc_nov_col)
-
-        else:
-            temp_col = f"__{col.replace(' ', '_').lower()}"
-            df[temp_col] = df[col].astype(str).str.lower()
-            conditions.append(df[temp_col] == searchterm_lower)
-            temp_cols.append(temp_col)
-
-    if not conditions:
-        missing = ", ".join(cols_to_check)
-        raise ValueError(f"None of the specified columns were found in the DataFrame: {missing}")
+    # Keys are stored with the positions of their lines in the file, clustered by key
+    con.executescript(
+        """
+        PRAGMA journal_mode = OFF;
+        PRAGMA synchronous = OFF;
+        PRAGMA cache_size = -262144;
+        CREATE TABLE meta (name TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE keys (
+            key TEXT, col INTEGER, offset INTEGER, PRIMARY KEY (key, col, offset)
+        ) WITHOUT ROWID;
+        """
+    )
+
+    with open(cosmic_tsv_path, "rb") as f:
+        header = f.readline()
+        columns = list(pd.read_csv(io.BytesIO(header), sep="\t", nrows=0).columns)
+        key_columns = [
+            col
+            for col in dict.fromkeys(COSMIC_CANCER_SEARCH_COLUMNS + COSMIC_SEARCH_COLUMNS)
+            if col in columns
+        ]
+        dtypes = {}
+
+        def add_batch(lines, offsets):
+            data = header + b"".join(lines)
+            # Column types as pandas infers them, combined over all batches
+            df = pd.read_csv(io.BytesIO(data), sep="\t", low_memory=False)
+            if len(df) != len(lines):
+                raise ValueError(
+                    f"{cosmic_tsv_path} cannot be indexed because some of its records span several lines."
+                )
+            for col, dtype in df.dtypes.items():
+                dtypes[col] = combine_dtypes(dtypes[col], dtype) if col in dtypes else dtype
 
-    mask = conditions[0]
-    for cond in conditions[1:]:
-        mask |= cond
+            # Search keys are the lowercased text of the fields
+            keys = pd.read_csv(
+                io.BytesIO(data), sep="\t", usecols=key_columns, dtype=str, keep_default_na=False
+            )
+            for col_id, col in enumerate(key_columns):
+                values = keys[col].str.lower()
+                con.executemany(
+                    "INSERT OR IGNORE INTO keys VALUES (?, ?, ?)",
+                    zip(values.tolist(), itertools.repeat(col_id), offsets),
+                )
+                if col in COSMIC_ACCESSION_COLUMNS:
+                    no_version = values.str.split(".").str[0]
+                    versioned = (no_version != values).to_numpy()
+                    con.executemany(
+                        "INSERT OR IGNORE INTO keys VALUES (?, ?, ?)",
+                        zip(
+                            no_version[versioned].tolist(),
+                            itertools.repeat(col_id),
+                            np.array(offsets)[versioned].tolist(),
+                        ),
+                    )
 
-    return mask
+        lines = []
+        offsets = []
+        offset = len(header)
+        for line in f:
+            if line.strip():
+                lines.append(line if line.endswith(b"\n") else line + b"\n")
+                offsets.append(offset)
+                if len(lines) == batch_size:
+                    add_batch(lines, offsets)
+                    lines = []
+                    offsets = []
+            offset += len(line)
+        if lines:
+            add_batch(lines, offsets)
+
+    stat = os.stat(cosmic_tsv_path)
+    con.executemany(
+        "INSERT INTO meta VALUES (?, ?)",
+        [
+            ("size", str(stat.st_size)),
+            ("mtime_ns", str(stat.st_mtime_ns)),
+            ("columns", json_package.dumps(columns)),
+            ("dtypes", json_package.dumps({col: str(dtype) for col, dtype in dtypes.items()})),
+            ("key_columns", json_package.dumps(key_columns)),
+        ],
+    )
+    con.commit()
+
+
+def load_cosmic_index(cosmic_tsv_path):
+    """
+    Returns a connection to the search index of a COSMIC tsv file, the SQLite database
+    <cosmic_tsv_path>.sqlite saved next to it. The index holds the lowercased search columns
+    of every record (Ensembl accessions also without version number) with the position of the
+    record in the tsv file, so that a search only reads the matching lines of the file.
+    It is built in one pass over the file when it does not exist yet or the file has changed since.
+    """
+    index_path = f"{cosmic_tsv_path}.sqlite"
+    stat = os.stat(cosmic_tsv_path)
+    key = {"size": str(stat.st_size), "mtime_ns": str(stat.st_mtime_ns)}
+
+    if os.path.exists(index_path):
+        con = sqlite3.connect(index_path)
+        try:
+            meta = dict(con.execute("SELECT name, value FROM meta"))
+            if all(meta.get(name) == value for name, value in key.items()):
+                return con
+        except sqlite3.DatabaseError:
+            pass
+        con.close()
+
+    logger.info(f"Indexing {cosmic_tsv_path} for searching (only done once)...")
+    tmp_path = f"{index_path}.tmp"
+    try:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        con = sqlite3.connect(tmp_path)
+        try:
+            build_cosmic_index(cosmic_tsv_path, con)
+        finally:
+            con.close()
+        os.replace(tmp_path, index_path)
+        logger.info(f"Saved the search index of the COSMIC database to {index_path}")
+        return sqlite3.connect(index_path)
+    except (OSError, sqlite3.OperationalError) as e:
+        logger.warning(f"Could not save the search index of the COSMIC database to {index_path}: {e}")
+
+    con = sqlite3.connect(":memory:")
+    build_cosmic_index(cosmic_tsv_path, con)
+    return con
 
 
 def query_local_cosmic(cosmic_tsv_path, cosmic_project, searchterm, limit):
     """
-    Search the local COSMIC mutation census file for matching entries.
+    Search the local COSMIC mutation census file for entries where any of the search
+    columns of the cosmic_project match the search term exactly (ignoring case).
+    The file is searched through its index (see load_cosmic_index).
     """
-    df = pd.read_csv(cosmic_tsv_path, sep="\t", low_memory=False)
-    searchterm_lower = searchterm.lower()
-    results = []
-
-    def match_and_limit(mask, extract_fn):
-        for _, row in df[mask].head(limit).iterrows():
-            results.append(extract_fn(row))
-    
     if cosmic_project in ["cancer", "cancer_example"]:
-
-        # Columns to check for search term
-        cols_to_check = [
-            "GENE_NAME", 
-            "ACCESSION_NUMBER", 
-            "LEGACY_MUTATION_ID", 
-            "Mutation CDS", 
-            "Mutation AA",
-            "GENOMIC_MUTATION_ID"
-            ]
-        mask = make_exact_match_mask(df, searchterm_lower, cols_to_check)
-
-        match_and_limit(mask, lambda row: {
-            col.replace(" ", "_"): row[col]
-            for col in row.index
-            if not col.startswith("__")
-        })
-
+        cols_to_check = COSMIC_CANCER_SEARCH_COLUMNS
     elif cosmic_project in ["census", "resistance", "cell_line", "genome_screen", "targeted_screen", "other"]:
-        # Columns to check for search term
-        cols_to_check = [
-            "GENE_SYMBOL",
-            "TRANSCRIPT_ACCESSION",
-            "COSMIC_GENE_ID",
-            "COSMIC_SAMPLE_ID",
-            "COSMIC_PHENOTYPE_ID",
-            "GENOMIC_MUTATION_ID",
-            "LEGACY_MUTATION_ID",
-            "SAMPLE_NAME",
-            "MUTATION_CDS", 
-            "MUTATION_AA", 
-            "MUTATION_ID",
-            "COSMIC_STUDY_ID"
-            ]
-        mask = make_exact_match_mask(df, searchterm_lower, cols_to_check)
-
-        match_and_limit(mask, lambda row: {
-            col.replace(" ", "_"): row[col]
-            for col in row.index
-            if not col.startswith("__")
-        })
-
+        cols_to_check = COSMIC_SEARCH_COLUMNS
     else:
         raise ValueError(f"Unsupported cosmic_project: {cosmic_project}")
-    
-    if len(results) == 0:
+
+    con = load_cosmic_index(cosmic_tsv_path)
+    try:
+        meta = dict(con.execute("SELECT name, value FROM meta"))
+        key_columns = json_package.loads(meta["key_columns"])
+        col_ids = [i for i, col in enumerate(key_columns) if col in cols_to_check]
+        if not col_ids:
+            missing = ", ".join(cols_to_check)
+            raise ValueError(f"None of the specified columns were found in the DataFrame: {missing}")
+
+        # Matching lines in the order of the file
+        offsets = [
+            offset
+            for offset, in con.execute(
+                f"""
+                SELECT DISTINCT offset FROM keys
+                WHERE key = ? AND col IN ({", ".join("?" * len(col_ids))})
+                ORDER BY offset LIMIT ?
+                """,
+                [searchterm.lower(), *col_ids, -1 if limit is None else limit],
+            )
+        ]
+    finally:
+        con.close()
+
+    if len(offsets) == 0:
         raise ValueError(f"No results were found for searchterm '{searchterm}' and cosmic_project '{cosmic_project}' in COSMIC database file (cosmic_tsv_path) '{cosmic_tsv_path}'.")
 
-    return results
+    # Read only the matching lines, with the column types of the whole file
+    with open(cosmic_tsv_path, "rb") as f:
+        lines = []
+        for offset in offsets:
+            f.seek(offset)
+            line = f.readline()
+            lines.append(line if line.endswith(b"\n") else line + b"\n")
+
+    df = pd.read_csv(
+        io.BytesIO(b"".join(lines)),
+        sep="\t",
+        header=None,
+        names=json_package.loads(meta["columns"]),
+        dtype=json_package.loads(meta["dtypes"]),
+    )
+
+    return df.rename(columns=lambda col: col.replace(" ", "_")).to_dict("records")
 
 
 def cosmic(
@@ -374,6 +493,7 @@ def cosmic(
                         NOTE: Set to None when downloading COSMIC databases with download_cosmic=True.
     - cosmic_tsv_path   (str) Path to the COSMIC mutation tsv file, e.g. 'path/to/CancerMutationCensus_AllData_v101_GRCh37.tsv'.
                         This file is downloaded when downloading COSMIC databases using the arguments described above. 
+                        The first search builds an index of the file ('[cosmic_tsv_path].sqlite'), so later searches only read the matching lines.
                         NOTE: This is a required argument when download_cosmic=False.
     - limit             (int) Number of hits to return. Default: 100
     - json              (True/False) If True, returns results in json format instead of data frame. Default: False
@@ -494,7 +614,7 @@ def cosmic(
                     #     }
                     # )
 
-                    from gget.gget_mutate import mutation_pattern, convert_chromosome_value_to_int_when_possible
+                    from gget.gget_mutate import parse_mutations, convert_chromosome_value_to_int_when_possible
                     import numpy as np
 
                     # * uncomment to include strand information (tested not to be accurate for CMC)
@@ -508,28 +628,18 @@ def cosmic(
                         "-", expand=True
                     )
 
-                    df[["nucleotide_positions", "actual_mutation"]] = df[
-                        "mutation"
-                    ].str.extract(mutation_pattern)
+                    # Each distinct mutation is parsed once (the same mutations recur across transcripts)
+                    parsed = parse_mutations(df["mutation"])
+                    df["actual_mutation"] = parsed["actual_mutation"].values
 
-                    sub_mask = df["actual_mutation"].str.contains(">")
-                    ins_mask = (df["actual_mutation"].str.contains("ins")) & (
-                        ~df["actual_mutation"].str.contains("delins")
-                    )
-                    delins_mask = df["actual_mutation"].str.contains("delins")
+                    sub_mask = (parsed["mutation_type"] == "substitution").values
+                    ins_mask = (parsed["mutation_type"] == "insertion").values
+                    delins_mask = (parsed["mutation_type"] == "delins").values
                     ins_delins_mask = ins_mask | delins_mask
                     sub_ins_delins_mask = sub_mask | ins_delins_mask
 
-                    df.loc[sub_mask, "wt_allele_cds"] = (
-                        df.loc[sub_mask, "actual_mutation"].str.split(">").str[0]
-                    )
-                    df.loc[sub_mask, "mut_allele_cds"] = (
-                        df.loc[sub_mask, "actual_mutation"].str.split(">").str[1]
-                    )
-
-                    df.loc[ins_delins_mask, "mut_allele_cds"] = df.loc[
-                        ins_delins_mask, "actual_mutation"
-                    ].str.extract(r"ins(.+)")[0]
+                    # The new bases of substitutions, insertions and delins
+                    df["mut_allele_cds"] = parsed["inserted_nucleotides"].values
 
                     df["strand"] = np.nan
 
@@ -591,12 +701,10 @@ def cosmic(
                             "GENOME_POS",
                             "GENOME_START",
                             "GENOME_STOP",
-                            "nucleotide_positions",
                             "actual_mutation",
                             "actual_mutation_updated",
                             "actual_mutation_final",
                             "Mutation genome position GRCh37",
-                            "wt_allele_cds",
                             "mut_allele_cds",
                             "GENOMIC_WT_ALLELE_SEQ",
                             "GENOMIC_MUT_ALLELE_SEQ",
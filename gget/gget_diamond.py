@@ -7,7 +7,13 @@ import uuid
 import json as json_package
 
 from .compile import PACKAGE_PATH
-from .utils import tsv_to_df, create_tmp_fasta, remove_temp_files, set_up_logger
+from .utils import (
+    tsv_to_df,
+    create_tmp_fasta,
+    remove_temp_files,
+    set_up_logger,
+    track_subprocess,
+)
 
 logger = set_up_logger()
 
@@ -139,10 +145,12 @@ def diamond(
 
     # Step 1: Check diamond version
     version_cmd = [diamond_bin, "version"]
-    with subprocess.Popen(version_cmd, stderr=subprocess.PIPE) as process:
-        stderr = process.stderr.read().decode("utf-8")
-        if stderr:
-            sys.stderr.write(stderr)
+    with track_subprocess("diamond version") as call:
+        with subprocess.Popen(version_cmd, stderr=subprocess.PIPE) as process:
+            stderr = process.stderr.read().decode("utf-8")
+            if stderr:
+                sys.stderr.write(stderr)
+        call["status"] = process.wait()
     if process.wait() != 0:
         raise RuntimeError("DIAMOND version check failed.")
 
@@ -154,10 +162,14 @@ def diamond(
         "--db", db_path,
         "--threads", str(threads)
     ]
-    with subprocess.Popen(makedb_cmd, stderr=subprocess.PIPE) as process:
-        stderr = process.stderr.read().decode("utf-8")
-        if stderr:
-            sys.stderr.write(stderr)
+    with track_subprocess(
+        "diamond makedb", inputs=[ref_file], outputs=[f"{db_path}.dmnd"]
+    ) as call:
+        with subprocess.Popen(makedb_cmd, stderr=subprocess.PIPE) as process:
+            stderr = process.stderr.read().decode("utf-8")
+            if stderr:
+                sys.stderr.write(stderr)
+        call["status"] = process.wait()
     if process.wait() != 0:
         raise RuntimeError("DIAMOND database creation failed.")
 
@@ -175,10 +187,14 @@ def diamond(
         "--threads", str(threads),
         "--ignore-warnings"
     ]
-    with subprocess.Popen(align_cmd, stderr=subprocess.PIPE) as process:
-        stderr = process.stderr.read().decode("utf-8")
-        if stderr:
-            sys.stderr.write(stderr)
+    with track_subprocess(
+        f"diamond {diamond_program}", inputs=[in_file], outputs=[out_file]
+    ) as call:
+        with subprocess.Popen(align_cmd, stderr=subprocess.PIPE) as process:
+            stderr = process.stderr.read().decode("utf-8")
+            if stderr:
+                sys.stderr.write(stderr)
+        call["status"] = process.wait()
 
     if process.wait() != 0:
         raise RuntimeError("DIAMOND alignment failed.")
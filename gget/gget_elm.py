@@ -18,6 +18,31 @@ from .gget_setup import (
 )
 
 
+# Parsed ELM tables, keyed on path, skiprows, size and modification time
+_elm_tables = {}
+
+
+def read_elm_tsv(tsv_file, skiprows=None):
+    """
+    Read a local ELM tsv file into a data frame.
+    Parsed tables are kept in memory until the file changes (e.g. after 'gget setup elm'),
+    so repeated calls (and calls served by gget serve) do not parse them again.
+
+    Returns a copy of the data frame.
+    """
+    stat = os.stat(tsv_file)
+    key = (tsv_file, skiprows, stat.st_size, stat.st_mtime_ns)
+    df = _elm_tables.get(key)
+    if df is None:
+        df = tsv_to_df(tsv_file, skiprows=skiprows)
+        # Drop tables parsed from previous versions of the file
+        for old_key in [k for k in _elm_tables if k[:2] == key[:2]]:
+            del _elm_tables[old_key]
+        _elm_tables[key] = df
+
+    return df.copy()
+
+
 def motif_in_query(row):
     """
     Checks if motif is in the overlapping region with the query sequence
@@ -46,7 +71,7 @@ def get_elm_instances(UniProtID):
     """
     # Get matching rows from elm_instances.tsv
     # ELM Instances.tsv file contains 5 lines before headers and data
-    df_full_instances = tsv_to_df(ELM_INSTANCES_TSV, skiprows=5)
+    df_full_instances = read_elm_tsv(ELM_INSTANCES_TSV, skiprows=5)
     df_instances_matching = df_full_instances[
         df_full_instances["Primary_Acc"] == UniProtID
     ]
@@ -60,11 +85,11 @@ def get_elm_instances(UniProtID):
     )
 
     # Get class descriptions
-    df_classes = tsv_to_df(ELM_CLASSES_TSV, skiprows=5)
+    df_classes = read_elm_tsv(ELM_CLASSES_TSV, skiprows=5)
     df_classes = df_classes.rename(columns={"Accession": "class_accession"})
 
     # Get interaction domains
-    df_intdomains = tsv_to_df(ELM_INTDOMAINS_TSV)
+    df_intdomains = read_elm_tsv(ELM_INTDOMAINS_TSV)
     df_intdomains = df_intdomains.rename(
         columns={
             "ELM identifier": "ELMIdentifier",
@@ -181,9 +206,9 @@ def regex_match(sequence):
     TODO: Make sure this returns empty dataframe if no matches were found
     """
     # Get all motif regex patterns from elm db local file
-    df_elm_classes = tsv_to_df(ELM_CLASSES_TSV, skiprows=5)
-    df_full_instances = tsv_to_df(ELM_INSTANCES_TSV, skiprows=5)
-    df_full_intdomains = tsv_to_df(ELM_INTDOMAINS_TSV)
+    df_elm_classes = read_elm_tsv(ELM_CLASSES_TSV, skiprows=5)
+    df_full_instances = read_elm_tsv(ELM_INSTANCES_TSV, skiprows=5)
+    df_full_intdomains = read_elm_tsv(ELM_INTDOMAINS_TSV)
     df_full_intdomains = df_full_intdomains.rename(
         columns={
             "ELM identifier": "ELMIdentifier",
@@ -1,4 +1,3 @@
-import requests
 import pandas as pd
 import json as json_package
 import numpy as np
@@ -17,7 +16,7 @@ from .constants import (
 from .compile import PACKAGE_PATH
 from .gget_info import info
 
-from .utils import set_up_logger
+from .utils import set_up_logger, http_request
 
 logger = set_up_logger()
 
@@ -284,7 +283,7 @@ def enrichr(
         "description": (None, "gget client gene list"),
     }
 
-    r1 = requests.post(POST_ENRICHR_URLS[species], files=args_dict)
+    r1 = http_request("POST", POST_ENRICHR_URLS[species], files=args_dict)
 
     if not r1.ok:
         raise RuntimeError(
@@ -328,8 +327,8 @@ def enrichr(
             "background": (None, background_final),
         }
 
-        request_background_id = requests.post(
-            POST_BACKGROUND_ID_ENRICHR_URL, files=args_dict_background
+        request_background_id = http_request(
+            "POST", POST_BACKGROUND_ID_ENRICHR_URL, files=args_dict_background
         )
 
         if not request_background_id.ok:
@@ -346,12 +345,14 @@ def enrichr(
 
     # Submit query to Enrich using gene list and background genes list
     if not background_final:
-        r2 = requests.get(
+        r2 = http_request(
+            "GET",
             GET_ENRICHR_URLS[species],
             params={"userListId": userListId, "backgroundType": database},
         )
     else:
-        r2 = requests.post(
+        r2 = http_request(
+            "POST",
             GET_BACKGROUND_ENRICHR_URL,
             params={
                 "userListId": userListId,
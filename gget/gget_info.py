@@ -1,17 +1,19 @@
 import numpy as np
 import pandas as pd
 import json as json_package
-import requests
 from bs4 import BeautifulSoup
 
 # Custom functions
 from .utils import (
+    http_request,
     rest_query,
-    get_uniprot_info,
+    fetch_uniprot_json,
+    uniprot_json_to_info,
     wrap_cols_func,
-    get_pdb_ids,
+    async_get_pdb_ids,
     set_up_logger,
     post_query,
+    run_async,
 )
 
 logger = set_up_logger()
@@ -190,13 +192,29 @@ def info(
         # df_temp will hold information from NCBI, UniProt and PDB for each of the Ensembl IDs
         df_temp = pd.DataFrame()
 
-        for ens_id in ens_ids_clean_2:
+        # Submit the UniProt and PDBe requests for all IDs concurrently
+        if fetch_uniprot is True:
+            all_uniprot_json = run_async(
+                (
+                    fetch_uniprot_json(UNIPROT_REST_API, ens_id, verbose=verbose)
+                    for ens_id in ens_ids_clean_2
+                ),
+                return_exceptions=True,
+            )
+        if fetch_pdb:
+            all_pdb_ids = run_async(
+                (async_get_pdb_ids(ens_id) for ens_id in ens_ids_clean_2),
+                return_exceptions=True,
+            )
+
+        for i, ens_id in enumerate(ens_ids_clean_2):
             if fetch_uniprot is True:
                 try:
+                    if isinstance(all_uniprot_json[i], Exception):
+                        raise all_uniprot_json[i]
+
                     # Get gene names and descriptions from UniProt
-                    df_uniprot = get_uniprot_info(
-                        UNIPROT_REST_API, ens_id, verbose=verbose
-                    )
+                    df_uniprot = uniprot_json_to_info(all_uniprot_json[i], ens_id)
 
                 except Exception as e:
                     if verbose:
@@ -236,7 +254,7 @@ def info(
                 url = NCBI_URL + f"/gene/?term={ens_id}"
 
                 try:
-                    html = requests.get(url)
+                    html = http_request("GET", url)
                     # Raise error if status code not "OK" Response
                     if html.status_code != 200:
                         logger.error(
@@ -322,7 +340,10 @@ def info(
             if fetch_pdb:
                 ## Get PDB IDs from Ensembl ID
                 try:
-                    pdb_ids = get_pdb_ids(ens_id)
+                    if isinstance(all_pdb_ids[i], Exception):
+                        raise all_pdb_ids[i]
+
+                    pdb_ids = all_pdb_ids[i]
 
                 except Exception as e:
                     if verbose:
@@ -8,7 +8,13 @@ import uuid
 
 # Custom functions
 from .compile import compile_muscle, MUSCLE_PATH, PACKAGE_PATH
-from .utils import aa_colors, n_colors, create_tmp_fasta, set_up_logger
+from .utils import (
+    aa_colors,
+    n_colors,
+    create_tmp_fasta,
+    set_up_logger,
+    track_subprocess,
+)
 
 logger = set_up_logger()
 
@@ -105,11 +111,17 @@ def muscle(fasta, super5=False, out=None, verbose=True):
         logger.info("MUSCLE aligning... ")
 
     # Run muscle command and write command output
-    with subprocess.Popen(command, stderr=subprocess.PIPE) as process_2:
-        stderr_2 = process_2.stderr.read().decode("utf-8")
-        # Log the standard error if it is not empty
-        if stderr_2:
-            sys.stderr.write(stderr_2)
+    with track_subprocess(
+        "muscle super5" if super5 else "muscle align",
+        inputs=[abs_fasta_path],
+        outputs=[abs_out_path],
+    ) as call:
+        with subprocess.Popen(command, stderr=subprocess.PIPE) as process_2:
+            stderr_2 = process_2.stderr.read().decode("utf-8")
+            # Log the standard error if it is not empty
+            if stderr_2:
+                sys.stderr.write(stderr_2)
+        call["status"] = process_2.wait()
     # Exit system if the subprocess returned with an error
     if process_2.wait() != 0:
         return
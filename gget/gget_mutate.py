@@ -1,13 +1,32 @@
 import pandas as pd
 import re
+import json
+import hashlib
 from tqdm import tqdm
 import numpy as np
 import os
+import pickle
+import itertools
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from typing import Union, List, Optional
 
 tqdm.pandas()
 
-from .utils import read_fasta, set_up_logger
+from .constants import (
+    MUTATE_KMER_BATCH_SIZE,
+    MUTATE_KMER_INDEX_MERGE_SIZE,
+    MUTATE_MERGE_BUCKETS,
+)
+from .utils import (
+    iter_fasta,
+    IndexedFasta,
+    PackedSequences,
+    set_up_logger,
+    infer_csv_dtypes,
+    cache_dir,
+)
 
 logger = set_up_logger()
 
@@ -20,6 +39,23 @@ ambiguous_position_mutations = 0
 cosmic_incorrect_wt_base = 0
 mut_idx_outside_seq = 0
 
+# Base of the rolling k-mer hashes (odd, so it has an inverse modulo 2**64)
+KMER_HASH_BASE = np.uint64(0x9E3779B97F4A7C15)
+KMER_HASH_BASE_INVERSE = np.uint64(pow(0x9E3779B97F4A7C15, -1, 2**64))
+
+# Uppercase and complement of each ASCII code, and whether it is one of the bases A, C, G and T
+KMER_UPPERCASE = np.frombuffer(bytes(range(128)).upper(), dtype=np.uint8)
+KMER_COMPLEMENT = np.arange(128, dtype=np.uint8)
+KMER_COMPLEMENT[list(b"ACGT")] = list(b"TGCA")
+KMER_IS_BASE = np.zeros(128, dtype=bool)
+KMER_IS_BASE[list(b"ACGT")] = True
+
+# Keys of the two 64-bit hashes of the 128-bit digests of mutated sequences (see sequence_digests)
+SEQUENCE_DIGEST_KEYS = ("0123456789123456", "gget_mutate_seqs")
+
+# Types of mutations, in the order their patterns are looked for in the mutation strings (see parse_mutations)
+MUTATION_TYPES = ["substitution", "delins", "deletion", "insertion", "duplication", "inversion"]
+
 mutation_pattern = r"(?:c|g)\.([0-9_\-\+\*]+)([a-zA-Z>]+)"  # more complex: r'c\.([0-9_\-\+\*\(\)\?]+)([a-zA-Z>\(\)0-9]+)'
 
 # Get complement
@@ -39,6 +75,9 @@ complement = {
     ".": ".",  # annotation for gaps
     "-": "-",  # annotation for gaps
 }
+# Complement of each ASCII code ('N' for characters without a complement, see reverse_complement_strings)
+COMPLEMENT_CODES = np.full(128, ord("N"), dtype=np.uint8)
+COMPLEMENT_CODES[[ord(base) for base in complement]] = [ord(base) for base in complement.values()]
 
 
 codon_to_amino_acid = {
@@ -108,6 +147,20 @@ codon_to_amino_acid = {
     "GGG": "G",
 }
 
+# 2-bit code of each ASCII character (A, C, G and T in either case), 4 for other characters
+CODON_BASE_CODES = np.full(128, 4, dtype=np.uint8)
+CODON_BASE_CODES[list(b"ACGT")] = CODON_BASE_CODES[list(b"acgt")] = range(4)
+# Amino acid (ASCII code) of each codon, indexed by 16 * first + 4 * second + third base code
+CODON_TABLE = np.frombuffer(
+    "".join(
+        codon_to_amino_acid[first + second + third]
+        for first in "ACGT"
+        for second in "ACGT"
+        for third in "ACGT"
+    ).encode("ascii"),
+    dtype=np.uint8,
+)
+
 
 def convert_chromosome_value_to_int_when_possible(val):
     try:
@@ -118,9 +171,11 @@ def convert_chromosome_value_to_int_when_possible(val):
         return str(val)
 
 
-def merge_gtf_transcript_locations_into_cosmic_csv(
-    mutations, gtf_path, gtf_transcript_id_column
-):
+def read_gtf_transcript_locations(gtf_path, gtf_transcript_id_column):
+    """
+    Returns the transcript IDs (in column gtf_transcript_id_column), start and end positions and
+    strands of the transcripts in a GTF file.
+    """
     gtf_df = pd.read_csv(
         gtf_path,
         sep="\t",
@@ -139,9 +194,6 @@ def merge_gtf_transcript_locations_into_cosmic_csv(
         ],
     )
 
-    if "strand" in mutations.columns:
-        mutations.rename(columns={"strand": "strand_original"}, inplace=True)
-
     gtf_df = gtf_df[gtf_df["feature"] == "transcript"]
 
     gtf_df["transcript_id"] = gtf_df["attribute"].str.extract('transcript_id "([^"]+)"')
@@ -153,7 +205,7 @@ def merge_gtf_transcript_locations_into_cosmic_csv(
     # Filter out rows where transcript_id is NaN
     gtf_df = gtf_df.dropna(subset=["transcript_id"])
 
-    gtf_df = gtf_df[["transcript_id", "start", "end", "strand"]].rename(
+    return gtf_df[["transcript_id", "start", "end", "strand"]].rename(
         columns={
             "transcript_id": gtf_transcript_id_column,
             "start": "start_transcript_position",
@@ -161,6 +213,84 @@ def merge_gtf_transcript_locations_into_cosmic_csv(
         }
     )
 
+
+def load_gtf_transcript_locations(gtf_path, gtf_transcript_id_column):
+    """
+    Returns the transcript locations of a GTF file (see read_gtf_transcript_locations) from the table
+    cached next to it: <gtf>.transcripts.npy, a memory-mapped array of the transcript IDs, start and end
+    positions and strands, and <gtf>.transcripts.json, the size and modification time of the GTF file
+    it was made from. The GTF file is only parsed (and the table saved) when it has no table yet or
+    has changed since.
+    """
+    table_path = f"{gtf_path}.transcripts.npy"
+    key_path = f"{gtf_path}.transcripts.json"
+    stat = os.stat(gtf_path)
+    key = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    try:
+        with open(key_path) as f:
+            cached = json.load(f) == key
+    except (OSError, ValueError):
+        cached = False
+
+    if cached:
+        # A missing or damaged table is made again from the gtf file
+        try:
+            table = np.load(table_path, mmap_mode="r")
+            logger.info(f"Reading the transcript locations of the gtf file from {table_path}")
+            return pd.DataFrame(
+                {
+                    gtf_transcript_id_column: np.char.decode(table["transcript_id"], "utf-8").astype(object),
+                    "start_transcript_position": table["start"],
+                    "end_transcript_position": table["end"],
+                    "strand": np.char.decode(table["strand"], "ascii").astype(object),
+                }
+            )
+        except (OSError, ValueError, KeyError, IndexError) as e:
+            logger.warning(f"Could not read the transcript locations from {table_path} ({e}). Parsing the gtf file again.")
+
+    gtf_df = read_gtf_transcript_locations(gtf_path, gtf_transcript_id_column)
+
+    transcript_ids = np.char.encode(gtf_df[gtf_transcript_id_column].to_numpy(dtype=str), "utf-8")
+    table = np.empty(
+        len(gtf_df),
+        dtype=[
+            ("transcript_id", transcript_ids.dtype),
+            ("start", np.int64),
+            ("end", np.int64),
+            # Strands are '+', '-' or '.'
+            ("strand", "S1"),
+        ],
+    )
+    table["transcript_id"] = transcript_ids
+    table["start"] = gtf_df["start_transcript_position"].to_numpy()
+    table["end"] = gtf_df["end_transcript_position"].to_numpy()
+    table["strand"] = np.char.encode(gtf_df["strand"].to_numpy(dtype=str), "ascii")
+
+    # The key is written last, so an interrupted save leaves no table that looks up to date
+    try:
+        np.save(f"{table_path}.tmp.npy", table)
+        os.replace(f"{table_path}.tmp.npy", table_path)
+        with open(f"{key_path}.tmp", "w") as f:
+            json.dump(key, f)
+        os.replace(f"{key_path}.tmp", key_path)
+        logger.info(f"Saved the transcript locations of the gtf file to {table_path}")
+    except OSError as e:
+        logger.warning(f"Could not save the transcript locations of the gtf file to {table_path}: {e}")
+
+    return gtf_df
+
+
+def merge_gtf_transcript_locations_into_cosmic_csv(
+    mutations, gtf_df, gtf_transcript_id_column
+):
+    """
+    Adds the transcript start and end positions and strands (gtf_df, see read_gtf_transcript_locations)
+    to the mutations.
+    """
+    if "strand" in mutations.columns:
+        mutations.rename(columns={"strand": "strand_original"}, inplace=True)
+
     merged_df = pd.merge(mutations, gtf_df, on=gtf_transcript_id_column, how="left")
 
     # Fill NaN values
@@ -179,13 +309,6 @@ def get_sequence_length(seq_id, seq_dict):
     return len(seq_dict.get(seq_id, ""))
 
 
-def get_nucleotide_at_position(seq_id, pos, seq_dict):
-    full_seq = seq_dict.get(seq_id, "")
-    if pos < len(full_seq):
-        return full_seq[pos]
-    return None
-
-
 def translate_sequence(sequence, start, end):
     amino_acid_sequence = ""
     for i in range(start, end, 3):
@@ -198,6 +321,48 @@ def translate_sequence(sequence, start, end):
     return amino_acid_sequence
 
 
+def translate_sequences(sequences, starts, ends):
+    """
+    Translates the codons of each sequence from starts[i] to ends[i] (like translate_sequence,
+    for many sequences at once) through CODON_TABLE. Incomplete codons, codons past the end
+    of the sequence and codons with other characters than A, C, G and T are translated to 'X'.
+    starts and ends are arrays or single positions for all sequences.
+    Returns a list of amino acid sequences.
+    """
+    sequences = np.asarray(sequences, dtype=object)
+    starts = np.broadcast_to(np.asarray(starts, dtype=np.int64), len(sequences))
+    ends = np.broadcast_to(np.asarray(ends, dtype=np.int64), len(sequences))
+
+    translations = []
+    for rows in string_batches(sequences):
+        codes, offsets = encode_strings(sequences[rows])
+        if codes.dtype != np.uint8:
+            codes = np.where(codes < 128, codes, ord("N")).astype(np.uint8)
+        # Padded so the codons of an empty last sequence can be looked up
+        codes = np.append(CODON_BASE_CODES[codes], np.full(3, 4, dtype=np.uint8))
+
+        n_codons = np.maximum(-(-(ends[rows] - starts[rows]) // 3), 0)
+        codon_rows = np.repeat(np.arange(len(n_codons)), n_codons)
+        positions = starts[rows][codon_rows] + 3 * (
+            np.arange(len(codon_rows)) - np.repeat(np.cumsum(n_codons) - n_codons, n_codons)
+        )
+        complete = (positions >= 0) & (positions + 3 <= np.diff(offsets)[codon_rows])
+        first = offsets[:-1][codon_rows] + np.where(complete, positions, 0)
+        bases = codes[first], codes[first + 1], codes[first + 2]
+
+        known = complete & (bases[0] < 4) & (bases[1] < 4) & (bases[2] < 4)
+        amino_acids = np.where(
+            known, CODON_TABLE[(16 * bases[0] + 4 * bases[1] + bases[2]) % 64], ord("X")
+        )
+        joined = amino_acids.astype(np.uint8).tobytes().decode("ascii")
+        ends_of_rows = np.cumsum(n_codons).tolist()
+        translations.extend(
+            joined[end - n : end] for end, n in zip(ends_of_rows, n_codons.tolist())
+        )
+
+    return translations
+
+
 # def remove_all_but_first_gt(line):
 #     return line[:1] + line[1:].replace(">", "")
 
@@ -226,48 +391,588 @@ def wt_fragment_and_mutant_fragment_share_kmer(
         return False
 
 
-def add_mutation_type(mutations, mut_column):
-    mutations["mutation_type_id"] = mutations[mut_column].str.extract(mutation_pattern)[
-        1
-    ]
+def encode_strings(strings):
+    """
+    Concatenates strings into one array of character codes (uint8 for ASCII, uint32 otherwise).
+    Returns the codes and the start of each string in them (with the total length appended).
+    """
+    strings = list(strings)
+    lengths = np.fromiter(map(len, strings), dtype=np.int64, count=len(strings))
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    joined = "".join(strings)
+    try:
+        codes = np.frombuffer(joined.encode("ascii"), dtype=np.uint8)
+    except UnicodeEncodeError:
+        codes = np.frombuffer(joined.encode("utf-32-le"), dtype=np.uint32)
+    return codes, offsets
+
+
+def string_batches(*columns, batch_size=MUTATE_KMER_BATCH_SIZE):
+    """
+    Splits rows into consecutive batches of about batch_size characters (summed over columns).
+    Yields the row slices.
+    """
+    # Every row counts as at least one character, so batches have at most batch_size rows
+    lengths = 1 + sum(
+        np.fromiter(map(len, column), dtype=np.int64, count=len(column))
+        for column in columns
+    )
+    if len(lengths) == 0:
+        return
+    # Batch of each row, from the number of characters before it
+    batches = np.concatenate(([0], np.cumsum(lengths)[:-1])) // batch_size
+    bounds = np.flatnonzero(np.diff(batches)) + 1
+    for start, end in zip(np.concatenate(([0], bounds)), np.concatenate((bounds, [len(lengths)]))):
+        yield slice(int(start), int(end))
+
+
+def window_starts(offsets, n_windows):
+    """
+    Returns the row and the (global) start of each of the first n_windows[i] windows of row i.
+    """
+    n_windows = np.maximum(n_windows, 0)
+    rows = np.repeat(np.arange(len(n_windows)), n_windows)
+    within = np.arange(len(rows)) - np.repeat(np.cumsum(n_windows) - n_windows, n_windows)
+    return rows, offsets[:-1][rows] + within
+
+
+def decode_strings(codes, offsets):
+    """
+    Inverse of encode_strings: returns the list of strings codes[offsets[i]:offsets[i + 1]].
+    """
+    if codes.dtype == np.uint8:
+        joined = codes.tobytes().decode("ascii")
+    else:
+        joined = codes.astype(np.uint32).tobytes().decode("utf-32-le")
+    bounds = offsets.tolist()
+    return [joined[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def join_string_slices(*parts):
+    """
+    Column-wise concatenation of slices of strings: parts are (strings, starts, ends) tuples, and row i
+    of the result is the concatenation of strings[i][starts[i]:ends[i]] over all parts. starts and
+    ends are arrays of non-negative positions, or None to slice from the start / to the end of the strings.
+    The characters of all rows are gathered at once with numpy, instead of slicing one row at a time.
+    Returns an array of strings.
+    """
+    parts = [(np.asarray(strings, dtype=object), starts, ends) for strings, starts, ends in parts]
+    result = np.empty(len(parts[0][0]), dtype=object)
+
+    for rows in string_batches(*(strings for strings, _, _ in parts)):
+        pieces = []
+        for strings, starts, ends in parts:
+            codes, offsets = encode_strings(strings[rows])
+            lengths = np.diff(offsets)
+            piece_starts = np.zeros_like(lengths) if starts is None else np.asarray(starts, dtype=np.int64)[rows]
+            piece_ends = lengths if ends is None else np.asarray(ends, dtype=np.int64)[rows]
+            piece_starts = np.clip(piece_starts, 0, lengths)
+            piece_ends = np.clip(piece_ends, piece_starts, lengths)
+            pieces.append((codes, offsets[:-1] + piece_starts, piece_ends - piece_starts))
+
+        dtype = np.result_type(*(codes for codes, _, _ in pieces))
+        joined_lengths = sum(piece_lengths for _, _, piece_lengths in pieces)
+        joined_offsets = np.concatenate(([0], np.cumsum(joined_lengths)))
+        joined = np.empty(joined_offsets[-1], dtype=dtype)
+
+        # Each piece is copied after the pieces before it in its row
+        position = joined_offsets[:-1].copy()
+        for codes, piece_starts, piece_lengths in pieces:
+            # Row of each character of the pieces and its position in the piece
+            piece_rows, within = window_starts(
+                np.zeros(len(piece_lengths) + 1, dtype=np.int64), piece_lengths
+            )
+            joined[position[piece_rows] + within] = codes[piece_starts[piece_rows] + within]
+            position += piece_lengths
+
+        result[rows] = decode_strings(joined, joined_offsets)
+
+    return result
+
+
+def reverse_complement_strings(strings):
+    """
+    Returns the reverse complements of strings (as an array of strings) through the complement dictionary.
+    Characters without a complement are replaced with 'N'.
+    """
+    codes, offsets = encode_strings(np.asarray(strings, dtype=object))
+    if codes.dtype != np.uint8:
+        codes = np.where(codes < 128, codes, ord("?")).astype(np.uint8)
+    # Reversing the characters of all strings also reverses the order of the strings
+    reversed_codes = COMPLEMENT_CODES[codes][::-1]
+    reversed_offsets = offsets[-1] - offsets[::-1]
+    return np.asarray(decode_strings(reversed_codes, reversed_offsets)[::-1], dtype=object)
+
+
+def kmer_hashes(codes, starts, k):
+    """
+    Polynomial hashes (modulo 2**64) of the k characters of codes following each start,
+    computed for all windows at once from prefix sums: windows with the same characters
+    have the same hash, wherever they are in codes.
+    """
+    n = len(codes) + 1
+    # Powers of the base and of its inverse (uint64 arithmetic wraps around modulo 2**64)
+    inverse_powers = np.cumprod(np.full(n, KMER_HASH_BASE_INVERSE, dtype=np.uint64))
+    inverse_powers = np.concatenate(([np.uint64(1)], inverse_powers[:-1]))
+    powers = np.cumprod(np.full(n, KMER_HASH_BASE, dtype=np.uint64))
+    powers = np.concatenate(([np.uint64(1)], powers[:-1]))
+
+    # Sum of codes[j] * base**-j over the characters before each position
+    prefix = np.concatenate(
+        ([np.uint64(0)], np.cumsum((codes.astype(np.uint64) + 1) * inverse_powers[:-1]))
+    )
+    # Sum of codes[start + j] * base**-j over the window
+    return (prefix[starts + k] - prefix[starts]) * powers[starts]
+
+
+def fragments_share_kmer(mutated_fragments, wildtype_fragments, k):
+    """
+    Column-wise wt_fragment_and_mutant_fragment_share_kmer: returns for each row whether a k-mer of the
+    mutated fragment (except its last one) occurs in the wildtype fragment (or, if the mutated fragment
+    is not longer than k, whether it occurs in the wildtype fragment).
+
+    The k-mers of all rows are compared at once through their rolling hashes (see kmer_hashes), and
+    rows with a matching hash are confirmed by comparing the strings, so hash collisions cannot
+    change the result.
+    """
+    mutated_fragments = np.asarray(mutated_fragments, dtype=object)
+    wildtype_fragments = np.asarray(wildtype_fragments, dtype=object)
+    shared = np.zeros(len(mutated_fragments), dtype=bool)
+
+    for rows in string_batches(mutated_fragments, wildtype_fragments):
+        mutated = mutated_fragments[rows]
+        wildtype = wildtype_fragments[rows]
+        batch_shared = shared[rows]
+
+        codes, offsets = encode_strings(np.concatenate((mutated, wildtype)))
+        lengths = np.diff(offsets)
+        mutated_lengths, wildtype_lengths = lengths[: len(mutated)], lengths[len(mutated) :]
+
+        # Short mutated fragments are searched as a whole
+        short = np.flatnonzero(mutated_lengths <= k)
+        batch_shared[short] = [mutated[i] in wildtype[i] for i in short]
+
+        mutated_rows, mutated_starts = window_starts(
+            offsets[: len(mutated) + 1], mutated_lengths - k
+        )
+        wildtype_rows, wildtype_starts = window_starts(
+            offsets[len(mutated) :], wildtype_lengths - k + 1
+        )
+        if len(mutated_starts) == 0 or len(wildtype_starts) == 0:
+            continue
+
+        # Keys of the k-mers: the row in the upper 24 bits (batches have fewer rows than 2**24)
+        # and the upper 40 bits of the hash, so the keys of a row are next to each other once sorted
+        keys = (
+            np.concatenate((mutated_rows, wildtype_rows)).astype(np.uint64) << np.uint64(40)
+        ) | (
+            kmer_hashes(codes, np.concatenate((mutated_starts, wildtype_starts)), k)
+            >> np.uint64(24)
+        )
+        mutated_keys, wildtype_keys = keys[: len(mutated_starts)], keys[len(mutated_starts) :]
+        # Keys found in the sorted wildtype keys
+        wildtype_keys.sort()
+        found = np.minimum(
+            np.searchsorted(wildtype_keys, mutated_keys), len(wildtype_keys) - 1
+        )
+        candidates = np.flatnonzero(wildtype_keys[found] == mutated_keys)
+
+        for row, start in zip(
+            mutated_rows[candidates].tolist(),
+            (mutated_starts[candidates] - offsets[mutated_rows[candidates]]).tolist(),
+        ):
+            if not batch_shared[row]:
+                batch_shared[row] = mutated[row][start : start + k] in wildtype[row]
+
+    return shared
+
+
+def periodic_prefix_lengths(repeats, sequences):
+    """
+    Returns for each row the number of leading characters of the sequence that match the repeat
+    repeated indefinitely, e.g. 3 for 'AC' and 'ACAT' (0 for an empty repeat).
+    This is the column-wise form of beginning_mut_nucleotides_with_right_flank.
+    """
+    repeats = np.asarray(repeats, dtype=object)
+    sequences = np.asarray(sequences, dtype=object)
+    lengths = np.zeros(len(sequences), dtype=np.int64)
+
+    for rows in string_batches(repeats, sequences):
+        repeat_codes, repeat_offsets = encode_strings(repeats[rows])
+        sequence_codes, sequence_offsets = encode_strings(sequences[rows])
+        repeat_lengths = np.diff(repeat_offsets)
+        sequence_lengths = np.diff(sequence_offsets)
+
+        # Compare each character of the sequences to the character of the repeat at the same position
+        sequence_rows, positions = window_starts(sequence_offsets, sequence_lengths)
+        positions -= sequence_offsets[sequence_rows]
+        row_repeat_lengths = repeat_lengths[sequence_rows]
+        repeat_positions = repeat_offsets[sequence_rows] + positions % np.maximum(
+            row_repeat_lengths, 1
+        )
+        # A code that is never compared, so empty repeats can be indexed
+        repeat_codes = np.concatenate(
+            (repeat_codes, np.zeros(1, dtype=repeat_codes.dtype))
+        )
+        mismatches = np.flatnonzero(
+            (sequence_codes != repeat_codes[repeat_positions]) | (row_repeat_lengths == 0)
+        )
+
+        # Leading matches end at the first mismatch of each row
+        batch_lengths = sequence_lengths.copy()
+        mismatch_rows, first = np.unique(sequence_rows[mismatches], return_index=True)
+        batch_lengths[mismatch_rows] = positions[mismatches[first]]
+        lengths[rows] = batch_lengths
+
+    return lengths
+
+
+def calculate_mutation_overlaps_with_flanks(mutations):
+    """
+    Column-wise calculate_beginning_mutation_overlap_with_right_flank and calculate_end_mutation_overlap_with_left_flank.
+    Returns the overlaps of the beginning of the mutation with the right flank and of its end with the left flank.
+    """
+    mutation_type = mutations["mutation_type"]
+    wt_nucleotides = mutations["wt_nucleotides_ensembl"]
+
+    sequence_to_check = np.where(
+        mutation_type == "deletion",
+        np.asarray(wt_nucleotides, dtype=object),
+        np.asarray(mutations["mut_nucleotides"], dtype=object),
+    )
+    wt_included = mutation_type.isin(["delins", "inversion"]).values
+    right_sequence = np.where(
+        wt_included,
+        np.asarray(wt_nucleotides + mutations["right_flank_region"], dtype=object),
+        np.asarray(mutations["right_flank_region"], dtype=object),
+    )
+    left_sequence = np.where(
+        wt_included,
+        np.asarray(mutations["left_flank_region"] + wt_nucleotides, dtype=object),
+        np.asarray(mutations["left_flank_region"], dtype=object),
+    )
+
+    def reverse(strings):
+        return [string[::-1] for string in strings]
+
+    # The overlap of the end of the mutation with the left flank is the overlap of their reverses
+    return (
+        periodic_prefix_lengths(sequence_to_check, right_sequence),
+        periodic_prefix_lengths(reverse(sequence_to_check), reverse(left_sequence)),
+    )
+
+
+def canonical_kmer_hashes(strings, k):
+    """
+    Returns the row and the canonical hash (the smaller hash of the k-mer and of its reverse complement,
+    see kmer_hashes) of every k-mer of strings, ignoring case. K-mers containing characters other than
+    A, C, G and T are skipped.
+    """
+    codes, offsets = encode_strings(strings)
+    if codes.dtype != np.uint8:
+        # Non-ASCII characters are never part of a k-mer
+        codes = np.where(codes < 128, codes, ord("N")).astype(np.uint8)
+    codes = KMER_UPPERCASE[codes]
+
+    rows, starts = window_starts(offsets, np.diff(offsets) - k + 1)
+
+    # Drop the k-mers containing other characters
+    invalid = np.concatenate(([0], np.cumsum(~KMER_IS_BASE[codes])))
+    valid = invalid[starts + k] == invalid[starts]
+    rows, starts = rows[valid], starts[valid]
+
+    # The k-mer at start is the reverse complement of the k-mer at len(codes) - start - k
+    # of the reverse complemented codes
+    reverse_complement = KMER_COMPLEMENT[codes][::-1]
+    hashes = np.minimum(
+        kmer_hashes(codes, starts, k),
+        kmer_hashes(reverse_complement, len(codes) - starts - k, k),
+    )
+    return rows, hashes
+
+
+def sorted_unique(values):
+    """
+    Returns the sorted unique values of an array (np.unique without its hash table, which is
+    much slower than sorting for large arrays of random hashes).
+    """
+    values = np.sort(values)
+    return values[np.concatenate(([True], values[1:] != values[:-1]))] if len(values) else values
+
+
+class KmerIndex:
+    """
+    Sorted array of the canonical hashes of all k-mers of a set of sequences (see canonical_kmer_hashes),
+    saved as a .npy file and memory-mapped, so it is built once and shared between runs and processes.
+
+    Args:
+    - filename  Path to the .npy file of the index (see build).
+    - k         Length of the k-mers.
+
+    Since only 64-bit hashes are stored, a k-mer is wrongly reported as found with a probability of
+    about (number of k-mers in the index) / 2**64.
+    """
 
-    # Define conditions and choices for the mutation types
+    def __init__(self, filename, k):
+        self.filename = filename
+        self.k = k
+        self._hashes = np.load(filename, mmap_mode="r")
+        if self._hashes.dtype != np.uint64 or self._hashes.ndim != 1:
+            raise ValueError(f"{filename} is not a k-mer index.")
+
+    @classmethod
+    def build(cls, seq_dict, k, filename):
+        """
+        Indexes the k-mers of all sequences in seq_dict (a mapping of IDs to sequences, e.g. an
+        IndexedFasta) and saves the index to filename. Returns the KmerIndex.
+        """
+        # Long sequences are split into pieces overlapping by k - 1 bases, so no k-mer is lost
+        def pieces():
+            for key in seq_dict:
+                seq = seq_dict[key]
+                for start in range(0, max(len(seq) - k + 1, 0), MUTATE_KMER_BATCH_SIZE):
+                    yield seq[start : start + MUTATE_KMER_BATCH_SIZE + k - 1]
+
+        # Unique hashes of the batches, merged into the index whenever they add up to
+        # MUTATE_KMER_INDEX_MERGE_SIZE or to the size of the index so far (so each hash is
+        # merged a logarithmic number of times)
+        index = np.zeros(0, dtype=np.uint64)
+        hashes = []
+        n_hashes = 0
+        batch = []
+        batch_size = 0
+        for piece in itertools.chain(pieces(), [None]):
+            if piece is not None:
+                batch.append(str(piece))
+                batch_size += len(batch[-1])
+            if batch and (piece is None or batch_size >= MUTATE_KMER_BATCH_SIZE):
+                hashes.append(sorted_unique(canonical_kmer_hashes(batch, k)[1]))
+                n_hashes += len(hashes[-1])
+                batch, batch_size = [], 0
+            if n_hashes >= max(MUTATE_KMER_INDEX_MERGE_SIZE, len(index)) or piece is None:
+                hashes.append(index)
+                index = sorted_unique(np.concatenate(hashes))
+                hashes, n_hashes = [], 0
+
+        # Written to a temporary file first, so an interrupted build does not leave a truncated index
+        tmp_filename = f"{filename}.tmp.npy"
+        np.save(tmp_filename, index)
+        os.replace(tmp_filename, filename)
+
+        return cls(filename, k)
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def contains_any(self, sequences):
+        """
+        Returns for each sequence whether one of its k-mers (or their reverse complements) is in the index.
+        """
+        sequences = np.asarray(sequences, dtype=object)
+        found = np.zeros(len(sequences), dtype=bool)
+        if len(self._hashes) == 0:
+            return found
+
+        for rows in string_batches(sequences):
+            batch_rows, hashes = canonical_kmer_hashes(sequences[rows], self.k)
+            # Sorted queries are looked up faster
+            order = np.argsort(hashes)
+            hashes = hashes[order]
+            positions = np.minimum(
+                np.searchsorted(self._hashes, hashes), len(self._hashes) - 1
+            )
+            hits = order[self._hashes[positions] == hashes]
+            found[rows][batch_rows[hits]] = True
+
+        return found
+
+    def __getstate__(self):
+        # Only the filename is pickled (e.g. when sent to worker processes), the index is mapped again
+        return {"filename": self.filename, "k": self.k}
+
+    def __setstate__(self, state):
+        self.__init__(state["filename"], state["k"])
+
+
+def kmer_index_key(seq_dict, k, sequences_path=None):
+    """
+    Returns the key identifying the k-mer index of the sequences in seq_dict: k and the size and
+    modification time of the fasta file sequences_path, or (sequences_path=None) a SHA-256 digest
+    of the IDs and sequences in seq_dict.
+    """
+    if sequences_path is not None:
+        stat = os.stat(sequences_path)
+        return {"k": k, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    digest = hashlib.sha256()
+    for key in seq_dict:
+        digest.update(f">{key}\n{seq_dict[key]}\n".encode())
+    return {"k": k, "sha256": digest.hexdigest()}
+
+
+def default_kmer_index_path(sequences_path, k):
+    """
+    Returns the path of the k-mer index of the fasta file sequences_path in the gget cache directory
+    (see utils.cache_dir): kmer_indexes/[file name].[hash of its absolute path].[k]mers.npy
+    """
+    digest = hashlib.sha256(os.path.abspath(sequences_path).encode()).hexdigest()[:16]
+    return os.path.join(
+        cache_dir("kmer_indexes"), f"{os.path.basename(sequences_path)}.{digest}.{k}mers.npy"
+    )
+
+
+def load_kmer_index(seq_dict, k, filename, sequences_path=None):
+    """
+    Returns the KmerIndex of the k-mers of the sequences in seq_dict, read from filename if it was built
+    for the same sequences and k, otherwise built and saved to filename.
+    The key of the index (see kmer_index_key) is saved to [filename].json, and an index without a matching
+    key (e.g. built for another version of the fasta file sequences_path or another k) is built again.
+    """
+    key_path = f"{filename}.json"
+    key = kmer_index_key(seq_dict, k, sequences_path)
+
+    try:
+        with open(key_path) as f:
+            saved_key = json.load(f)
+    except (OSError, ValueError):
+        saved_key = None
+
+    if saved_key == key:
+        try:
+            logger.info(f"Reading the {k}-mer index {filename}")
+            return KmerIndex(filename, k)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read the {k}-mer index {filename} ({e}). Building it again.")
+    elif os.path.exists(filename):
+        logger.warning(
+            f"The {k}-mer index {filename} was not built for these sequences and k. Building it again."
+        )
+
+    # The key is removed first and written last, so an interrupted build leaves no index that looks up to date
+    try:
+        os.remove(key_path)
+    except FileNotFoundError:
+        pass
+
+    logger.info(f"Building the {k}-mer index of the input sequences (saved to {filename})")
+    index = KmerIndex.build(seq_dict, k, filename)
+    with open(f"{key_path}.tmp", "w") as f:
+        json.dump(key, f)
+    os.replace(f"{key_path}.tmp", key_path)
+
+    return index
+
+
+def parse_mutations(mutations):
+    """
+    Parses HGVS mutation strings (e.g. 'c.35G>A' or 'g.4_5insT', see mutation_pattern) column-wise.
+    Each distinct string is parsed once and the results are broadcast to all its rows.
+
+    Returns a DataFrame with the index of mutations and the columns:
+    - nucleotide_positions, actual_mutation     The groups of mutation_pattern (NaN if the string does not match)
+    - mutation_type                             One of MUTATION_TYPES, or 'unknown'
+    - start_position, end_position              The first and last positions of the mutation (as written, i.e. 1-based;
+                                                end_position = start_position for a single position), or -1 if they are
+                                                not integers (e.g. intronic positions such as 35+1)
+    - reference_nucleotides                     The wildtype base of substitutions (NaN for other mutations)
+    - inserted_nucleotides                      The new bases of substitutions, insertions and delins (NaN for other mutations)
+    - uncertain_mutation, ambiguous_position_mutation, intronic_mutation, posttranslational_region_mutation
+                                                Whether the string contains '?', parentheses, '+' or '-', or '*'
+    """
+    mutations = pd.Series(mutations)
+    codes, uniques = pd.factorize(mutations.to_numpy(dtype=object))
+    # Missing values (code -1) get the results of the last entry
+    strings = pd.Series(np.append(np.asarray(uniques, dtype=object), np.nan), dtype=object)
+
+    parsed = strings.str.extract(mutation_pattern).rename(
+        columns={0: "nucleotide_positions", 1: "actual_mutation"}
+    )
+    actual_mutation = parsed["actual_mutation"]
+
+    # The first type whose pattern is found (so e.g. delins is not a deletion)
     conditions = [
-        mutations["mutation_type_id"].str.contains(">", na=False),
-        mutations["mutation_type_id"].str.contains("delins", na=False),
-        mutations["mutation_type_id"].str.contains("del", na=False)
-        & ~mutations["mutation_type_id"].str.contains("delins", na=False),
-        mutations["mutation_type_id"].str.contains("ins", na=False)
-        & ~mutations["mutation_type_id"].str.contains("delins", na=False),
-        mutations["mutation_type_id"].str.contains("dup", na=False),
-        mutations["mutation_type_id"].str.contains("inv", na=False),
+        actual_mutation.str.contains(">", na=False),
+        actual_mutation.str.contains("delins", na=False),
+        actual_mutation.str.contains("del", na=False),
+        actual_mutation.str.contains("ins", na=False),
+        actual_mutation.str.contains("dup", na=False),
+        actual_mutation.str.contains("inv", na=False),
     ]
+    parsed["mutation_type"] = np.select(conditions, MUTATION_TYPES, default="unknown")
+
+    positions = parsed["nucleotide_positions"].str.split("_")
+    starts = pd.to_numeric(positions.str[0], errors="coerce")
+    ends = pd.to_numeric(positions.str[1].fillna(positions.str[0]), errors="coerce")
+    integers = (starts >= 0) & (ends >= 0)
+    parsed["start_position"] = np.where(integers, starts, -1).astype(np.int64)
+    parsed["end_position"] = np.where(integers, ends, -1).astype(np.int64)
+
+    substitutions = parsed["mutation_type"] == "substitution"
+    parsed["reference_nucleotides"] = actual_mutation.str[0].where(substitutions)
+    parsed["inserted_nucleotides"] = (
+        actual_mutation.str[-1]
+        .where(substitutions)
+        .fillna(
+            actual_mutation.str.extract(r"delins([A-Z]+)")[0].where(
+                parsed["mutation_type"] == "delins"
+            )
+        )
+        .fillna(
+            actual_mutation.str.extract(r"ins([A-Z]+)")[0].where(
+                parsed["mutation_type"] == "insertion"
+            )
+        )
+    )
 
-    choices = [
-        "substitution",
-        "delins",
-        "deletion",
-        "insertion",
-        "duplication",
-        "inversion",
-    ]
+    parsed["uncertain_mutation"] = strings.str.contains(r"\?", na=False)
+    parsed["ambiguous_position_mutation"] = strings.str.contains(r"\(|\)", na=False)
+    parsed["intronic_mutation"] = strings.str.contains(r"\+|\-", na=False)
+    parsed["posttranslational_region_mutation"] = strings.str.contains(r"\*", na=False)
+
+    return parsed.iloc[codes].set_axis(mutations.index)
 
-    # Assign the mutation types
-    mutations["mutation_type"] = np.select(conditions, choices, default="unknown")
 
-    # Drop the temporary mutation_type_id column
-    mutations.drop(columns=["mutation_type_id"], inplace=True)
+def add_mutation_type(mutations, mut_column):
+    mutations["mutation_type"] = parse_mutations(mutations[mut_column])[
+        "mutation_type"
+    ].values
 
     return mutations
 
 
-def extract_sequence(row, seq_dict, seq_id_column="seq_ID"):
-    if pd.isna(row["start_mutation_position"]) or pd.isna(row["end_mutation_position"]):
-        return None
-    seq = seq_dict[row[seq_id_column]][
-        int(row["start_mutation_position"]) : int(row["end_mutation_position"]) + 1
-    ]
-    return seq
+def extract_regions(seq_dict, seq_ids, starts, ends):
+    """
+    Returns the regions seq_dict[seq_ids[i]][starts[i]:ends[i]] as an array of strings
+    (negative positions count from the end of the sequence, as for slicing).
+
+    Rows are grouped by sequence ID and all regions of a sequence are extracted at once
+    (with fetch_many for indexed and packed sequences), instead of one row at a time.
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    regions = np.empty(len(starts), dtype=object)
+
+    codes, unique_seq_ids = pd.factorize(np.asarray(seq_ids, dtype=object))
+    order = np.argsort(codes, kind="stable")
+    group_bounds = np.searchsorted(codes[order], np.arange(len(unique_seq_ids) + 1))
+
+    for i, seq_id in enumerate(unique_seq_ids):
+        rows = order[group_bounds[i] : group_bounds[i + 1]]
+        seq = seq_dict[seq_id]
+        seq_len = len(seq)
+        seq_starts = starts[rows]
+        seq_starts = np.where(seq_starts < 0, seq_starts + seq_len, seq_starts)
+        seq_ends = ends[rows]
+        seq_ends = np.where(seq_ends < 0, seq_ends + seq_len, seq_ends)
+
+        if hasattr(seq_dict, "fetch_many"):
+            regions[rows] = seq_dict.fetch_many(seq_id, seq_starts, seq_ends)
+        else:
+            regions[rows] = [
+                seq[start:end] for start, end in zip(seq_starts.tolist(), seq_ends.tolist())
+            ]
+
+    return regions
 
 
 def common_prefix_length(s1, s2):
@@ -350,299 +1055,534 @@ def calculate_end_mutation_overlap_with_left_flank(row):
     return end_mut_nucleotides_with_left_flank(sequence_to_check, original_sequence)
 
 
-def mutate(
-    sequences: Union[str, List[str]],
-    mutations: Union[str, List[str]],
-    mut_column: str = "mutation",
-    seq_id_column: str = "seq_ID",
-    mut_id_column: Optional[str] = None,
-    gtf: Optional[str] = None,
-    gtf_transcript_id_column: Optional[str] = None,
-    k: int = 30,
-    min_seq_len: Optional[int] = None,
-    optimize_flanking_regions: bool = False,
-    remove_seqs_with_wt_kmers: bool = False,
-    max_ambiguous: Optional[int] = None,
-    merge_identical: bool = True,
-    update_df: bool = False,
-    update_df_out: Optional[str] = None,
-    store_full_sequences: bool = False,
-    translate: bool = False,
-    translate_start: Union[int, str, None] = None,
-    translate_end: Union[int, str, None] = None,
-    out: Optional[str] = None,
-    verbose: bool = True,
-):
+def sequence_digests(sequences):
     """
-    Takes in nucleotide sequences and mutations (in standard mutation annotation - see below)
-    and returns mutated versions of the input sequences according to the provided mutations.
+    Returns 128-bit digests of sequences, as two arrays of 64-bit hashes (SipHash with the two keys
+    of SEQUENCE_DIGEST_KEYS, see pd.util.hash_array), so identical sequences are found by comparing
+    the digests instead of the strings.
+    """
+    sequences = np.asarray(sequences, dtype=object)
+    digests = tuple(np.empty(len(sequences), dtype=np.uint64) for _ in SEQUENCE_DIGEST_KEYS)
+    # Hashed in batches, as hash_array holds an encoded copy of all the strings it hashes
+    for rows in string_batches(sequences):
+        for digest, key in zip(digests, SEQUENCE_DIGEST_KEYS):
+            digest[rows] = pd.util.hash_array(sequences[rows], hash_key=key, categorize=False)
+    return digests
 
-    Reuiqred input argument:
-    - sequences     (str) Path to the fasta file containing the sequences to be mutated, e.g., 'seqs.fa'.
-                    Sequence identifiers following the '>' character must correspond to the identifiers
-                    in the seq_ID column of 'mutations'.
 
-                    Example:
-                    >seq1 (or ENSG00000106443)
-                    ACTGCGATAGACT
-                    >seq2
-                    AGATCGCTAG
+def find_identical_sequences(digests):
+    """
+    Numbers the distinct sequences (by their digests, see sequence_digests) in the order of their
+    first occurrence. Returns the number of the sequence of each row and the first row of each sequence.
+    """
+    # Sorting the digests (stable, so the first row of each sequence comes first) uses less memory
+    # than a hash table
+    high, low = digests
+    order = np.lexsort((low, high))
+    high, low = high[order], low[order]
+    first = np.concatenate(([True], (high[1:] != high[:-1]) | (low[1:] != low[:-1])))[: len(order)]
+    first_rows = order[first]
+
+    # Sequences numbered by their first row
+    ranks = np.empty(len(first_rows), dtype=np.int64)
+    ranks[np.argsort(first_rows)] = np.arange(len(first_rows))
+    group_ids = np.empty(len(order), dtype=np.int64)
+    group_ids[order] = ranks[np.cumsum(first) - 1]
+    return group_ids, np.sort(first_rows)
+
+
+def merge_groups(mutations, group_ids, first_rows, update_df=False):
+    """
+    Merges the rows of each group of identical mutant sequences (see find_identical_sequences) by
+    concatenating their headers (and, if update_df=True, the values of all other columns) separated
+    by semicolons. The '>' characters after each semicolon of the merged headers are removed,
+    as remove_gt_after_semicolon does.
+    """
+    group_sizes = np.bincount(group_ids, minlength=len(first_rows))
+
+    # Rows of the sequences found more than once, grouped in the order of the groups
+    repeated = np.flatnonzero(group_sizes[group_ids] > 1)
+    repeated = repeated[np.argsort(group_ids[repeated], kind="stable")]
+    repeated_groups = np.flatnonzero(group_sizes > 1)
+    ends = np.cumsum(group_sizes[repeated_groups])
+    starts = ends - group_sizes[repeated_groups]
+
+    merged = {"mutant_sequence": mutations["mutant_sequence"].to_numpy(dtype=object)[first_rows]}
+    columns = (
+        [column for column in mutations.columns if column != "mutant_sequence"]
+        if update_df
+        else ["header"]
+    )
+    for column in columns:
+        values = mutations[column].to_numpy(dtype=object)
+        if update_df:
+            values = np.fromiter(map(str, values), dtype=object, count=len(values))
+
+        merged_values = values[first_rows]
+        if len(repeated):
+            repeated_values = values[repeated].tolist()
+            merged_values[repeated_groups] = [
+                ";".join(repeated_values[start:end])
+                for start, end in zip(starts.tolist(), ends.tolist())
+            ]
+        if column == "header":
+            merged_values = np.fromiter(
+                (
+                    re.sub(";>+", ";", value) if ";>" in value else value
+                    for value in merged_values
+                ),
+                dtype=object,
+                count=len(merged_values),
+            )
+        merged[column] = merged_values
 
-                    Alternatively: Input sequence(s) as a string or list, e.g. 'AGCTAGCT' or ['ACTGCTAGCT', 'AGCTAGCT'].
+    return pd.DataFrame(merged)
 
-                    NOTE: Only the letters until the first space or dot will be used as sequence identifiers
-                    - Version numbers of Ensembl IDs will be ignored.
-                    NOTE: When 'sequences' input is a genome, also see 'gtf' argument below.
 
-    - mutations     Path to csv or tsv file (str) (e.g., 'mutations.csv') or data frame (DataFrame object)
-                    containing information about the mutations in the following format:
+def count_merged_rows(headers):
+    """
+    Returns the number of rows that were merged with another row, from the merged headers.
+    """
+    # Calculate the number of semicolons in each entry
+    semicolon_count = headers.str.count(";") + 1
 
-                    | mutation         | mut_ID | seq_ID |
-                    | c.2C>T           | mut1   | seq1   | -> Apply mutation 1 to sequence 1
-                    | c.9_13inv        | mut2   | seq2   | -> Apply mutation 2 to sequence 2
-                    | c.9_13inv        | mut2   | seq3   | -> Apply mutation 2 to sequence 3
-                    | c.9_13delinsAAT  | mut3   | seq3   | -> Apply mutation 3 to sequence 3
-                    | ...              | ...    | ...    |
+    # Take the sum across all merged rows
+    return int(semicolon_count[semicolon_count > 1].sum())
 
-                    'mutation' = Column containing the mutations to be performed written in standard mutation annotation (see below)
-                    'mut_ID' = Column containing an identifier for each mutation
-                    'seq_ID' = Column containing the identifiers of the sequences to be mutated (must correspond to the string following
-                    the > character in the 'sequences' fasta file; do NOT include spaces or dots)
 
-                    Alternatively: Input mutation(s) as a string or list, e.g., 'c.2C>T' or ['c.2C>T', 'c.1A>C'].
-                    If a list is provided, the number of mutations must equal the number of input sequences.
+def merge_identical_mutations(mutations, update_df=False, digests=None):
+    """
+    Merges the rows of identical mutant sequences by concatenating their headers (and, if update_df=True,
+    the values of all other columns) separated by semicolons. Sequences are compared by their digests
+    (see sequence_digests, computed if not given).
 
-                    For more information on the standard mutation annotation, see https://www.ncbi.nlm.nih.gov/pmc/articles/PMC1867422/.
+    Returns the merged DataFrame and the number of rows that were merged with another row.
+    """
+    if digests is None:
+        digests = sequence_digests(mutations["mutant_sequence"])
+    group_ids, first_rows = find_identical_sequences(digests)
+    mutations = merge_groups(mutations, group_ids, first_rows, update_df=update_df)
 
-    Additional input arguments:
-    - mut_column                   (str) Name of the column containing the mutations to be performed in 'mutations'. Default: 'mutation'.
-    - seq_id_column                (str) Name of the column containing the IDs of the sequences to be mutated in 'mutations'. Default: 'seq_ID'.
-    - mut_id_column                (str) Name of the column containing the IDs of each mutation in 'mutations'. Default: Will use mut_column.
-    - gtf                          (str) Path to .gtf file. When providing a genome fasta file as input for 'sequences', you can provide a .gtf file here
-                                   and the input sequences will be defined according to the transcript boundaries. Default: None
-    - gtf_transcript_id_column     (str) Column name in the input 'mutations' file containing the transcript ID. In this case, column seq_id_column should contain the chromosome number.
-                                   Required when 'gtf' is provided. Default: None
+    return mutations, count_merged_rows(mutations["header"])
 
-    Mutant sequence generation/filtering options:
-    - k                            (int) Length of sequences flanking the mutation. Default: 30.
-                                   If k > total length of the sequence, the entire sequence will be kept.
-    - min_seq_len                  (int) Minimum length of the mutant output sequence. Mutant sequences smaller than this will be dropped.
-                                   Default: None
-    - optimize_flanking_regions    (True/False) Whether to remove nucleotides from either end of the mutant sequence to ensure (when possible)
-                                   that the mutant sequence does not contain any k-mers also found in the wildtype/input sequence. Default: False
-    - remove_seqs_with_wt_kmers    (True/False) Removes output sequences where at least one (k+1)-mer is also present in the wildtype/input sequence in the same region.
-                                   If optimize_flanking_regions=True, only sequences for which a wildtype kmer is still present after optimization will be removed.
-                                   Default: False
-    - max_ambiguous                (int) Maximum number of 'N' characters allowed in the output sequence. Default: None (no 'N' filter will be applied)
-    - merge_identical              (True/False) Whether to merge identical mutant sequences in the output (identical sequences will be merged by concatenating the sequence
-                                   headers for all identical sequences). Default: True
 
-    # Optional arguments to generate additional output stored in a copy of the 'mutations' DataFrame
-    - update_df                    (True/False) Whether to update the input 'mutations' DataFrame to include additional columns with the mutation type,
-                                   wildtype nucleotide sequence, and mutant nucleotide sequence (only valid if 'mutations' is a csv or tsv file). Default: False
-    - update_df_out                (str) Path to output csv file containing the updated DataFrame. Only valid if update_df=True.
-                                   Default: None -> the new DataFrame will be saved in the same directory as the 'mutations' DataFrame with appendix '_updated'
-    - store_full_sequences         (True/False) Whether to also include the complete wildtype and mutant sequences in the updated 'mutations' DataFrame (not just the sub-sequence with
-                                   k-length flanks). Only valid if update_df=True. Default: False
-    - translate                    (True/False) Add additional columns to the 'mutations' DataFrame containing the wildtype and mutant amino acid sequences.
-                                   Only valid if store_full_sequences=True. Default: False
-    - translate_start              (int | str | None) The position in the input nucleotide sequence to start translating. If a string is provided, it should correspond
-                                   to a column name in 'mutations' containing the open reading frame start positions for each sequence/mutation.
-                                   Only valid if translate=True. Default: None (translate from the beginning of the sequence)
-    - translate_end                (int | str | None) The position in the input nucleotide sequence to end translating. If a string is provided, it should correspond
-                                   to a column name in 'mutations' containing the open reading frame end positions for each sequence/mutation.
-                                   Only valid if translate=True. Default: None (translate from to the end of the sequence)
+def iter_pickles(path):
+    """
+    Yields the objects pickled one after the other into the file at path.
+    """
+    with open(path, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
 
-    # General arguments:
-    - out                          (str) Path to output fasta file containing the mutated sequences, e.g., 'path/to/output_fasta.fa'.
-                                   Default: None -> returns a list of the mutated sequences to standard out.
-                                   The identifiers (following the '>') of the mutated sequences in the output fasta will be '>[seq_ID]_[mut_ID]'.
-    - verbose                      (True/False) whether to print progress information. Default: True
 
-    Saves mutated sequences in fasta format (or, if out=None: when update_df is True, returns the mutation dataframe, otherwise returns a list containing the mutated sequences).
+def write_merge_buckets(mutations, bucket_paths, first_row, update_df=False):
     """
+    Merges the identical mutant sequences of a chunk (see merge_identical_mutations) and appends
+    the merged rows to the bucket files chosen by the digest of their mutant sequence, so identical
+    sequences of all chunks end up in the same file. Each row keeps the digest of its sequence
+    (columns '_digest_high' and '_digest_low') and the number of its first row, counted from
+    first_row (column '_row_number'), to restore the order of the sequences after merging.
+    """
+    digests = sequence_digests(mutations["mutant_sequence"])
+    group_ids, first_rows = find_identical_sequences(digests)
+    mutations = merge_groups(mutations, group_ids, first_rows, update_df=update_df).assign(
+        _row_number=first_row + first_rows,
+        _digest_high=digests[0][first_rows],
+        _digest_low=digests[1][first_rows],
+    )
 
-    global intronic_mutations, posttranslational_region_mutations, unknown_mutations, uncertain_mutations, ambiguous_position_mutations, cosmic_incorrect_wt_base, mut_idx_outside_seq
+    buckets = mutations["_digest_high"].to_numpy() % np.uint64(len(bucket_paths))
+    for bucket, rows in mutations.groupby(buckets, sort=False):
+        with open(bucket_paths[bucket], "ab") as f:
+            pickle.dump(rows, f, protocol=pickle.HIGHEST_PROTOCOL)
 
-    columns_to_keep = [
-        "header",
-        seq_id_column,
-        mut_column,
-        "mutation_type",
-        "wt_sequence",
-        "mutant_sequence",
-        "start_mutation_position",
-        "end_mutation_position"
-    ]
 
-    # Load input sequences and their identifiers from fasta file
-    if "." in sequences:
-        titles, seqs = read_fasta(sequences)
+def merge_buckets(bucket_paths, update_df=False, batch_size=100000):
+    """
+    Merges the identical mutant sequences of each bucket file written by write_merge_buckets
+    (by their digests, so the sequences are not hashed again).
+    Only one bucket is merged in memory at a time; the merged rows of each bucket are written back
+    to disk (in pieces of batch_size rows) and the bucket file is removed.
+
+    Returns the paths of the merged buckets, the bucket of each merged row in the order of the
+    first occurrence of its sequence (see iter_merged_buckets) and the number of rows that
+    were merged with another row.
+    """
+    merged_paths = []
+    row_numbers = []
+    total_semicolons = 0
+
+    for path in bucket_paths:
+        if not os.path.exists(path):
+            continue
+        bucket = pd.concat(iter_pickles(path), ignore_index=True)
+        os.remove(path)
+
+        # Rows were appended in order, so the first row of each group has its smallest row number
+        group_ids, first_rows = find_identical_sequences(
+            (bucket["_digest_high"].to_numpy(), bucket["_digest_low"].to_numpy())
+        )
+        first_row_numbers = bucket["_row_number"].to_numpy()[first_rows]
+        merged = merge_groups(
+            bucket.drop(columns=["_row_number", "_digest_high", "_digest_low"]),
+            group_ids,
+            first_rows,
+            update_df=update_df,
+        )
+        total_semicolons += count_merged_rows(merged["header"])
+        del bucket
+
+        merged_path = f"{path}.merged"
+        with open(merged_path, "wb") as f:
+            for start in range(0, len(merged), batch_size):
+                pickle.dump(
+                    merged.iloc[start : start + batch_size],
+                    f,
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                )
+        merged_paths.append(merged_path)
+        row_numbers.append(first_row_numbers)
 
-    # Handle input sequences passed as a list
-    elif isinstance(sequences, list):
-        titles = [f"seq{i+1}" for i in range(len(sequences))]
-        seqs = sequences
+    if not merged_paths:
+        return merged_paths, np.zeros(0, dtype=np.int64), total_semicolons
 
-    # Handle a single sequence passed as a string
-    elif isinstance(sequences, str):
-        titles = ["seq1"]
-        seqs = [sequences]
+    bucket_ids = np.concatenate(
+        [np.full(len(rows), i) for i, rows in enumerate(row_numbers)]
+    )[np.argsort(np.concatenate(row_numbers), kind="stable")]
 
-    else:
-        raise ValueError(
-            """
-            Format of the input to the 'sequences' argument not recognized. 
-            'sequences' must be one of the following:
-            - Path to the fasta file containing the sequences to be mutated (e.g. 'seqs.fa')
-            - A list of sequences to be mutated (e.g. ['ACTGCTAGCT', 'AGCTAGCT'])
-            - A single sequence to be mutated passed as a string (e.g. 'AGCTAGCT')
-            """
-        )
+    return merged_paths, bucket_ids, total_semicolons
 
-    mutations_path = None
 
-    # Read in 'mutations' if passed as filepath to comma-separated csv
-    if isinstance(mutations, str) and mutations.endswith(".csv"):
-        mutations_path = mutations
-        mutations = pd.read_csv(mutations)
-        for col in mutations.columns:
-            if col not in columns_to_keep:
-                columns_to_keep.append(
-                    col
-                )  # append "mutation_aa", "gene_name", "mutation_id"
+def iter_merged_buckets(merged_paths, bucket_ids, batch_size=100000):
+    """
+    Yields the rows of the merged buckets (see merge_buckets) in the order given by bucket_ids
+    (the bucket of each row), batch_size rows at a time. This is the order in which merging
+    all mutations at once returns them.
+    """
+    # The rows of each merged bucket are already in order, so each one is read sequentially
+    readers = [iter_pickles(path) for path in merged_paths]
+    buffers = [None] * len(merged_paths)
+
+    for start in range(0, len(bucket_ids), batch_size):
+        batch_ids = bucket_ids[start : start + batch_size]
+        positions = np.empty(len(batch_ids), dtype=np.int64)
+        frames = []
+        offset = 0
+        for i in np.unique(batch_ids):
+            in_bucket = batch_ids == i
+            n = int(in_bucket.sum())
+            while buffers[i] is None or len(buffers[i]) < n:
+                piece = next(readers[i])
+                buffers[i] = piece if buffers[i] is None else pd.concat([buffers[i], piece])
+            frames.append(buffers[i].iloc[:n])
+            buffers[i] = buffers[i].iloc[n:]
+            # Positions of the rows of this bucket in the batch
+            positions[in_bucket] = np.arange(offset, offset + n)
+            offset += n
+
+        yield pd.concat(frames).iloc[positions]
+
+
+ARROW_TABLE_EXTENSIONS = (".parquet", ".arrow", ".feather")
+
+
+class ArrowTableWriter:
+    """
+    Streams DataFrames with the same columns and dtypes to a Parquet file (one row group per DataFrame)
+    or an Arrow IPC / Feather file (one record batch per DataFrame), depending on the extension
+    of the file name. The first DataFrame fixes the schema of the file. Requires pyarrow.
 
-    elif isinstance(mutations, str) and mutations.endswith(".tsv"):
-        mutations_path = mutations
-        mutations = pd.read_csv(mutations, sep="\t")
-        for col in mutations.columns:
-            if col not in columns_to_keep:
-                columns_to_keep.append(
-                    col
-                )  # append "mutation_aa", "gene_name", "mutation_id"
+    Text columns are written as strings, and the dictionary_columns as dictionary-encoded
+    strings (read back by pandas as categoricals). The dictionaries grow with every DataFrame,
+    so that the IPC file only stores the values not seen before in each batch.
 
-    # Handle mutations passed as a list
-    elif isinstance(mutations, list):
-        if len(mutations) > 1:
-            if len(mutations) != len(seqs):
-                raise ValueError(
-                    "If a list is passed, the number of mutations must equal the number of input sequences."
-                )
+    Args:
+    - filename              Path to the output file ending with .parquet, .arrow or .feather.
+    - dictionary_columns    Names of the columns to dictionary-encode. Default: ()
+    """
 
-            temp = pd.DataFrame()
-            temp["mutation"] = mutations
-            temp["mut_ID"] = [f"mut{i+1}" for i in range(len(mutations))]
-            temp["seq_ID"] = [f"seq{i+1}" for i in range(len(mutations))]
-            mutations = temp
-        else:
-            temp = pd.DataFrame()
-            temp["mutation"] = [mutations[0]] * len(seqs)
-            temp["mut_ID"] = [f"mut{i+1}" for i in range(len(seqs))]
-            temp["seq_ID"] = [f"seq{i+1}" for i in range(len(seqs))]
-            mutations = temp
+    def __init__(self, filename, dictionary_columns=()):
+        import pyarrow as pa
+
+        self.filename = filename
+        self.dictionary_columns = list(dictionary_columns)
+        self.categories = {column: pd.Index([], dtype=object) for column in self.dictionary_columns}
+        self.parquet = filename.lower().endswith(".parquet")
+        self.schema = None
+        self.writer = None
+        self._pa = pa
+
+    def schema_from(self, df):
+        pa = self._pa
+        fields = []
+        for column, dtype in df.dtypes.items():
+            if column in self.categories:
+                pa_type = pa.dictionary(pa.int32(), pa.string())
+            elif dtype == object or isinstance(dtype, pd.StringDtype):
+                pa_type = pa.large_string()
+            else:
+                pa_type = pa.from_numpy_dtype(dtype)
+            fields.append(pa.field(str(column), pa_type))
+        return pa.schema(fields)
+
+    def write(self, df):
+        pa = self._pa
+        df = df.copy()
+        for column in self.dictionary_columns:
+            if column not in df.columns:
+                continue
+            values = df[column].astype(object).where(df[column].notna(), None)
+            uniques = pd.Index(pd.unique(values.dropna()).astype(str), dtype=object)
+            new = uniques[~uniques.isin(self.categories[column])]
+            self.categories[column] = self.categories[column].append(new)
+            df[column] = pd.Categorical(
+                values.map(str, na_action="ignore"), categories=self.categories[column]
+            )
 
-    # Handle single mutation passed as a string
-    elif isinstance(mutations, str):
-        # This will work for one mutation for one sequence as well as one mutation for multiple sequences
-        temp = pd.DataFrame()
-        temp["mutation"] = [mutations] * len(seqs)
-        temp["mut_ID"] = [f"mut{i+1}" for i in range(len(seqs))]
-        temp["seq_ID"] = [f"seq{i+1}" for i in range(len(seqs))]
-        mutations = temp
+        if self.writer is None:
+            self.schema = self.schema_from(df)
+            if self.parquet:
+                import pyarrow.parquet as pq
 
-    elif isinstance(mutations, pd.DataFrame):
-        pass
+                self.writer = pq.ParquetWriter(self.filename, self.schema)
+            else:
+                self.writer = pa.ipc.new_file(
+                    self.filename,
+                    self.schema,
+                    options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True),
+                )
 
-    else:
-        raise ValueError(
-            """
-            Format of the input to the 'mutations' argument not recognized. 
-            'mutations' must be one of the following:
-            - Path to comma-separated csv file (e.g. 'mutations.csv')
-            - A pandas DataFrame object
-            - A single mutation to be applied to all input sequences (e.g. 'c.2C>T')
-            - A list of mutations (the number of mutations must equal the number of input sequences) (e.g. ['c.2C>T', 'c.1A>C'])
-            """
+        self.writer.write_table(
+            pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
         )
 
-    # Set of possible nucleotides (- and . are gap annotations)
-    nucleotides = set("ATGCUNatgcun.-")
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+def new_mutation_counts():
+    """
+    Returns a dictionary to count the mutations removed by each filter of apply_mutations.
+    """
+    counts = dict.fromkeys(
+        [
+            "missing_seq_ids",
+            "non_nuc_seqs",
+            "seqs_not_found",
+            "total_mutations",
+            "uncertain_mutations",
+            "ambiguous_position_mutations",
+            "intronic_mutations",
+            "posttranslational_region_mutations",
+            "unknown_mutations",
+            "mut_idx_outside_seq",
+            "cosmic_incorrect_wt_base",
+            "long_duplications",
+            "mutations_overlapping_with_wt",
+            "mutations_with_reference_kmers",
+            "rows_less_than_minimum",
+            "num_rows_with_N",
+        ],
+        0,
+    )
+    counts["seqs_not_found_ids"] = []
+    return counts
 
-    seq_dict = {}
-    non_nuc_seqs = 0
-    for title, seq in zip(titles, seqs):
-        # Check that sequences are nucleotide sequences
-        if not set(seq) <= nucleotides:
-            non_nuc_seqs += 1
 
-        # Keep text following the > until the first space/dot as the sequence identifier
-        # Dots are removed so Ensembl version numbers are removed
-        seq_dict[title.split(" ")[0].split(".")[0]] = seq
+def partition_by_sequence(seq_ids, n_partitions):
+    """
+    Splits rows into at most n_partitions groups of similar size, keeping all rows with the same
+    sequence ID in the same group (rows with a missing ID are put in the first group).
+    Sequences are assigned largest first to the group with the fewest rows, so the split is deterministic.
 
-    if non_nuc_seqs > 0:
-        logger.warning(
-            f"""
-            Non-nucleotide characters detected in {non_nuc_seqs} input sequences. gget mutate is currently only optimized for mutating nucleotide sequences.
-            Specifically inversion mutations might not be performed correctly. 
-            """
+    Returns a list of arrays with the (ascending) positions of the rows of each non-empty group.
+    """
+    codes, uniques = pd.factorize(seq_ids)
+    sizes = np.bincount(codes[codes >= 0], minlength=len(uniques))
+
+    loads = np.zeros(n_partitions, dtype=np.int64)
+    # The last entry is the group of the missing IDs (code -1)
+    assignment = np.zeros(len(uniques) + 1, dtype=np.int64)
+    for code in np.argsort(-sizes, kind="stable"):
+        partition = int(np.argmin(loads))
+        assignment[code] = partition
+        loads[partition] += sizes[code]
+
+    row_partitions = assignment[codes]
+    partitions = [np.flatnonzero(row_partitions == i) for i in range(n_partitions)]
+    return [rows for rows in partitions if len(rows)]
+
+
+# Sequences of the worker processes of mutate (see init_mutate_worker)
+_worker_seq_dict = None
+
+
+def init_mutate_worker(seq_dict):
+    global _worker_seq_dict
+    _worker_seq_dict = seq_dict
+
+
+def apply_mutations_in_worker(mutations, columns_to_keep, checked_seq_ids, kwargs):
+    """
+    Runs apply_mutations on the sequences of the worker process.
+    Returns the mutated rows with their '_row_number', the counts and the checked sequence IDs.
+    """
+    counts = new_mutation_counts()
+    checked_seq_ids = set(checked_seq_ids)
+    mutations = apply_mutations(
+        mutations,
+        _worker_seq_dict,
+        columns_to_keep + ["_row_number"],
+        counts,
+        checked_seq_ids,
+        **kwargs,
+    )
+    return mutations, counts, checked_seq_ids
+
+
+def apply_mutations_in_parallel(
+    executor, mutations, columns_to_keep, counts, checked_seq_ids, threads, **kwargs
+):
+    """
+    Applies the mutations of each sequence in a separate task of executor (see init_mutate_worker),
+    with mutations partitioned by sequence ID (see partition_by_sequence).
+    The results are returned in the order of the input rows, so they do not depend on the number of threads.
+    Arguments and return value as for apply_mutations.
+    """
+    seq_id_column = kwargs["seq_id_column"]
+    mutations = mutations.assign(_row_number=np.arange(len(mutations)))
+
+    futures = [
+        executor.submit(
+            apply_mutations_in_worker,
+            mutations.iloc[rows],
+            list(columns_to_keep),
+            checked_seq_ids,
+            kwargs,
         )
+        for rows in partition_by_sequence(mutations[seq_id_column].values, threads)
+    ]
+
+    # Collected in submission order, so the counts are summed deterministically
+    results = []
+    for future in futures:
+        result, partition_counts, partition_checked_seq_ids = future.result()
+        for key, value in partition_counts.items():
+            counts[key] += value
+        checked_seq_ids.update(partition_checked_seq_ids)
+        if result is not None:
+            results.append(result)
+
+    if not results:
+        return None
+
+    mutations = pd.concat(results).sort_values("_row_number", kind="stable")
+    return mutations.drop(columns="_row_number")
+
+
+def apply_mutations(
+    mutations,
+    seq_dict,
+    columns_to_keep,
+    counts,
+    checked_seq_ids,
+    mut_column="mutation",
+    seq_id_column="seq_ID",
+    mut_id_column="mutation",
+    gtf=None,
+    gtf_df=None,
+    gtf_transcript_id_column=None,
+    mutations_path=None,
+    k=30,
+    min_seq_len=None,
+    optimize_flanking_regions=False,
+    remove_seqs_with_wt_kmers=False,
+    reference_kmer_index=None,
+    max_ambiguous=None,
+    update_df=False,
+    store_full_sequences=False,
+    translate=False,
+    translate_start=None,
+    translate_end=None,
+    verbose=True,
+):
+    """
+    Applies the mutations in a 'mutations' DataFrame (or a chunk of its rows) to the sequences in seq_dict.
+    See mutate for the arguments; gtf_df holds the transcript locations read from the gtf file
+    (see read_gtf_transcript_locations), or None if 'mutations' already contains them, and
+    reference_kmer_index the KmerIndex of the input sequences (with remove_seqs_with_reference_kmers).
+
+    Returns a DataFrame with the columns in columns_to_keep (and the columns added by the options),
+    or None if none of the mutations are valid.
+    The numbers of mutations removed by each filter are added to the counts dictionary, and the IDs of the
+    sequences checked for non-nucleotide characters to the checked_seq_ids set (so they are checked once).
+    """
+    columns_to_keep = list(columns_to_keep)
 
     number_of_missing_seq_ids = mutations[seq_id_column].isna().sum()
+    counts["missing_seq_ids"] += number_of_missing_seq_ids
 
     if number_of_missing_seq_ids > 0:
-        logger.warning(
-            f"""
-            {number_of_missing_seq_ids} rows in 'mutations' are missing sequence IDs. These rows will be dropped from the analysis.
-            """
-        )
-
         # Drop rows with missing sequence IDs
         mutations = mutations.dropna(subset=[seq_id_column])
 
     # ensure seq_ID column is string type, and chromosome numbers don't have decimals
-    mutations[seq_id_column] = mutations[seq_id_column].apply(
-        convert_chromosome_value_to_int_when_possible
+    # (each distinct ID is converted once)
+    mutations[seq_id_column] = mutations[seq_id_column].map(
+        {
+            seq_id: convert_chromosome_value_to_int_when_possible(seq_id)
+            for seq_id in mutations[seq_id_column].unique()
+        }
     )
 
-    mutations = add_mutation_type(mutations, mut_column)
+    # Each distinct mutation string is parsed once
+    parsed = parse_mutations(mutations[mut_column])
+    for column in parsed.columns:
+        mutations[column] = parsed[column].values
+
+    # Set of possible nucleotides (- and . are gap annotations)
+    nucleotides = "ATGCUNatgcun.-"
+
+    # Check that the sequences to be mutated are nucleotide sequences
+    # (stripping all nucleotides from a sequence leaves an empty string)
+    # Sequences already checked for previous chunks are skipped
+    new_seq_ids = [
+        seq_id
+        for seq_id in mutations[seq_id_column].unique()
+        if seq_id in seq_dict and seq_id not in checked_seq_ids
+    ]
+    checked_seq_ids.update(new_seq_ids)
+    counts["non_nuc_seqs"] += sum(
+        1 for seq_id in new_seq_ids if str(seq_dict[seq_id]).strip(nucleotides)
+    )
 
     # Link sequences to their mutations using the sequence identifiers
+    # (one string per sequence, shared by all its mutations)
     if store_full_sequences:
-        mutations["wt_sequence_full"] = mutations[seq_id_column].map(seq_dict)
+        mutations["wt_sequence_full"] = mutations[seq_id_column].map(
+            {
+                seq_id: str(seq_dict[seq_id])
+                for seq_id in mutations[seq_id_column].unique()
+                if seq_id in seq_dict
+            }
+        )
 
-    # Handle sequences that were not found based on their sequence IDs
+    # Record sequences that were not found based on their sequence IDs
     seqs_not_found = mutations[~mutations[seq_id_column].isin(seq_dict.keys())]
-    if 0 < len(seqs_not_found) < 20:
-        logger.warning(
-            f"""
-            The sequences with the following {len(seqs_not_found)} sequence ID(s) were not found: {", ".join(seqs_not_found[seq_id_column].values)}  
-            These sequences and their corresponding mutations will not be included in the output.  
-            Ensure that the sequence IDs correspond to the string following the > character in the 'sequences' fasta file (do NOT include spaces or dots).
-            """
-        )
-    elif len(seqs_not_found) > 0:
-        logger.warning(
-            f"""
-            The sequences corresponding to {len(seqs_not_found)} sequence IDs were not found.  
-            These sequences and their corresponding mutations will not be included in the output.  
-            Ensure that the sequence IDs correspond to the string following the > character in the 'sequences' fasta file (do NOT include spaces or dots).
-            """
-        )
+    counts["seqs_not_found"] += len(seqs_not_found)
+    counts["seqs_not_found_ids"].extend(seqs_not_found[seq_id_column].values[:20])
 
     # Drop inputs for sequences that were not found
     mutations = mutations.dropna(subset=[seq_id_column, mut_column])
     if len(mutations) < 1:
-        raise ValueError(
-            """
-            None of the input sequences match the sequence IDs provided in 'mutations'. 
-            Ensure that the sequence IDs correspond to the string following the > character in the 'sequences' fasta file (do NOT include spaces or dots).
-            """
-        )
-
-    total_mutations = mutations.shape[0]
+        return None
 
-    if mut_id_column is None:
-        mut_id_column = mut_column
+    counts["total_mutations"] += mutations.shape[0]
 
     mutations["mutant_sequence"] = ""
     mutations["header"] = (
@@ -650,58 +1590,47 @@ def mutate(
     )
 
     # Calculate number of bad mutations
-    uncertain_mutations = mutations[mut_column].str.contains(r"\?").sum()
+    counts["uncertain_mutations"] += mutations["uncertain_mutation"].sum()
 
-    ambiguous_position_mutations = mutations[mut_column].str.contains(r"\(|\)").sum()
+    counts["ambiguous_position_mutations"] += mutations["ambiguous_position_mutation"].sum()
 
-    intronic_mutations = mutations[mut_column].str.contains(r"\+|\-").sum()
+    counts["intronic_mutations"] += mutations["intronic_mutation"].sum()
 
-    posttranslational_region_mutations = mutations[mut_column].str.contains(r"\*").sum()
+    counts["posttranslational_region_mutations"] += (
+        mutations["posttranslational_region_mutation"].sum()
+    )
 
     # Filter out bad mutations
-    combined_pattern = re.compile(r"(\?|\(|\)|\+|\-|\*)")
-    mask = mutations[mut_column].str.contains(combined_pattern)
+    mask = mutations[
+        [
+            "uncertain_mutation",
+            "ambiguous_position_mutation",
+            "intronic_mutation",
+            "posttranslational_region_mutation",
+        ]
+    ].any(axis=1)
     mutations = mutations[~mask]
 
-    # Extract nucleotide positions and mutation info from Mutation CDS
-    mutations[["nucleotide_positions", "actual_mutation"]] = mutations[
-        mut_column
-    ].str.extract(mutation_pattern)
-
-    # Filter out mutations that did not match the re
-    unknown_mutations = mutations["nucleotide_positions"].isna().sum()
-    mutations = mutations.dropna(subset=["nucleotide_positions", "actual_mutation"])
+    # Filter out mutations that did not match the re (or whose positions are not integers)
+    unknown_mask = mutations["nucleotide_positions"].isna() | (mutations["start_position"] < 0)
+    counts["unknown_mutations"] += unknown_mask.sum()
+    mutations = mutations[~unknown_mask]
 
     if mutations.empty:
-        logger.warning("No valid mutations found in the input.")
-        return mutations if update_df else []
-
-    # Split nucleotide positions into start and end positions
-    split_positions = mutations["nucleotide_positions"].str.split("_", expand=True)
-
-    mutations["start_mutation_position"] = split_positions[0]
-    if split_positions.shape[1] > 1:
-        mutations["end_mutation_position"] = split_positions[1].fillna(
-            split_positions[0]
-        )
-    else:
-        mutations["end_mutation_position"] = mutations["start_mutation_position"]
-
-    mutations.loc[
-        mutations["end_mutation_position"].isna(), "end_mutation_position"
-    ] = mutations["start_mutation_position"]
-
-    mutations[["start_mutation_position", "end_mutation_position"]] = mutations[
-        ["start_mutation_position", "end_mutation_position"]
-    ].astype(int)
+        return None
 
     # Adjust positions to 0-based indexing
-    mutations["start_mutation_position"] -= 1
-    mutations["end_mutation_position"] -= 1  # don't forget to increment by 1 later
+    mutations["start_mutation_position"] = mutations["start_position"] - 1
+    mutations["end_mutation_position"] = (
+        mutations["end_position"] - 1
+    )  # don't forget to increment by 1 later
 
     # Calculate sequence length
-    mutations["sequence_length"] = mutations[seq_id_column].apply(
-        lambda x: get_sequence_length(x, seq_dict)
+    mutations["sequence_length"] = mutations[seq_id_column].map(
+        {
+            seq_id: get_sequence_length(seq_id, seq_dict)
+            for seq_id in mutations[seq_id_column].unique()
+        }
     )
 
     # Filter out mutations with positions outside the sequence
@@ -709,13 +1638,12 @@ def mutate(
         mutations["start_mutation_position"] > mutations["sequence_length"]
     ) | (mutations["end_mutation_position"] > mutations["sequence_length"])
 
-    mut_idx_outside_seq = index_error_mask.sum()
+    counts["mut_idx_outside_seq"] += index_error_mask.sum()
 
     mutations = mutations[~index_error_mask]
 
     if mutations.empty:
-        logger.warning("No valid mutations found in the input.")
-        return mutations if update_df else []
+        return None
 
     # Create masks for each type of mutation
     mutations["wt_nucleotides_ensembl"] = None
@@ -737,7 +1665,7 @@ def mutate(
                 >= k
             )
         ).sum()
-        logger.info(f"Removing {long_duplications} duplications > k")
+        counts["long_duplications"] += long_duplications
         mutations = mutations[
             ~(
                 (duplication_mask)
@@ -758,16 +1686,20 @@ def mutate(
 
     # Extract the WT nucleotides for the substitution rows from reference fasta (i.e., Ensembl)
     start_positions = mutations.loc[substitution_mask, "start_mutation_position"].values
+    start_positions = np.where(
+        start_positions < 0,
+        start_positions + mutations.loc[substitution_mask, "sequence_length"].values,
+        start_positions,
+    )
 
-    # Get the nucleotides at the start positions
-    wt_nucleotides_substitution = np.array(
-        [
-            get_nucleotide_at_position(seq_id, pos, seq_dict)
-            for seq_id, pos in zip(
-                mutations.loc[substitution_mask, seq_id_column], start_positions
-            )
-        ]
+    # Get the nucleotides at the start positions (None for positions after the end of the sequence)
+    wt_nucleotides_substitution = extract_regions(
+        seq_dict,
+        mutations.loc[substitution_mask, seq_id_column].values,
+        start_positions,
+        start_positions + 1,
     )
+    wt_nucleotides_substitution[wt_nucleotides_substitution == ""] = None
 
     mutations.loc[substitution_mask, "wt_nucleotides_ensembl"] = (
         wt_nucleotides_substitution
@@ -776,8 +1708,8 @@ def mutate(
     # Extract the WT nucleotides for the substitution rows from the Mutation CDS (i.e., COSMIC)
     mutations["wt_nucleotides_cosmic"] = None
     mutations.loc[substitution_mask, "wt_nucleotides_cosmic"] = mutations[
-        "actual_mutation"
-    ].str[0]
+        "reference_nucleotides"
+    ]
 
     congruent_wt_bases_mask = (
         mutations["wt_nucleotides_cosmic"] == mutations["wt_nucleotides_ensembl"]
@@ -785,13 +1717,12 @@ def mutate(
         axis=1
     )
 
-    cosmic_incorrect_wt_base = (~congruent_wt_bases_mask).sum()
+    counts["cosmic_incorrect_wt_base"] += (~congruent_wt_bases_mask).sum()
 
     mutations = mutations[congruent_wt_bases_mask]
 
     if mutations.empty:
-        logger.warning("No valid mutations found in the input.")
-        return mutations if update_df else []
+        return None
 
     # Adjust the start and end positions for insertions
     mutations.loc[
@@ -802,33 +1733,25 @@ def mutate(
     ] -= 1  # in this notation, the end position is one before the start position
 
     # Extract the WT nucleotides for the non-substitution rows from the Mutation CDS (i.e., COSMIC)
-    mutations.loc[non_substitution_mask, "wt_nucleotides_ensembl"] = mutations.loc[
-        non_substitution_mask
-    ].apply(lambda row: extract_sequence(row, seq_dict, seq_id_column), axis=1)
+    mutations.loc[non_substitution_mask, "wt_nucleotides_ensembl"] = extract_regions(
+        seq_dict,
+        mutations.loc[non_substitution_mask, seq_id_column].values,
+        mutations.loc[non_substitution_mask, "start_mutation_position"].values,
+        mutations.loc[non_substitution_mask, "end_mutation_position"].values + 1,
+    )
 
     # Apply mutations to the sequences
     mutations["mut_nucleotides"] = None
-    mutations.loc[substitution_mask, "mut_nucleotides"] = mutations.loc[
-        substitution_mask, "actual_mutation"
-    ].str[-1]
+    inserted_mask = substitution_mask | delins_mask | insertion_mask
+    mutations.loc[inserted_mask, "mut_nucleotides"] = mutations.loc[
+        inserted_mask, "inserted_nucleotides"
+    ]
     mutations.loc[deletion_mask, "mut_nucleotides"] = ""
-    mutations.loc[delins_mask, "mut_nucleotides"] = mutations.loc[
-        delins_mask, "actual_mutation"
-    ].str.extract(r"delins([A-Z]+)")[0]
-    mutations.loc[insertion_mask, "mut_nucleotides"] = mutations.loc[
-        insertion_mask, "actual_mutation"
-    ].str.extract(r"ins([A-Z]+)")[0]
     mutations.loc[duplication_mask, "mut_nucleotides"] = mutations.loc[
-        duplication_mask
-    ].apply(lambda row: row["wt_nucleotides_ensembl"], axis=1)
-    mutations.loc[inversion_mask, "mut_nucleotides"] = mutations.loc[
-        inversion_mask
-    ].apply(
-        lambda row: "".join(
-            complement.get(nucleotide, "N")
-            for nucleotide in row["wt_nucleotides_ensembl"][::-1]
-        ),
-        axis=1,
+        duplication_mask, "wt_nucleotides_ensembl"
+    ]
+    mutations.loc[inversion_mask, "mut_nucleotides"] = reverse_complement_strings(
+        mutations.loc[inversion_mask, "wt_nucleotides_ensembl"]
     )
 
     # Adjust the nucleotide positions of duplication mutations to mimic that of insertions (since duplications are essentially just insertions)
@@ -852,15 +1775,12 @@ def mutate(
     )  # don't forget to increment by 1 later on
 
     if gtf is not None:
-        assert mutations_path.endswith(".csv") or mutations_path.endswith(
-            ".tsv"
-        ), "Mutations must be a CSV or TSV file"
         if (
             "start_transcript_position" not in mutations.columns
             and "end_transcript_position" not in mutations.columns
         ):  # * currently hard-coded column names, but optionally can be changed to arguments later
             mutations = merge_gtf_transcript_locations_into_cosmic_csv(
-                mutations, gtf, gtf_transcript_id_column=gtf_transcript_id_column
+                mutations, gtf_df, gtf_transcript_id_column=gtf_transcript_id_column
             )
             columns_to_keep.extend(
                 ["start_transcript_position", "end_transcript_position", "strand"]
@@ -880,53 +1800,34 @@ def mutate(
             ["end_kmer_position", "end_transcript_position"]
         ].min(axis=1)
 
-    mut_apply = (
-        (lambda *args, **kwargs: mutations.progress_apply(*args, **kwargs))
-        if verbose
-        else mutations.apply
-    )
+    # Extract the flank sequences of all mutations of each sequence at once
+    seq_ids = mutations[seq_id_column].values
+    start_mutation_positions = mutations["start_mutation_position"].values
+    end_mutation_positions = mutations["end_mutation_position"].values
 
     if update_df and store_full_sequences:
-        # Extract flank sequences
-        if verbose:
-            tqdm.pandas(desc="Extracting full left flank sequences")
-
-        mutations["left_flank_region_full"] = mut_apply(
-            lambda row: seq_dict[row[seq_id_column]][
-                0 : row["start_mutation_position"]
-            ],
-            axis=1,
-        )  # ? vectorize
-
-        if verbose:
-            tqdm.pandas(desc="Extracting full right flank sequences")
-
-        mutations["right_flank_region_full"] = mut_apply(
-            lambda row: seq_dict[row[seq_id_column]][
-                row["end_mutation_position"] + 1 : row["sequence_length"]
-            ],
-            axis=1,
-        )  # ? vectorize
-
-    if verbose:
-        tqdm.pandas(desc="Extracting k-mer left flank sequences")
-
-    mutations["left_flank_region"] = mut_apply(
-        lambda row: seq_dict[row[seq_id_column]][
-            row["start_kmer_position"] : row["start_mutation_position"]
-        ],
-        axis=1,
-    )  # ? vectorize
-
-    if verbose:
-        tqdm.pandas(desc="Extracting k-mer right flank sequences")
+        mutations["left_flank_region_full"] = extract_regions(
+            seq_dict, seq_ids, np.zeros(len(mutations), dtype=np.int64), start_mutation_positions
+        )
+        mutations["right_flank_region_full"] = extract_regions(
+            seq_dict,
+            seq_ids,
+            end_mutation_positions + 1,
+            mutations["sequence_length"].values,
+        )
 
-    mutations["right_flank_region"] = mut_apply(
-        lambda row: seq_dict[row[seq_id_column]][
-            row["end_mutation_position"] + 1 : row["end_kmer_position"] + 1
-        ],
-        axis=1,
-    )  # ? vectorize
+    mutations["left_flank_region"] = extract_regions(
+        seq_dict,
+        seq_ids,
+        mutations["start_kmer_position"].values,
+        start_mutation_positions,
+    )
+    mutations["right_flank_region"] = extract_regions(
+        seq_dict,
+        seq_ids,
+        end_mutation_positions + 1,
+        mutations["end_kmer_position"].values + 1,
+    )
 
     mutations["beginning_mutation_overlap_with_right_flank"] = 0
     mutations["end_mutation_overlap_with_left_flank"] = 0
@@ -944,26 +1845,24 @@ def mutate(
     # To what extend the end of i overlaps with the beginning of d --> shave up to that many nucleotides off the end of r2 until k - len(r2) ≥ extent of overlap
 
     if optimize_flanking_regions:
-        # Apply the function for beginning of mut_nucleotides with right_flank_region
+        # Overlaps of the beginning of mut_nucleotides with right_flank_region
+        # and of the end of mut_nucleotides with left_flank_region
+        beginning_overlaps, end_overlaps = calculate_mutation_overlaps_with_flanks(
+            mutations.loc[non_substitution_mask]
+        )
         mutations.loc[
             non_substitution_mask, "beginning_mutation_overlap_with_right_flank"
-        ] = mutations.loc[non_substitution_mask].apply(
-            calculate_beginning_mutation_overlap_with_right_flank, axis=1
-        )
-
-        # Apply the function for end of mut_nucleotides with left_flank_region
+        ] = beginning_overlaps
         mutations.loc[non_substitution_mask, "end_mutation_overlap_with_left_flank"] = (
-            mutations.loc[non_substitution_mask].apply(
-                calculate_end_mutation_overlap_with_left_flank, axis=1
-            )
+            end_overlaps
         )
 
         # Calculate k-len(flank) (see above instructions)
         mutations.loc[non_substitution_mask, "k_minus_left_flank_length"] = (
-            k - mutations.loc[non_substitution_mask, "left_flank_region"].apply(len)
+            k - mutations.loc[non_substitution_mask, "left_flank_region"].str.len()
         )
         mutations.loc[non_substitution_mask, "k_minus_right_flank_length"] = (
-            k - mutations.loc[non_substitution_mask, "right_flank_region"].apply(len)
+            k - mutations.loc[non_substitution_mask, "right_flank_region"].str.len()
         )
 
         mutations.loc[non_substitution_mask, "updated_left_flank_start"] = np.maximum(
@@ -991,104 +1890,95 @@ def mutate(
         mutations["updated_right_flank_end"] = 0
 
     # Create WT substitution k-mer sequences
+    # (concatenated as object arrays, since pyarrow-backed string columns cannot be added to
+    # empty or all-None object columns)
     mutations.loc[substitution_mask, "wt_sequence"] = (
-        mutations.loc[substitution_mask, "left_flank_region"]
-        + mutations.loc[substitution_mask, "wt_nucleotides_ensembl"]
-        + mutations.loc[substitution_mask, "right_flank_region"]
+        mutations.loc[substitution_mask, "left_flank_region"].to_numpy(dtype=object)
+        + mutations.loc[substitution_mask, "wt_nucleotides_ensembl"].to_numpy(dtype=object)
+        + mutations.loc[substitution_mask, "right_flank_region"].to_numpy(dtype=object)
+    )
+
+    # Flanks of the non-substitution k-mer sequences, shortened by updated_left_flank_start
+    # and updated_right_flank_end (a negative end of the right flank counts from its end, as when slicing)
+    non_substitution = mutations.loc[non_substitution_mask]
+    left_flank_starts = non_substitution["updated_left_flank_start"].values
+    right_flank_lengths = non_substitution["right_flank_region"].str.len().values
+    right_flank_ends = right_flank_lengths - non_substitution["updated_right_flank_end"].values
+    right_flank_ends = np.where(
+        right_flank_ends < 0, right_flank_ends + right_flank_lengths, right_flank_ends
     )
 
     # Create WT non-substitution k-mer sequences
-    mutations.loc[non_substitution_mask, "wt_sequence"] = mutations.loc[
-        non_substitution_mask
-    ].apply(
-        lambda row: row["left_flank_region"][row["updated_left_flank_start"] :]
-        + row["wt_nucleotides_ensembl"]
-        + row["right_flank_region"][
-            : len(row["right_flank_region"]) - row["updated_right_flank_end"]
-        ],
-        axis=1,
+    mutations.loc[non_substitution_mask, "wt_sequence"] = join_string_slices(
+        (non_substitution["left_flank_region"].values, left_flank_starts, None),
+        (non_substitution["wt_nucleotides_ensembl"].values, None, None),
+        (non_substitution["right_flank_region"].values, None, right_flank_ends),
     )
 
     # Create mutant substitution k-mer sequences
     mutations.loc[substitution_mask, "mutant_sequence"] = (
-        mutations.loc[substitution_mask, "left_flank_region"]
-        + mutations.loc[substitution_mask, "mut_nucleotides"]
-        + mutations.loc[substitution_mask, "right_flank_region"]
+        mutations.loc[substitution_mask, "left_flank_region"].to_numpy(dtype=object)
+        + mutations.loc[substitution_mask, "mut_nucleotides"].to_numpy(dtype=object)
+        + mutations.loc[substitution_mask, "right_flank_region"].to_numpy(dtype=object)
     )
 
     # Create mutant non-substitution k-mer sequences
-    mutations.loc[non_substitution_mask, "mutant_sequence"] = mutations.loc[
-        non_substitution_mask
-    ].apply(
-        lambda row: row["left_flank_region"][row["updated_left_flank_start"] :]
-        + row["mut_nucleotides"]
-        + row["right_flank_region"][
-            : len(row["right_flank_region"]) - row["updated_right_flank_end"]
-        ],
-        axis=1,
+    mutations.loc[non_substitution_mask, "mutant_sequence"] = join_string_slices(
+        (non_substitution["left_flank_region"].values, left_flank_starts, None),
+        (non_substitution["mut_nucleotides"].values, None, None),
+        (non_substitution["right_flank_region"].values, None, right_flank_ends),
     )
 
     if remove_seqs_with_wt_kmers:
-        if verbose:
-            tqdm.pandas(
-                desc="Removing mutant fragments that share a kmer with wt fragments"
-            )
-
-        mutations["wt_fragment_and_mutant_fragment_share_kmer"] = mut_apply(
-            lambda row: wt_fragment_and_mutant_fragment_share_kmer(
-                mutated_fragment=row["mutant_sequence"],
-                wildtype_fragment=row["wt_sequence"],
-                k=k + 1,
-            ),
-            axis=1,
+        # The (k+1)-mers of all mutant and wt fragments are compared at once
+        mutations["wt_fragment_and_mutant_fragment_share_kmer"] = fragments_share_kmer(
+            mutations["mutant_sequence"], mutations["wt_sequence"], k + 1
         )
 
-        mutations_overlapping_with_wt = mutations[
+        counts["mutations_overlapping_with_wt"] += mutations[
             "wt_fragment_and_mutant_fragment_share_kmer"
         ].sum()
 
         mutations = mutations[~mutations["wt_fragment_and_mutant_fragment_share_kmer"]]
 
+    if reference_kmer_index is not None:
+        # Mutant sequences with a (k+1)-mer found anywhere in the input sequences (on either strand)
+        reference_kmer_mask = reference_kmer_index.contains_any(
+            mutations["mutant_sequence"]
+        )
+        counts["mutations_with_reference_kmers"] += reference_kmer_mask.sum()
+        mutations = mutations[~reference_kmer_mask]
+
     if update_df and store_full_sequences:
         columns_to_keep.extend(["wt_sequence_full", "mutant_sequence_full"])
 
         # Create full sequences (substitution and non-substitution)
         mutations["mutant_sequence_full"] = (
-            mutations["left_flank_region_full"]
-            + mutations["mut_nucleotides"]
-            + mutations["right_flank_region_full"]
+            mutations["left_flank_region_full"].to_numpy(dtype=object)
+            + mutations["mut_nucleotides"].to_numpy(dtype=object)
+            + mutations["right_flank_region_full"].to_numpy(dtype=object)
         )
 
     # Calculate k-mer lengths and report the distribution
-    mutations["mutant_sequence_kmer_length"] = mutations["mutant_sequence"].apply(
-        lambda x: len(x) if pd.notna(x) else 0
+    mutations["mutant_sequence_kmer_length"] = (
+        mutations["mutant_sequence"].str.len().fillna(0).astype(int)
     )
 
     max_length = mutations["mutant_sequence_kmer_length"].max()
 
     if min_seq_len:
-        rows_less_than_minimum = (
+        counts["rows_less_than_minimum"] += (
             mutations["mutant_sequence_kmer_length"] < min_seq_len
         ).sum()
 
         mutations = mutations[mutations["mutant_sequence_kmer_length"] >= min_seq_len]
 
-        if verbose:
-            logger.info(
-                f"Removed {rows_less_than_minimum} mutant kmers with length less than {min_seq_len}..."
-            )
-
     if max_ambiguous is not None:
         # Get number of 'N' or 'n' occuring in the sequence
         mutations["num_N"] = mutations["mutant_sequence"].str.lower().str.count("n")
-        num_rows_with_N = (mutations["num_N"] > max_ambiguous).sum()
+        counts["num_rows_with_N"] += (mutations["num_N"] > max_ambiguous).sum()
         mutations = mutations[mutations["num_N"] <= max_ambiguous]
 
-        if verbose:
-            logger.info(
-                f"Removed {num_rows_with_N} mutant kmers containing more than {max_ambiguous} 'N's..."
-            )
-
         # Drop the 'num_N' column after filtering
         mutations = mutations.drop(columns=["num_N"])
 
@@ -1109,245 +1999,708 @@ def mutate(
     except Exception as e:
         pass
 
-    # split_cols = mutations[mut_id_column].str.split("_", n=1, expand=True)
-
-    # if split_cols.shape[1] == 1:
-    #     split_cols[1] = None
+    if translate and update_df and store_full_sequences:
+        columns_to_keep.extend(["wt_sequence_aa_full", "mutant_sequence_aa_full"])
 
-    # # Extract gene name and mutation ID from mut_ID column (based on formatting of gget cosmic)
-    # mutations["gene_name"] = split_cols[0]
-    # mutations["mutation_id"] = split_cols[1].fillna(mutations[mut_id_column])
+        if not mutations_path:
+            assert (
+                type(translate_start) != str and type(translate_end) != str
+            ), "translate_start and translate_end must be integers when translating sequences (or default None)."
+            if translate_start is None:
+                translate_start = 0
+            if translate_end is None:
+                # Translate each sequence to its own end
+                translate_end = mutations["sequence_length"].values
 
-    # Report status of mutations back to user
-    good_mutations = mutations.shape[0]
+            starts, ends = translate_start, translate_end
+        else:
+            if not translate_start:
+                translate_start = "translate_start"
 
-    # good_mutations = total_mutations - intronic_mutations - posttranslational_region_mutations - unknown_mutations - uncertain_mutations - ambiguous_position_mutations - cosmic_incorrect_wt_base - mut_idx_outside_seq
+            if not translate_end:
+                translate_end = "translate_end"
 
-    # if remove_seqs_with_wt_kmers:
-    #     good_mutations = good_mutations - long_duplications - mutations_overlapping_with_wt
+            if translate_start not in mutations.columns:
+                mutations["translate_start"] = 0
 
-    # if min_seq_len:
-    #     good_mutations = good_mutations - rows_less_than_minimum
+            if translate_end not in mutations.columns:
+                mutations["translate_end"] = mutations["sequence_length"]
 
-    # if max_ambigious:
-    #     good_mutations = good_mutations - num_rows_with_N
+            starts, ends = mutations[translate_start].values, mutations[translate_end].values
 
-    report = f"""
-        {good_mutations} mutations correctly recorded ({good_mutations/total_mutations*100:.2f}%)
-        {intronic_mutations} intronic mutations found ({intronic_mutations/total_mutations*100:.2f}%)
-        {posttranslational_region_mutations} posttranslational region mutations found ({posttranslational_region_mutations/total_mutations*100:.2f}%)
-        {unknown_mutations} unknown mutations found ({unknown_mutations/total_mutations*100:.2f}%)
-        {uncertain_mutations} mutations with uncertain mutation found ({uncertain_mutations/total_mutations*100:.2f}%)
-        {ambiguous_position_mutations} mutations with ambiguous position found ({ambiguous_position_mutations/total_mutations*100:.2f}%)
-        {cosmic_incorrect_wt_base} mutations with incorrect wildtype base found ({cosmic_incorrect_wt_base/total_mutations*100:.2f}%)
-        {mut_idx_outside_seq} mutations with indices outside of the sequence length found ({mut_idx_outside_seq/total_mutations*100:.2f}%)
-        """
+        if verbose:
+            logger.info("Translating wildtype and mutant sequences")
+
+        # The wildtype translation is the same for all mutations of a sequence with the same reading frame,
+        # so each is translated once
+        frames = pd.DataFrame(
+            {
+                "seq_ID": mutations[seq_id_column].values,
+                "start": np.broadcast_to(starts, len(mutations)),
+                "end": np.broadcast_to(ends, len(mutations)),
+            }
+        )
+        frame_ids = frames.groupby(list(frames.columns), sort=False, dropna=False).ngroup().values
+        first_rows = np.unique(frame_ids, return_index=True)[1]
+        wt_translations = translate_sequences(
+            mutations["wt_sequence_full"].values[first_rows],
+            frames["start"].values[first_rows],
+            frames["end"].values[first_rows],
+        )
+        mutations["wt_sequence_aa_full"] = np.asarray(wt_translations, dtype=object)[frame_ids]
+        mutations["mutant_sequence_aa_full"] = translate_sequences(
+            mutations["mutant_sequence_full"].values, starts, ends
+        )
 
-    if remove_seqs_with_wt_kmers:
-        report += f"""{long_duplications} duplications longer than k found ({long_duplications/total_mutations*100:.2f}%)
-        {mutations_overlapping_with_wt} mutations with overlapping kmers found ({mutations_overlapping_with_wt/total_mutations*100:.2f}%)
-        """
+    return mutations[columns_to_keep]
 
-    if min_seq_len:
-        report += f"""{rows_less_than_minimum} mutations with fragment length < k found ({rows_less_than_minimum/total_mutations*100:.2f}%)
-        """
 
-    if max_ambiguous is not None:
-        report += f"""{num_rows_with_N} mutations with Ns found ({num_rows_with_N/total_mutations*100:.2f}%)
-        """
+def mutate(
+    sequences: Union[str, List[str]],
+    mutations: Union[str, List[str]],
+    mut_column: str = "mutation",
+    seq_id_column: str = "seq_ID",
+    mut_id_column: Optional[str] = None,
+    gtf: Optional[str] = None,
+    gtf_transcript_id_column: Optional[str] = None,
+    k: int = 30,
+    min_seq_len: Optional[int] = None,
+    optimize_flanking_regions: bool = False,
+    remove_seqs_with_wt_kmers: bool = False,
+    remove_seqs_with_reference_kmers: bool = False,
+    reference_kmer_index: Optional[str] = None,
+    max_ambiguous: Optional[int] = None,
+    merge_identical: bool = True,
+    update_df: bool = False,
+    update_df_out: Optional[str] = None,
+    store_full_sequences: bool = False,
+    translate: bool = True,
+    translate_start: Union[int, str, None] = None,
+    translate_end: Union[int, str, None] = None,
+    out: Optional[str] = None,
+    verbose: bool = True,
+    chunk_size: Optional[int] = None,
+    threads: int = 1,
+):
+    """
+    Takes in nucleotide sequences and mutations (in standard mutation annotation - see below)
+    and returns mutated versions of the input sequences according to the provided mutations.
+
+    Reuiqred input argument:
+    - sequences     (str) Path to the fasta file containing the sequences to be mutated, e.g., 'seqs.fa'.
+                    Sequence identifiers following the '>' character must correspond to the identifiers
+                    in the seq_ID column of 'mutations'.
+
+                    Example:
+                    >seq1 (or ENSG00000106443)
+                    ACTGCGATAGACT
+                    >seq2
+                    AGATCGCTAG
+
+                    Alternatively: Input sequence(s) as a string or list, e.g. 'AGCTAGCT' or ['ACTGCTAGCT', 'AGCTAGCT'].
+
+                    NOTE: Only the letters until the first space or dot will be used as sequence identifiers
+                    - Version numbers of Ensembl IDs will be ignored.
+                    NOTE: When 'sequences' input is a genome, also see 'gtf' argument below.
+                    NOTE: The fasta file is indexed in memory (an up-to-date samtools index '<sequences>.fai' is reused,
+                    but none is written), so only the sequence regions around the mutations are read from it.
+                    Of several sequences with the same identifier, the last one is used.
+                    Gzip/bgzip compressed fasta files (e.g. 'genome.fa.gz' from gget ref) are read directly and their
+                    sequences are kept in memory with 2 bits per base.
+
+    - mutations     Path to csv or tsv file (str) (e.g., 'mutations.csv') or data frame (DataFrame object)
+                    containing information about the mutations in the following format:
+
+                    | mutation         | mut_ID | seq_ID |
+                    | c.2C>T           | mut1   | seq1   | -> Apply mutation 1 to sequence 1
+                    | c.9_13inv        | mut2   | seq2   | -> Apply mutation 2 to sequence 2
+                    | c.9_13inv        | mut2   | seq3   | -> Apply mutation 2 to sequence 3
+                    | c.9_13delinsAAT  | mut3   | seq3   | -> Apply mutation 3 to sequence 3
+                    | ...              | ...    | ...    |
+
+                    'mutation' = Column containing the mutations to be performed written in standard mutation annotation (see below)
+                    'mut_ID' = Column containing an identifier for each mutation
+                    'seq_ID' = Column containing the identifiers of the sequences to be mutated (must correspond to the string following
+                    the > character in the 'sequences' fasta file; do NOT include spaces or dots)
+
+                    Alternatively: Input mutation(s) as a string or list, e.g., 'c.2C>T' or ['c.2C>T', 'c.1A>C'].
+                    If a list is provided, the number of mutations must equal the number of input sequences.
+
+                    For more information on the standard mutation annotation, see https://www.ncbi.nlm.nih.gov/pmc/articles/PMC1867422/.
+
+    Additional input arguments:
+    - mut_column                   (str) Name of the column containing the mutations to be performed in 'mutations'. Default: 'mutation'.
+    - seq_id_column                (str) Name of the column containing the IDs of the sequences to be mutated in 'mutations'. Default: 'seq_ID'.
+    - mut_id_column                (str) Name of the column containing the IDs of each mutation in 'mutations'. Default: Will use mut_column.
+    - gtf                          (str) Path to .gtf file. When providing a genome fasta file as input for 'sequences', you can provide a .gtf file here
+                                   and the input sequences will be defined according to the transcript boundaries. The transcript locations are saved
+                                   next to the gtf file ('<gtf>.transcripts.npy') and reused until the gtf file changes. Default: None
+    - gtf_transcript_id_column     (str) Column name in the input 'mutations' file containing the transcript ID. In this case, column seq_id_column should contain the chromosome number.
+                                   Required when 'gtf' is provided. Default: None
+
+    Mutant sequence generation/filtering options:
+    - k                            (int) Length of sequences flanking the mutation. Default: 30.
+                                   If k > total length of the sequence, the entire sequence will be kept.
+    - min_seq_len                  (int) Minimum length of the mutant output sequence. Mutant sequences smaller than this will be dropped.
+                                   Default: None
+    - optimize_flanking_regions    (True/False) Whether to remove nucleotides from either end of the mutant sequence to ensure (when possible)
+                                   that the mutant sequence does not contain any k-mers also found in the wildtype/input sequence. Default: False
+    - remove_seqs_with_wt_kmers    (True/False) Removes output sequences where at least one (k+1)-mer is also present in the wildtype/input sequence in the same region.
+                                   If optimize_flanking_regions=True, only sequences for which a wildtype kmer is still present after optimization will be removed.
+                                   Default: False
+    - remove_seqs_with_reference_kmers (True/False) Removes output sequences where at least one (k+1)-mer (or its reverse complement) is present anywhere
+                                   in the input sequences, e.g. the transcriptome (k-mers containing characters other than A, C, G and T are ignored).
+                                   The (k+1)-mers of the input sequences are hashed into an index, which is built once and reused (see reference_kmer_index).
+                                   Default: False
+    - reference_kmer_index         (str) Path to the (k+1)-mer index of the input sequences used by remove_seqs_with_reference_kmers. The index is read if it
+                                   was built for the same sequences and k (recorded in '[reference_kmer_index].json'), otherwise it is built and saved there.
+                                   Default: None -> saved in the gget cache directory ($GGET_CACHE_DIR or ~/.cache/gget) under 'kmer_indexes'
+                                   (for sequences passed as a list or string, the index is not saved)
+    - max_ambiguous                (int) Maximum number of 'N' characters allowed in the output sequence. Default: None (no 'N' filter will be applied)
+    - merge_identical              (True/False) Whether to merge identical mutant sequences in the output (identical sequences will be merged by concatenating the sequence
+                                   headers for all identical sequences). Default: True
+
+    # Optional arguments to generate additional output stored in a copy of the 'mutations' DataFrame
+    - update_df                    (True/False) Whether to update the input 'mutations' DataFrame to include additional columns with the mutation type,
+                                   wildtype nucleotide sequence, and mutant nucleotide sequence (only valid if 'mutations' is a csv or tsv file). Default: False
+    - update_df_out                (str) Path to output csv file containing the updated DataFrame. Only valid if update_df=True.
+                                   If the path ends with .parquet, .arrow or .feather, the DataFrame is instead written chunk by chunk as a Parquet
+                                   or Arrow IPC (Feather) file with dictionary-encoded sequence ID and mutation type columns (requires pyarrow).
+                                   Default: None -> the new DataFrame will be saved in the same directory as the 'mutations' DataFrame with appendix '_updated'
+    - store_full_sequences         (True/False) Whether to also include the complete wildtype and mutant sequences in the updated 'mutations' DataFrame (not just the sub-sequence with
+                                   k-length flanks). Only valid if update_df=True. Default: False
+    - translate                    (True/False) Add additional columns to the 'mutations' DataFrame containing the wildtype and mutant amino acid sequences.
+                                   Only takes effect if update_df=True and store_full_sequences=True. Default: True
+    - translate_start              (int | str | None) The position in the input nucleotide sequence to start translating. If a string is provided, it should correspond
+                                   to a column name in 'mutations' containing the open reading frame start positions for each sequence/mutation.
+                                   Only valid if translate=True. Default: None (translate from the beginning of the sequence)
+    - translate_end                (int | str | None) The position in the input nucleotide sequence to end translating. If a string is provided, it should correspond
+                                   to a column name in 'mutations' containing the open reading frame end positions for each sequence/mutation.
+                                   Only valid if translate=True. Default: None (translate from to the end of the sequence)
+
+    # General arguments:
+    - out                          (str) Path to output fasta file containing the mutated sequences, e.g., 'path/to/output_fasta.fa'.
+                                   Default: None -> returns a list of the mutated sequences to standard out.
+                                   The identifiers (following the '>') of the mutated sequences in the output fasta will be '>[seq_ID]_[mut_ID]'.
+    - verbose                      (True/False) whether to print progress information. Default: True
+    - chunk_size                   (int) Number of rows of 'mutations' processed at a time. The mutated sequences (and the rows of the updated
+                                   DataFrame) of each chunk are appended to 'out' (and 'update_df_out') before the next chunk is read, so memory use
+                                   is bounded by the chunk size instead of the number of mutations. With merge_identical=True, the mutated sequences are
+                                   sorted into temporary files by sequence hash (next to 'out'), so identical sequences of different chunks are still merged.
+                                   Default: None (all mutations are processed at once)
+    - threads                      (int) Number of processes used to mutate the sequences. The mutations (of each chunk) are split by sequence ID
+                                   between the processes, which read the sequences from a shared memory-mapped file, and the results are combined in
+                                   the order of the input mutations (the output does not depend on the number of threads). Default: 1
+
+    Saves mutated sequences in fasta format (or, if out=None: when update_df is True, returns the mutation dataframe, otherwise returns a list containing the mutated sequences).
+    """
+
+    global intronic_mutations, posttranslational_region_mutations, unknown_mutations, uncertain_mutations, ambiguous_position_mutations, cosmic_incorrect_wt_base, mut_idx_outside_seq
+
+    columns_to_keep = [
+        "header",
+        seq_id_column,
+        mut_column,
+        "mutation_type",
+        "wt_sequence",
+        "mutant_sequence",
+        "start_mutation_position",
+        "end_mutation_position"
+    ]
+
+    # Keep text following the > until the first space/dot as the sequence identifier
+    # Dots are removed so Ensembl version numbers are removed
+    # (of several records with the same identifier, e.g. two versions of a transcript, the last one is used)
+    def seq_id_from_title(title):
+        return title.split(" ")[0].split(".")[0]
+
+    # Index the fasta file, so only the sequence regions around the mutations are read
+    sequences_path = None
+    if "." in sequences:
+        sequences_path = sequences
+        try:
+            # No index file is written next to the input
+            seq_dict = IndexedFasta(
+                sequences, save_index=False, key=seq_id_from_title, keep="last"
+            )
+        except ValueError:
+            # Compressed files and sequence lines of different lengths cannot be indexed,
+            # so their sequences are kept in memory with 2 bits per base
+            seq_dict = PackedSequences(
+                ((seq_id_from_title(title), seq) for title, seq in iter_fasta(sequences)),
+                keep="last",
+            )
+        if seq_dict.duplicates:
+            logger.warning(
+                f"{seq_dict.duplicates} sequences in {sequences} have the same sequence ID (before the first space or dot) "
+                "as a later sequence. Only the last sequence with each ID is mutated."
+            )
+        n_seqs = len(seq_dict)
+
+    # Handle input sequences passed as a list
+    elif isinstance(sequences, list):
+        seq_dict = {f"seq{i+1}": seq for i, seq in enumerate(sequences)}
+        n_seqs = len(sequences)
+
+    # Handle a single sequence passed as a string
+    elif isinstance(sequences, str):
+        seq_dict = {"seq1": sequences}
+        n_seqs = 1
 
-    if good_mutations != total_mutations:
-        logger.warning(report)
     else:
-        logger.info("All mutations correctly recorded")
+        raise ValueError(
+            """
+            Format of the input to the 'sequences' argument not recognized. 
+            'sequences' must be one of the following:
+            - Path to the fasta file containing the sequences to be mutated (e.g. 'seqs.fa')
+            - A list of sequences to be mutated (e.g. ['ACTGCTAGCT', 'AGCTAGCT'])
+            - A single sequence to be mutated passed as a string (e.g. 'AGCTAGCT')
+            """
+        )
 
-    if translate and update_df and store_full_sequences:
-        columns_to_keep.extend(["wt_sequence_aa_full", "mutant_sequence_aa_full"])
+    mutations_path = None
 
-        if not mutations_path:
-            assert (
-                type(translate_start) != str and type(translate_end) != str
-            ), "translate_start and translate_end must be integers when translating sequences (or default None)."
-            if translate_start is None:
-                translate_start = 0
-            if translate_end is None:
-                translate_end = mutations["sequence_length"][0]
+    if chunk_size is not None and chunk_size < 1:
+        raise ValueError(
+            f"'chunk_size' argument specified as {chunk_size}. Expected a positive integer."
+        )
 
-            # combined_df['ORF'] = combined_df[translate_start] % 3
+    if threads < 1:
+        raise ValueError(
+            f"'threads' argument specified as {threads}. Expected a positive integer."
+        )
 
-            if verbose:
-                tqdm.pandas(desc="Translating WT amino acid sequences")
-                mutations["wt_sequence_aa_full"] = mutations[
-                    "wt_sequence_full"
-                ].progress_apply(
-                    lambda x: translate_sequence(
-                        x, start=translate_start, end=translate_end
-                    )
-                )
-            else:
-                mutations["wt_sequence_aa_full"] = mutations["wt_sequence_full"].apply(
-                    lambda x: translate_sequence(
-                        x, start=translate_start, end=translate_end
-                    )
-                )
+    # pandas infers the dtypes of each chunk of a csv/tsv file separately, but the columns of a
+    # Parquet/Arrow IPC file have the types of the first chunk, so the dtypes are inferred from
+    # the whole file first
+    infer_dtypes = bool(
+        chunk_size
+        and update_df
+        and update_df_out
+        and update_df_out.lower().endswith(ARROW_TABLE_EXTENSIONS)
+    )
 
-            if verbose:
-                tqdm.pandas(desc="Translating mutant amino acid sequences")
+    # Read in 'mutations' if passed as filepath to comma-separated csv
+    # (with chunk_size, as an iterator over DataFrames of chunk_size rows)
+    if isinstance(mutations, str) and mutations.endswith(".csv"):
+        mutations_path = mutations
+        mutations = pd.read_csv(
+            mutations,
+            chunksize=chunk_size,
+            dtype=infer_csv_dtypes(mutations) if infer_dtypes else None,
+        )
+        for col in pd.read_csv(mutations_path, nrows=0).columns:
+            if col not in columns_to_keep:
+                columns_to_keep.append(
+                    col
+                )  # append "mutation_aa", "gene_name", "mutation_id"
 
-                mutations["mutant_sequence_aa_full"] = mutations[
-                    "mutant_sequence_full"
-                ].progress_apply(
-                    lambda x: translate_sequence(
-                        x, start=translate_start, end=translate_end
-                    )
-                )
+    elif isinstance(mutations, str) and mutations.endswith(".tsv"):
+        mutations_path = mutations
+        mutations = pd.read_csv(
+            mutations,
+            sep="\t",
+            chunksize=chunk_size,
+            dtype=infer_csv_dtypes(mutations, sep="\t") if infer_dtypes else None,
+        )
+        for col in pd.read_csv(mutations_path, sep="\t", nrows=0).columns:
+            if col not in columns_to_keep:
+                columns_to_keep.append(
+                    col
+                )  # append "mutation_aa", "gene_name", "mutation_id"
 
-            else:
-                mutations["mutant_sequence_aa_full"] = mutations[
-                    "mutant_sequence_full"
-                ].apply(
-                    lambda x: translate_sequence(
-                        x, start=translate_start, end=translate_end
-                    )
+    # Handle mutations passed as a list
+    elif isinstance(mutations, list):
+        if len(mutations) > 1:
+            if len(mutations) != n_seqs:
+                raise ValueError(
+                    "If a list is passed, the number of mutations must equal the number of input sequences."
                 )
 
-            print(f"Translated mutated sequences: {mutations['wt_sequence_aa_full']}")
+            temp = pd.DataFrame()
+            temp["mutation"] = mutations
+            temp["mut_ID"] = [f"mut{i+1}" for i in range(len(mutations))]
+            temp["seq_ID"] = [f"seq{i+1}" for i in range(len(mutations))]
+            mutations = temp
         else:
-            if not translate_start:
-                translate_start = "translate_start"
+            temp = pd.DataFrame()
+            temp["mutation"] = [mutations[0]] * n_seqs
+            temp["mut_ID"] = [f"mut{i+1}" for i in range(n_seqs)]
+            temp["seq_ID"] = [f"seq{i+1}" for i in range(n_seqs)]
+            mutations = temp
 
-            if not translate_end:
-                translate_end = "translate_end"
+    # Handle single mutation passed as a string
+    elif isinstance(mutations, str):
+        # This will work for one mutation for one sequence as well as one mutation for multiple sequences
+        temp = pd.DataFrame()
+        temp["mutation"] = [mutations] * n_seqs
+        temp["mut_ID"] = [f"mut{i+1}" for i in range(n_seqs)]
+        temp["seq_ID"] = [f"seq{i+1}" for i in range(n_seqs)]
+        mutations = temp
 
-            if translate_start not in mutations.columns:
-                mutations["translate_start"] = 0
+    elif isinstance(mutations, pd.DataFrame):
+        pass
 
-            if translate_end not in mutations.columns:
-                mutations["translate_end"] = mutations["sequence_length"]
+    else:
+        raise ValueError(
+            """
+            Format of the input to the 'mutations' argument not recognized. 
+            'mutations' must be one of the following:
+            - Path to comma-separated csv file (e.g. 'mutations.csv')
+            - A pandas DataFrame object
+            - A single mutation to be applied to all input sequences (e.g. 'c.2C>T')
+            - A list of mutations (the number of mutations must equal the number of input sequences) (e.g. ['c.2C>T', 'c.1A>C'])
+            """
+        )
 
-            if verbose:
-                tqdm.pandas(desc="Translating WT amino acid sequences")
 
-            mutations["wt_sequence_aa_full"] = mut_apply(
-                lambda row: translate_sequence(
-                    row["wt_sequence_full"], row[translate_start], row[translate_end]
-                ),
-                axis=1,
+    # Mutations are processed chunk_size rows at a time (all at once by default)
+    if isinstance(mutations, pd.DataFrame):
+        if chunk_size:
+            chunks = (
+                mutations.iloc[start : start + chunk_size].copy()
+                for start in range(0, len(mutations), chunk_size)
             )
+        else:
+            chunks = [mutations]
+    else:
+        chunks = mutations
 
-            if verbose:
-                tqdm.pandas(desc="Translating mutant amino acid sequences")
+    if mut_id_column is None:
+        mut_id_column = mut_column
 
-            mutations["mutant_sequence_aa_full"] = mut_apply(
-                lambda row: translate_sequence(
-                    row["mutant_sequence_full"],
-                    row[translate_start],
-                    row[translate_end],
-                ),
-                axis=1,
+    gtf_df = None
+    if gtf is not None:
+        assert mutations_path.endswith(".csv") or mutations_path.endswith(
+            ".tsv"
+        ), "Mutations must be a CSV or TSV file"
+        # Read the transcript locations once for all chunks
+        if (
+            "start_transcript_position" not in columns_to_keep
+            and "end_transcript_position" not in columns_to_keep
+        ):
+            gtf_df = load_gtf_transcript_locations(gtf, gtf_transcript_id_column)
+
+    if update_df:
+        if not update_df_out and mutations_path:
+            base_name, ext = os.path.splitext(mutations_path)
+            update_df_out = f"{base_name}_updated{ext}"
+
+    # Parquet and Arrow IPC output is written chunk by chunk with pyarrow
+    table_writer = None
+    if update_df and update_df_out and update_df_out.lower().endswith(ARROW_TABLE_EXTENSIONS):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError(
+                f"Saving 'update_df_out' as a {os.path.splitext(update_df_out)[1]} file requires pyarrow. "
+                "Install it with: pip install pyarrow"
             )
+        table_writer = ArrowTableWriter(
+            update_df_out, dictionary_columns=[seq_id_column, "mutation_type"]
+        )
 
-    mutations = mutations[columns_to_keep]
+    # Numbers of mutations removed by each filter (summed over all chunks)
+    counts = new_mutation_counts()
+    checked_seq_ids = set()
 
-    if merge_identical:
-        logger.info("Merging identical mutated sequences")
-        if update_df:
-            logger.warning(
-                "Merging identical mutated sequences can take a while if update_df=True since it will concatenate all MCRSs too)"
+    # Worker processes share the sequences through a memory-mapped file
+    # (the indexed fasta file, or a file written from the sequences held in memory)
+    share_sequences = threads > 1 and not isinstance(seq_dict, IndexedFasta)
+
+    tmp_dir = None
+    if (merge_identical and chunk_size) or share_sequences or remove_seqs_with_reference_kmers:
+        tmp_dir = tempfile.TemporaryDirectory(
+            prefix="gget_mutate_", dir=os.path.dirname(os.path.abspath(out)) if out else None
+        )
+
+    # Index of the (k+1)-mers of all input sequences, saved in the gget cache directory
+    # (or to reference_kmer_index) and reused by later runs
+    kmer_index = None
+    if remove_seqs_with_reference_kmers:
+        try:
+            if reference_kmer_index is None and sequences_path is not None:
+                reference_kmer_index = default_kmer_index_path(sequences_path, k + 1)
+
+            if reference_kmer_index is not None:
+                kmer_index = load_kmer_index(
+                    seq_dict, k + 1, reference_kmer_index, sequences_path=sequences_path
+                )
+        except OSError as e:
+            logger.warning(f"Could not save the {k + 1}-mer index of the input sequences: {e}")
+
+        if kmer_index is None:
+            kmer_index = KmerIndex.build(
+                seq_dict, k + 1, os.path.join(tmp_dir.name, "kmers.npy")
             )
-            mutations = (
-                mutations.groupby("mutant_sequence", sort=False)
-                .agg(
-                    lambda x: ";".join(x.astype(str))
-                )  # Concatenate values with semicolons
-                .reset_index()
+
+    # Identical sequences of different chunks are merged through bucket files sorted by sequence hash
+    bucket_paths = None
+    if merge_identical and chunk_size:
+        bucket_paths = [
+            os.path.join(tmp_dir.name, f"bucket_{i}.pkl")
+            for i in range(MUTATE_MERGE_BUCKETS)
+        ]
+
+    results = []
+    empty_kmer_count = 0
+    out_mode = "w"
+
+    def write_mutations(mutations):
+        # Append mutated sequences to the output files (or results when out=None)
+        nonlocal empty_kmer_count, out_mode
+
+        empty = mutations["mutant_sequence"] == ""
+        empty_kmer_count += empty.sum()
+        mutations = mutations[~empty]
+
+        mutations["header"] = mutations["header"].str[1:]  # remove the > character
+
+        if table_writer is not None:
+            table_writer.write(mutations)
+        elif update_df and update_df_out:
+            mutations.to_csv(
+                update_df_out, mode=out_mode, header=out_mode == "w", index=False
             )
 
+        if out:
+            # Save mutated sequences in new fasta file
+            with open(out, out_mode) as fasta_file:
+                fasta_file.write(
+                    "".join(
+                        (
+                            ">" + mutations["header"] + "\n" + mutations["mutant_sequence"] + "\n"
+                        ).values
+                    )
+                )
+        elif update_df:
+            results.append(mutations)
+        else:
+            results.extend(mutations["mutant_sequence"].values)
+
+        out_mode = "a"
+
+    good_mutations = 0
+    unmerged = []
+    executor = None
+    try:
+        if threads > 1:
+            shared_seq_dict = seq_dict
+            if share_sequences:
+                if not isinstance(seq_dict, PackedSequences):
+                    seq_dict = PackedSequences(seq_dict.items())
+                shared_seq_dict = seq_dict.memory_map(
+                    os.path.join(tmp_dir.name, "sequences.bin")
+                )
+            executor = ProcessPoolExecutor(
+                max_workers=threads,
+                initializer=init_mutate_worker,
+                initargs=(shared_seq_dict,),
+            )
+            process_chunk = partial(
+                apply_mutations_in_parallel, executor, threads=threads
+            )
         else:
-            mutations = (
-                mutations.groupby("mutant_sequence", sort=False, group_keys=False)[
-                    "header"
-                ]
-                .apply(";".join)
-                .reset_index()
+            process_chunk = partial(apply_mutations, seq_dict=seq_dict)
+
+        for chunk in chunks:
+            chunk = process_chunk(
+                chunk,
+                columns_to_keep=columns_to_keep,
+                counts=counts,
+                checked_seq_ids=checked_seq_ids,
+                mut_column=mut_column,
+                seq_id_column=seq_id_column,
+                mut_id_column=mut_id_column,
+                gtf=gtf,
+                gtf_df=gtf_df,
+                gtf_transcript_id_column=gtf_transcript_id_column,
+                mutations_path=mutations_path,
+                k=k,
+                min_seq_len=min_seq_len,
+                optimize_flanking_regions=optimize_flanking_regions,
+                remove_seqs_with_wt_kmers=remove_seqs_with_wt_kmers,
+                reference_kmer_index=kmer_index,
+                max_ambiguous=max_ambiguous,
+                update_df=update_df,
+                store_full_sequences=store_full_sequences,
+                translate=translate,
+                translate_start=translate_start,
+                translate_end=translate_end,
+                # Progress bars are not shown for worker processes
+                verbose=verbose and executor is None,
+            )
+            if chunk is None or chunk.empty:
+                continue
+
+            output_columns = list(chunk.columns)
+            if bucket_paths is not None:
+                write_merge_buckets(chunk, bucket_paths, good_mutations, update_df=update_df)
+            elif merge_identical:
+                unmerged.append(chunk)
+            else:
+                write_mutations(chunk)
+            good_mutations += len(chunk)
+
+        if counts["missing_seq_ids"] > 0:
+            logger.warning(
+                f"""
+                {counts["missing_seq_ids"]} rows in 'mutations' are missing sequence IDs. These rows will be dropped from the analysis.
+                """
             )
 
-        # apply remove_gt_after_semicolon to mutant_sequence
-        mutations["header"] = mutations["header"].apply(remove_gt_after_semicolon)
+        if counts["non_nuc_seqs"] > 0:
+            logger.warning(
+                f"""
+                Non-nucleotide characters detected in {counts["non_nuc_seqs"]} input sequences. gget mutate is currently only optimized for mutating nucleotide sequences.
+                Specifically inversion mutations might not be performed correctly. 
+                """
+            )
+
+        if 0 < counts["seqs_not_found"] < 20:
+            logger.warning(
+                f"""
+                The sequences with the following {counts["seqs_not_found"]} sequence ID(s) were not found: {", ".join(counts["seqs_not_found_ids"])}  
+                These sequences and their corresponding mutations will not be included in the output.  
+                Ensure that the sequence IDs correspond to the string following the > character in the 'sequences' fasta file (do NOT include spaces or dots).
+                """
+            )
+        elif counts["seqs_not_found"] > 0:
+            logger.warning(
+                f"""
+                The sequences corresponding to {counts["seqs_not_found"]} sequence IDs were not found.  
+                These sequences and their corresponding mutations will not be included in the output.  
+                Ensure that the sequence IDs correspond to the string following the > character in the 'sequences' fasta file (do NOT include spaces or dots).
+                """
+            )
 
-        # Calculate the number of semicolons in each entry
-        mutations["semicolon_count"] = mutations["header"].str.count(";")
+        total_mutations = counts["total_mutations"]
+        if total_mutations < 1:
+            raise ValueError(
+                """
+                None of the input sequences match the sequence IDs provided in 'mutations'. 
+                Ensure that the sequence IDs correspond to the string following the > character in the 'sequences' fasta file (do NOT include spaces or dots).
+                """
+            )
 
-        mutations["semicolon_count"] += 1
+        uncertain_mutations = counts["uncertain_mutations"]
+        ambiguous_position_mutations = counts["ambiguous_position_mutations"]
+        intronic_mutations = counts["intronic_mutations"]
+        posttranslational_region_mutations = counts["posttranslational_region_mutations"]
+        unknown_mutations = counts["unknown_mutations"]
+        mut_idx_outside_seq = counts["mut_idx_outside_seq"]
+        cosmic_incorrect_wt_base = counts["cosmic_incorrect_wt_base"]
 
-        # Convert all 1 values to NaN
-        mutations["semicolon_count"] = mutations["semicolon_count"].replace(1, np.nan)
+        if good_mutations == 0:
+            logger.warning("No valid mutations found in the input.")
+            return pd.DataFrame(columns=columns_to_keep) if update_df else []
 
-        # Take the sum across all rows of the new column
-        total_semicolons = int(mutations["semicolon_count"].sum())
+        if remove_seqs_with_wt_kmers:
+            logger.info(f"Removing {counts['long_duplications']} duplications > k")
 
-        mutations = mutations.drop(columns=["semicolon_count"])
+        if min_seq_len and verbose:
+            logger.info(
+                f"Removed {counts['rows_less_than_minimum']} mutant kmers with length less than {min_seq_len}..."
+            )
 
-        if verbose:
+        if max_ambiguous is not None and verbose:
             logger.info(
-                f"{total_semicolons} identical mutated sequences were merged (headers were combined and separated using a semicolon (;). Occurences of identical mutated sequences may be reduced by increasing k."
+                f"Removed {counts['num_rows_with_N']} mutant kmers containing more than {max_ambiguous} 'N's..."
             )
 
-    empty_kmer_count = (mutations["mutant_sequence"] == "").sum()
+        report = f"""
+            {good_mutations} mutations correctly recorded ({good_mutations/total_mutations*100:.2f}%)
+            {intronic_mutations} intronic mutations found ({intronic_mutations/total_mutations*100:.2f}%)
+            {posttranslational_region_mutations} posttranslational region mutations found ({posttranslational_region_mutations/total_mutations*100:.2f}%)
+            {unknown_mutations} unknown mutations found ({unknown_mutations/total_mutations*100:.2f}%)
+            {uncertain_mutations} mutations with uncertain mutation found ({uncertain_mutations/total_mutations*100:.2f}%)
+            {ambiguous_position_mutations} mutations with ambiguous position found ({ambiguous_position_mutations/total_mutations*100:.2f}%)
+            {cosmic_incorrect_wt_base} mutations with incorrect wildtype base found ({cosmic_incorrect_wt_base/total_mutations*100:.2f}%)
+            {mut_idx_outside_seq} mutations with indices outside of the sequence length found ({mut_idx_outside_seq/total_mutations*100:.2f}%)
+            """
 
-    if empty_kmer_count > 0 and verbose:
-        logger.warning(
-            f"{empty_kmer_count} mutated sequences were empty and were not included in the output."
-        )
+        if remove_seqs_with_wt_kmers:
+            long_duplications = counts["long_duplications"]
+            mutations_overlapping_with_wt = counts["mutations_overlapping_with_wt"]
+            report += f"""{long_duplications} duplications longer than k found ({long_duplications/total_mutations*100:.2f}%)
+            {mutations_overlapping_with_wt} mutations with overlapping kmers found ({mutations_overlapping_with_wt/total_mutations*100:.2f}%)
+            """
 
-    mutations = mutations[mutations["mutant_sequence"] != ""]
+        if remove_seqs_with_reference_kmers:
+            mutations_with_reference_kmers = counts["mutations_with_reference_kmers"]
+            report += f"""{mutations_with_reference_kmers} mutations with kmers found in the input sequences ({mutations_with_reference_kmers/total_mutations*100:.2f}%)
+            """
 
-    mutations["header"] = mutations["header"].str[1:]  # remove the > character
+        if min_seq_len:
+            rows_less_than_minimum = counts["rows_less_than_minimum"]
+            report += f"""{rows_less_than_minimum} mutations with fragment length < k found ({rows_less_than_minimum/total_mutations*100:.2f}%)
+            """
 
-    if update_df:
-        logger.info("Saving dataframe with updated mutation info...")
-        saved_updated_df = True
+        if max_ambiguous is not None:
+            num_rows_with_N = counts["num_rows_with_N"]
+            report += f"""{num_rows_with_N} mutations with Ns found ({num_rows_with_N/total_mutations*100:.2f}%)
+            """
+
+        if good_mutations != total_mutations:
+            logger.warning(report)
+        else:
+            logger.info("All mutations correctly recorded")
+
+        if update_df:
+            logger.info("Saving dataframe with updated mutation info...")
+            logger.warning(
+                "File size can be very large if the number of mutations is large."
+            )
+
+        if merge_identical:
+            logger.info("Merging identical mutated sequences")
+            if update_df:
+                logger.warning(
+                    "Merging identical mutated sequences can take a while if update_df=True since it will concatenate all MCRSs too)"
+                )
+
+            if bucket_paths is not None:
+                merged_paths, bucket_ids, total_semicolons = merge_buckets(
+                    bucket_paths, update_df=update_df, batch_size=chunk_size
+                )
+                for merged in iter_merged_buckets(
+                    merged_paths, bucket_ids, batch_size=chunk_size
+                ):
+                    write_mutations(merged)
+            else:
+                merged, total_semicolons = merge_identical_mutations(
+                    pd.concat(unmerged), update_df=update_df
+                )
+                write_mutations(merged)
+
+            if verbose:
+                logger.info(
+                    f"{total_semicolons} identical mutated sequences were merged (headers were combined and separated using a semicolon (;). Occurences of identical mutated sequences may be reduced by increasing k."
+                )
+
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        if table_writer is not None:
+            table_writer.close()
+        if tmp_dir is not None:
+            tmp_dir.cleanup()
+
+    if empty_kmer_count > 0 and verbose:
         logger.warning(
-            "File size can be very large if the number of mutations is large."
+            f"{empty_kmer_count} mutated sequences were empty and were not included in the output."
         )
-        if not update_df_out:
-            if not mutations_path:
-                # logger.warning(
-                #     "mutations_path must be provided if update_df is True and update_df_out is not provided."
-                # )
-                saved_updated_df = False
-            else:
-                base_name, ext = os.path.splitext(mutations_path)
-                update_df_out = f"{base_name}_updated{ext}"
-        if saved_updated_df:
-            mutations.to_csv(update_df_out, index=False)
-            print(f"Updated mutation info has been saved to {update_df_out}")
-
-    mutations["fasta_format"] = (
-        ">" + mutations["header"] + "\n" + mutations["mutant_sequence"] + "\n"
-    )
 
-    if out:
-        # Save mutated sequences in new fasta file
-        with open(out, "w") as fasta_file:
-            fasta_file.write("".join(mutations["fasta_format"].values))
+    if update_df and update_df_out:
+        print(f"Updated mutation info has been saved to {update_df_out}")
 
+    if out:
         if verbose:
             logger.info(f"FASTA file containing mutated sequences created at {out}.")
 
     # When out=None, return list of mutated seqs
+    elif update_df:
+        # Merged chunks are numbered from 0, as merging all mutations at once does
+        return pd.concat(results, ignore_index=bucket_paths is not None)[output_columns]
     else:
-        if update_df:
-            return mutations[columns_to_keep]
-        else:
-            all_mut_seqs = []
-            all_mut_seqs.extend(mutations["mutant_sequence"].values)
-    
-            # Remove empty strings from final list of mutated sequences
-            # (these are introduced when unknown mutations are encountered)
-            while "" in all_mut_seqs:
-                all_mut_seqs.remove("")
-    
-            if len(all_mut_seqs) > 0:
-                return all_mut_seqs
-            return []
+        return results
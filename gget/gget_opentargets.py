@@ -1,10 +1,9 @@
 import json as json_
 import textwrap
 import pandas as pd
-import requests
 
-from .constants import OPENTARGETS_GRAPHQL_API
-from .utils import set_up_logger
+from .constants import OPENTARGETS_GRAPHQL_API, OPENTARGETS_RESOURCES
+from .utils import set_up_logger, http_request
 
 logger = set_up_logger()  # export GGET_LOGLEVEL=DEBUG
 
@@ -171,7 +170,6 @@ query target($ensemblId: String!) {
 }
 """
 
-OPENTARGETS_RESOURCES = {"diseases", "drugs", "tractability", "pharmacogenetics", "expression", "depmap", "interactions"}
 
 def _collapse_singletons(obj):
     """
@@ -304,7 +302,8 @@ def opentargets(
         logger.info(f"Querying OpenTargets for {resource} associated with {ensembl_id}...")
         logger.debug(f"GraphQL query string:\n{query_string}\n\nWith variables:\n{variables}")
 
-    r = requests.post(
+    r = http_request(
+        "POST",
         OPENTARGETS_GRAPHQL_API,
         json={"query": query_string, "variables": variables},
     )
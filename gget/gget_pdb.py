@@ -1,8 +1,7 @@
-from urllib.request import urlopen
-from urllib.error import HTTPError
 import json
+import requests
 
-from .utils import set_up_logger
+from .utils import set_up_logger, http_request
 
 logger = set_up_logger()
 
@@ -96,19 +95,15 @@ def pdb(pdb_id, resource="pdb", identifier=None, save=False):
     code = None
     for url in urls:
         try:
-            r = urlopen(url)
-
-            # Get status code (in a way that is stable across Python versions)
-            code = getattr(r, "status", None)
-            if code is None:
-                code = r.getcode()
-
-            if code == 200:
-                break
-        except HTTPError as e:
+            r = http_request("GET", url)
+        except requests.exceptions.RequestException as e:
             last_error = e
             continue
 
+        code = r.status_code
+        if code == 200:
+            break
+
     if r is None or code != 200:
         if resource == "assembly":
             logger.error(
@@ -130,7 +125,7 @@ def pdb(pdb_id, resource="pdb", identifier=None, save=False):
 
     if resource != "pdb":
         # Read json formatted results
-        results = json.load(r)
+        results = r.json()
 
         # Sort list-valued ID fields for deterministic output
         ids = (results.get("rcsb_assembly_container_identifiers") or {}).get("interface_ids")
@@ -138,7 +133,7 @@ def pdb(pdb_id, resource="pdb", identifier=None, save=False):
             ids.sort()
     else:
         # Read PDB file
-        results = r.read().decode()
+        results = r.text
 
     if save:
         if resource != "pdb":
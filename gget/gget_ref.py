@@ -1,9 +1,9 @@
 from bs4 import BeautifulSoup
-import requests
 import json
 
 # Custom functions
 from .utils import (
+    http_request,
     ref_species_options,
     find_latest_ens_rel,
     find_nv_kingdom,
@@ -25,7 +25,7 @@ def find_FTP_link(url, link_substring):
 
     Returns the link, date, and size as strings.
     """
-    html = requests.get(url)
+    html = http_request("GET", url)
 
     # Raise error if status code not "OK" Response
     if html.status_code != 200:
@@ -340,7 +340,7 @@ def ref(
         else:
             ncrna_search_url = database + f"release-{ENS_rel}/fasta/{species}/ncrna/"
 
-        html = requests.get(ncrna_search_url)
+        html = http_request("GET", ncrna_search_url)
 
         # If ncRNA data is not available, HTML requests returns an error code (!= 200)
         if html.status_code == 200:
@@ -1,7 +1,14 @@
 import numpy as np
 
 # Custom functions
-from .utils import rest_query, get_uniprot_seqs, set_up_logger, post_query
+from .utils import (
+    rest_query,
+    async_rest_query,
+    run_async,
+    get_uniprot_seqs,
+    set_up_logger,
+    post_query,
+)
 
 logger = set_up_logger()
 from .gget_info import info
@@ -151,17 +158,31 @@ def seq(
                             f"Requesting nucleotide sequences of all transcripts of {ensembl_ID} from Ensembl."
                         )
 
+                    transcript_ids = []
                     for transcipt_id in info_df.loc[ensembl_ID]["all_transcripts"]:
                         # Remove version number for Ensembl IDs (not for flybase/wormbase IDs)
                         if transcipt_id.startswith("ENS"):
                             transcipt_id = transcipt_id.split(".")[0]
+                        transcript_ids.append(transcipt_id)
+
+                    # Submit the queries for all transcripts concurrently
+                    all_results = run_async(
+                        (
+                            async_rest_query(
+                                server,
+                                "sequence/id/" + transcipt_id + "?",
+                                content_type,
+                            )
+                            for transcipt_id in transcript_ids
+                        ),
+                        return_exceptions=True,
+                    )
 
+                    for transcipt_id, df_temp in zip(transcript_ids, all_results):
                         # Try if query is valid
                         try:
-                            # Define the REST query
-                            query = "sequence/id/" + transcipt_id + "?"
-                            # Submit query
-                            df_temp = rest_query(server, query, content_type)
+                            if isinstance(df_temp, Exception):
+                                raise df_temp
 
                             # Delete superfluous entries
                             keys_to_delete = ["query", "version", "molecule"]
@@ -0,0 +1,422 @@
+import contextlib
+import hmac
+import io
+import json as json_package
+import logging
+import os
+import secrets
+import socket
+import socketserver
+import stat
+import sys
+import tempfile
+import threading
+
+from .constants import SERVE_SOCKET_NAME, SERVE_DEFAULT_TCP_ADDRESS
+
+# Same logger as set_up_logger() in utils, which is not imported here to keep the client light
+logger = logging.getLogger("gget.utils")
+
+# Command line runs redirect the process-wide stdout/stderr and change the working directory,
+# so only one command line or function call runs at a time
+_cli_lock = threading.Lock()
+
+
+def runtime_dir():
+    """
+    Returns the directory holding the socket and token files of gget serve:
+    $XDG_RUNTIME_DIR, or the directory gget-<uid> in the temporary directory, created
+    with mode 0700. Raises a PermissionError if the directory is accessible to other users.
+    """
+    path = os.getenv("XDG_RUNTIME_DIR")
+    if not path:
+        uid = os.getuid() if hasattr(os, "getuid") else os.getlogin()
+        path = os.path.join(tempfile.gettempdir(), f"gget-{uid}")
+        os.makedirs(path, mode=0o700, exist_ok=True)
+
+    if hasattr(os, "getuid"):
+        info = os.stat(path)
+        if info.st_uid != os.getuid() or info.st_mode & (stat.S_IRWXG | stat.S_IRWXO):
+            raise PermissionError(
+                f"{path} must be owned by the current user and not accessible to other users."
+            )
+    return path
+
+
+def default_address():
+    """
+    Returns the default address of gget serve: the Unix socket gget.sock in runtime_dir(),
+    or "127.0.0.1:8765" on platforms without Unix sockets.
+    """
+    if hasattr(socketserver, "ThreadingUnixStreamServer"):
+        return os.path.join(runtime_dir(), SERVE_SOCKET_NAME)
+    return SERVE_DEFAULT_TCP_ADDRESS
+
+
+def token_path(address):
+    """
+    Returns the path of the file holding the token of the gget serve server listening
+    on the TCP address (host, port).
+    """
+    host, port = address
+    return os.path.join(runtime_dir(), f"gget-{host}-{port}.token")
+
+
+def _parse_address(address):
+    """
+    Returns (family, address) for a "host:port" string or the path of a Unix socket.
+    """
+    address = address or default_address()
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and os.sep not in address:
+        return socket.AF_INET, (host or "127.0.0.1", int(port))
+    return socket.AF_UNIX, address
+
+
+def _stats_out(argv):
+    for i, arg in enumerate(argv):
+        if arg == "--stats-out" and i + 1 < len(argv):
+            return argv[i + 1]
+        if arg.startswith("--stats-out="):
+            return arg.split("=", 1)[1]
+    return None
+
+
+def run_cli(argv, cwd=None):
+    """
+    Run a gget command line in this process.
+
+    Args:
+    - argv    Command line arguments, e.g. ["info", "ENSG00000034713", "-csv"].
+    - cwd     Working directory relative paths in argv refer to. Default: None (current directory).
+
+    Returns a dictionary with the exit code, standard out and standard error of the command.
+    """
+    from .main import main
+    from .utils import dump_stats
+
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    exit_code = 0
+
+    with _cli_lock:
+        # Point the gget log handlers to the captured standard error
+        handlers = [
+            h
+            for h in logger.handlers
+            if isinstance(h, logging.StreamHandler)
+            and not isinstance(h, logging.FileHandler)
+        ]
+        streams = [h.setStream(stderr) for h in handlers]
+        previous_cwd = os.getcwd()
+        try:
+            if cwd:
+                os.chdir(cwd)
+            with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+                try:
+                    main(argv)
+                except SystemExit as e:
+                    if e.code is None:
+                        exit_code = 0
+                    elif isinstance(e.code, int):
+                        exit_code = e.code
+                    else:
+                        print(e.code, file=sys.stderr)
+                        exit_code = 1
+                except Exception as e:
+                    print(f"{type(e).__name__}: {e}", file=sys.stderr)
+                    exit_code = 1
+
+            # The server process does not exit, so write the I/O statistics now
+            stats_out = _stats_out(argv)
+            if stats_out:
+                dump_stats(stats_out)
+        finally:
+            os.chdir(previous_cwd)
+            for handler, stream in zip(handlers, streams):
+                handler.setStream(stream)
+
+    return {"exit_code": exit_code, "stdout": stdout.getvalue(), "stderr": stderr.getvalue()}
+
+
+def call_function(function, args=None, kwargs=None):
+    """
+    Call a gget Python function (e.g. "info" or "stats") in this process.
+
+    Returns its return value converted to a JSON serializable object.
+    """
+    from .utils import get_gget_function, json_compatible
+
+    # Relative paths in kwargs must not resolve against the working directory of a command line run
+    with _cli_lock:
+        return json_compatible(
+            get_gget_function(function)(*(args or []), **(kwargs or {}))
+        )
+
+
+def handle_request(request):
+    """
+    Process one JSON-lines RPC request and return the response dictionary.
+
+    Requests are JSON objects with an optional "id" that is copied to the response
+    (and the "token" of the server when it listens on a TCP port) and either
+    - "argv": list of command line arguments (with an optional working directory "cwd"),
+      answered with "exit_code", "stdout" and "stderr", or
+    - "function" (with optional "args" and "kwargs"): gget function to call, answered with "result", or
+    - "ping": true, answered with the gget version.
+    """
+    response = {"id": request.get("id")}
+    try:
+        if "argv" in request:
+            response.update(
+                run_cli([str(arg) for arg in request["argv"]], cwd=request.get("cwd"))
+            )
+        elif "function" in request:
+            response["result"] = call_function(
+                request["function"], request.get("args"), request.get("kwargs")
+            )
+        elif request.get("ping"):
+            from . import __version__
+
+            response["version"] = __version__
+        else:
+            raise ValueError(
+                "Request must contain one of the keys 'argv', 'function' or 'ping'."
+            )
+        response["ok"] = True
+    except Exception as e:
+        response["ok"] = False
+        response["error"] = f"{type(e).__name__}: {e}"
+
+    return response
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        token = getattr(self.server, "token", None)
+        # One connection can send any number of requests, one JSON object per line
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json_package.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("Request must be a JSON object.")
+            except ValueError as e:
+                response = {"id": None, "ok": False, "error": f"Invalid request: {e}"}
+            else:
+                if token is not None and not hmac.compare_digest(
+                    str(request.get("token", "")), token
+                ):
+                    response = {
+                        "id": request.get("id"),
+                        "ok": False,
+                        "error": "PermissionError: Invalid or missing token.",
+                    }
+                else:
+                    response = handle_request(request)
+
+            self.wfile.write(
+                (json_package.dumps(response, ensure_ascii=False, default=str) + "\n").encode(
+                    "utf-8"
+                )
+            )
+            self.wfile.flush()
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+
+    class _UnixServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+
+def make_server(address=None, token_file=None):
+    """
+    Create (but do not start) a gget serve server bound to address.
+    Returns the socketserver instance; call serve_forever() to start serving.
+
+    A Unix socket is created with mode 0600, so only the current user can connect.
+    A server listening on a TCP port only answers requests containing its token (server.token),
+    a random string written to token_file with mode 0600.
+    Default token_file: None -> token_path(address), which Client reads.
+    """
+    family, bind_address = _parse_address(address)
+    if family == socket.AF_UNIX:
+        # Remove the socket of a previous server
+        if os.path.exists(bind_address):
+            os.remove(bind_address)
+        previous_umask = os.umask(0o177)
+        try:
+            server = _UnixServer(bind_address, _RequestHandler)
+        finally:
+            os.umask(previous_umask)
+        server.token = None
+        server.token_file = None
+        return server
+
+    server = _TCPServer(bind_address, _RequestHandler)
+    try:
+        server.token = secrets.token_hex(32)
+        server.token_file = token_file or token_path(server.server_address[:2])
+        if os.path.exists(server.token_file):
+            os.remove(server.token_file)
+        fd = os.open(server.token_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(server.token)
+    except Exception:
+        server.server_close()
+        raise
+    return server
+
+
+def serve(address=None, verbose=True):
+    """
+    Run a long-lived gget server that answers JSON-lines RPC requests until interrupted.
+
+    The server keeps the shared HTTP connection pools, the in-memory caches (latest Ensembl release,
+    species lists, parsed ELM tables) and imported modules warm across calls, so repeated
+    calls do not pay for interpreter startup, imports and cold lookups.
+
+    Args:
+    - address   Path of a Unix socket, or "host:port" to listen on a TCP port.
+                Default: None -> the Unix socket gget.sock in $XDG_RUNTIME_DIR (or in the private
+                directory gget-<uid> of the temporary directory), "127.0.0.1:8765" on platforms without Unix sockets.
+    - verbose   True/False whether to print progress information. Default: True.
+
+    The Unix socket is only accessible to the current user (mode 0600). Requests to a TCP port
+    must contain the token the server writes to a file only readable by the current user
+    (see make_server); Client reads it.
+
+    Each request is one line containing a JSON object, answered by one line of JSON:
+    - {"id": 1, "argv": ["info", "ENSG00000034713"]}
+      -> {"id": 1, "ok": true, "exit_code": 0, "stdout": "...", "stderr": "..."}
+    - {"id": 2, "function": "info", "args": [["ENSG00000034713"]], "kwargs": {"verbose": false}}
+      -> {"id": 2, "ok": true, "result": [...]}
+    - {"id": 3, "ping": true} -> {"id": 3, "ok": true, "version": "..."}
+
+    Set the environment variable GGET_SERVER to the address of the server to forward
+    gget command line calls to it (see Client).
+    """
+    from .utils import set_up_logger
+
+    # Set up the log handlers and load the shared dependencies before the first request
+    set_up_logger()
+
+    server = make_server(address)
+    bound = server.server_address
+    if isinstance(bound, tuple):
+        bound = f"{bound[0]}:{bound[1]}"
+
+    if verbose:
+        logger.info(f"gget serve listening on {bound}. Press Ctrl+C to stop.")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        for path in (server.server_address, server.token_file):
+            if isinstance(path, str) and os.path.exists(path):
+                os.remove(path)
+        if verbose:
+            logger.info("gget serve stopped.")
+
+
+class Client:
+    """
+    Thin client for a running gget serve server.
+
+    Args:
+    - address       Address of the server (path of a Unix socket or "host:port").
+                    Default: value of the GGET_SERVER environment variable or the default address of serve.
+    - timeout       Seconds to wait for the connection. Default: 5.
+    - token_file    File with the token of a server listening on a TCP port.
+                    Default: None -> the file written by the server (see make_server).
+
+    The connection is kept open across calls.
+    """
+
+    def __init__(self, address=None, timeout=5, token_file=None):
+        family, self.address = _parse_address(address or os.getenv("GGET_SERVER"))
+        self._token = None
+        if family != socket.AF_UNIX:
+            with open(token_file or token_path(self.address)) as f:
+                self._token = f.read().strip()
+        self._socket = socket.socket(family, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        self._socket.connect(self.address)
+        # Calls can take arbitrarily long
+        self._socket.settimeout(None)
+        self._file = self._socket.makefile("rwb")
+        self._id = 0
+
+    def request(self, request):
+        """
+        Send a request dictionary and return the response dictionary.
+        """
+        self._id += 1
+        request = dict(request, id=self._id)
+        if self._token is not None:
+            request["token"] = self._token
+        self._file.write((json_package.dumps(request) + "\n").encode("utf-8"))
+        self._file.flush()
+
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("The gget server closed the connection.")
+        return json_package.loads(line)
+
+    def run(self, argv, cwd=None):
+        """
+        Run a gget command line on the server.
+        Relative paths in argv refer to cwd (default: the current directory of the client).
+        Returns a dictionary with the exit code, standard out and standard error of the command.
+        """
+        response = self.request({"argv": list(argv), "cwd": cwd or os.getcwd()})
+        if not response["ok"]:
+            raise RuntimeError(response["error"])
+        return response
+
+    def call(self, function, *args, **kwargs):
+        """
+        Call a gget function (e.g. "info") on the server and return its JSON formatted result.
+        """
+        response = self.request({"function": function, "args": args, "kwargs": kwargs})
+        if not response["ok"]:
+            raise RuntimeError(response["error"])
+        return response["result"]
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def forward(address, argv):
+    """
+    Forward a command line to the gget server at address and print its output.
+
+    Returns the exit code of the command, or None if the server could not be reached.
+    """
+    try:
+        client = Client(address)
+    except OSError:
+        return None
+
+    with client:
+        response = client.run(argv)
+
+    sys.stdout.write(response["stdout"])
+    sys.stderr.write(response["stderr"])
+    return response["exit_code"]
@@ -23,10 +23,24 @@ from urllib3.util.retry import Retry
 from requests.adapters import HTTPAdapter
 from urllib.parse import quote
 import calendar
+import io
 
 # Internal imports for logging, unique ID generation, and FASTA parsing
-from .utils import set_up_logger, FastaIO
-from .constants import NCBI_API_BASE, NCBI_EUTILS_BASE_EFETCH, NCBI_EUTILS_BASE_ESEARCH
+from .utils import (
+    set_up_logger,
+    FastaIO,
+    FastaRecord,
+    IndexedFasta,
+    open_fasta,
+    http_request,
+    session_request,
+    set_ncbi_api_key_rate_limits,
+)
+from .constants import (
+    NCBI_API_BASE,
+    NCBI_EUTILS_BASE_EFETCH,
+    NCBI_EUTILS_BASE_ESEARCH,
+)
 from .compile import PACKAGE_PATH
 
 # Optional psutil import for memory monitoring
@@ -53,8 +67,6 @@ PAGE_SIZE_FALLBACK_DECREMENT = 50  # Decrease page size by this amount on retry
 # E-utilities Configuration
 EUTILS_TIMEOUT = 300  # Timeout in seconds for E-utilities requests
 EUTILS_DEFAULT_BATCH_SIZE = 200  # Default batch size for E-utilities requests
-EUTILS_INTER_BATCH_DELAY = 0.5  # Delay in seconds between batch requests
-EUTILS_INTER_BATCH_DELAY_WITH_KEY = 0.11  # Delay when using API key (10 req/sec allowed)
 EUTILS_MIN_BATCH_SIZE_FOR_SPLIT = 50  # Minimum batch size before giving up on splitting
 
 # EPost + EFetch History Server Configuration
@@ -63,7 +75,6 @@ EFETCH_FASTA_RETMAX = 500  # Records per EFetch call when downloading FASTA via
 
 # GenBank Configuration
 GENBANK_DEFAULT_BATCH_SIZE = 200  # Default batch size for GenBank requests
-GENBANK_INTER_BATCH_DELAY = 0.35  # Delay in seconds between GenBank batch requests
 GENBANK_MAX_BATCH_SIZE_WARNING = 500  # Warn user if batch size exceeds this
 GENBANK_RETRY_ATTEMPTS = 5  # Number of retry attempts for GenBank requests
 GENBANK_XML_CHUNK_SIZE = 10000  # Rows to process before writing to CSV
@@ -73,6 +84,8 @@ GENBANK_COMPLEXITY = 1 # Complexity level with only the accessions requested. Al
 # Users can also pass an api_key argument directly to the virus() function / CLI --api_key.
 # Without an API key, NCBI E-utilities rate limit is 3 requests/sec;
 # with a key it increases to 10 requests/sec.
+# All NCBI requests are throttled by the shared per-host rate limiter in utils
+# (see HTTP_RATE_LIMITS and HTTP_RATE_LIMITS_NCBI_API_KEY in constants.py).
 API_KEY = os.environ.get("NCBI_API_KEY")
 
 # Subprocess and Download Configuration
@@ -1217,10 +1230,6 @@ def _fetch_metadata_for_accession_list(
                 failed_batch_info,
                 error_info if error_info else {'error': 'No data returned', 'exception_type': 'EmptyResponse'}
             )
-        
-        # Add a small delay between batches to respect rate limits
-        if batch_num < len(batches):
-            time.sleep(EUTILS_INTER_BATCH_DELAY)
     
     # Log summary
     if failed_batches:
@@ -1477,7 +1486,7 @@ def fetch_virus_metadata(
             # Make the HTTP GET request to the NCBI API  
             logger.debug("Making API request to: %s", url)
             logger.debug("Request parameters: %s", params)
-            response = requests.get(full_url, timeout=API_REQUEST_TIMEOUT)
+            response = http_request("GET", full_url, timeout=API_REQUEST_TIMEOUT)
             logger.debug("Explicit URL request sent: %s", response.url)
             
             # Raise an exception if the HTTP request failed (4xx or 5xx status codes)
@@ -3374,9 +3383,6 @@ def _download_sequences_epost_efetch(accessions, fasta_path, failed_commands=Non
     total_downloaded = 0
     batch_failures = 0
     
-    # Determine inter-batch delay based on API key availability
-    delay = EUTILS_INTER_BATCH_DELAY_WITH_KEY if api_key else EUTILS_INTER_BATCH_DELAY
-    
     logger.info("Fetching FASTA sequences in batches of %d (total: %d)", retmax, total)
     
     try:
@@ -3402,7 +3408,8 @@ def _download_sequences_epost_efetch(accessions, fasta_path, failed_commands=Non
                     if api_key:
                         params['api_key'] = api_key
                     
-                    response = requests.get(
+                    response = http_request(
+                        "GET",
                         NCBI_EUTILS_BASE_EFETCH,
                         params=params,
                         timeout=EUTILS_TIMEOUT,
@@ -3458,10 +3465,6 @@ def _download_sequences_epost_efetch(accessions, fasta_path, failed_commands=Non
                         {'batch_num': batch_num, 'retstart': retstart, 'retmax': retmax},
                         error_info if error_info else {'error': 'unknown'}
                     )
-                
-                # Respect NCBI rate limits
-                if retstart + retmax < total:
-                    time.sleep(delay)
     
     except IOError as e:
         raise RuntimeError(f"Failed to write FASTA file {fasta_path}: {e}") from e
@@ -3532,7 +3535,7 @@ def _download_sequences_single_batch(accessions, NCBI_EUTILS_BASE_EFETCH, fasta_
         if api_key:
             params['api_key'] = api_key
         logger.debug("E-utilities URL: %s", NCBI_EUTILS_BASE_EFETCH)
-        response = requests.get(NCBI_EUTILS_BASE_EFETCH, params=params, timeout=EUTILS_TIMEOUT)
+        response = http_request("GET", NCBI_EUTILS_BASE_EFETCH, params=params, timeout=EUTILS_TIMEOUT)
         response.raise_for_status()
         
         # Verify we got FASTA data
@@ -3630,7 +3633,7 @@ def _download_sequences_batched(accessions, NCBI_EUTILS_BASE_EFETCH, fasta_path,
         RuntimeError: If all batches fail or no sequences are downloaded
         
     Note:
-        - Respects NCBI rate limits with 0.5s delays between batches
+        - Respects NCBI rate limits through the shared per-host token bucket (3 req/sec, 10 with an API key)
         - Implements exponential backoff for individual batch retries
         - Automatically reduces batch size for URL length errors
         - Continues processing even if some batches fail
@@ -3671,7 +3674,7 @@ def _download_sequences_batched(accessions, NCBI_EUTILS_BASE_EFETCH, fasta_path,
                     }
                     if api_key:
                         params['api_key'] = api_key
-                    response = requests.get(NCBI_EUTILS_BASE_EFETCH, params=params, timeout=EUTILS_TIMEOUT)
+                    response = http_request("GET", NCBI_EUTILS_BASE_EFETCH, params=params, timeout=EUTILS_TIMEOUT)
                     response.raise_for_status()
                     
                     # Verify we got FASTA data
@@ -3763,10 +3766,6 @@ def _download_sequences_batched(accessions, NCBI_EUTILS_BASE_EFETCH, fasta_path,
                             error_info
                         )
                         continue
-                
-                # Add small delay between requests to be respectful to NCBI servers
-                if batch_num < len(batches):  # Don't delay after the last batch
-                    time.sleep(EUTILS_INTER_BATCH_DELAY)
         
         # Check if we downloaded anything
         if total_downloaded == 0:
@@ -3989,16 +3988,13 @@ def _write_fasta_record(handle, record):
     Write a single FASTA record to an open file handle.
     
     Args:
-        handle: Open file handle for writing.
+        handle: Open file handle for writing (text or binary; binary avoids re-encoding).
         record: FastaRecord object with id, description, and seq attributes.
     """
-    if hasattr(record, 'description') and record.description:
-        handle.write(f">{record.id} {record.description}\n")
+    if isinstance(handle, io.TextIOBase):
+        handle.write(FastaIO.format(record))
     else:
-        handle.write(f">{record.id}\n")
-    seq_str = str(record.seq)
-    for i in range(0, len(seq_str), 70):
-        handle.write(seq_str[i:i+70] + '\n')
+        handle.write(FastaIO.to_bytes(record))
 
 
 def _stream_copy_fasta(input_path, output_path, accession_set=None):
@@ -4007,10 +4003,13 @@ def _stream_copy_fasta(input_path, output_path, accession_set=None):
     
     This avoids loading all sequences into RAM — only one record at a time is in memory.
     For large datasets (millions of sequences), this is critical to avoid out-of-memory errors.
+    When filtering, the input is indexed (see IndexedFasta), so only the headers of the other
+    records are read. All selected records are written (records with duplicate accessions included)
+    and rewrapped exactly as when the input is parsed.
     
     Args:
         input_path (str): Path to input FASTA file.
-        output_path (str): Path to output FASTA file.
+        output_path (str): Path to output FASTA file (bgzip compressed if it ends in .gz).
         accession_set (set, optional): If provided, only copy records whose ID is in this set.
         
     Returns:
@@ -4018,7 +4017,38 @@ def _stream_copy_fasta(input_path, output_path, accession_set=None):
     """
     count = 0
     skipped = 0
-    with open(output_path, 'w', encoding='utf-8') as out_handle:
+
+    fasta = None
+    if accession_set is not None:
+        # With an index, the selected records are copied as they are without parsing the others
+        try:
+            fasta = IndexedFasta(input_path, save_index=False)
+        except ValueError as e:
+            logger.debug("Could not index %s (%s), parsing all records instead", input_path, e)
+
+    if fasta is not None:
+        with fasta, open_fasta(output_path, 'wb') as out_handle:
+            # All records in file order, not only the first one of each accession
+            for entry in fasta.entries():
+                # Header split as FastaIO.parse does
+                accession, _, description = fasta.header(entry).strip().partition(" ")
+                if accession not in accession_set:
+                    skipped += 1
+                    continue
+                raw = fasta.raw(entry)
+                # Sequence lines joined with all whitespace removed, as FastaIO.parse does
+                seq = b"".join(raw[raw.find(b"\n") + 1 :].split()).decode("utf-8")
+                _write_fasta_record(out_handle, FastaRecord(seq, accession, description))
+                count += 1
+                if count % FASTA_STREAM_LOG_INTERVAL == 0:
+                    logger.debug("Streamed %d FASTA records so far...", count)
+
+        logger.info("Stream-copied %d FASTA records (%d skipped by accession filter)", count, skipped)
+        return count
+
+    # Large buffer so records are written in big blocks instead of one small write each
+    # (output paths ending in .gz are bgzip compressed on all cores)
+    with open_fasta(output_path, 'wb') as out_handle:
         for record in FastaIO.parse(input_path, "fasta"):
             if accession_set is not None and record.id not in accession_set:
                 skipped += 1
@@ -4623,6 +4653,7 @@ def filter_sequences(
         proteins_complete (bool): Whether proteins must be complete.
         output_fasta_path (str, optional): Path to write filtered sequences directly.
             When provided, sequences are streamed to disk instead of held in memory.
+            Paths ending in .gz are bgzip compressed.
         
     Returns:
         tuple: (filtered_count, filtered_metadata, protein_headers)
@@ -4653,7 +4684,7 @@ def filter_sequences(
     output_handle = None
     try:
         if output_fasta_path:
-            output_handle = open(output_fasta_path, 'w', encoding='utf-8')
+            output_handle = open_fasta(output_fasta_path, 'wb')
             logger.info("Streaming filtered sequences directly to: %s", output_fasta_path)
         
         for record in FastaIO.parse(fna_file, "fasta"):
@@ -5496,8 +5527,8 @@ def _esearch_prefilter_genbank(
         if api_key:
             params['api_key'] = api_key
         
-        response = requests.get(NCBI_EUTILS_BASE_ESEARCH, params=params, timeout=60,
-                               headers={'User-Agent': 'gget/1.0'})
+        response = http_request("GET", NCBI_EUTILS_BASE_ESEARCH, params=params, timeout=60,
+                                    headers={'User-Agent': 'gget/1.0'})
         response.raise_for_status()
         root = ET.fromstring(response.text)
         
@@ -5530,8 +5561,6 @@ def _esearch_prefilter_genbank(
         batch_size = 10000
         
         for retstart in range(0, total_count, batch_size):
-            time.sleep(0.35 if not api_key else 0.1)
-            
             fetch_params = {
                 'db': 'nucleotide',
                 'WebEnv': web_env,
@@ -5544,8 +5573,8 @@ def _esearch_prefilter_genbank(
             if api_key:
                 fetch_params['api_key'] = api_key
             
-            resp = requests.get(NCBI_EUTILS_BASE_EFETCH, params=fetch_params, timeout=120,
-                               headers={'User-Agent': 'gget/1.0'})
+            resp = http_request("GET", NCBI_EUTILS_BASE_EFETCH, params=fetch_params, timeout=120,
+                                  headers={'User-Agent': 'gget/1.0'})
             resp.raise_for_status()
             
             batch_accs = [a.strip() for a in resp.text.strip().split('\n') if a.strip()]
@@ -5624,7 +5653,8 @@ def _epost_accessions(accessions, api_key=None):
     
     try:
         # Make POST request with accessions in body
-        response = requests.post(
+        response = http_request(
+            "POST",
             epost_url,
             params=params,
             data=data,
@@ -5736,7 +5766,7 @@ def _efetch_with_history(web_env, query_key, retstart, retmax, api_key=None, fai
             logger.debug("EFetch with history: retstart=%d, retmax=%d (attempt %d)", 
                         retstart, retmax, attempt + 1)
             
-            response = session.get(NCBI_EUTILS_BASE_EFETCH, params=params, timeout=EUTILS_TIMEOUT, headers=headers)
+            response = session_request(session, "GET", NCBI_EUTILS_BASE_EFETCH, params=params, timeout=EUTILS_TIMEOUT, headers=headers)
             response.raise_for_status()
             
             # Verify we got XML data
@@ -5787,7 +5817,7 @@ def _efetch_with_history(web_env, query_key, retstart, retmax, api_key=None, fai
     return {}, ""
 
 
-def fetch_genbank_metadata(accessions, genbank_full_xml_path, genbank_full_csv_path, batch_size=200, delay=0.5, failed_log_path=None, api_key=None):
+def fetch_genbank_metadata(accessions, genbank_full_xml_path, genbank_full_csv_path, batch_size=200, delay=None, failed_log_path=None, api_key=None):
     """
     Fetch detailed GenBank metadata for a list of accession numbers using NCBI E-utilities.
     
@@ -5802,7 +5832,7 @@ def fetch_genbank_metadata(accessions, genbank_full_xml_path, genbank_full_csv_p
         genbank_full_xml_path (str): Path to save the full XML output.
         genbank_full_csv_path (str): Path to save the full CSV output.
         batch_size (int): Maximum accessions per EFetch request (default: 200, can use 500 with EPost method).
-        delay (float): Delay in seconds between batch requests (default: 0.5).
+        delay (float): DEPRECATED and ignored (a warning is logged if it is set). Requests are throttled by the shared per-host rate limiter.
         failed_log_path (str, optional): Path to log file for failed batches.
         api_key (str, optional): NCBI API key for higher rate limits (10 req/sec vs 3). Falls back to NCBI_API_KEY env var if not provided.
         
@@ -5810,6 +5840,12 @@ def fetch_genbank_metadata(accessions, genbank_full_xml_path, genbank_full_csv_p
         tuple: (metadata_dict, failed_log_path) where metadata_dict maps accession
                numbers to their GenBank metadata.
     """
+    # Handle deprecated arguments
+    if delay is not None:
+        logger.warning(
+            "'delay' argument deprecated! Requests to NCBI are throttled by the shared per-host rate limiter instead."
+        )
+
     # Use module-level API_KEY (from NCBI_API_KEY env var) if not provided directly
     if api_key is None:
         api_key = API_KEY
@@ -5850,12 +5886,10 @@ def fetch_genbank_metadata(accessions, genbank_full_xml_path, genbank_full_csv_p
     use_epost_method = len(accessions) > 100  # Use EPost for any significant number
     optimized_batch_size = 500 if use_epost_method else batch_size  # EPost method allows larger batches
     
-    # Optimize delay based on API key: 10 req/sec with key vs 3 req/sec without
-    # With API key: 0.1s delay allows ~10 req/sec
-    # Without API key: 0.35s delay allows ~3 req/sec
-    effective_delay = 0.1 if api_key else delay
-    logger.info("Using delay of %.2fs between requests (API key: %s)", 
-               effective_delay, "yes" if api_key else "no")
+    # Requests are throttled by the shared NCBI rate limiter: 10 req/sec with API key vs 3 req/sec without
+    set_ncbi_api_key_rate_limits(api_key)
+    logger.info("Using NCBI rate limit of %d requests/sec (API key: %s)",
+               10 if api_key else 3, "yes" if api_key else "no")
     
     try:
         # Open temp file for incremental XML writing
@@ -5961,10 +5995,6 @@ def fetch_genbank_metadata(accessions, genbank_full_xml_path, genbank_full_csv_p
                             # Periodic memory logging
                             if overall_batch_num % memory_log_frequency == 0:
                                 _log_memory_usage(f"GenBank batch {overall_batch_num}/{total_batches_all_chunks}")
-                            
-                            # Delay between requests (respect NCBI rate limits)
-                            if overall_batch_num < total_batches_all_chunks and effective_delay > 0:
-                                time.sleep(effective_delay)
                                 
                         except Exception as e:
                             logger.error("⚠️ Batch %d/%d failed: %s", 
@@ -5973,10 +6003,6 @@ def fetch_genbank_metadata(accessions, genbank_full_xml_path, genbank_full_csv_p
                             batch_end = min(batch_start + optimized_batch_size, chunk_total)
                             failed_batches.append(chunk_accessions[batch_start:batch_end])
                             continue
-                    
-                    # Brief delay between EPost chunks to be respectful to NCBI
-                    if chunk_idx < len(epost_chunks) - 1:
-                        time.sleep(1.0)
                         
                 else:
                     logger.warning("EPost chunk %d/%d failed, will use direct fetch for %d accessions",
@@ -6007,8 +6033,6 @@ def fetch_genbank_metadata(accessions, genbank_full_xml_path, genbank_full_csv_p
                             xml_written = True
                             del batch_xml_text
                             del cleaned_xml
-                        if dbatch_num < len(direct_batches) and effective_delay > 0:
-                            time.sleep(effective_delay)
                     except Exception as e:
                         logger.error("⚠️ Direct fallback batch %d failed: %s", dbatch_num, e)
                         failed_batches.append(dbatch_accessions)
@@ -6083,11 +6107,6 @@ def fetch_genbank_metadata(accessions, genbank_full_xml_path, genbank_full_csv_p
                     if batch_num % memory_log_frequency == 0:
                         _log_memory_usage(f"GenBank batch {batch_num}/{len(batches)}")
                     
-                    # Add delay between requests to be respectful to NCBI servers
-                    if batch_num < len(batches) and effective_delay > 0:
-                        logger.debug("Adding %.1f second delay before next batch", effective_delay)
-                        time.sleep(effective_delay)
-                    
                 except Exception as e:
                     logger.error("⚠️ Batch %d failed: %s", batch_num, e)
                     failed_batches.append(batch_accessions)
@@ -6155,8 +6174,6 @@ def fetch_genbank_metadata(accessions, genbank_full_xml_path, genbank_full_csv_p
                         xml_written = True
                         del xml
                         del cleaned_xml
-                    if dbatch_num < len(direct_batches) and effective_delay > 0:
-                        time.sleep(effective_delay)
                 except Exception as e:
                     logger.warning("Direct retry failed for dropped accessions %s: %s", 
                                   dbatch_accessions, e)
@@ -6330,7 +6347,7 @@ def _fetch_genbank_batch(accessions, failed_log_path=None):
             # Use POST instead of GET for EFetch to avoid 414 URI Too Long errors.
             # NCBI E-utilities supports POST for all requests, and POST puts the
             # accession list in the request body instead of the URL.
-            response = session.post(NCBI_EUTILS_BASE_EFETCH, data=params, timeout=EUTILS_TIMEOUT, headers=headers)
+            response = session_request(session, "POST", NCBI_EUTILS_BASE_EFETCH, data=params, timeout=EUTILS_TIMEOUT, headers=headers)
             efetch_url = response.url  # Capture the full URL for logging
             logger.debug("POST request sent to: %s", NCBI_EUTILS_BASE_EFETCH)
             response.raise_for_status()
@@ -8181,6 +8198,7 @@ def virus(
     api_key=None,
     baseline_metadata=None,
     merge_results=True,
+    compress_fasta=False,
     verbose=True,
     ):
     """
@@ -8203,6 +8221,7 @@ def virus(
     # If no key is provided, the process continues at the lower rate limit.
     if api_key is None:
         api_key = os.environ.get("NCBI_API_KEY")
+    set_ncbi_api_key_rate_limits(api_key)
     if api_key:
         logger.info("Using NCBI API key for higher rate limits (10 req/sec)")
     else:
@@ -8334,6 +8353,11 @@ def virus(
             "Argument 'keep_temp' must be a boolean (True or False)."
         )
 
+    if not isinstance(compress_fasta, bool):
+        raise TypeError(
+            "Argument 'compress_fasta' must be a boolean (True or False)."
+        )
+
     if is_accession is not None and not isinstance(is_accession, bool):
         raise TypeError(
             "Argument 'is_accession' must be a boolean (True or False)."
@@ -9076,7 +9100,10 @@ def virus(
         all_metadata_filters_none = all(v is None for k, v in filters.items())
 
         # Prepare output file paths (defined early for use in cleanup even if filters return early)
-        output_fasta_file = os.path.join(outfolder, f"{virus_clean}_sequences.fasta")
+        # Compressed output is written as bgzip, which stays indexable for random access
+        output_fasta_file = os.path.join(
+            outfolder, f"{virus_clean}_sequences.fasta" + (".gz" if compress_fasta else "")
+        )
         output_metadata_csv = os.path.join(outfolder, f"{virus_clean}_metadata.csv")
         output_metadata_jsonl = os.path.join(outfolder, f"{virus_clean}_metadata.jsonl")
 
@@ -9242,7 +9269,6 @@ def virus(
                     genbank_full_xml_path=genbank_prefetch_xml,
                     genbank_full_csv_path=genbank_prefetch_csv,
                     batch_size=genbank_batch_size,
-                    delay=GENBANK_INTER_BATCH_DELAY,
                     api_key=api_key
                 )
                 
@@ -9361,13 +9387,8 @@ def virus(
             filtered_count = 0
             
             try:
-                # Generator expression: yields only sequences in filtered_accessions
-                filtered_records = (r for r in FastaIO.parse(cached_fasta_file, "fasta") if r.id in filtered_acc_set)
-                FastaIO.write(filtered_records, fna_file, "fasta")
-                
-                # Count the written sequences
-                for _ in FastaIO.parse(fna_file, "fasta"):
-                    filtered_count += 1
+                # Copies only the records in filtered_accessions and returns their number
+                filtered_count = _stream_copy_fasta(cached_fasta_file, fna_file, filtered_acc_set)
                 
                 logger.info("✅ Streamed and wrote %d filtered sequences from cached FASTA", filtered_count)
                 logger.info("   Output: %s", fna_file)
@@ -9569,7 +9590,6 @@ def virus(
                             accessions=list(set(final_accessions)),  # Remove duplicates
                             genbank_full_xml_path=genbank_full_xml_path, genbank_full_csv_path=genbank_full_csv_path,
                             batch_size=genbank_batch_size,
-                            delay=GENBANK_INTER_BATCH_DELAY,
                             api_key=api_key
                         )
                         
@@ -9642,7 +9662,9 @@ def virus(
                                     total_after_genbank_filter = len(genbank_filtered_accessions)
                                     # Re-filter FASTA by streaming from output
                                     # file through accession filter, instead of holding all sequences in RAM
-                                    temp_refiltered_fasta = output_fasta_file + ".tmp"
+                                    temp_refiltered_fasta = os.path.join(
+                                        os.path.dirname(output_fasta_file), "tmp_" + os.path.basename(output_fasta_file)
+                                    )
                                     refiltered_count = _stream_copy_fasta(output_fasta_file, temp_refiltered_fasta, genbank_filtered_set)
                                     shutil.move(temp_refiltered_fasta, output_fasta_file)
                                     total_final_sequences = refiltered_count
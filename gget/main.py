@@ -1,10 +1,9 @@
 import argparse
+import atexit
 import sys
 from datetime import datetime
 from typing import Optional
 
-import pandas as pd
-
 # Get current date and time for alphafold default foldername
 dt_string = datetime.now().strftime("%Y_%m_%d-%H_%M")
 
@@ -12,37 +11,10 @@ import os
 import json
 import subprocess
 
-from .utils import set_up_logger
-
-logger = set_up_logger()
-
-from .__init__ import __version__
-
-# Module functions
-from .gget_ref import ref
-from .gget_search import search
-from .gget_info import info
-from .gget_seq import seq
-from .gget_muscle import muscle
-from .gget_blast import blast
-from .gget_blat import blat
-from .gget_enrichr import enrichr
-from .gget_archs4 import archs4
-from .gget_alphafold import alphafold
-from .gget_setup import setup
-from .gget_pdb import pdb
-from .gget_gpt import gpt
-from .gget_cellxgene import cellxgene
-from .gget_elm import elm
-from .gget_diamond import diamond
-from .gget_cosmic import cosmic
-from .gget_mutate import mutate
-from .gget_opentargets import opentargets, OPENTARGETS_RESOURCES
-from .gget_cbio import cbio_plot, cbio_search
-from .gget_bgee import bgee
-from .gget_8cube import specificity, psi_block, gene_expression
-from .gget_virus import virus
+from . import __version__
+from .constants import OPENTARGETS_RESOURCES
 
+# Module functions are imported when their command is run to keep the startup time of the CLI short
 
 # Custom formatter for help messages that preserved the text formatting and adds the default value to the end of the help message
 class CustomHelpFormatter(argparse.RawTextHelpFormatter):
@@ -102,10 +74,28 @@ def parse_opentargets_filter(filter_arg):
     return filter_key, int_or_str(str_to_bool_or_none(filter_value))
 
 
-def main():
+def main(argv=None):
     """
     Function containing argparse parsers and arguments to allow the use of gget from the terminal.
+
+    Args:
+    - argv    List of command line arguments. Default: None -> sys.argv[1:].
+              In-process calls (e.g. by gget serve) pass argv explicitly and are not forwarded to a server.
     """
+    from_command_line = argv is None
+    argv = sys.argv[1:] if argv is None else list(argv)
+
+    # Forward the command to a running gget serve instance if GGET_SERVER is set
+    if from_command_line and os.getenv("GGET_SERVER") and argv[:1] != ["serve"]:
+        from .gget_serve import forward
+
+        exit_code = forward(os.getenv("GGET_SERVER"), argv)
+        if exit_code is not None:
+            sys.exit(exit_code)
+        sys.stderr.write(
+            f"gget server at {os.getenv('GGET_SERVER')} is not reachable. Running the command locally.\n"
+        )
+
     # Define parent parser
     parent_parser = argparse.ArgumentParser(
         description=f"gget v{__version__}", add_help=False
@@ -114,6 +104,17 @@ def main():
     parent_subparsers = parent_parser.add_subparsers(dest="command")
     # Define parent (not sure why I need both parent parser and parent, but otherwise it does not work)
     parent = argparse.ArgumentParser(add_help=False)
+    # Add I/O statistics argument shared by all modules
+    parent.add_argument(
+        "--stats-out",
+        type=str,
+        default=None,
+        required=False,
+        help=(
+            "Path to a JSON file the I/O statistics of this run (latency, bytes, status codes and "
+            "cache hits per HTTP endpoint and external binary) are written to on exit."
+        ),
+    )
 
     # Add custom help argument to parent parser
     parent_parser.add_argument(
@@ -2052,6 +2053,25 @@ def main():
             "The identifiers (following the '>') of the mutated sequences in the output fasta will be '>[seq_ID]_[mut_ID]'."
         ),
     )
+    parser_mutate.add_argument(
+        "-cs",
+        "--chunk_size",
+        default=None,
+        type=int,
+        required=False,
+        help=(
+            "Number of mutations processed at a time. The mutated sequences of each chunk are appended to 'out' before the next chunk is read, "
+            "so memory use is bounded by the chunk size instead of the number of mutations. Default: None (all mutations are processed at once)"
+        ),
+    )
+    parser_mutate.add_argument(
+        "-t",
+        "--threads",
+        default=1,
+        type=int,
+        required=False,
+        help="Number of processes used to mutate the sequences (mutations are split between the processes by sequence ID). Default: 1",
+    )
     parser_mutate.add_argument(
         "-q",
         "--quiet",
@@ -2780,6 +2800,13 @@ def main():
         required=False,
         help="Save all output files, including intermediate files.",
     )
+    parser_virus.add_argument(
+        "--compress_fasta",
+        default=False,
+        action="store_true",
+        required=False,
+        help="Save the sequences as a bgzip-compressed FASTA file (.fasta.gz), compressed on all CPU cores.",
+    )
     parser_virus.add_argument(
         "--baseline",
         type=str,
@@ -2827,8 +2854,94 @@ def main():
         help="Does not print progress information. For large datasets, it is recommended to not use this flag, to monitor progress.",
     )
 
+    ## gget serve subparser
+    serve_desc = "Run a long-lived gget server answering JSON-lines RPC requests with warm caches."
+    parser_serve = parent_subparsers.add_parser(
+        "serve",
+        parents=[parent],
+        description=serve_desc,
+        help=serve_desc,
+        add_help=True,
+        formatter_class=CustomHelpFormatter,
+    )
+    parser_serve.add_argument(
+        "-a",
+        "--address",
+        type=str,
+        default=None,
+        required=False,
+        help=(
+            "Path of a Unix socket (only accessible to the current user), or 'host:port' to listen on a TCP port\n"
+            "(requests must contain the token the server writes to a file only readable by the current user).\n"
+            "Default: $XDG_RUNTIME_DIR/gget.sock (127.0.0.1:8765 on platforms without Unix sockets).\n"
+            "Set the environment variable GGET_SERVER to this address to forward gget commands to the server."
+        ),
+    )
+    parser_serve.add_argument(
+        "-q",
+        "--quiet",
+        default=True,
+        action="store_false",
+        required=False,
+        help="Does not print progress information.",
+    )
+
+    ## gget batch subparser
+    batch_desc = "Run the gget queries listed in a JSON lines jobs file concurrently."
+    parser_batch = parent_subparsers.add_parser(
+        "batch",
+        parents=[parent],
+        description=batch_desc,
+        help=batch_desc,
+        add_help=True,
+        formatter_class=CustomHelpFormatter,
+    )
+    parser_batch.add_argument(
+        "jobs",
+        type=str,
+        help=(
+            "Path to a JSON lines file with one job per line, naming the gget function in 'command' and its arguments in 'args', e.g.\n"
+            '{"id": "q1", "command": "info", "args": {"ens_ids": ["ENSG00000034713"], "verbose": false}}'
+        ),
+    )
+    parser_batch.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=4,
+        required=False,
+        help="Number of jobs run at the same time. All workers share the per-host rate limits.",
+    )
+    parser_batch.add_argument(
+        "-o",
+        "--out",
+        type=str,
+        default=None,
+        required=False,
+        help=(
+            "Path to a JSON lines file the result records are streamed to, e.g. path/to/directory/results.jsonl.\n"
+            "Default: Standard out (unless --out_dir is set)."
+        ),
+    )
+    parser_batch.add_argument(
+        "-od",
+        "--out_dir",
+        type=str,
+        default=None,
+        required=False,
+        help="Path to a folder in which the result record of each job is saved as <id>.json.",
+    )
+    parser_batch.add_argument(
+        "-q",
+        "--quiet",
+        default=True,
+        action="store_false",
+        required=False,
+        help="Does not show the progress bar.",
+    )
+
     ### Define return values
-    args = parent_parser.parse_args()
+    args = parent_parser.parse_args(argv)
 
     # Help return
     if args.help:
@@ -2851,7 +2964,7 @@ def main():
         sys.exit(1)
 
     # Show help when no arguments are given
-    if len(sys.argv) == 1:
+    if len(argv) == 0:
         parent_parser.print_help(sys.stderr)
         sys.exit(1)
 
@@ -2880,17 +2993,54 @@ def main():
         "bgee": parser_bgee,
         "8cube": parser_8cube,
         "virus": parser_virus,
+        "batch": parser_batch,
     }
 
-    if len(sys.argv) == 2:
-        if sys.argv[1] in command_to_parser:
-            command_to_parser[sys.argv[1]].print_help(sys.stderr)
+    if len(argv) == 1 and argv[0] != "serve":
+        if argv[0] in command_to_parser:
+            command_to_parser[argv[0]].print_help(sys.stderr)
         else:
             parent_parser.print_help(sys.stderr)
         sys.exit(1)
 
+    from .utils import set_up_logger, dump_stats
+
+    logger = set_up_logger()
+
+    # Write I/O statistics on exit (also when a module exits early)
+    # In-process calls write them themselves since the process keeps running
+    if getattr(args, "stats_out", None) and from_command_line:
+        atexit.register(dump_stats, args.stats_out)
+
+    ## serve return
+    if args.command == "serve":
+        from .gget_serve import serve
+
+        serve(address=args.address, verbose=args.quiet)
+
+    ## batch return
+    if args.command == "batch":
+        from .gget_batch import batch
+
+        summary = batch(
+            args.jobs,
+            workers=args.workers,
+            out=args.out,
+            out_dir=args.out_dir,
+            verbose=args.quiet,
+        )
+        if args.quiet:
+            logger.info(
+                f"gget batch finished {summary['jobs']} jobs in {summary['elapsed']} seconds "
+                f"({summary['failed']} failed)."
+            )
+        if summary["failed"]:
+            sys.exit(1)
+
     ## cellxgene return
     if args.command == "cellxgene":
+        from .gget_cellxgene import cellxgene
+
         cellxgene(
             species=args.species,
             gene=args.gene,
@@ -2924,6 +3074,8 @@ def main():
 
     ## gpt return
     if args.command == "gpt":
+        from .gget_gpt import gpt
+
         gpt_results = gpt(
             prompt=args.prompt,
             api_key=args.api_key,
@@ -2944,6 +3096,8 @@ def main():
 
     ## blat return
     if args.command == "blat":
+        from .gget_blat import blat
+
         # Handle deprecated flags for backwards compatibility
         if args.seq_deprecated and args.sequence:
             logger.warning(
@@ -2994,6 +3148,8 @@ def main():
 
     ## blast return
     if args.command == "blast":
+        from .gget_blast import blast
+
         # Handle deprecated flags for backwards compatibility
         if args.seq_deprecated and args.sequence:
             logger.warning(
@@ -3048,6 +3204,8 @@ def main():
 
     ## mutate return
     if args.command == "mutate":
+        from .gget_mutate import mutate
+
         if isinstance(args.sequences, list) and len(args.sequences) == 1:
             seqs = args.sequences[0]
         else:
@@ -3068,6 +3226,8 @@ def main():
             seq_id_column=args.seq_id_column,
             out=args.out,
             verbose=args.quiet,
+            chunk_size=args.chunk_size,
+            threads=args.threads,
         )
 
         # Print list of mutated sequences if any are returned (this should only happen when out=None)
@@ -3077,6 +3237,8 @@ def main():
 
     ## cosmic return
     if args.command == "cosmic":
+        from .gget_cosmic import cosmic
+
         # Run gget cosmic function
         cosmic_results = cosmic(
             searchterm=args.searchterm,
@@ -3127,6 +3289,8 @@ def main():
 
     ## archs4 return
     if args.command == "archs4":
+        from .gget_archs4 import archs4
+
         # Handle deprecated flags for backwards compatibility
         if args.gene_deprecated and args.gene:
             logger.warning(
@@ -3179,6 +3343,8 @@ def main():
 
     ## muscle return
     if args.command == "muscle":
+        from .gget_muscle import muscle
+
         # Handle deprecated flags for backwards compatibility
         if args.fasta_deprecated and args.fasta:
             logger.warning(
@@ -3196,6 +3362,8 @@ def main():
 
     ## elm return
     if args.command == "elm":
+        from .gget_elm import elm
+
         ortho, regex = elm(
             sequence=args.sequence,
             uniprot=args.uniprot,
@@ -3217,6 +3385,8 @@ def main():
 
     ## diamond return
     if args.command == "diamond":
+        from .gget_diamond import diamond
+
         diamond_results = diamond(
             query=args.query,
             reference=args.reference,
@@ -3238,6 +3408,8 @@ def main():
 
     ## ref return
     if args.command == "ref":
+        from .gget_ref import ref
+
         # Return all vertebrate available species
         if args.list_species:
             species_list = ref(
@@ -3366,6 +3538,8 @@ def main():
 
     ## search return
     if args.command == "search":
+        from .gget_search import search
+
         # Handle deprecated flags for backwards compatibility
         if args.sw_deprecated and args.searchwords:
             logger.warning(
@@ -3429,6 +3603,8 @@ def main():
 
     ## enrichr return
     if args.command == "enrichr":
+        from .gget_enrichr import enrichr
+
         # Handle deprecated flags for backwards compatibility
         if args.genes_deprecated and args.genes:
             logger.warning(
@@ -3511,6 +3687,8 @@ def main():
 
     ## info return
     if args.command == "info":
+        from .gget_info import info
+
         # Handle deprecated flags for backwards compatibility
         if args.id_deprecated and args.ens_ids:
             logger.warning(
@@ -3579,6 +3757,8 @@ def main():
 
     ## seq return
     if args.command == "seq":
+        from .gget_seq import seq
+
         # Handle deprecated flags for backwards compatibility
         if args.id_deprecated and args.ens_ids:
             logger.warning(
@@ -3631,10 +3811,14 @@ def main():
 
     ## setup return
     if args.command == "setup":
+        from .gget_setup import setup
+
         setup(args.module, verbose=args.quiet, out=args.out)
 
     ## alphafold return
     if args.command == "alphafold":
+        from .gget_alphafold import alphafold
+
         if args.out:
             directory = "/".join(args.out.split("/")[:-1])
             if directory != "":
@@ -3656,6 +3840,8 @@ def main():
 
     ## pdb return
     if args.command == "pdb":
+        from .gget_pdb import pdb
+
         pdb_results = pdb(
             pdb_id=args.pdb_id,
             resource=args.resource,
@@ -3691,6 +3877,8 @@ def main():
 
     ## opentargets return
     if args.command == "opentargets":
+        from .gget_opentargets import opentargets
+
         filters = dict(args.filter) if args.filter is not None else None
 
         opentargets_results = opentargets(
@@ -3727,6 +3915,8 @@ def main():
 
     ## cbio return
     if args.command == "cbio":
+        from .gget_cbio import cbio_plot, cbio_search
+
         if args.subcommand == "search":
             cbio_results = cbio_search(convert_to_list(*args.keywords))
             print(json.dumps(cbio_results, ensure_ascii=False, indent=4))
@@ -3749,6 +3939,9 @@ def main():
 
     ## bgee return
     if args.command == "bgee":
+        import pandas as pd
+        from .gget_bgee import bgee
+
         bgee_results: pd.DataFrame = bgee(
             args.ens_id,
             type=args.type,
@@ -3779,6 +3972,7 @@ def main():
 
     ## 8cube return
     if args.command == "8cube":
+        import pandas as pd
         from .gget_8cube import specificity, psi_block, gene_expression
 
         if args.cube_command is None:
@@ -3875,6 +4069,8 @@ def main():
 
     ## virus return
     if args.command == "virus":
+        from .gget_virus import virus
+
         # Parse has_proteins argument - convert comma-separated string to list
         has_proteins_arg = args.has_proteins
         if has_proteins_arg and ',' in has_proteins_arg:
@@ -3972,6 +4168,7 @@ def main():
             gen_mol_type=gen_mol_type_arg,
             baseline_metadata=args.baseline_metadata,
             merge_results=merge_results_arg,
+            compress_fasta=args.compress_fasta,
             api_key=args.api_key,
             verbose=args.quiet,
         )
@@ -1,14 +1,33 @@
 from bs4 import BeautifulSoup
 import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib.parse import urlsplit
 
-# from requests.adapters import HTTPAdapter, Retry
-# import time
+# from requests.adapters import Retry
+import time
 import re
 import os
+import json
 import uuid
+import hashlib
+import sqlite3
+import gzip
+import zlib
+import struct
+import base64
+import asyncio
+import functools
+import itertools
+import mmap
+import collections.abc
+import threading
+import contextlib
+import copy
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
-from IPython.display import display, HTML
 import logging
 
 # from datetime import datetime
@@ -21,6 +40,20 @@ from .constants import (
     ENSEMBL_FTP_URL_NV,
     ENS_TO_PDB_API,
     COSMIC_RELEASE_URL,
+    HTTP_POOL_CONNECTIONS,
+    HTTP_POOL_MAXSIZE,
+    HTTP_HOST_POOL_MAXSIZE,
+    HTTP_ASYNC_MAX_WORKERS,
+    HTTP_RATE_LIMITS,
+    HTTP_RATE_LIMITS_NCBI_API_KEY,
+    HTTP_CACHE_MAX_SIZE,
+    HTTP_CACHE_TTL,
+    HTTP_CACHE_ENSEMBL_RELEASE_SCOPED,
+    STATS_LATENCY_BUCKETS,
+    MEMO_TTL,
+    FASTA_IO_BUFFER_SIZE,
+    BGZF_BLOCK_SIZE,
+    BGZF_COMPRESSION_LEVEL,
 )
 
 
@@ -59,6 +92,897 @@ def set_up_logger():
 logger = set_up_logger()
 
 
+# Shared HTTP session
+# All gget modules send their requests through http_request() so that TCP/TLS
+# connections are kept alive and reused across calls (and across modules).
+_session = None
+_session_lock = threading.Lock()
+_session_config = {
+    "pool_connections": int(
+        os.getenv("GGET_HTTP_POOL_CONNECTIONS", HTTP_POOL_CONNECTIONS)
+    ),
+    "pool_maxsize": int(os.getenv("GGET_HTTP_POOL_MAXSIZE", HTTP_POOL_MAXSIZE)),
+    "host_pool_maxsize": dict(HTTP_HOST_POOL_MAXSIZE),
+}
+
+
+def configure_session(pool_connections=None, pool_maxsize=None, host_pool_maxsize=None):
+    """
+    Configure the connection pool limits of the shared HTTP session.
+    The current session (if any) is closed and rebuilt with the new limits on the next request.
+
+    Args:
+    - pool_connections    Number of per-host connection pools to keep alive.
+    - pool_maxsize        Default number of keep-alive connections per host.
+    - host_pool_maxsize   Dictionary of host -> number of keep-alive connections,
+                          e.g. {"rest.ensembl.org": 15}. Updates the per-host defaults.
+    """
+    global _session
+
+    with _session_lock:
+        if pool_connections is not None:
+            _session_config["pool_connections"] = int(pool_connections)
+        if pool_maxsize is not None:
+            _session_config["pool_maxsize"] = int(pool_maxsize)
+        if host_pool_maxsize is not None:
+            _session_config["host_pool_maxsize"].update(host_pool_maxsize)
+
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def get_session():
+    """
+    Returns the process-wide requests.Session shared by all gget modules.
+    The session keeps connections alive in pools sized per host and negotiates gzip compression.
+    """
+    global _session
+
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                session.headers.update({"Accept-Encoding": "gzip, deflate"})
+
+                # Default adapter for all hosts
+                adapter = HTTPAdapter(
+                    pool_connections=_session_config["pool_connections"],
+                    pool_maxsize=_session_config["pool_maxsize"],
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+
+                # Dedicated adapters for hosts that need larger/smaller pools
+                for host, maxsize in _session_config["host_pool_maxsize"].items():
+                    host_adapter = HTTPAdapter(pool_connections=1, pool_maxsize=maxsize)
+                    session.mount(f"https://{host}", host_adapter)
+                    session.mount(f"http://{host}", host_adapter)
+
+                _session = session
+
+    return _session
+
+
+def http_request(method, url, **kwargs):
+    """
+    Send an HTTP request through the shared session.
+    If the persistent response cache is enabled (see configure_cache), successful
+    responses from the endpoints listed in HTTP_CACHE_TTL are served from disk.
+    If a cassette is active (see configure_cassette), responses are recorded to or replayed from it.
+    Latency, transferred bytes, status codes and cache hits are recorded per endpoint (see stats).
+    Time spent waiting for the host's rate limit is recorded separately from the latency.
+
+    Args:
+    - method    HTTP method, e.g. "GET" or "POST".
+    - url       URL to send the request to.
+    - kwargs    Additional arguments passed to requests.Session.request (params, json, headers, ...).
+
+    Returns the requests.Response object.
+    """
+    with track_io("http", _http_endpoint(url)) as call:
+        cassette = _cassette
+        if cassette is not None:
+            response = cassette.request(method, url, call=call, **kwargs)
+        else:
+            response = _cached_request(method, url, call=call, **kwargs)
+        _record_response(call, response)
+
+    return response
+
+
+def _cached_request(method, url, call=None, **kwargs):
+    cache = _get_cache()
+    if cache is None or kwargs.get("files") or kwargs.get("stream"):
+        return _send(method, url, call, **kwargs)
+
+    prefix = _cache_prefix(url)
+    if prefix is None:
+        return _send(method, url, call, **kwargs)
+
+    key = _cache_key(method, url, kwargs, prefix)
+    if key is None:
+        return _send(method, url, call, **kwargs)
+
+    response = cache.get(key)
+    if response is None:
+        response = _send(method, url, call, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response, HTTP_CACHE_TTL[prefix])
+
+    return response
+
+
+def _send(method, url, call=None, **kwargs):
+    # Wait for the host's rate limit before the request leaves the process
+    # (only requests that are actually sent wait, cache hits and replays do not)
+    wait = acquire_rate_limit(url)
+    if call is not None:
+        call["throttle"] += wait
+    return get_session().request(method, url, **kwargs)
+
+
+def session_request(session, method, url, **kwargs):
+    """
+    Send an HTTP request through a dedicated session (e.g. one mounting a custom retry policy)
+    while applying the host's rate limit and recording the request in the I/O statistics.
+    Responses are not cached.
+
+    Args:
+    - session   requests.Session to send the request with.
+    - method    HTTP method, e.g. "GET" or "POST".
+    - url       URL to send the request to.
+    - kwargs    Additional arguments passed to session.request (params, data, headers, ...).
+
+    Returns the requests.Response object.
+    """
+    with track_io("http", _http_endpoint(url)) as call:
+        call["throttle"] = acquire_rate_limit(url)
+        response = session.request(method, url, **kwargs)
+        _record_response(call, response)
+
+    return response
+
+
+# I/O instrumentation
+# Every HTTP request and external binary run is recorded per endpoint, so the time spent
+# waiting on servers and subprocesses can be inspected with stats() or written to disk
+# with dump_stats() (gget --stats-out).
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def track_io(kind, endpoint):
+    """
+    Context manager recording the duration of an I/O call in the per-endpoint statistics.
+
+    Args:
+    - kind        Type of the call, e.g. "http" or "subprocess".
+    - endpoint    Name the call is aggregated under, e.g. "rest.ensembl.org/lookup" or "diamond blastp".
+
+    Yields a dictionary in which the caller can set "status", "bytes_in", "bytes_out",
+    "retries", "cache_hit" and "throttle" for the call. Exceptions are counted as errors and re-raised.
+    "throttle" is the number of seconds spent waiting for a rate limit inside the block; it is
+    recorded as throttle time and excluded from the latency of the call.
+    """
+    call = {
+        "status": None,
+        "bytes_in": 0,
+        "bytes_out": 0,
+        "retries": 0,
+        "cache_hit": False,
+        "throttle": 0.0,
+    }
+    start = time.perf_counter()
+    error = False
+    try:
+        yield call
+    except BaseException:
+        error = True
+        raise
+    finally:
+        _record_call(kind, endpoint, time.perf_counter() - start, call, error)
+
+
+def _record_call(kind, endpoint, elapsed, call, error):
+    throttle = call["throttle"]
+    elapsed = max(elapsed - throttle, 0.0)
+    with _stats_lock:
+        entry = _stats.setdefault(kind, {}).get(endpoint)
+        if entry is None:
+            entry = {
+                "calls": 0,
+                "errors": 0,
+                "cache_hits": 0,
+                "retries": 0,
+                "bytes_in": 0,
+                "bytes_out": 0,
+                "total_time": 0.0,
+                "throttle_time": 0.0,
+                "min_time": None,
+                "max_time": 0.0,
+                "latency_histogram": [0] * (len(STATS_LATENCY_BUCKETS) + 1),
+                "status_codes": {},
+            }
+            _stats[kind][endpoint] = entry
+
+        entry["calls"] += 1
+        entry["errors"] += int(error)
+        entry["cache_hits"] += int(bool(call["cache_hit"]))
+        entry["retries"] += call["retries"]
+        entry["bytes_in"] += call["bytes_in"]
+        entry["bytes_out"] += call["bytes_out"]
+        entry["total_time"] += elapsed
+        entry["throttle_time"] += throttle
+        if entry["min_time"] is None or elapsed < entry["min_time"]:
+            entry["min_time"] = elapsed
+        entry["max_time"] = max(entry["max_time"], elapsed)
+
+        bucket = len(STATS_LATENCY_BUCKETS)
+        for i, bound in enumerate(STATS_LATENCY_BUCKETS):
+            if elapsed <= bound:
+                bucket = i
+                break
+        entry["latency_histogram"][bucket] += 1
+
+        if call["status"] is not None:
+            status = str(call["status"])
+            entry["status_codes"][status] = entry["status_codes"].get(status, 0) + 1
+
+
+def _http_endpoint(url):
+    """
+    Returns the host and first path segment of url, e.g. "rest.ensembl.org/lookup".
+    """
+    split = urlsplit(url)
+    segment = split.path.strip("/").split("/", 1)[0]
+    return f"{split.hostname}/{segment}" if segment else split.hostname
+
+
+def _record_response(call, response):
+    call["status"] = response.status_code
+    call["cache_hit"] = getattr(response, "from_cache", False)
+
+    if response.request is not None and response.request.body is not None:
+        body = response.request.body
+        call["bytes_out"] = len(body) if isinstance(body, (bytes, str)) else 0
+
+    # Do not consume streamed bodies, the caller reads them
+    if response._content_consumed:
+        call["bytes_in"] = len(response.content or b"")
+    else:
+        call["bytes_in"] = int(response.headers.get("Content-Length", 0) or 0)
+
+    retries = getattr(response.raw, "retries", None)
+    if retries is not None:
+        call["retries"] = len(retries.history)
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except (OSError, TypeError):
+        return 0
+
+
+@contextlib.contextmanager
+def track_subprocess(endpoint, inputs=(), outputs=()):
+    """
+    Context manager recording an external binary run in the per-endpoint statistics.
+
+    Args:
+    - endpoint    Name the run is aggregated under, e.g. "diamond blastp".
+    - inputs      Paths of the files read by the binary (counted as bytes out).
+    - outputs     Paths of the files written by the binary (counted as bytes in).
+
+    Yields the call dictionary of track_io; set call["status"] to the exit code of the process.
+    """
+    with track_io("subprocess", endpoint) as call:
+        call["bytes_out"] = sum(_file_size(path) for path in inputs)
+        try:
+            yield call
+        finally:
+            call["bytes_in"] = sum(_file_size(path) for path in outputs)
+
+
+def stats(reset=False):
+    """
+    Returns the I/O statistics recorded in this process.
+
+    Args:
+    - reset    True/False whether to clear the statistics after returning them. Default: False.
+
+    Returns a dictionary {kind: {endpoint: statistics}} where kind is "http" or "subprocess".
+    The statistics of each endpoint contain the number of calls, errors, cache hits and retries,
+    bytes in/out, status codes (HTTP status or process exit code), total/mean/min/max time in
+    seconds, and a latency histogram mapping the upper bound of each bucket in seconds to the
+    number of calls. Time spent waiting for rate limits is not part of these times and is
+    reported as throttle_time (total seconds).
+    """
+    with _stats_lock:
+        snapshot = copy.deepcopy(_stats)
+        if reset:
+            _stats.clear()
+
+    bounds = [f"<={bound:g}" for bound in STATS_LATENCY_BUCKETS]
+    bounds.append(f">{STATS_LATENCY_BUCKETS[-1]:g}")
+    for endpoints in snapshot.values():
+        for entry in endpoints.values():
+            entry["mean_time"] = entry["total_time"] / entry["calls"]
+            entry["latency_histogram"] = dict(zip(bounds, entry["latency_histogram"]))
+
+    return snapshot
+
+
+def reset_stats():
+    """
+    Clear the I/O statistics recorded in this process.
+    """
+    with _stats_lock:
+        _stats.clear()
+
+
+def dump_stats(path):
+    """
+    Write the I/O statistics recorded in this process to a JSON file.
+
+    Args:
+    - path    Path to the JSON file.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(stats(), f, ensure_ascii=False, indent=4)
+
+
+# Per-host rate limiting
+# One token bucket per host is shared by all modules and threads in the process,
+# so concurrent requests to the same server never exceed its allowed rate.
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+
+    Args:
+    - rate        Number of tokens (requests) added per second.
+    - capacity    Maximum number of tokens that can accumulate, i.e. the largest allowed burst
+                  (default: 1 -> requests are evenly spaced 1/rate seconds apart).
+    """
+
+    def __init__(self, rate, capacity=1):
+        if rate <= 0:
+            raise ValueError(f"Rate must be greater than 0, got {rate}.")
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """
+        Block until tokens are available. Returns the number of seconds spent waiting.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._last) * self.rate
+            )
+            self._last = now
+            # Reserve the tokens now (the balance may become negative),
+            # so that concurrent callers queue up behind each other
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+
+        if wait > 0:
+            time.sleep(wait)
+
+        return wait
+
+
+def set_rate_limit(host, rate, capacity=1):
+    """
+    Set the maximum number of requests per second sent to host by this process.
+
+    Args:
+    - host        Host name, e.g. "rest.ensembl.org".
+    - rate        Requests per second. None removes the rate limit for this host.
+    - capacity    Largest allowed burst of requests (default: 1).
+    """
+    with _rate_limiters_lock:
+        _rate_limiters[host] = None if rate is None else TokenBucket(rate, capacity)
+
+
+def set_ncbi_api_key_rate_limits(api_key=None):
+    """
+    Raise the NCBI rate limits to the rates allowed with an API key
+    if api_key is provided or the NCBI_API_KEY environment variable is set.
+    """
+    if api_key or os.getenv("NCBI_API_KEY"):
+        for host, rate in HTTP_RATE_LIMITS_NCBI_API_KEY.items():
+            set_rate_limit(host, rate)
+
+
+def get_rate_limiter(host):
+    """
+    Returns the TokenBucket shared by all requests to host (None if host is not rate limited).
+    """
+    if host not in _rate_limiters:
+        with _rate_limiters_lock:
+            if host not in _rate_limiters:
+                rate = HTTP_RATE_LIMITS.get(host)
+                if os.getenv("NCBI_API_KEY"):
+                    rate = HTTP_RATE_LIMITS_NCBI_API_KEY.get(host, rate)
+                _rate_limiters[host] = None if rate is None else TokenBucket(rate)
+
+    return _rate_limiters[host]
+
+
+def acquire_rate_limit(url):
+    """
+    Block until a request to the host of url is allowed by its rate limit.
+    Returns the number of seconds spent waiting.
+    """
+    limiter = get_rate_limiter(urlsplit(url).hostname)
+    if limiter is None:
+        return 0
+    return limiter.acquire()
+
+
+# Persistent HTTP response cache
+# Disabled by default. Enable with configure_cache() or by setting the environment variable GGET_CACHE=1.
+_cache = None
+_cache_config = {
+    "enabled": os.getenv("GGET_CACHE", "0").lower() in ("1", "true", "yes"),
+    "path": os.getenv(
+        "GGET_CACHE_DIR",
+        os.path.join(
+            os.getenv(
+                "XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")
+            ),
+            "gget",
+        ),
+    ),
+    "max_size": int(os.getenv("GGET_CACHE_MAX_SIZE", HTTP_CACHE_MAX_SIZE)),
+}
+
+
+class ResponseCache:
+    """
+    On-disk cache of HTTP responses backed by SQLite.
+    Entries are content-addressed (see _cache_key), expire after a per-endpoint time to live,
+    and the least recently used entries are evicted once the cache grows beyond max_size bytes.
+    """
+
+    def __init__(self, path, max_size=HTTP_CACHE_MAX_SIZE):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.db_path = os.path.join(path, "http_cache.sqlite")
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connect()
+
+    def _connect(self):
+        self._pid = os.getpid()
+        self._db = sqlite3.connect(self.db_path, timeout=60, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT,
+                status INTEGER,
+                headers TEXT,
+                content BLOB,
+                size INTEGER,
+                expires REAL,
+                last_access REAL
+            )
+            """)
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_last_access ON responses (last_access)"
+        )
+        self._db.commit()
+
+    def _conn(self):
+        # SQLite connections must not be shared with forked child processes
+        if os.getpid() != self._pid:
+            self._connect()
+        return self._db
+
+    def get(self, key):
+        """
+        Returns the cached requests.Response for key or None if it is missing or expired.
+        """
+        now = time.time()
+        with self._lock:
+            db = self._conn()
+            row = db.execute(
+                "SELECT url, status, headers, content, expires FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+
+            if row is None or row[4] < now:
+                self.misses += 1
+                return None
+
+            db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            db.commit()
+            self.hits += 1
+
+        url, status, headers, content, _ = row
+
+        response = _build_response(url, status, json.loads(headers), content)
+        response.from_cache = True
+
+        return response
+
+    def set(self, key, response, ttl):
+        """
+        Store response under key for ttl seconds and evict least recently used entries if needed.
+        """
+        headers = _stored_headers(response)
+        content = response.content
+        now = time.time()
+
+        with self._lock:
+            db = self._conn()
+            db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    response.url,
+                    response.status_code,
+                    json.dumps(headers),
+                    content,
+                    len(content),
+                    now + ttl,
+                    now,
+                ),
+            )
+            self._evict(db)
+            db.commit()
+
+    def _evict(self, db):
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_size:
+            return
+
+        # Drop expired entries first, then the least recently used ones
+        db.execute("DELETE FROM responses WHERE expires < ?", (time.time(),))
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+        to_delete = []
+        for key, size in db.execute(
+            "SELECT key, size FROM responses ORDER BY last_access"
+        ):
+            if total <= self.max_size:
+                break
+            to_delete.append((key,))
+            total -= size
+
+        db.executemany("DELETE FROM responses WHERE key = ?", to_delete)
+
+    def clear(self):
+        with self._lock:
+            db = self._conn()
+            db.execute("DELETE FROM responses")
+            db.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        with self._lock:
+            entries, size = (
+                self._conn()
+                .execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses")
+                .fetchone()
+            )
+
+        return {
+            "path": self.db_path,
+            "entries": entries,
+            "size": size,
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def configure_cache(enabled=True, path=None, max_size=None):
+    """
+    Enable or disable the persistent on-disk HTTP response cache.
+
+    Args:
+    - enabled     True/False whether to cache responses (default: True).
+    - path        Directory to store the cache in (default: $GGET_CACHE_DIR or ~/.cache/gget).
+    - max_size    Maximum cache size in bytes (default: 2 GB).
+                  The least recently used responses are evicted once this size is exceeded.
+    """
+    global _cache
+
+    with _session_lock:
+        _cache_config["enabled"] = enabled
+        if path is not None:
+            _cache_config["path"] = path
+        if max_size is not None:
+            _cache_config["max_size"] = int(max_size)
+        _cache = None
+
+
+def cache_info():
+    """
+    Returns a dictionary with the location, number of entries, size in bytes,
+    and hit/miss counters of the persistent HTTP response cache (None if disabled).
+    """
+    cache = _get_cache()
+    if cache is None:
+        return None
+    return cache.info()
+
+
+def clear_cache():
+    """
+    Delete all entries from the persistent HTTP response cache.
+    """
+    cache = _get_cache()
+    if cache is not None:
+        cache.clear()
+
+
+def cache_dir(*subdirs):
+    """
+    Returns the gget cache directory ($GGET_CACHE_DIR or ~/.cache/gget, see configure_cache),
+    or its subdirectory subdirs, created if it does not exist.
+    Raises an OSError if the directory cannot be created.
+    """
+    path = os.path.join(_cache_config["path"], *subdirs)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _get_cache():
+    global _cache
+
+    if not _cache_config["enabled"]:
+        return None
+
+    if _cache is None:
+        with _session_lock:
+            if _cache is None:
+                _cache = ResponseCache(
+                    _cache_config["path"], max_size=_cache_config["max_size"]
+                )
+
+    return _cache
+
+
+def _cache_prefix(url):
+    """
+    Returns the longest HTTP_CACHE_TTL prefix matching url or None if url should not be cached.
+    """
+    split = urlsplit(url)
+    target = split.netloc + split.path
+
+    matches = [prefix for prefix in HTTP_CACHE_TTL if target.startswith(prefix)]
+    if not matches:
+        return None
+
+    return max(matches, key=len)
+
+
+def _cache_key(method, url, kwargs, prefix):
+    """
+    Returns the content address of a request, scoped to the Ensembl release if required
+    by prefix, or None if the request cannot be cached.
+    """
+    scope = ""
+    if prefix in HTTP_CACHE_ENSEMBL_RELEASE_SCOPED:
+        # Responses are only valid for the Ensembl release they were fetched from.
+        # find_latest_ens_rel is memoized for MEMO_TTL seconds, so long-running processes
+        # (e.g. gget serve) pick up a new release without checking it on every request.
+        try:
+            scope = str(find_latest_ens_rel())
+        except Exception:
+            return None
+
+    return _request_key(method, url, kwargs, scope)
+
+
+def _request_key(method, url, kwargs, scope=""):
+    """
+    Returns the content address (SHA-256 of method, URL, body and content negotiation headers)
+    of a request.
+    """
+    prepared = requests.Request(
+        method.upper(),
+        url,
+        params=kwargs.get("params"),
+        data=kwargs.get("data"),
+        json=kwargs.get("json"),
+        headers=kwargs.get("headers"),
+    ).prepare()
+
+    body = prepared.body or b""
+    if isinstance(body, str):
+        body = body.encode()
+    if kwargs.get("files"):
+        # Multipart bodies contain a random boundary, so hash the form fields instead
+        body += repr(sorted(kwargs["files"].items())).encode()
+
+    h = hashlib.sha256()
+    for part in (
+        prepared.method,
+        prepared.url,
+        prepared.headers.get("Content-Type", ""),
+        prepared.headers.get("Accept", ""),
+        scope,
+    ):
+        h.update(part.encode())
+        h.update(b"\0")
+    h.update(body)
+
+    return h.hexdigest()
+
+
+def _build_response(url, status, headers, content):
+    response = requests.Response()
+    response.status_code = status
+    response.reason = requests.status_codes._codes.get(status, ("",))[0].upper()
+    response.url = url
+    response.headers = CaseInsensitiveDict(headers)
+    response._content = content
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+
+    return response
+
+
+def _stored_headers(response):
+    # Content is stored decoded, so drop headers that describe the transfer encoding
+    return {
+        k: v
+        for k, v in response.headers.items()
+        if k.lower() not in ("content-encoding", "content-length", "transfer-encoding")
+    }
+
+
+# Record/replay cassettes
+# In "record" mode every response returned by http_request is appended to a gzip-compressed
+# JSON lines file. In "replay" mode responses are served from that file without network access,
+# which makes tests and benchmarks of the parsing code deterministic and offline.
+_cassette = None
+
+
+class Cassette:
+    """
+    Gzip-compressed JSON lines file of recorded HTTP interactions.
+
+    Args:
+    - path    Path to the cassette file.
+    - mode    "record" to send requests and append their responses to the cassette,
+              "replay" to serve responses from the cassette without network access.
+    """
+
+    def __init__(self, path, mode="replay"):
+        if mode not in ("record", "replay"):
+            raise ValueError(
+                f"Cassette mode specified as '{mode}'. Expected one of: record, replay"
+            )
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        # Recorded responses per request key and the number of times each key was replayed
+        self._interactions = {}
+        self._replayed = {}
+
+        if mode == "replay":
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Cassette {path} does not exist.")
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self._interactions.setdefault(entry["key"], []).append(entry)
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def request(self, method, url, call=None, **kwargs):
+        key = _request_key(method, url, kwargs)
+
+        if self.mode == "replay":
+            with self._lock:
+                entries = self._interactions.get(key)
+                if not entries:
+                    raise RuntimeError(
+                        f"No response for {method.upper()} {url} was recorded in cassette {self.path}."
+                    )
+                # Identical requests are replayed in the order they were recorded,
+                # repeating the last response once all of them have been replayed
+                i = self._replayed.get(key, 0)
+                self._replayed[key] = i + 1
+                entry = entries[min(i, len(entries) - 1)]
+
+            return _build_response(
+                entry["url"],
+                entry["status"],
+                entry["headers"],
+                base64.b64decode(entry["content"]),
+            )
+
+        response = _cached_request(method, url, call=call, **kwargs)
+        entry = {
+            "key": key,
+            "method": method.upper(),
+            "url": response.url,
+            "status": response.status_code,
+            "headers": _stored_headers(response),
+            "content": base64.b64encode(response.content).decode(),
+        }
+        with self._lock:
+            # Appending adds a gzip member, and multi-member files read back as one stream
+            with gzip.open(self.path, "at", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+        return response
+
+
+def configure_cassette(path=None, mode="replay"):
+    """
+    Record HTTP responses to or replay them from a cassette file.
+
+    Args:
+    - path    Path to the gzip-compressed JSON lines cassette. None deactivates the cassette (default).
+    - mode    "record": send requests and append their responses to the cassette.
+              "replay": serve responses from the cassette without network access (default).
+                        Requests that were not recorded raise a RuntimeError.
+
+    The cassette can also be activated with the environment variables
+    GGET_CASSETTE (path) and GGET_CASSETTE_MODE ("record" or "replay").
+    """
+    global _cassette
+
+    _cassette = None if path is None else Cassette(path, mode=mode)
+
+
+if os.getenv("GGET_CASSETTE"):
+    configure_cassette(
+        os.getenv("GGET_CASSETTE"), mode=os.getenv("GGET_CASSETTE_MODE", "replay")
+    )
+
+
+def get_gget_function(name):
+    """
+    Returns the public gget function name (e.g. "info") for remote calls (gget serve and gget batch).
+    """
+    import gget
+
+    # Functions that run servers or job queues themselves cannot be called remotely
+    callable_functions = [f for f in gget.__all__ if f not in ("serve", "batch")]
+    if name not in callable_functions:
+        raise ValueError(
+            f"Function specified as '{name}'. Expected one of: {', '.join(callable_functions)}"
+        )
+
+    return getattr(gget, name)
+
+
+def json_compatible(value):
+    """
+    Convert the return value of a gget function (data frames, lists and dictionaries of them)
+    to a JSON serializable object.
+    """
+    if isinstance(value, pd.DataFrame):
+        return json.loads(value.to_json(orient="records", force_ascii=False))
+    if isinstance(value, (list, tuple)):
+        return [json_compatible(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): json_compatible(v) for k, v in value.items()}
+    return value
+
+
 def flatten(xss):
     """
     Function to flatten a list of lists.
@@ -67,7 +991,7 @@ def flatten(xss):
 
 
 def get_latest_cosmic():
-    html = requests.get(COSMIC_RELEASE_URL)
+    html = http_request("GET", COSMIC_RELEASE_URL)
     if html.status_code != 200:
         raise RuntimeError(
             f"The COSMIC server returned error status code {html.status_code}. Please try again."
@@ -102,45 +1026,45 @@ def check_file_for_error_message(filepath, filename, download_path):
         )
 
 
-def read_fasta(fasta):
+def iter_fasta(fasta):
     """
     Args:
     - fasta     (str) Path to fasta file.
 
-    Returns titles and seqs from fasta file as two list objects.
+    Yields (title, seq) tuples from the fasta file (optionally gzip/bgzip compressed) in a single
+    streaming pass, so only one record is held in memory at a time. Sequences spanning multiple
+    lines are joined.
     """
-    titles = []
-    seqs = []
-    title_last = False
-    new_seq = False
-    with open(fasta) as fasta_file:
-        for i, line in enumerate(fasta_file):
-            if i == 0 and line[0] != ">":
-                raise ValueError("Expected FASTA file to start with a '>' character. ")
-            elif line[0] == ">":
-                if title_last:
-                    raise ValueError(
-                        "FASTA file contains two lines starting with '>' in a row -> missing sequence line. "
-                    )
+    with open_fasta(fasta) as fasta_file:
+        if fasta_file.read(1) != b">":
+            raise ValueError("Expected FASTA file to start with a '>' character. ")
+
+    missing_seq = False
+    for pieces in FastaIO._iter_raw(fasta):
+        if missing_seq:
+            raise ValueError(
+                "FASTA file contains two lines starting with '>' in a row -> missing sequence line. "
+            )
+        # A header without line break is followed by the next header or the end of the file
+        missing_seq = not any(b"\n" in piece for piece in pieces)
 
-                if new_seq:
-                    # Append last recorded sequence
-                    seqs.append(new_seq)
+        title, seq = FastaIO._split_raw(pieces)
+        yield title.strip().replace(">", ""), seq
 
-                # Append title line to titles list
-                titles.append(line.strip().replace(">", ""))
-                title_last = True
 
-            else:
-                if title_last:
-                    # Start recording new sequence if title was last
-                    new_seq = line.strip()
-                else:
-                    new_seq = new_seq + line.strip()
-                title_last = False
+def read_fasta(fasta):
+    """
+    Args:
+    - fasta     (str) Path to fasta file.
 
-        # Append last sequence
-        seqs.append(new_seq)
+    Returns titles and seqs from fasta file as two list objects.
+    Use iter_fasta to read the records one at a time instead.
+    """
+    titles = []
+    seqs = []
+    for title, seq in iter_fasta(fasta):
+        titles.append(title)
+        seqs.append(seq)
 
     return titles, seqs
 
@@ -259,28 +1183,32 @@ def aa_colors(amino_acid):
     return f"\033[38;5;{textcolor}m\033[48;5;{bkg_color}m{amino_acid}\033[0;0m"
 
 
-def get_uniprot_seqs(server, ensembl_ids):
+async def fetch_uniprot_json(server, id_, verbose=True):
     """
-    Retrieve UniProt sequences based on Ensemsbl, WormBase or FlyBase identifiers.
+    Query UniProt for reviewed entries matching an Ensembl, WormBase or FlyBase ID
+    and fall back to unreviewed entries if no reviewed entries were found.
 
     Args:
     - server        Link to UniProt REST API server.
-    - ensembl_ids   One or more Ensembl, WormBase or FlyBase IDs (string or list of strings).
+    - id_           Ensembl, WormBase or FlyBase ID (str).
+    - verbose       True/False to print logging messages.
 
-    Returns data frame with UniProt ID, gene name, organism, sequence, sequence length, and query ID.
+    Returns the UniProt search results as JSON.
     """
+    # API documentation: https://www.uniprot.org/help/api_queries
+    # Submit server request for reviewed entries
+    r = await async_http_request("GET", server + id_ + "+AND+reviewed:true")
+    if not r.ok:
+        logger.error(
+            f"UniProt server request returned with error status code: {r.status_code}. Please double-check arguments or try again later."
+        )
+    # Convert to json
+    json = r.json()
 
-    # If a single UniProt ID is passed as string, convert to list
-    if type(ensembl_ids) == str:
-        ensembl_ids = [ensembl_ids]
-
-    # Initiate data frame so empty df will be returned if no matches are found
-    master_df = pd.DataFrame()
-
-    for id_ in ensembl_ids:
-        # API documentation: https://www.uniprot.org/help/api_queries
+    # If no reviewed entries were found, try again for unreviewed entries
+    if not len(json["results"]) > 0:
         # Submit server request
-        r = requests.get(server + id_ + "+AND+reviewed:true")
+        r = await async_http_request("GET", server + id_)
         if not r.ok:
             logger.error(
                 f"UniProt server request returned with error status code: {r.status_code}. Please double-check arguments or try again later."
@@ -288,23 +1216,38 @@ def get_uniprot_seqs(server, ensembl_ids):
         # Convert to json
         json = r.json()
 
-        # If no reviewed results were found, try again for unreviewed results
-        if not len(json["results"]) > 0:
-            # Submit server request
-            r = requests.get(server + id_)
-            if not r.ok:
-                logger.error(
-                    f"UniProt server request returned with error status code: {r.status_code}. Please double-check arguments or try again later."
-                )
-            # Convert to json
-            json = r.json()
-
-            # Warn user if unreviewed results were found
-            if len(json["results"]) > 0:
+        # Warn user if unreviewed results were found
+        if len(json["results"]) > 0:
+            if verbose is True:
                 logger.warning(
                     f"No reviewed UniProt results were found for ID {id_}. Returning all unreviewed results."
                 )
 
+    return json
+
+
+def get_uniprot_seqs(server, ensembl_ids):
+    """
+    Retrieve UniProt sequences based on Ensemsbl, WormBase or FlyBase identifiers.
+
+    Args:
+    - server        Link to UniProt REST API server.
+    - ensembl_ids   One or more Ensembl, WormBase or FlyBase IDs (string or list of strings).
+
+    Returns data frame with UniProt ID, gene name, organism, sequence, sequence length, and query ID.
+    """
+
+    # If a single UniProt ID is passed as string, convert to list
+    if type(ensembl_ids) == str:
+        ensembl_ids = [ensembl_ids]
+
+    # Initiate data frame so empty df will be returned if no matches are found
+    master_df = pd.DataFrame()
+
+    # Submit the requests for all IDs concurrently
+    all_json = run_async(fetch_uniprot_json(server, id_) for id_ in ensembl_ids)
+
+    for id_, json in zip(ensembl_ids, all_json):
         if len(json["results"]) > 0:
             # Convert results to data frame
             df = pd.json_normalize(json["results"])
@@ -358,36 +1301,24 @@ def get_uniprot_info(server, ensembl_id, verbose=True):
     - ensembl_id      Ensembl, WormBase or FlyBase ID (str).
     - verbose         True/False to print logging messages.
 
-    Returns data frame with UniProt ID, gene name, organism, sequence, sequence length, and query ID.
-    """
-    # API documentation: https://www.uniprot.org/help/api_queries
-    # Submit server request for reviewed entries
-    r = requests.get(server + ensembl_id + "+AND+reviewed:true")
-    if not r.ok:
-        logger.error(
-            f"UniProt server request returned with error status code: {r.status_code}. Please double-check arguments or try again later."
-        )
-    # Convert to json
-    json = r.json()
+    Returns data frame with UniProt ID, gene name, organism, sequence, sequence length, and query ID.
+    """
+    json = run_async([fetch_uniprot_json(server, ensembl_id, verbose=verbose)])[0]
 
-    # If no reviewed entries were found, try again for unreviewed entries
-    if not len(json["results"]) > 0:
-        # Submit server request
-        r = requests.get(server + ensembl_id)
-        if not r.ok:
-            logger.error(
-                f"UniProt server request returned with error status code: {r.status_code}. Please double-check arguments or try again later."
-            )
-        # Convert to json
-        json = r.json()
+    return uniprot_json_to_info(json, ensembl_id)
 
-        # Warn user if unreviewed results were found
-        if len(json["results"]) > 0:
-            if verbose is True:
-                logger.warning(
-                    f"No reviewed UniProt results were found for ID {ensembl_id}. Returning all unreviewed results."
-                )
 
+def uniprot_json_to_info(json, ensembl_id):
+    """
+    Build the gget info UniProt data frame from the JSON returned by fetch_uniprot_json.
+
+    Args:
+    - json            UniProt REST API search results (dict).
+    - ensembl_id      Ensembl, WormBase or FlyBase ID (str) that was queried.
+
+    Returns data frame with UniProt ID, gene name, synonyms, protein names, description,
+    subcellular localisation and query ID (None if no results were found).
+    """
     if len(json["results"]) > 0:
         # Convert results to data frame
         df = pd.json_normalize(json["results"])
@@ -620,7 +1551,14 @@ def get_pdb_ids(ens_id):
     https://www.ebi.ac.uk/pdbe/aggregated-api/#/SIFTS/get_ensembl_to_pdb_mappings_api_mappings_ensembl_to_pdb__gene_id__get
     """
 
-    res = requests.get(ENS_TO_PDB_API + ens_id)
+    return run_async([async_get_pdb_ids(ens_id)])[0]
+
+
+async def async_get_pdb_ids(ens_id):
+    """
+    Awaitable counterpart to get_pdb_ids.
+    """
+    res = await async_http_request("GET", ENS_TO_PDB_API + ens_id)
 
     if not res.ok:
         # If no PDB IDs were found, return None
@@ -647,6 +1585,9 @@ def wrap_cols_func(df, cols):
     for col in cols:
         df.loc[:, col] = df[col].str.wrap(30)
 
+    # IPython is only needed for notebook display and slow to import
+    from IPython.display import display, HTML
+
     return display(HTML(df.to_html().replace("\\n", "<br>")))
 
 
@@ -662,8 +1603,12 @@ def rest_query(server, query, content_type):
     Returns server output.
     """
 
-    r = requests.get(server + query, headers={"Content-Type": content_type})
+    r = http_request("GET", server + query, headers={"Content-Type": content_type})
+
+    return _rest_output(server, r, content_type)
+
 
+def _rest_output(server, r, content_type):
     if not r.ok:
         raise RuntimeError(
             f"{server} returned error status code {r.status_code}. "
@@ -687,17 +1632,14 @@ def post_query(server, endpoint, query):
     :return: server output
     """
 
-    r = requests.post(
-        server + endpoint, json=query, headers={"Content-Type": "application/json"}
+    r = http_request(
+        "POST",
+        server + endpoint,
+        json=query,
+        headers={"Content-Type": "application/json"},
     )
 
-    if not r.ok:
-        raise RuntimeError(
-            f"{server} returned error status code {r.status_code}. "
-            "Please double-check arguments and try again.\n"
-        )
-
-    return r.json()
+    return _rest_output(server, r, "application/json")
 
 
 def graphql_query(server, query, variables):
@@ -712,8 +1654,12 @@ def graphql_query(server, query, variables):
     Returns server output.
     """
 
-    r = requests.post(server, json={"query": query, "variables": variables})
+    r = http_request("POST", server, json={"query": query, "variables": variables})
+
+    return _graphql_output(server, r, query, variables)
 
+
+def _graphql_output(server, r, query, variables):
     if not r.ok:
         logger.debug(
             f"Server: {server}, Query: {query}, Variables: {variables}, Response: {r.text}"
@@ -726,6 +1672,197 @@ def graphql_query(server, query, variables):
     return r.json()
 
 
+# Asynchronous request engine
+# Blocking requests run in a thread pool through the shared session (and cache),
+# while per-host semaphores bound the number of requests in flight to each server.
+_async_executor = None
+_async_semaphores = weakref.WeakKeyDictionary()
+
+
+def _async_host_semaphore(host):
+    """
+    Returns the semaphore limiting concurrent requests to host in the running event loop.
+    The limit equals the size of the host's keep-alive connection pool.
+    """
+    loop = asyncio.get_running_loop()
+    semaphores = _async_semaphores.setdefault(loop, {})
+
+    if host not in semaphores:
+        limit = _session_config["host_pool_maxsize"].get(
+            host, _session_config["pool_maxsize"]
+        )
+        semaphores[host] = asyncio.Semaphore(limit)
+
+    return semaphores[host]
+
+
+async def async_http_request(method, url, **kwargs):
+    """
+    Awaitable counterpart to http_request.
+
+    Args:
+    - method    HTTP method, e.g. "GET" or "POST".
+    - url       URL to send the request to.
+    - kwargs    Additional arguments passed to requests.Session.request (params, json, headers, ...).
+
+    Returns the requests.Response object.
+    """
+    global _async_executor
+
+    if _async_executor is None:
+        with _session_lock:
+            if _async_executor is None:
+                _async_executor = ThreadPoolExecutor(
+                    max_workers=HTTP_ASYNC_MAX_WORKERS, thread_name_prefix="gget_http"
+                )
+
+    loop = asyncio.get_running_loop()
+    async with _async_host_semaphore(urlsplit(url).hostname):
+        return await loop.run_in_executor(
+            _async_executor, functools.partial(http_request, method, url, **kwargs)
+        )
+
+
+async def async_rest_query(server, query, content_type):
+    """
+    Awaitable counterpart to rest_query.
+    """
+    r = await async_http_request(
+        "GET", server + query, headers={"Content-Type": content_type}
+    )
+
+    return _rest_output(server, r, content_type)
+
+
+async def async_post_query(server, endpoint, query):
+    """
+    Awaitable counterpart to post_query.
+    """
+    r = await async_http_request(
+        "POST",
+        server + endpoint,
+        json=query,
+        headers={"Content-Type": "application/json"},
+    )
+
+    return _rest_output(server, r, "application/json")
+
+
+async def async_graphql_query(server, query, variables):
+    """
+    Awaitable counterpart to graphql_query.
+    """
+    r = await async_http_request(
+        "POST", server, json={"query": query, "variables": variables}
+    )
+
+    return _graphql_output(server, r, query, variables)
+
+
+def run_async(coroutines, return_exceptions=False):
+    """
+    Run coroutines (e.g. async_rest_query calls) concurrently and return their results in input order.
+    Also works when an event loop is already running (e.g. in Jupyter notebooks).
+
+    Args:
+    - coroutines          List of coroutine objects.
+    - return_exceptions   If True, exceptions are returned in place of the failed results
+                          instead of being raised (default: False).
+
+    Returns list of results.
+    """
+    coroutines = list(coroutines)
+    if not coroutines:
+        return []
+
+    async def gather():
+        return await asyncio.gather(*coroutines, return_exceptions=return_exceptions)
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(gather())
+
+    # An event loop is already running in this thread, so run the batch in a separate one
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, gather()).result()
+
+
+def combine_dtypes(dtype1, dtype2):
+    """
+    Returns the dtype pandas infers for a column read in one go from the dtypes
+    it inferred for two parts of the column.
+    """
+    if dtype1 == dtype2:
+        return dtype1
+    numeric = [
+        pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+        for dtype in (dtype1, dtype2)
+    ]
+    if all(numeric):
+        return np.dtype("float64")
+    # Columns with any text are read as text
+    for dtype in (dtype1, dtype2):
+        if dtype == object or isinstance(dtype, pd.StringDtype):
+            return dtype
+    return np.dtype(object)
+
+
+def infer_csv_dtypes(path, sep=",", chunk_size=100000):
+    """
+    Returns the dtype of each column of a csv/tsv file as pandas infers it when reading the whole
+    file in one go, reading only chunk_size rows at a time.
+    Reading the file in chunks with dtype=infer_csv_dtypes(...) gives all chunks the same dtypes
+    (pandas otherwise infers the dtypes of each chunk separately).
+
+    Args:
+    - path          Path to the csv/tsv file.
+    - sep           Field separator. Default: ","
+    - chunk_size    Number of rows read at a time. Default: 100000
+
+    Returns a dictionary {column: dtype}.
+    """
+    dtypes = {}
+    for chunk in pd.read_csv(path, sep=sep, chunksize=chunk_size):
+        for col, dtype in chunk.dtypes.items():
+            dtypes[col] = combine_dtypes(dtypes[col], dtype) if col in dtypes else dtype
+    return dtypes
+
+
+def memoize(ttl=MEMO_TTL):
+    """
+    Decorator keeping the results of a function in memory for ttl seconds per set of arguments.
+    Results are returned as copies, so callers can modify them without affecting the memo.
+    Use <function>.cache_clear() to drop the memorized results.
+
+    Keeps lookups that rarely change (e.g. the latest Ensembl release) resident in
+    long-running processes such as gget serve.
+    """
+
+    def decorator(func):
+        memo = {}
+        lock = threading.Lock()
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            with lock:
+                hit = memo.get(key)
+            if hit is not None and time.monotonic() - hit[0] < ttl:
+                return copy.deepcopy(hit[1])
+
+            value = func(*args, **kwargs)
+            with lock:
+                memo[key] = (time.monotonic(), value)
+            return copy.deepcopy(value)
+
+        wrapper.cache_clear = memo.clear
+        return wrapper
+
+    return decorator
+
+
+@memoize()
 def find_latest_ens_rel(database=ENSEMBL_FTP_URL):
     """
     Returns the latest Ensembl release number.
@@ -752,7 +1889,7 @@ def find_latest_ens_rel(database=ENSEMBL_FTP_URL):
     # # Find highest release number (= latest release)
     # ENS_rel = np.array(rels).astype(int).max()
 
-    html = requests.get(database + "VERSION")
+    html = http_request("GET", database + "VERSION")
     if html.status_code != 200:
         raise RuntimeError(
             f"The Ensembl FTP server returned error status code {html.status_code}. Please try again."
@@ -762,6 +1899,7 @@ def find_latest_ens_rel(database=ENSEMBL_FTP_URL):
     return ENS_rel
 
 
+@memoize()
 def search_species_options(database=ENSEMBL_FTP_URL, release=None):
     """
     Function to find all available species core databases for gget search.
@@ -790,7 +1928,7 @@ def search_species_options(database=ENSEMBL_FTP_URL, release=None):
         kds = ["plants", "protists", "metazoa", "fungi"]
         for kingdom in kds:
             url = database + f"release-{ENS_rel}/{kingdom}/mysql/"
-            html = requests.get(url)
+            html = http_request("GET", url)
 
             # Raise error if status code not "OK" Response
             if html.status_code != 200:
@@ -807,7 +1945,7 @@ def search_species_options(database=ENSEMBL_FTP_URL, release=None):
 
     else:
         url = database + f"release-{ENS_rel}/mysql/"
-        html = requests.get(url)
+        html = http_request("GET", url)
 
         # Raise error if status code not "OK" Response
         if html.status_code != 200:
@@ -830,7 +1968,7 @@ def find_nv_kingdom(species, release):
     kds = ["plants", "protists", "metazoa", "fungi"]
     for kingdom in kds:
         url = ENSEMBL_FTP_URL_NV + f"release-{release}/{kingdom}/fasta/"
-        html = requests.get(url)
+        html = http_request("GET", url)
 
         # Raise error if status code not "OK" Response
         if html.status_code != 200:
@@ -850,6 +1988,7 @@ def find_nv_kingdom(species, release):
             return kingdom
 
 
+@memoize()
 def ref_species_options(which, database=ENSEMBL_FTP_URL, release=None):
     """
     Function to find all available species for gget ref.
@@ -884,7 +2023,7 @@ def ref_species_options(which, database=ENSEMBL_FTP_URL, release=None):
                 url = database + f"release-{ENS_rel}/{kingdom}/gtf/"
             elif which in ("dna", "cdna"):
                 url = database + f"release-{ENS_rel}/{kingdom}/fasta/"
-            html = requests.get(url)
+            html = http_request("GET", url)
 
             # Raise error if status code not "OK" Response
             if html.status_code != 200:
@@ -909,7 +2048,7 @@ def ref_species_options(which, database=ENSEMBL_FTP_URL, release=None):
             url = database + f"release-{ENS_rel}/gtf/"
         elif which in ("dna", "cdna"):
             url = database + f"release-{ENS_rel}/fasta/"
-        html = requests.get(url)
+        html = http_request("GET", url)
 
         # Raise error if status code not "OK" Response
         if html.status_code != 200:
@@ -1098,6 +2237,121 @@ def json_list_to_df(json_list, columns) -> pd.DataFrame:
 # functionality specifically for FASTA files, maintaining compatibility with
 # the original BioPython API while removing the external dependency.
 
+class BgzfWriter:
+    """
+    Binary file writer producing BGZF (blocked gzip) output, as written by bgzip.
+
+    The data is split into blocks of BGZF_BLOCK_SIZE bytes that are compressed independently
+    on a pool of threads (zlib releases the GIL while compressing), so compression runs on
+    several cores. The output is a regular gzip file that samtools faidx can index for random access.
+
+    Args:
+    - filename  Path to the output file.
+    - threads   Number of compression threads. Default: None -> number of CPUs.
+    - level     zlib compression level. Default: 6
+    """
+
+    # Empty block marking the end of a BGZF file
+    EOF_BLOCK = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+
+    def __init__(self, filename, threads=None, level=BGZF_COMPRESSION_LEVEL):
+        self.threads = threads or os.cpu_count() or 1
+        self.level = level
+        self._handle = open(filename, "wb")
+        self._executor = (
+            ThreadPoolExecutor(self.threads, thread_name_prefix="gget_bgzf")
+            if self.threads > 1
+            else None
+        )
+        self._buffer = bytearray()
+        # Compress a few blocks per thread at a time
+        self._batch_size = BGZF_BLOCK_SIZE * self.threads * 4
+
+    def _compress_block(self, data):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, -15)
+        cdata = compressor.compress(data) + compressor.flush()
+        # gzip header with the BC extra field holding the total block size - 1
+        header = struct.pack(
+            "<BBBBIBBHBBHH", 31, 139, 8, 4, 0, 0, 255, 6, 66, 67, 2, len(cdata) + 25
+        )
+        return header + cdata + struct.pack("<II", zlib.crc32(data), len(data))
+
+    def _flush(self, final=False):
+        end = len(self._buffer)
+        if not final:
+            end -= end % BGZF_BLOCK_SIZE
+        blocks = [
+            bytes(self._buffer[i : min(i + BGZF_BLOCK_SIZE, end)])
+            for i in range(0, end, BGZF_BLOCK_SIZE)
+        ]
+        del self._buffer[:end]
+
+        if self._executor is not None and len(blocks) > 1:
+            compressed = self._executor.map(self._compress_block, blocks)
+        else:
+            compressed = map(self._compress_block, blocks)
+        self._handle.write(b"".join(compressed))
+
+    def write(self, data):
+        self._buffer += data
+        if len(self._buffer) >= self._batch_size:
+            self._flush()
+        return len(data)
+
+    def close(self):
+        if self._handle.closed:
+            return
+        try:
+            self._flush(final=True)
+            self._handle.write(self.EOF_BLOCK)
+        finally:
+            self._handle.close()
+            if self._executor is not None:
+                self._executor.shutdown()
+
+    @property
+    def closed(self):
+        return self._handle.closed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def is_gzipped(filename):
+    """Returns True if the file starts with the gzip magic bytes (this includes bgzip files)."""
+    with open(filename, "rb") as f:
+        return f.read(2) == b"\x1f\x8b"
+
+
+def open_fasta(filename, mode="rb", threads=None):
+    """
+    Open a (compressed) FASTA file in binary mode.
+
+    Args:
+    - filename  Path to the FASTA file.
+    - mode      "rb" to read or "wb" to write. Default: "rb"
+                Gzip and bgzip files are detected and decompressed when reading. Files written to
+                paths ending in ".gz" or ".bgz" are bgzip compressed (see BgzfWriter).
+    - threads   Number of compression threads when writing a compressed file. Default: None -> number of CPUs.
+
+    Returns a binary file object.
+    """
+    if mode not in ("rb", "wb"):
+        raise ValueError(f"Unsupported mode: {mode}. Expected 'rb' or 'wb'.")
+
+    if mode == "rb":
+        if is_gzipped(filename):
+            return gzip.open(filename, "rb")
+        return open(filename, "rb")
+
+    if filename.endswith((".gz", ".bgz")):
+        return BgzfWriter(filename, threads=threads)
+    return open(filename, "wb", buffering=FASTA_IO_BUFFER_SIZE)
+
+
 class FastaRecord:
     """Simple FASTA record class compatible with BioPython SeqIO.SeqRecord"""
     def __init__(self, seq, id, description=""):
@@ -1108,62 +2362,845 @@ class FastaRecord:
 
 class FastaIO:
     """Simple FASTA parser and writer, compatible with BioPython SeqIO interface"""
-    
+
+    # Whitespace removed from sequence lines
+    _SEQ_WHITESPACE = b" \t\r\n\v\f"
+    _SEQ_WHITESPACE_OTHER = (b" ", b"\t", b"\r", b"\v", b"\f")
+
     @staticmethod
-    def parse(filename, format=None):
-        """Parse FASTA file and yield records. Compatible with SeqIO.parse()"""
+    def parse(filename, format=None, buffer_size=FASTA_IO_BUFFER_SIZE):
+        """
+        Parse FASTA file and yield records. Compatible with SeqIO.parse()
+
+        The file is read in binary blocks of buffer_size bytes and split at record boundaries,
+        so the per-line work of a text parser is only done once per record.
+        Gzip and bgzip compressed files are decompressed while reading.
+        """
         if format and format.lower() != "fasta":
             raise ValueError(f"Unsupported format: {format}")
-        
-        with open(filename, 'r', encoding='utf-8') as handle:
-            current_id = None
-            current_description = ""
-            current_seq = []
-            
-            for line in handle:
-                line = line.strip()
-                if not line:
-                    continue
-                    
-                if line.startswith('>'):
-                    # Yield previous record if exists
-                    if current_id is not None:
-                        seq_str = ''.join(current_seq)
-                        yield FastaRecord(seq_str, current_id, current_description)
-                    
-                    # Start new record
-                    header = line[1:]  # Remove '>'
-                    if ' ' in header:
-                        current_id = header.split(' ', 1)[0]
-                        current_description = header.split(' ', 1)[1]
-                    else:
-                        current_id = header
-                        current_description = ""
-                    current_seq = []
-                else:
-                    # Accumulate sequence
-                    current_seq.append(line)
-            
+
+        for pieces in FastaIO._iter_raw(filename, buffer_size):
+            yield FastaIO._make_record(pieces)
+
+    @staticmethod
+    def _iter_raw(filename, buffer_size=FASTA_IO_BUFFER_SIZE):
+        """
+        Yield the bytes of each record in a FASTA file (header and sequence lines,
+        without the leading '>') as a list of chunks. Text before the first header is ignored.
+        """
+        with open_fasta(filename) as handle:
+            # Chunks of the current record (header and sequence, without the leading '>')
+            pieces = []
+            in_record = False
+            at_line_start = True
+
+            for block in iter(functools.partial(handle.read, buffer_size), b""):
+                pos = 0
+                if at_line_start and block[:1] == b">":
+                    if in_record:
+                        yield pieces
+                    pieces = []
+                    in_record = True
+                    pos = 1
+
+                search = pos
+                while True:
+                    # Searching a single byte (memchr) is much faster than searching b"\n>"
+                    boundary = block.find(b">", search) - 1
+                    if boundary == -2:
+                        break
+                    search = boundary + 2
+                    if boundary < 0 or block[boundary] != 10:
+                        # '>' inside a line (boundaries at the block start are handled above)
+                        continue
+                    if in_record:
+                        pieces.append(block[pos:boundary])
+                        yield pieces
+                    # Text before the first header is ignored
+                    pieces = []
+                    in_record = True
+                    pos = boundary + 2
+
+                if in_record:
+                    pieces.append(block[pos:])
+                at_line_start = block[-1:] == b"\n"
+
             # Yield final record if exists
-            if current_id is not None:
-                seq_str = ''.join(current_seq)
-                yield FastaRecord(seq_str, current_id, current_description)
-    
+            if in_record:
+                yield pieces
+
+    @staticmethod
+    def _split_raw(pieces):
+        """
+        Returns the header line (str, without line break) and the sequence (str, whitespace removed)
+        of a record from its chunks. The chunks are released while the sequence is built,
+        so a large record is held in memory at most twice.
+        """
+        header_end = pieces[0].find(b"\n")
+        if header_end == -1 and len(pieces) > 1:
+            # Header line longer than a block
+            pieces[:] = [b"".join(pieces)]
+            header_end = pieces[0].find(b"\n")
+        if header_end == -1:
+            header_end = len(pieces[0])
+        header = pieces[0][:header_end].decode("utf-8")
+        pieces[0] = pieces[0][header_end + 1 :]
+
+        for i, piece in enumerate(pieces):
+            piece = piece.replace(b"\n", b"")
+            # Removing newlines is much faster than a full translate, which is only needed for other whitespace
+            if any(c in piece for c in FastaIO._SEQ_WHITESPACE_OTHER):
+                piece = piece.translate(None, FastaIO._SEQ_WHITESPACE)
+            pieces[i] = piece
+
+        seq = b"".join(pieces)
+        pieces.clear()
+
+        return header, seq.decode("utf-8")
+
+    @staticmethod
+    def _make_record(pieces):
+        header, seq = FastaIO._split_raw(pieces)
+        header = header.strip()
+
+        if " " in header:
+            id_, description = header.split(" ", 1)
+        else:
+            id_, description = header, ""
+
+        return FastaRecord(seq, id_, description)
+
+    @staticmethod
+    def to_bytes(record, line_length=70):
+        """Returns the UTF-8 encoded FASTA text of a record (sequence wrapped at line_length characters)."""
+        if hasattr(record, "description") and record.description:
+            header = f">{record.id} {record.description}\n".encode("utf-8")
+        else:
+            header = f">{record.id}\n".encode("utf-8")
+
+        seq = str(record.seq).encode("utf-8")
+        n_lines, rest = divmod(len(seq), line_length)
+
+        # Wrap full lines at once: view them as rows of a matrix and append a newline column
+        lines = np.empty((n_lines, line_length + 1), dtype=np.uint8)
+        lines[:, :line_length] = np.frombuffer(
+            seq, dtype=np.uint8, count=n_lines * line_length
+        ).reshape(n_lines, line_length)
+        lines[:, line_length] = ord("\n")
+
+        if rest:
+            return b"".join((header, lines.tobytes(), seq[-rest:], b"\n"))
+        return header + lines.tobytes()
+
+    @staticmethod
+    def format(record, line_length=70):
+        """Returns the FASTA formatted text of a record (sequence wrapped at line_length characters)."""
+        return FastaIO.to_bytes(record, line_length).decode("utf-8")
+
     @staticmethod
-    def write(records, filename, format=None):
-        """Write records to FASTA file. Compatible with SeqIO.write()"""
+    def write(records, filename, format=None, buffer_size=FASTA_IO_BUFFER_SIZE, threads=None):
+        """
+        Write records to FASTA file. Compatible with SeqIO.write()
+
+        Formatted records are collected and written in blocks of about buffer_size bytes.
+        Files ending in ".gz" or ".bgz" are bgzip compressed using threads threads (default: number of CPUs).
+        Returns the number of records written.
+        """
         if format and format.lower() != "fasta":
             raise ValueError(f"Unsupported format: {format}")
-        
-        with open(filename, 'w', encoding='utf-8') as handle:
+
+        count = 0
+        with open_fasta(filename, "wb", threads=threads) as handle:
+            buffer = []
+            buffered = 0
             for record in records:
-                # Write header
-                if hasattr(record, 'description') and record.description:
-                    handle.write(f">{record.id} {record.description}\n")
-                else:
-                    handle.write(f">{record.id}\n")
-                
-                # Write sequence (wrap at 70 characters)
-                seq_str = str(record.seq)
-                for i in range(0, len(seq_str), 70):
-                    handle.write(seq_str[i:i+70] + '\n')
+                text = FastaIO.to_bytes(record)
+                buffer.append(text)
+                buffered += len(text)
+                count += 1
+                if buffered >= buffer_size:
+                    handle.write(b"".join(buffer))
+                    buffer = []
+                    buffered = 0
+            if buffer:
+                handle.write(b"".join(buffer))
+
+        return count
+
+
+# Bases gathered at a time by fetch_many (which holds about 40 bytes of indices per base)
+_FETCH_BATCH_SIZE = 2**20
+
+
+def _region_batches(starts, ends, length):
+    """
+    Clips the regions starts[i] to ends[i] (0-based, end exclusive) to a sequence of the given length
+    and yields them in batches of about _FETCH_BATCH_SIZE bases as (starts, ends, bounds, offsets, positions)
+    of the regions of the batch: positions[bounds[j]:bounds[j + 1]] are the positions of the bases
+    of region j, and offsets the index of each base in its region.
+    """
+    starts = np.clip(np.asarray(starts, dtype=np.int64), 0, length)
+    ends = np.clip(np.asarray(ends, dtype=np.int64), 0, length)
+    lengths = np.maximum(ends - starts, 0)
+    bounds = np.concatenate(([0], np.cumsum(lengths)))
+
+    first = 0
+    while first < len(lengths):
+        last = int(np.searchsorted(bounds, bounds[first] + _FETCH_BATCH_SIZE, side="right")) - 1
+        last = min(max(last, first + 1), len(lengths))
+        batch_starts, batch_lengths = starts[first:last], lengths[first:last]
+        batch_bounds = bounds[first : last + 1] - bounds[first]
+
+        offsets = np.arange(batch_bounds[-1], dtype=np.int64) - np.repeat(
+            batch_bounds[:-1], batch_lengths
+        )
+        positions = np.repeat(batch_starts, batch_lengths) + offsets
+        yield batch_starts, batch_starts + batch_lengths, batch_bounds, offsets, positions
+        first = last
+
+
+def _split_batch(text, bounds):
+    return [text[a:b] for a, b in zip(bounds[:-1].tolist(), bounds[1:].tolist())]
+
+
+class IndexedSequence:
+    """
+    Sequence of an IndexedFasta or PackedSequences record. Behaves like a read-only string:
+    len() and slicing only read (or unpack) the requested bases.
+    """
+
+    def __init__(self, fasta, key):
+        self._fasta = fasta
+        self.key = key
+
+    def __len__(self):
+        return self._fasta.length(self.key)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(len(self))
+            if step == 1:
+                return self._fasta.fetch(self.key, start, stop)
+            return self._fasta.fetch(self.key)[item]
+
+        index = int(item)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("sequence index out of range")
+        return self._fasta.fetch(self.key, index, index + 1)
+
+    def __str__(self):
+        return self._fasta.fetch(self.key)
+
+    def __repr__(self):
+        return f"IndexedSequence({self.key!r}, length={len(self)})"
+
+
+class IndexedFasta(collections.abc.Mapping):
+    """
+    Random access to the sequences of a FASTA file through a samtools-compatible .fai index.
+
+    The file is memory-mapped, so fetching a region only reads the requested bases instead of
+    loading whole records. Looking up a key returns an IndexedSequence, which can be sliced like
+    the sequence string.
+
+    Args:
+    - filename      Path to an uncompressed FASTA file.
+    - fai           Path to the .fai index. It is read if it exists and is newer than the FASTA file,
+                    otherwise the index is built in one pass over the file.
+                    Default: None -> filename + ".fai"
+    - save_index    True/False whether to save a newly built index to fai. Default: True
+    - key           Function returning the key a record is looked up by from its name (the first word of
+                    the header), e.g. lambda name: name.split(".")[0]. Default: None (the name).
+    - keep          "first" or "last": which of several records with the same key is looked up by the key
+                    (the number of records not kept is stored in the attribute duplicates).
+                    Default: "first" (as samtools faidx does).
+
+    Raises a ValueError if the file is compressed or cannot be indexed because the lines of
+    a record have different lengths (as samtools faidx does).
+    """
+
+    def __init__(self, filename, fai=None, save_index=True, key=None, keep="first"):
+        if keep not in ("first", "last"):
+            raise ValueError(f"keep must be 'first' or 'last', not {keep!r}.")
+        self.filename = filename
+        self.fai = fai or f"{filename}.fai"
+
+        if is_gzipped(filename):
+            raise ValueError(
+                f"{filename} is compressed and cannot be memory-mapped. Use iter_fasta to read it."
+            )
+
+        with open(filename, "rb") as f:
+            # Empty files cannot be memory-mapped
+            self._mm = (
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                if os.path.getsize(filename)
+                else b""
+            )
+
+        try:
+            if os.path.exists(self.fai) and os.path.getmtime(
+                self.fai
+            ) >= os.path.getmtime(filename):
+                records = self._read_index(self.fai)
+            else:
+                records = self._build_index(self._mm)
+                if save_index:
+                    try:
+                        self._write_index(records, self.fai)
+                    except OSError as e:
+                        logger.debug(f"Could not save FASTA index {self.fai}: {e}")
+        except Exception:
+            self.close()
+            raise
+
+        # key -> (name, length, offset, linebases, linewidth)
+        self._index = {}
+        # Entries of the records not kept because of duplicate keys
+        self._dropped = []
+        for record in records:
+            record_key = key(record[0]) if key else record[0]
+            if record_key in self._index:
+                if keep == "first":
+                    self._dropped.append(record)
+                    continue
+                self._dropped.append(self._index[record_key])
+            # A replaced key keeps its position, as in a dictionary filled with the records
+            self._index[record_key] = record
+        self.duplicates = len(self._dropped)
+
+    @staticmethod
+    def _read_index(fai):
+        records = []
+        with open(fai, "r", encoding="utf-8") as f:
+            for line in f:
+                fields = line.rstrip("\r\n").split("\t")
+                if len(fields) < 5:
+                    continue
+                records.append((fields[0],) + tuple(int(x) for x in fields[1:5]))
+        return records
+
+    @staticmethod
+    def _write_index(records, fai):
+        with open(fai, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write("\t".join(str(x) for x in record) + "\n")
+
+    @staticmethod
+    def _build_index(mm):
+        """
+        Returns the .fai entries (name, length, offset, linebases, linewidth) of all records.
+        """
+        size = len(mm)
+        if size and mm[:1] != b">":
+            raise ValueError("Expected FASTA file to start with a '>' character. ")
+
+        records = []
+        start = 0
+        while start < size:
+            next_start = mm.find(b"\n>", start)
+            end = size if next_start == -1 else next_start + 1
+
+            header_end = mm.find(b"\n", start, end)
+            if header_end == -1:
+                header_end = end
+            words = mm[start + 1 : header_end].split(None, 1)
+            name = words[0].decode("utf-8") if words else ""
+
+            records.append((name,) + IndexedFasta._index_record(mm, header_end + 1, end))
+            start = end
+
+        return records
+
+    @staticmethod
+    def _index_record(mm, seq_start, end):
+        """
+        Returns (length, offset, linebases, linewidth) of the sequence lines in mm[seq_start:end].
+        """
+        # Line breaks and blank lines at the end of the record
+        seq_end = end
+        while seq_end > seq_start and mm[seq_end - 1] in (10, 13):
+            seq_end -= 1
+        n = seq_end - seq_start
+        if n <= 0:
+            return 0, min(seq_start, len(mm)), 0, 0
+
+        first_eol = mm.find(b"\n", seq_start, seq_end)
+        if first_eol == -1:
+            # Single line sequence
+            return n, seq_start, n, n + (2 if mm[seq_end : seq_end + 1] == b"\r" else 1)
+
+        linewidth = first_eol - seq_start + 1
+        linebases = linewidth - (2 if mm[first_eol - 1] == 13 else 1)
+        full_lines, last_line = divmod(n, linewidth)
+
+        # All lines but the last one must have the same length
+        lines = np.frombuffer(mm, dtype=np.uint8, count=n, offset=seq_start)
+        valid = (
+            0 < last_line <= linebases
+            and np.count_nonzero(lines == 10) == full_lines
+            and bool((lines[linewidth - 1 :: linewidth] == 10).all())
+            and (
+                linewidth - linebases == 1
+                or bool((lines[linewidth - 2 :: linewidth] == 13).all())
+            )
+        )
+        # Release the buffer of the memory map before raising
+        del lines
+        if not valid:
+            raise ValueError(
+                f"Different line lengths in the FASTA record starting at byte {seq_start}. "
+                "The file cannot be indexed."
+            )
+
+        return full_lines * linebases + last_line, seq_start, linebases, linewidth
+
+    def __getitem__(self, key):
+        if key not in self._index:
+            raise KeyError(key)
+        return IndexedSequence(self, key)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def length(self, key):
+        """Returns the length of the sequence of key."""
+        return self._index[key][1]
+
+    def fetch(self, key, start=0, end=None):
+        """
+        Returns the bases start to end (0-based, end exclusive) of the sequence of key as a string.
+        """
+        _, length, offset, linebases, linewidth = self._index[key]
+        start = max(int(start), 0)
+        end = length if end is None else min(int(end), length)
+        if start >= end:
+            return ""
+
+        first = offset + start // linebases * linewidth + start % linebases
+        last = offset + (end - 1) // linebases * linewidth + (end - 1) % linebases + 1
+        data = self._mm[first:last]
+        if last - first != end - start:
+            # The region spans line breaks
+            data = data.replace(b"\n", b"")
+            if linewidth - linebases == 2:
+                data = data.replace(b"\r", b"")
+
+        return data.decode("utf-8")
+
+    def fetch_many(self, key, starts, ends):
+        """
+        Returns the regions starts[i] to ends[i] (0-based, end exclusive) of the sequence of key
+        as a list of strings.
+
+        The bases are gathered from the memory map in batches with array operations,
+        without a Python loop over the regions.
+        """
+        _, length, offset, linebases, linewidth = self._index[key]
+        if not length:
+            return [""] * len(starts)
+
+        results = []
+        data = np.frombuffer(self._mm, dtype=np.uint8)
+        try:
+            for _, _, bounds, _, positions in _region_batches(starts, ends, length):
+                # Byte offsets of the bases, skipping the line breaks
+                lines, columns = np.divmod(positions, linebases)
+                chars = data[offset + lines * linewidth + columns]
+                # One character per byte, so the region bounds stay valid
+                results.extend(_split_batch(chars.tobytes().decode("latin-1"), bounds))
+        finally:
+            # Release the buffer of the memory map, so it can be closed
+            del data
+
+        return results
+
+    def entries(self):
+        """
+        Returns the .fai entries (name, length, offset, linebases, linewidth) of all records
+        in file order, including the records not kept because of duplicate keys.
+        """
+        return sorted(
+            itertools.chain(self._index.values(), self._dropped), key=lambda entry: entry[2]
+        )
+
+    def header(self, key):
+        """
+        Returns the header line of the record of key (without the leading '>').
+        key can also be one of the entries().
+        """
+        offset = (key if isinstance(key, tuple) else self._index[key])[2]
+        header_start = self._mm.rfind(b"\n", 0, offset - 1) + 1
+        return self._mm[header_start + 1 : offset].rstrip(b"\r\n").decode("utf-8")
+
+    def raw(self, key):
+        """
+        Returns the FASTA text of the record of key as it is in the file (bytes).
+        key can also be one of the entries().
+        """
+        _, length, offset, linebases, linewidth = key if isinstance(key, tuple) else self._index[key]
+        header_start = self._mm.rfind(b"\n", 0, offset - 1) + 1
+        if length:
+            full_lines, last_line = divmod(length, linebases)
+            end = offset + full_lines * linewidth
+            if last_line:
+                end += last_line + linewidth - linebases
+        else:
+            end = offset
+
+        data = self._mm[header_start:end]
+        # Add the line break missing at the end of the file
+        return data if data.endswith(b"\n") else data + b"\n"
+
+    def close(self):
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+
+    def __getstate__(self):
+        # Only the index is pickled (e.g. when sent to worker processes),
+        # the file is memory-mapped again when unpickled
+        state = self.__dict__.copy()
+        del state["_mm"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        with open(self.filename, "rb") as f:
+            self._mm = (
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                if os.path.getsize(self.filename)
+                else b""
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PackedSequences(collections.abc.Mapping):
+    """
+    Compact in-memory store of nucleotide sequences with 2 bits per base.
+
+    A, C, G and T (in any case) are packed four per byte in a NumPy array. Other characters
+    (N, IUPAC codes, gaps) and lowercase (soft-masked) stretches are kept as runs on the side,
+    so the sequences are stored losslessly in about a quarter of the memory of Python strings.
+    Looking up a key returns an IndexedSequence, which can be sliced like the sequence string.
+
+    Args:
+    - records   Iterable of (key, sequence) tuples, e.g. iter_fasta(path).
+    - keep      "first" or "last": which of several records with the same key is kept
+                (the number of records not kept is stored in the attribute duplicates).
+                Default: "first" (as for IndexedFasta).
+    """
+
+    # Codes of the packed bases and ASCII characters of the codes
+    _ENCODE = np.zeros(256, dtype=np.uint8)
+    for _i, _base in enumerate(b"ACGT"):
+        _ENCODE[_base] = _ENCODE[_base + 32] = _i
+    _BASES = np.frombuffer(b"ACGT", dtype=np.uint8)
+
+    # Characters stored as runs instead of codes
+    _IS_EXCEPTION = np.ones(256, dtype=bool)
+    _IS_EXCEPTION[list(b"ACGTacgt")] = False
+    _IS_LOWER = np.zeros(256, dtype=bool)
+    _IS_LOWER[ord("a") : ord("z") + 1] = True
+
+    # Unpacked characters of each byte value (four bases, lowest bits first)
+    _UNPACK = _BASES[
+        (np.arange(256, dtype=np.uint8)[:, None] >> np.array([0, 2, 4, 6], dtype=np.uint8)) & 3
+    ]
+
+    # Complement of each character (IUPAC codes included, case preserved)
+    _COMPLEMENT = np.arange(256, dtype=np.uint8)
+    for _a, _b in zip(b"ACGTUMRWSYKVHDBN", b"TGCAAKYWSRMBDHVN"):
+        _COMPLEMENT[_a] = _b
+        _COMPLEMENT[_a + 32] = _b + 32
+    del _i, _base, _a, _b
+
+    # Bases encoded at a time, so building does not hold several copies of a chromosome
+    _CHUNK_SIZE = FASTA_IO_BUFFER_SIZE
+
+    def __init__(self, records, keep="first"):
+        if keep not in ("first", "last"):
+            raise ValueError(f"keep must be 'first' or 'last', not {keep!r}.")
+        # key -> (length, packed bases, exception run starts, ends and characters, lowercase run starts and ends)
+        self._records = {}
+        self.duplicates = 0
+        for key, seq in records:
+            if key in self._records:
+                self.duplicates += 1
+                if keep == "first":
+                    continue
+            self._records[key] = self._pack(seq)
+
+    @staticmethod
+    def _runs(positions, values=None):
+        """
+        Returns the starts and ends of the runs of consecutive positions (with the same value).
+        """
+        if len(positions) == 0:
+            return positions, positions
+        breaks = np.diff(positions) != 1
+        if values is not None:
+            breaks |= np.diff(values) != 0
+        starts = positions[np.concatenate(([True], breaks))]
+        ends = positions[np.concatenate((breaks, [True]))] + 1
+        return starts, ends
+
+    @classmethod
+    def _pack(cls, seq):
+        length = len(seq)
+
+        packed = []
+        exc_starts, exc_ends, exc_chars = [], [], []
+        low_starts, low_ends = [], []
+        for chunk_start in range(0, length, cls._CHUNK_SIZE):
+            chunk = seq[chunk_start : chunk_start + cls._CHUNK_SIZE]
+            if isinstance(chunk, str):
+                # Encoded a chunk at a time, without a bytes copy of the whole sequence
+                chunk = chunk.encode("ascii")
+            chars = np.frombuffer(chunk, dtype=np.uint8)
+            codes = cls._ENCODE[chars]
+            if len(codes) % 4:
+                codes = np.concatenate((codes, np.zeros(4 - len(codes) % 4, dtype=np.uint8)))
+            codes = codes.reshape(-1, 4)
+            packed.append(codes[:, 0] | codes[:, 1] << 2 | codes[:, 2] << 4 | codes[:, 3] << 6)
+
+            positions = np.flatnonzero(cls._IS_EXCEPTION[chars])
+            starts, ends = cls._runs(positions, chars[positions])
+            exc_starts.append(starts + chunk_start)
+            exc_ends.append(ends + chunk_start)
+            exc_chars.append(chars[starts])
+
+            starts, ends = cls._runs(np.flatnonzero(cls._IS_LOWER[chars]))
+            low_starts.append(starts + chunk_start)
+            low_ends.append(ends + chunk_start)
+
+        # Run positions of chromosomes shorter than 2 Gb fit in 4 bytes
+        positions_dtype = np.int32 if length < 2**31 else np.int64
+
+        def concatenate(arrays, dtype=positions_dtype):
+            if not arrays:
+                return np.zeros(0, dtype=dtype)
+            return np.concatenate(arrays).astype(dtype, copy=False)
+
+        return (
+            length,
+            concatenate(packed, np.uint8),
+            concatenate(exc_starts),
+            concatenate(exc_ends),
+            concatenate(exc_chars, np.uint8),
+            concatenate(low_starts),
+            concatenate(low_ends),
+        )
+
+    def __getitem__(self, key):
+        if key not in self._records:
+            raise KeyError(key)
+        return IndexedSequence(self, key)
+
+    def __contains__(self, key):
+        return key in self._records
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def __len__(self):
+        return len(self._records)
+
+    @property
+    def nbytes(self):
+        """Number of bytes used by the stored sequences."""
+        return sum(
+            array.nbytes for record in self._records.values() for array in record[1:]
+        )
+
+    def length(self, key):
+        """Returns the length of the sequence of key."""
+        return self._records[key][0]
+
+    def memory_map(self, filename):
+        """
+        Writes the packed sequences to filename and returns a PackedSequences reading them from the
+        memory-mapped file. Pickling the returned store (e.g. to send it to worker processes) only
+        pickles the file layout, so the processes share the pages of the file instead of holding
+        copies of the sequences.
+        """
+        layout = {}
+        offset = 0
+        with open(filename, "wb") as f:
+            for key, (length, *arrays) in self._records.items():
+                entries = []
+                for array in arrays:
+                    f.write(array.tobytes())
+                    entries.append((offset, array.dtype.str, len(array)))
+                    # Keep every array aligned to 8 bytes
+                    padding = -array.nbytes % 8
+                    f.write(b"\0" * padding)
+                    offset += array.nbytes + padding
+                layout[key] = (length, entries)
+
+        return self._from_file(filename, layout)
+
+    @classmethod
+    def _from_file(cls, filename, layout):
+        store = cls.__new__(cls)
+        store._filename = filename
+        store._layout = layout
+
+        # Empty files cannot be memory-mapped
+        mm = (
+            np.memmap(filename, dtype=np.uint8, mode="r")
+            if os.path.getsize(filename)
+            else np.zeros(0, dtype=np.uint8)
+        )
+        store._records = {}
+        store.duplicates = 0
+        for key, (length, entries) in layout.items():
+            arrays = []
+            for offset, dtype, size in entries:
+                dtype = np.dtype(dtype)
+                arrays.append(mm[offset : offset + size * dtype.itemsize].view(dtype))
+            store._records[key] = (length, *arrays)
+
+        return store
+
+    def __getstate__(self):
+        if getattr(self, "_filename", None):
+            return {"_filename": self._filename, "_layout": self._layout}
+        return self.__dict__
+
+    def __setstate__(self, state):
+        if "_records" in state:
+            self.__dict__.update(state)
+        else:
+            self.__dict__.update(
+                self._from_file(state["_filename"], state["_layout"]).__dict__
+            )
+
+    def fetch(self, key, start=0, end=None, reverse_complement=False):
+        """
+        Returns the bases start to end (0-based, end exclusive) of the sequence of key as a string
+        (reverse complemented if reverse_complement=True).
+        """
+        record = self._records[key]
+        length, packed = record[:2]
+        start = min(max(int(start), 0), length)
+        end = length if end is None else min(max(int(end), start), length)
+        if start == end:
+            return ""
+
+        # Unpack the bytes holding the region (1 byte per base, also for whole chromosomes)
+        first = start % 4
+        chars = self._UNPACK[packed[start // 4 : (end + 3) // 4]].ravel()[
+            first : first + end - start
+        ]
+        exc_starts, exc_ends, exc_chars, low_starts, low_ends = record[2:]
+        # Same dtype as the runs, so searchsorted does not convert (copy) the runs
+        start, end = exc_starts.dtype.type(start), exc_starts.dtype.type(end)
+        if len(exc_starts):
+            first = exc_ends.searchsorted(start, side="right")
+            last = exc_starts.searchsorted(end, side="left")
+            for i in range(first, last):
+                chars[max(exc_starts[i], start) - start : min(exc_ends[i], end) - start] = exc_chars[i]
+        if len(low_starts):
+            first = low_ends.searchsorted(start, side="right")
+            last = low_starts.searchsorted(end, side="left")
+            if last - first > 64:
+                # Long regions (e.g. whole soft-masked chromosomes)
+                self._apply_runs(
+                    chars, record, np.array([start]), np.array([end]), np.array([0, end - start])
+                )
+            else:
+                for i in range(first, last):
+                    chars[max(low_starts[i], start) - start : min(low_ends[i], end) - start] |= 0x20
+
+        if reverse_complement:
+            chars = self._COMPLEMENT[chars[::-1]]
+
+        return chars.tobytes().decode("ascii")
+
+    def fetch_many(self, key, starts, ends, reverse_complement=False):
+        """
+        Returns the regions starts[i] to ends[i] (0-based, end exclusive) of the sequence of key
+        as a list of strings (reverse complemented if reverse_complement=True).
+
+        The regions are unpacked in batches with array operations, without a Python loop over them.
+        """
+        record = self._records[key]
+        length, packed = record[:2]
+
+        results = []
+        for batch_starts, batch_ends, bounds, offsets, positions in _region_batches(
+            starts, ends, length
+        ):
+            chars = self._BASES[
+                (packed[positions >> 2] >> ((positions & 3) << 1).astype(np.uint8)) & 3
+            ]
+            del positions
+            self._apply_runs(chars, record, batch_starts, batch_ends, bounds)
+
+            if reverse_complement:
+                reverse = np.repeat(bounds[1:] - 1, batch_ends - batch_starts) - offsets
+                chars = self._COMPLEMENT[chars[reverse]]
+
+            results.extend(_split_batch(chars.tobytes().decode("ascii"), bounds))
+
+        return results
+
+    @staticmethod
+    def _overlaps(run_starts, run_ends, starts, ends):
+        """
+        Returns the region index and the overlapping part (start, end) of each overlap
+        between the regions and the runs, and the run index.
+        """
+        # Same dtype as the runs, so searchsorted does not convert (copy) the runs
+        first = np.searchsorted(run_ends, starts.astype(run_ends.dtype), side="right")
+        counts = np.maximum(
+            np.searchsorted(run_starts, ends.astype(run_starts.dtype), side="left") - first, 0
+        )
+        regions = np.repeat(np.arange(len(starts)), counts)
+        runs = np.repeat(first - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        return (
+            regions,
+            runs,
+            np.maximum(run_starts[runs], starts[regions]),
+            np.minimum(run_ends[runs], ends[regions]),
+        )
+
+    def _apply_runs(self, chars, record, starts, ends, bounds):
+        """
+        Writes the stored characters and lowercase stretches into the unpacked regions
+        (chars[bounds[i]:bounds[i + 1]] holds the bases starts[i] to ends[i]).
+        """
+        exc_starts, exc_ends, exc_chars, low_starts, low_ends = record[2:]
+        shift = bounds[:-1] - starts
+
+        if len(exc_starts):
+            regions, runs, run_starts, run_ends = self._overlaps(exc_starts, exc_ends, starts, ends)
+            # Few runs (N stretches) overlap the regions
+            for a, b, char in zip(
+                (run_starts + shift[regions]).tolist(),
+                (run_ends + shift[regions]).tolist(),
+                exc_chars[runs].tolist(),
+            ):
+                chars[a:b] = char
+
+        if len(low_starts):
+            regions, _, run_starts, run_ends = self._overlaps(low_starts, low_ends, starts, ends)
+            if len(regions):
+                # +1 where a stretch starts and -1 where it ends, so the cumulative sum is 1 inside
+                marks = np.zeros(len(chars) + 1, dtype=np.int8)
+                np.add.at(marks, run_starts + shift[regions], 1)
+                np.add.at(marks, run_ends + shift[regions], -1)
+                chars |= np.cumsum(marks[:-1], dtype=np.int8).view(np.uint8) << 5
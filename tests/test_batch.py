@@ -0,0 +1,55 @@
+import unittest
+import tempfile
+import time
+import json
+import os
+from unittest import mock
+
+from gget.gget_batch import batch, read_jobs
+
+
+def slow_query(x, delay=0.1):
+    time.sleep(delay)
+    return {"x": x}
+
+
+class TestBatch(unittest.TestCase):
+    def test_read_jobs(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "jobs.jsonl")
+            with open(path, "w") as f:
+                f.write('{"id": "a", "command": "info", "args": {"ens_ids": ["ENSG1"]}}\n')
+                f.write("# comment\n\n")
+                f.write('{"command": "seq", "args": ["ENSG2"]}\n')
+
+            jobs = read_jobs(path)
+            self.assertEqual([job["id"] for job in jobs], ["a", "job_4"])
+
+            with open(path, "a") as f:
+                f.write('{"id": "a", "command": "info"}\n')
+            with self.assertRaises(ValueError):
+                read_jobs(path)
+
+    def test_batch_concurrent(self):
+        jobs = [{"id": f"q{i}", "command": "query", "args": [i]} for i in range(8)]
+        jobs.append({"id": "bad", "command": "query", "kwargs": {"y": 1}})
+
+        with tempfile.TemporaryDirectory() as tmp_dir, mock.patch(
+            "gget.gget_batch.get_gget_function", return_value=slow_query
+        ):
+            out = os.path.join(tmp_dir, "results.jsonl")
+            out_dir = os.path.join(tmp_dir, "results")
+
+            start = time.perf_counter()
+            summary = batch(jobs, workers=8, out=out, out_dir=out_dir, verbose=False)
+            elapsed = time.perf_counter() - start
+
+            # 8 jobs of 0.1 s each run at the same time
+            self.assertLess(elapsed, 0.5)
+            self.assertEqual((summary["succeeded"], summary["failed"]), (8, 1))
+
+            with open(out) as f:
+                records = {r["id"]: r for r in map(json.loads, f)}
+            self.assertEqual(records["q3"]["result"], {"x": 3})
+            self.assertFalse(records["bad"]["ok"])
+            self.assertEqual(len(os.listdir(out_dir)), 9)
@@ -97,3 +97,54 @@ class TestCosmicWorkflow(TestCaseBase, metaclass=from_json(cosmic_dict, cosmic,
             os.rmdir(cls.tarred_folder)
 
         super().tearDownClass()
+
+
+class TestCosmicIndex(unittest.TestCase):
+    """
+    Searches of a local COSMIC tsv file through its SQLite index (no download required).
+    """
+
+    def setUp(self):
+        import tempfile
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "Cosmic_MutantCensus_v1_GRCh37.tsv")
+        pd.DataFrame(
+            {
+                "GENE_SYMBOL": ["EGFR", "TP53", "EGFR", "KRAS"],
+                "TRANSCRIPT_ACCESSION": ["ENST00000275493.2", "ENST00000269305.4", "ENST00000275493.2", "ENST00000256078"],
+                "MUTATION_ID": ["COSV1", "COSV2", "COSV3", "COSV4"],
+                "MUTATION_CDS": ["c.1804G>C", "c.215C>G", "c.2369C>T", "c.35G>A"],
+                "MUTATION_AA": ["p.E602Q", "p.P72R", "p.T790M", "p.G12D"],
+                "TIER": [1, 2, 1, 1],
+                "SCORE": [0.5, None, 0.25, 1.0],
+            }
+        ).to_csv(self.path, sep="\t", index=False)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_search(self):
+        result = cosmic("egfr", cosmic_tsv_path=self.path, limit=5, verbose=False)
+        self.assertEqual(list(result["MUTATION_ID"]), ["COSV1", "COSV3"])
+        self.assertEqual(list(result["TIER"]), [1, 1])
+        self.assertTrue(os.path.exists(self.path + ".sqlite"))
+
+        # Accessions match with and without version number
+        result = cosmic("ENST00000275493", cosmic_tsv_path=self.path, limit=1, verbose=False)
+        self.assertEqual(list(result["MUTATION_ID"]), ["COSV1"])
+        result = cosmic("c.35G>A", cosmic_tsv_path=self.path, json=True, verbose=False)
+        self.assertEqual(result[0]["TRANSCRIPT_ACCESSION"], "ENST00000256078")
+
+        with self.assertRaises(ValueError):
+            cosmic("p.V600E", cosmic_tsv_path=self.path, verbose=False)
+
+    def test_rebuild(self):
+        cosmic("EGFR", cosmic_tsv_path=self.path, verbose=False)
+
+        # The index is rebuilt when the file changes
+        with open(self.path, "a") as f:
+            f.write("BRAF\tENST00000288602.6\tCOSV5\tc.1799T>A\tp.V600E\t1\t\n")
+        result = cosmic("p.V600E", cosmic_tsv_path=self.path, verbose=False)
+        self.assertEqual(list(result["GENE_SYMBOL"]), ["BRAF"])
+        self.assertTrue(pd.isna(result["SCORE"][0]))
@@ -1,3 +1,4 @@
+import gzip
 import json
 
 import pytest
@@ -55,6 +56,8 @@ def create_temp_files():
     # Cleanup
     os.remove(temp_csv_file.name)
     os.remove(temp_fasta_file.name)
+    # gget mutate does not leave an index next to the input
+    assert not os.path.exists(temp_fasta_file.name + ".fai")
 
 
 def assert_global_variables_zero(
@@ -226,6 +229,547 @@ def test_csv_of_mutations(create_temp_files):
     assert_global_variables_zero()
 
 
+def test_csv_of_mutations_gzipped_fasta(create_temp_files):
+    mutation_temp_csv_file, sequence_temp_fasta_path = create_temp_files
+
+    # Compressed sequences are read into a 2-bit PackedSequences store instead of being indexed
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        gz_path = os.path.join(tmp_dir, "sequences.fa.gz")
+        with open(sequence_temp_fasta_path, "rb") as f, gzip.open(gz_path, "wb") as gz:
+            gz.write(f.read())
+
+        result = gget.mutate(sequences=gz_path, mutations=mutation_temp_csv_file)
+
+    assert result == gget.mutate(
+        sequences=sequence_temp_fasta_path, mutations=mutation_temp_csv_file
+    )
+
+    assert_global_variables_zero()
+
+
+def test_duplicate_sequence_ids():
+    # Versions of the same transcript: as for a dictionary of the records, the last one is mutated
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        fasta_path = os.path.join(tmp_dir, "sequences.fa")
+        with open(fasta_path, "w") as f:
+            f.write(f">ENST1.1\n{'A' * 40}\n>ENST1.2\n{LONG_SEQUENCE}\n")
+        gz_path = fasta_path + ".gz"
+        with open(fasta_path, "rb") as f, gzip.open(gz_path, "wb") as gz:
+            gz.write(f.read())
+
+        expected = gget.mutate(sequences=[LONG_SEQUENCE], mutations=["c.35G>A"])
+        for path in (fasta_path, gz_path):
+            mutations = pd.DataFrame({"mutation": ["c.35G>A"], "mut_ID": ["MUT1"], "seq_ID": ["ENST1"]})
+            mutations_path = os.path.join(tmp_dir, "mutations.csv")
+            mutations.to_csv(mutations_path, index=False)
+            assert gget.mutate(sequences=path, mutations=mutations_path) == expected
+
+
+def test_chunk_size(create_temp_files):
+    mutation_temp_csv_file, sequence_temp_fasta_path = create_temp_files
+
+    # Repeat the mutations so identical mutated sequences end up in different chunks
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        mutations_path = os.path.join(tmp_dir, "mutations.csv")
+        df = pd.read_csv(mutation_temp_csv_file)
+        df = pd.concat([df, df.iloc[::-1]], ignore_index=True)
+        df["mut_ID"] = [f"MUT{i}" for i in range(len(df))]
+        df.to_csv(mutations_path, index=False)
+
+        # Sequences of different lengths, so each is translated to a different end
+        fasta_path = os.path.join(tmp_dir, "sequences.fa")
+        with open(fasta_path, "w") as f:
+            for seq_id, sequence in zip(
+                df["seq_ID"].unique(),
+                [LONG_SEQUENCE, EXTRA_LONG_SEQUENCE, LONG_SEQUENCE[:62], EXTRA_LONG_SEQUENCE[:100]],
+            ):
+                f.write(f">{seq_id}\n{sequence}\n")
+
+        for merge_identical in (True, False):
+            outputs = []
+            updated = []
+            for chunk_size in (None, 1, 3):
+                out = os.path.join(tmp_dir, f"out_{chunk_size}.fa")
+                gget.mutate(
+                    sequences=fasta_path,
+                    mutations=mutations_path,
+                    out=out,
+                    merge_identical=merge_identical,
+                    chunk_size=chunk_size,
+                )
+                with open(out) as f:
+                    outputs.append(f.read())
+
+                # Translated columns of a DataFrame of mutations (which has no translate_end column)
+                updated.append(
+                    gget.mutate(
+                        sequences=fasta_path,
+                        mutations=df,
+                        merge_identical=merge_identical,
+                        chunk_size=chunk_size,
+                        update_df=True,
+                        store_full_sequences=True,
+                        translate=True,
+                    )
+                )
+
+            assert outputs[1] == outputs[0]
+            assert outputs[2] == outputs[0]
+            assert outputs[0].count("\n>") + 1 == (4 if merge_identical else 8)
+            assert updated[0]["wt_sequence_aa_full"].str.len().nunique() == 4
+            pd.testing.assert_frame_equal(updated[1], updated[0], check_dtype=False)
+            pd.testing.assert_frame_equal(updated[2], updated[0], check_dtype=False)
+
+        # No temporary merge files are left behind
+        assert sorted(os.listdir(tmp_dir)) == [
+            "mutations.csv",
+            "out_1.fa",
+            "out_3.fa",
+            "out_None.fa",
+            "sequences.fa",
+        ]
+
+    with pytest.raises(ValueError):
+        gget.mutate(
+            sequences=sequence_temp_fasta_path,
+            mutations=mutation_temp_csv_file,
+            chunk_size=0,
+        )
+
+
+def test_update_df_out_arrow(create_temp_files):
+    pytest.importorskip("pyarrow")
+    mutation_temp_csv_file, sequence_temp_fasta_path = create_temp_files
+
+    expected = gget.mutate(
+        sequences=sequence_temp_fasta_path,
+        mutations=mutation_temp_csv_file,
+        update_df=True,
+        chunk_size=1,
+    )
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+
+        for ext, read in ((".parquet", pd.read_parquet), (".arrow", pd.read_feather)):
+            path = os.path.join(tmp_dir, f"updated{ext}")
+            gget.mutate(
+                sequences=sequence_temp_fasta_path,
+                mutations=mutation_temp_csv_file,
+                update_df=True,
+                update_df_out=path,
+                chunk_size=1,
+            )
+            result = read(path)
+
+            # Sequence IDs and mutation types are dictionary-encoded
+            assert isinstance(result["seq_ID"].dtype, pd.CategoricalDtype)
+            assert isinstance(result["mutation_type"].dtype, pd.CategoricalDtype)
+
+            result = result.astype({"seq_ID": object, "mutation_type": object})[expected.columns]
+            pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+
+def test_update_df_out_arrow_mixed_dtypes(create_temp_files):
+    pytest.importorskip("pyarrow")
+    mutation_temp_csv_file, sequence_temp_fasta_path = create_temp_files
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # pandas reads the first chunks of the score column as integers and the last one as text
+        mutations_path = os.path.join(tmp_dir, "mutations.csv")
+        df = pd.read_csv(mutation_temp_csv_file)
+        df["score"] = ["1", "2", "3", "x"]
+        df.to_csv(mutations_path, index=False)
+
+        path = os.path.join(tmp_dir, "updated.parquet")
+        gget.mutate(
+            sequences=sequence_temp_fasta_path,
+            mutations=mutations_path,
+            update_df=True,
+            update_df_out=path,
+            merge_identical=False,
+            chunk_size=1,
+        )
+
+        assert list(pd.read_parquet(path)["score"]) == ["1", "2", "3", "x"]
+
+
+def test_threads(create_temp_files):
+    mutation_temp_csv_file, sequence_temp_fasta_path = create_temp_files
+
+    # Sequences read from the indexed fasta file and passed as a list
+    for sequences, mutations in (
+        (sequence_temp_fasta_path, mutation_temp_csv_file),
+        ([LONG_SEQUENCE, EXTRA_LONG_SEQUENCE, LONG_SEQUENCE], ["c.35G>A", "c.35del", "c.4_5insT"]),
+    ):
+        result = gget.mutate(sequences=sequences, mutations=mutations)
+        for threads, chunk_size in ((2, None), (3, 2)):
+            assert (
+                gget.mutate(
+                    sequences=sequences,
+                    mutations=mutations,
+                    threads=threads,
+                    chunk_size=chunk_size,
+                )
+                == result
+            )
+
+    with pytest.raises(ValueError):
+        gget.mutate(
+            sequences=sequence_temp_fasta_path,
+            mutations=mutation_temp_csv_file,
+            threads=0,
+        )
+
+
+def test_extract_regions():
+    from gget.gget_mutate import extract_regions
+
+    seq_dict = {"seq1": "ACGTACGTAA", "seq2": "TTGGCC"}
+    seq_ids = ["seq1", "seq2", "seq1", "seq2", "seq1"]
+    starts = [0, 2, 8, -2, 5]
+    ends = [3, 4, 20, 6, 1]
+
+    regions = extract_regions(seq_dict, seq_ids, starts, ends)
+    assert list(regions) == [
+        seq_dict[seq_id][start:end] for seq_id, start, end in zip(seq_ids, starts, ends)
+    ]
+
+
+def test_join_string_slices():
+    from gget.gget_mutate import join_string_slices
+
+    left = ["ACGT", "", "GG", "TTTT"]
+    middle = ["A", "CC", "", "Ä"]
+    right = ["GATTACA", "T", "CA", ""]
+    starts = [1, 0, 5, 2]
+    ends = [3, 1, 0, 4]
+
+    joined = join_string_slices((left, starts, None), (middle, None, None), (right, None, ends))
+    assert list(joined) == [
+        l[start:] + m + r[:end] for l, m, r, start, end in zip(left, middle, right, starts, ends)
+    ]
+    assert list(join_string_slices(([], None, None))) == []
+
+
+def test_reverse_complement_strings():
+    from gget.gget_mutate import reverse_complement_strings, complement
+
+    strings = ["ACGTN", "", "acgu.-", "AXÄ"]
+    assert list(reverse_complement_strings(strings)) == [
+        "".join(complement.get(nucleotide, "N") for nucleotide in string[::-1])
+        for string in strings
+    ]
+
+
+def test_fragments_share_kmer():
+    from gget.gget_mutate import (
+        fragments_share_kmer,
+        wt_fragment_and_mutant_fragment_share_kmer,
+    )
+
+    mutated = ["ACGTAC", "ACGTAC", "AC", "TTTTGA", "", "ACGNNA", "CCCCAG", "éACG"]
+    wildtype = ["GGACGTT", "TTTAC", "CACA", "GGTTTTC", "ACG", "NNAC", "GGGG", "éACGT"]
+
+    for k in (1, 2, 3, 4, 6):
+        assert list(fragments_share_kmer(mutated, wildtype, k)) == [
+            wt_fragment_and_mutant_fragment_share_kmer(m, w, k)
+            for m, w in zip(mutated, wildtype)
+        ]
+
+
+def test_mutation_overlaps_with_flanks():
+    from gget.gget_mutate import (
+        calculate_mutation_overlaps_with_flanks,
+        calculate_beginning_mutation_overlap_with_right_flank,
+        calculate_end_mutation_overlap_with_left_flank,
+    )
+
+    mutations = pd.DataFrame(
+        {
+            "mutation_type": [
+                "deletion",
+                "insertion",
+                "duplication",
+                "delins",
+                "inversion",
+                "insertion",
+            ],
+            "wt_nucleotides_ensembl": ["CA", "", "AG", "TT", "ACG", ""],
+            "mut_nucleotides": ["", "CA", "AG", "TG", "CGT", "GGG"],
+            "left_flank_region": ["ACACA", "TTCAC", "AGAGA", "GTT", "CG", "AAAA"],
+            "right_flank_region": ["CACAT", "CACG", "AGAGT", "TTG", "T", "GG"],
+        }
+    )
+
+    beginning_overlaps, end_overlaps = calculate_mutation_overlaps_with_flanks(mutations)
+    assert list(beginning_overlaps) == list(
+        mutations.apply(calculate_beginning_mutation_overlap_with_right_flank, axis=1)
+    )
+    assert list(end_overlaps) == list(
+        mutations.apply(calculate_end_mutation_overlap_with_left_flank, axis=1)
+    )
+
+
+def test_gtf_transcript_locations_cache(monkeypatch):
+    from gget import gget_mutate
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        gtf_path = os.path.join(tmp_dir, "annotation.gtf")
+        with open(gtf_path, "w") as f:
+            f.write(
+                "#!genome-build GRCh38\n"
+                '1\tensembl\ttranscript\t11\t90\t.\t+\t.\tgene_id "G1"; transcript_id "ENST1";\n'
+                '1\tensembl\texon\t11\t40\t.\t+\t.\tgene_id "G1"; transcript_id "ENST1";\n'
+                'X\tensembl\ttranscript\t5\t500\t.\t-\t.\tgene_id "G2"; transcript_id "ENST2";\n'
+            )
+
+        expected = gget_mutate.read_gtf_transcript_locations(gtf_path, "transcript_ID")
+        loaded = gget_mutate.load_gtf_transcript_locations(gtf_path, "transcript_ID")
+        assert loaded.values.tolist() == expected.values.tolist()
+        assert os.path.exists(gtf_path + ".transcripts.npy")
+
+        # The cached table is read without parsing the gtf file again
+        def read_gtf(*args):
+            raise AssertionError("gtf file parsed again")
+
+        monkeypatch.setattr(gget_mutate, "read_gtf_transcript_locations", read_gtf)
+        cached = gget_mutate.load_gtf_transcript_locations(gtf_path, "transcript_ID")
+        assert list(cached.columns) == list(expected.columns)
+        assert cached.values.tolist() == expected.values.tolist()
+
+        # A changed gtf file is parsed again
+        monkeypatch.undo()
+        with open(gtf_path, "a") as f:
+            f.write('X\tensembl\ttranscript\t7\t70\t.\t+\t.\tgene_id "G3"; transcript_id "ENST3";\n')
+        loaded = gget_mutate.load_gtf_transcript_locations(gtf_path, "transcript_ID")
+        assert list(loaded["transcript_ID"]) == ["ENST1", "ENST2", "ENST3"]
+
+        # A missing or truncated table with an up-to-date key is made again
+        table_path = gtf_path + ".transcripts.npy"
+        expected = loaded.values.tolist()
+        for damage in ("delete", "truncate"):
+            if damage == "delete":
+                os.remove(table_path)
+            else:
+                with open(table_path, "r+b") as f:
+                    f.truncate(os.path.getsize(table_path) // 2)
+            assert os.path.exists(gtf_path + ".transcripts.json")
+            loaded = gget_mutate.load_gtf_transcript_locations(gtf_path, "transcript_ID")
+            assert loaded.values.tolist() == expected
+            # The table is saved again
+            monkeypatch.setattr(gget_mutate, "read_gtf_transcript_locations", read_gtf)
+            cached = gget_mutate.load_gtf_transcript_locations(gtf_path, "transcript_ID")
+            assert cached.values.tolist() == expected
+            monkeypatch.undo()
+
+
+def test_parse_mutations():
+    from gget.gget_mutate import parse_mutations
+
+    mutations = pd.Series(
+        ["c.35G>A", "c.4_5insTT", "g.4_6delinsAG", "c.5del", "c.35+1G>T", None, "c.?", "c.35G>A"],
+        index=[10, 11, 12, 13, 14, 15, 16, 10],
+    )
+    parsed = parse_mutations(mutations)
+
+    assert list(parsed.index) == list(mutations.index)
+    assert list(parsed["mutation_type"]) == [
+        "substitution",
+        "insertion",
+        "delins",
+        "deletion",
+        "substitution",
+        "unknown",
+        "unknown",
+        "substitution",
+    ]
+    assert list(parsed["start_position"]) == [35, 4, 4, 5, -1, -1, -1, 35]
+    assert list(parsed["end_position"]) == [35, 5, 6, 5, -1, -1, -1, 35]
+    assert list(parsed["inserted_nucleotides"].fillna("")) == ["A", "TT", "AG", "", "T", "", "", "A"]
+    assert list(parsed["reference_nucleotides"].fillna("")) == ["G", "", "", "", "G", "", "", "G"]
+    assert list(parsed["intronic_mutation"]) == [False, False, False, False, True, False, False, False]
+    assert list(parsed["uncertain_mutation"]) == [False] * 6 + [True, False]
+
+
+def test_merge_identical_mutations():
+    from gget.gget_mutate import merge_identical_mutations, remove_gt_after_semicolon
+
+    mutations = pd.DataFrame(
+        {
+            "header": [">a", ">b;>c", ">d", ">e", ">>f", ">g"],
+            "mutant_sequence": ["ACGT", "TTT", "ACGT", "", "TTT", "ACGT"],
+            "score": [1.5, None, 2.0, 3.0, 4.0, 5.5],
+            "count": [1, 2, 3, 4, 5, 6],
+        }
+    )
+
+    merged, total_semicolons = merge_identical_mutations(mutations)
+    assert list(merged["mutant_sequence"]) == ["ACGT", "TTT", ""]
+    assert list(merged["header"]) == [">a;d;g", ">b;c;f", ">e"]
+    assert total_semicolons == 6
+
+    # Same values as concatenating the strings of each group
+    merged, _ = merge_identical_mutations(mutations, update_df=True)
+    expected = (
+        mutations.groupby("mutant_sequence", sort=False)
+        .agg(lambda x: ";".join(map(str, x)))
+        .reset_index()
+    )
+    expected["header"] = expected["header"].apply(remove_gt_after_semicolon)
+    assert merged.values.tolist() == expected.values.tolist()
+    assert list(merged.columns) == list(expected.columns)
+
+
+def test_translate_sequences():
+    from gget.gget_mutate import translate_sequences, translate_sequence
+
+    sequences = ["ATGGCCTAA", "atgNNNtgg", "ATGGC", "", "ATGAAATTTGGG", "ATGé"]
+    starts = [0, 0, 0, 0, 1, 0]
+    ends = [9, 9, 9, 6, 12, 6]
+
+    assert translate_sequences(sequences, starts, ends) == [
+        translate_sequence(sequence, start, end)
+        for sequence, start, end in zip(sequences, starts, ends)
+    ]
+    assert translate_sequences(sequences, 0, 6) == [
+        translate_sequence(sequence, 0, 6) for sequence in sequences
+    ]
+
+
+def test_translate(create_temp_files):
+    mutation_temp_csv_file, sequence_temp_fasta_path = create_temp_files
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        result = gget.mutate(
+            sequences=sequence_temp_fasta_path,
+            mutations=mutation_temp_csv_file,
+            update_df=True,
+            update_df_out=os.path.join(tmp_dir, "updated.csv"),
+            store_full_sequences=True,
+            merge_identical=False,
+        )
+
+    # All sequences are LONG_SEQUENCE, so the wildtype translations are identical
+    wt_translation = "PRPTPPLPAPPRPSPPHPAPPRPTP"
+    assert list(result["wt_sequence_aa_full"]) == [wt_translation] * 4
+    # c.35G>A changes codon 12 (CGC to CAC), and the deletion shifts the reading frame
+    # so the last codon is incomplete
+    assert list(result["mutant_sequence_aa_full"]) == [
+        "PRPTPPLPAPPHPSPPHPAPPRPTP",
+        "PRPTPPLPAPPRPSPPHPAPPHPTP",
+        "PRPTPPLPAPPPPPRPTPPLPAPPX",
+        "PLPHPAPPRPTPPLPAPPRPSPPHP",
+    ]
+
+
+def test_translate_threads():
+    # Each sequence is translated to its own end, whichever sequences share a worker partition
+    sequences = ["ATGCCCAAAGGCTTTCCC", "ATGCCCAAAGGCTTTCCCAAAGGCTTTTAA"]
+    mutations = ["c.4C>T", "c.4C>T"]
+    columns = ["seq_ID", "wt_sequence_aa_full", "mutant_sequence_aa_full"]
+
+    results = [
+        gget.mutate(
+            sequences=sequences,
+            mutations=mutations,
+            update_df=True,
+            store_full_sequences=True,
+            translate=True,
+            threads=threads,
+        )[columns]
+        for threads in (1, 2)
+    ]
+
+    assert results[0].values.tolist() == [
+        ["seq1", "MPKGFP", "MSKGFP"],
+        ["seq2", "MPKGFPKGF*", "MSKGFPKGF*"],
+    ]
+    pd.testing.assert_frame_equal(results[1], results[0])
+
+
+def test_kmer_index():
+    from gget.gget_mutate import KmerIndex
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index = KmerIndex.build(
+            {"seq1": "ACGTTGCA", "seq2": "ggatcNNAT"}, 4, os.path.join(tmp_dir, "kmers.npy")
+        )
+        # ACGT, CGTT, GTTG, TTGC, TGCA, GGAT and GATC (NNAT is skipped)
+        assert len(index) == 7
+        assert list(
+            index.contains_any(
+                ["TTGC", "GCAA", "gatcc", "AACCT", "NNATC", "TTTTAACGTTT", "ACG", ""]
+            )
+        ) == [True, True, True, False, False, True, False, False]
+
+
+def test_remove_seqs_with_reference_kmers(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache_path = os.path.join(tmp_dir, "cache")
+        monkeypatch.setitem(gget.utils._cache_config, "path", cache_path)
+
+        fasta_path = os.path.join(tmp_dir, "sequences.fa")
+        with open(fasta_path, "w") as f:
+            f.write(f">seq1\n{LONG_SEQUENCE}\n>seq2\nGGGGGGGGTCAAAAAAAA\n")
+
+        mutations = pd.DataFrame(
+            {
+                "mutation": ["c.35G>A", "c.4_5insTTTGAC", "c.4_5insTTGA"],
+                "mut_ID": ["mut1", "mut2", "mut3"],
+                "seq_ID": ["seq1", "seq1", "seq1"],
+            }
+        )
+
+        result = gget.mutate(fasta_path, mutations, k=5, merge_identical=False)
+        assert result == ["ACCCCACCCCT", "CCCCTTTGACGCCCC", "CCCCTTGAGCCCC"]
+        # CCCCAC is found in seq1, and TTTGAC on the reverse strand of seq2
+        assert gget.mutate(
+            fasta_path,
+            mutations,
+            k=5,
+            merge_identical=False,
+            remove_seqs_with_reference_kmers=True,
+        ) == ["CCCCTTGAGCCCC"]
+
+        # The index is saved in the cache directory (not next to the fasta file) and reused
+        assert sorted(os.listdir(tmp_dir)) == ["cache", "sequences.fa"]
+        index_dir = os.path.join(cache_path, "kmer_indexes")
+        (index_name,) = [name for name in os.listdir(index_dir) if name.endswith(".npy")]
+        assert index_name.startswith("sequences.fa.") and index_name.endswith(".6mers.npy")
+        index_path = os.path.join(index_dir, index_name)
+        index_mtime = os.stat(index_path).st_mtime_ns
+
+        def run(k=5, **kwargs):
+            return gget.mutate(
+                fasta_path,
+                mutations,
+                k=k,
+                merge_identical=False,
+                remove_seqs_with_reference_kmers=True,
+                **kwargs,
+            )
+
+        assert run() == ["CCCCTTGAGCCCC"]
+        assert os.stat(index_path).st_mtime_ns == index_mtime
+
+        # A changed fasta file of the same size gets a new index, even if it is older than the index
+        # (TTGAGC is now found in seq2)
+        with open(fasta_path, "w") as f:
+            f.write(f">seq1\n{LONG_SEQUENCE}\n>seq2\nGGGGGTTGAGCAAAAAAA\n")
+        os.utime(fasta_path, ns=(0, index_mtime - 10**9))
+        assert run() == []
+
+        # An index built for another k or a damaged index is built again, not used
+        user_index = os.path.join(tmp_dir, "index.npy")
+        run(k=4, reference_kmer_index=user_index)
+        assert run(reference_kmer_index=user_index) == []
+        with open(user_index, "wb") as f:
+            f.write(b"not an index")
+        assert run(reference_kmer_index=user_index) == []
+        with open(user_index + ".json") as f:
+            assert json.load(f)["k"] == 6
+
+
 def test_mismatch_error():
     gget.gget_mutate.mutate(sequences=LONG_SEQUENCE, mutations="c.2G>A")
 
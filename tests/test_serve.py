@@ -0,0 +1,94 @@
+import unittest
+import threading
+import socket
+import json
+import tempfile
+import os
+
+from gget.gget_serve import make_server, Client, run_cli, handle_request
+
+
+class TestServe(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = make_server("127.0.0.1:0")
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.address = f"127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        os.remove(cls.server.token_file)
+
+    def test_ping(self):
+        with Client(self.address) as client:
+            response = client.request({"ping": True})
+            self.assertTrue(response["ok"])
+            self.assertIn("version", response)
+            # Connection is reused for the next request
+            self.assertEqual(client.request({"ping": True})["id"], 2)
+
+    def test_run_cli(self):
+        with Client(self.address) as client:
+            response = client.run(["--version"])
+        self.assertEqual(response["exit_code"], 1)
+        self.assertTrue(response["stdout"].startswith("gget version:"))
+
+    def test_run_cli_stats_out(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # Exits with a usage error because the 8cube subcommand is missing
+            result = run_cli(["8cube", "--stats-out", "stats.json"], cwd=tmp_dir)
+            self.assertEqual(result["exit_code"], 2)
+            self.assertIn("Please specify a subcommand", result["stderr"])
+            # Relative paths refer to the working directory of the request
+            self.assertTrue(os.path.exists(os.path.join(tmp_dir, "stats.json")))
+
+    def test_call_function(self):
+        with Client(self.address) as client:
+            self.assertIsInstance(client.call("stats"), dict)
+            with self.assertRaises(RuntimeError):
+                client.call("not_a_function")
+
+    def test_invalid_requests(self):
+        self.assertFalse(handle_request({"id": 1})["ok"])
+
+        host, port = self.address.split(":")
+        with socket.create_connection((host, int(port))) as sock:
+            f = sock.makefile("rwb")
+            f.write(b"not json\n")
+            f.flush()
+            response = json.loads(f.readline())
+        self.assertFalse(response["ok"])
+        self.assertIn("Invalid request", response["error"])
+
+    def test_token(self):
+        # The token file is only readable by the current user
+        self.assertEqual(os.stat(self.server.token_file).st_mode & 0o777, 0o600)
+
+        host, port = self.address.split(":")
+        with socket.create_connection((host, int(port))) as sock:
+            f = sock.makefile("rwb")
+            for request in ({"ping": True}, {"ping": True, "token": "wrong"}):
+                f.write((json.dumps(request) + "\n").encode())
+                f.flush()
+                response = json.loads(f.readline())
+                self.assertFalse(response["ok"])
+                self.assertIn("token", response["error"])
+
+    def test_unix_socket(self):
+        if not hasattr(socket, "AF_UNIX"):
+            self.skipTest("Unix sockets are not supported on this platform")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "gget.sock")
+            server = make_server(path)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            try:
+                # Only the current user can connect, without a token
+                self.assertEqual(os.stat(path).st_mode & 0o777, 0o600)
+                with Client(path) as client:
+                    self.assertTrue(client.request({"ping": True})["ok"])
+            finally:
+                server.shutdown()
+                server.server_close()
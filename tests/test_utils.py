@@ -1,5 +1,13 @@
+import os
+import gzip
+import pickle
+import time
 import unittest
+import tempfile
+import threading
+from unittest import mock
 import numpy as np
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from gget.utils import (
     n_colors,
     aa_colors,
@@ -10,9 +18,36 @@ from gget.utils import (
     search_species_options,
     ref_species_options,
     read_fasta,
+    iter_fasta,
+    IndexedFasta,
+    PackedSequences,
+    open_fasta,
+    get_session,
+    configure_session,
+    http_request,
+    configure_cache,
+    cache_info,
+    clear_cache,
+    configure_cassette,
+    stats,
+    reset_stats,
+    track_subprocess,
+    memoize,
+    FastaIO,
+    FastaRecord,
+    async_rest_query,
+    run_async,
+    TokenBucket,
+    set_rate_limit,
+    get_rate_limiter,
 )
 
-from gget.constants import UNIPROT_REST_API, ENSEMBL_REST_API, ENSEMBL_FTP_URL_NV
+from gget.constants import (
+    UNIPROT_REST_API,
+    ENSEMBL_REST_API,
+    ENSEMBL_FTP_URL_NV,
+    HTTP_POOL_MAXSIZE,
+)
 
 from .fixtures import (
     LATEST_ENS_RELEASE,
@@ -23,7 +58,374 @@ from .fixtures import (
 )
 
 
+class StubHandler(BaseHTTPRequestHandler):
+    """Local keep-alive HTTP server used to test the shared request path offline."""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    lock = threading.Lock()
+    active = 0
+    max_active = 0
+
+    def _respond(self, body):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.startswith("/missing"):
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        with StubHandler.lock:
+            StubHandler.active += 1
+            StubHandler.max_active = max(StubHandler.max_active, StubHandler.active)
+        if self.path.startswith("/slow"):
+            time.sleep(0.05)
+        with StubHandler.lock:
+            StubHandler.active -= 1
+
+        self._respond(b'{"path": "%s"}' % self.path.encode())
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self._respond(self.rfile.read(length))
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+
 class TestUtils(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server, cls.stub_url = start_stub_server()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_get_session_is_shared(self):
+        self.assertIs(get_session(), get_session())
+        self.assertIn("gzip", get_session().headers["Accept-Encoding"])
+
+    def test_configure_session(self):
+        session = get_session()
+        configure_session(pool_maxsize=4, host_pool_maxsize={"127.0.0.1": 2})
+        self.addCleanup(configure_session, pool_maxsize=HTTP_POOL_MAXSIZE)
+
+        new_session = get_session()
+        self.assertIsNot(session, new_session)
+        self.assertEqual(new_session.get_adapter("http://127.0.0.1/")._pool_maxsize, 2)
+        self.assertEqual(
+            new_session.get_adapter("http://example.org/")._pool_maxsize, 4
+        )
+
+    def test_http_request_stub_server(self):
+        r = http_request("GET", self.stub_url + "lookup/id/ENSG1")
+        self.assertEqual(r.json(), {"path": "/lookup/id/ENSG1"})
+
+        r = http_request("POST", self.stub_url + "lookup/id", json={"ids": ["ENSG1"]})
+        self.assertEqual(r.json(), {"ids": ["ENSG1"]})
+
+    def test_run_async(self):
+        ids = [f"ENSG{i}" for i in range(20)] + ["missing"]
+        results = run_async(
+            (async_rest_query(self.stub_url, id_, "application/json") for id_ in ids),
+            return_exceptions=True,
+        )
+
+        # Results are returned in input order
+        self.assertEqual(results[:-1], [{"path": f"/{id_}"} for id_ in ids[:-1]])
+        self.assertIsInstance(results[-1], RuntimeError)
+
+        with self.assertRaises(RuntimeError):
+            run_async([async_rest_query(self.stub_url, "missing", "application/json")])
+
+    def test_run_async_host_concurrency(self):
+        configure_session(host_pool_maxsize={"127.0.0.1": 3})
+        self.addCleanup(
+            configure_session, host_pool_maxsize={"127.0.0.1": HTTP_POOL_MAXSIZE}
+        )
+        StubHandler.max_active = 0
+
+        run_async(
+            async_rest_query(self.stub_url, f"slow{i}", "application/json")
+            for i in range(12)
+        )
+
+        self.assertEqual(StubHandler.max_active, 3)
+
+    def test_token_bucket(self):
+        bucket = TokenBucket(rate=20)
+        start = time.monotonic()
+        waits = [bucket.acquire() for _ in range(5)]
+        elapsed = time.monotonic() - start
+
+        # The first request passes immediately, the next four are spaced 1/20 s apart
+        self.assertEqual(waits[0], 0)
+        self.assertGreaterEqual(elapsed, 4 / 20 - 0.01)
+
+        with self.assertRaises(ValueError):
+            TokenBucket(rate=0)
+
+    def test_rate_limit_shared_across_threads(self):
+        set_rate_limit("127.0.0.1", 20)
+        self.addCleanup(set_rate_limit, "127.0.0.1", None)
+
+        start = time.monotonic()
+        run_async(
+            async_rest_query(self.stub_url, f"ENSG{i}", "application/json")
+            for i in range(9)
+        )
+        elapsed = time.monotonic() - start
+
+        # Concurrent requests are still spaced out by the host's rate limit
+        self.assertGreaterEqual(elapsed, 8 / 20 - 0.01)
+        self.assertIsNone(get_rate_limiter("example.org"))
+
+    def test_http_cache(self):
+        with tempfile.TemporaryDirectory() as tmp_dir, mock.patch.dict(
+            "gget.utils.HTTP_CACHE_TTL", {"127.0.0.1": 60}
+        ):
+            configure_cache(path=tmp_dir)
+            self.addCleanup(configure_cache, enabled=False)
+
+            r1 = http_request("GET", self.stub_url + "lookup/id/ENSG1")
+            r2 = http_request("GET", self.stub_url + "lookup/id/ENSG1")
+            # Different body -> different cache entry
+            r3 = http_request("POST", self.stub_url + "lookup", json={"ids": ["A"]})
+            r4 = http_request("POST", self.stub_url + "lookup", json={"ids": ["B"]})
+
+            self.assertFalse(getattr(r1, "from_cache", False))
+            self.assertTrue(r2.from_cache)
+            self.assertEqual(r1.json(), r2.json())
+            self.assertEqual(r3.json(), {"ids": ["A"]})
+            self.assertEqual(r4.json(), {"ids": ["B"]})
+
+            info = cache_info()
+            self.assertEqual((info["entries"], info["hits"], info["misses"]), (3, 1, 3))
+
+            clear_cache()
+            self.assertEqual(cache_info()["entries"], 0)
+
+    def test_http_cache_ensembl_release_scope(self):
+        with tempfile.TemporaryDirectory() as tmp_dir, mock.patch.dict(
+            "gget.utils.HTTP_CACHE_TTL", {"127.0.0.1": 60}
+        ), mock.patch(
+            "gget.utils.HTTP_CACHE_ENSEMBL_RELEASE_SCOPED", ("127.0.0.1",)
+        ), mock.patch(
+            "gget.utils.find_latest_ens_rel", return_value=113
+        ) as latest:
+            configure_cache(path=tmp_dir)
+            self.addCleanup(configure_cache, enabled=False)
+
+            http_request("GET", self.stub_url + "lookup/id/ENSG1")
+            self.assertTrue(http_request("GET", self.stub_url + "lookup/id/ENSG1").from_cache)
+
+            # A new release (e.g. after the memoized release expired) invalidates the entries
+            latest.return_value = 114
+            self.assertFalse(
+                getattr(
+                    http_request("GET", self.stub_url + "lookup/id/ENSG1"), "from_cache", False
+                )
+            )
+            self.assertEqual(cache_info()["entries"], 2)
+
+    def test_http_cache_lru_eviction(self):
+        with tempfile.TemporaryDirectory() as tmp_dir, mock.patch.dict(
+            "gget.utils.HTTP_CACHE_TTL", {"127.0.0.1": 60}
+        ):
+            # Each stub response is 18 bytes, so only two entries fit
+            configure_cache(path=tmp_dir, max_size=40)
+            self.addCleanup(configure_cache, enabled=False)
+
+            http_request("GET", self.stub_url + "ENSG1")
+            http_request("GET", self.stub_url + "ENSG2")
+            http_request("GET", self.stub_url + "ENSG1")
+            http_request("GET", self.stub_url + "ENSG3")
+
+            self.assertEqual(cache_info()["entries"], 2)
+            # ENSG2 was least recently used and must have been evicted
+            self.assertTrue(http_request("GET", self.stub_url + "ENSG1").from_cache)
+            self.assertFalse(
+                getattr(
+                    http_request("GET", self.stub_url + "ENSG2"), "from_cache", False
+                )
+            )
+
+    def test_cassette_record_replay(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = tmp_dir + "/cassette.jsonl.gz"
+            self.addCleanup(configure_cassette, None)
+
+            configure_cassette(path, mode="record")
+            r1 = http_request("GET", self.stub_url + "lookup/id/ENSG1")
+            r2 = http_request("POST", self.stub_url + "lookup", json={"ids": ["A"]})
+            r3 = http_request("GET", self.stub_url + "missing")
+
+            # Replay without the server answering any request
+            configure_cassette(path, mode="replay")
+            with mock.patch("gget.utils._send", side_effect=AssertionError):
+                p1 = http_request("GET", self.stub_url + "lookup/id/ENSG1")
+                p2 = http_request("POST", self.stub_url + "lookup", json={"ids": ["A"]})
+                p3 = http_request("GET", self.stub_url + "missing")
+
+                self.assertEqual(p1.json(), r1.json())
+                self.assertEqual(p2.json(), r2.json())
+                self.assertEqual(p3.status_code, r3.status_code)
+                self.assertEqual(p1.headers["Content-Type"], "application/json")
+
+                with self.assertRaises(RuntimeError):
+                    http_request("POST", self.stub_url + "lookup", json={"ids": ["B"]})
+
+    def test_stats(self):
+        reset_stats()
+        self.addCleanup(reset_stats)
+
+        http_request("GET", self.stub_url + "lookup/id/ENSG1")
+        http_request("POST", self.stub_url + "lookup", json={"ids": ["A"]})
+        http_request("GET", self.stub_url + "missing")
+        with tempfile.NamedTemporaryFile() as tmp:
+            tmp.write(b"ACGT")
+            tmp.flush()
+            with track_subprocess("tool run", inputs=[tmp.name]) as call:
+                call["status"] = 0
+        with self.assertRaises(ValueError):
+            with track_subprocess("tool run"):
+                raise ValueError
+
+        result = stats(reset=True)
+        lookup = result["http"]["127.0.0.1/lookup"]
+        self.assertEqual(lookup["calls"], 2)
+        self.assertEqual(lookup["status_codes"], {"200": 2})
+        self.assertEqual(lookup["bytes_out"], len(b'{"ids": ["A"]}'))
+        self.assertGreater(lookup["bytes_in"], 0)
+        self.assertEqual(sum(lookup["latency_histogram"].values()), 2)
+        self.assertEqual(result["http"]["127.0.0.1/missing"]["status_codes"], {"404": 1})
+
+        tool = result["subprocess"]["tool run"]
+        self.assertEqual((tool["calls"], tool["errors"]), (2, 1))
+        self.assertEqual(tool["bytes_out"], 4)
+        self.assertEqual(stats(), {})
+
+    def test_stats_throttle(self):
+        reset_stats()
+        self.addCleanup(reset_stats)
+        set_rate_limit("127.0.0.1", 2)
+        self.addCleanup(set_rate_limit, "127.0.0.1", None)
+
+        # The second request waits ~0.5 s for the rate limit
+        http_request("GET", self.stub_url + "lookup/id/ENSG1")
+        http_request("GET", self.stub_url + "lookup/id/ENSG1")
+
+        lookup = stats(reset=True)["http"]["127.0.0.1/lookup"]
+        self.assertEqual(lookup["calls"], 2)
+        self.assertGreater(lookup["throttle_time"], 0.3)
+        self.assertLess(lookup["max_time"], 0.3)
+
+    def test_memoize(self):
+        calls = []
+
+        @memoize(ttl=60)
+        def lookup(x):
+            calls.append(x)
+            return [x]
+
+        self.assertEqual(lookup(1), [1])
+        # Callers receive copies of the memorized result
+        lookup(1).append(2)
+        self.assertEqual(lookup(1), [1])
+        self.assertEqual(lookup(2), [2])
+        self.assertEqual(calls, [1, 2])
+
+        lookup.cache_clear()
+        lookup(1)
+        self.assertEqual(calls, [1, 2, 1])
+
+    def test_fasta_io(self):
+        text = (
+            "preamble\n"
+            ">seq1 first record\r\n"
+            "ACGT\r\nACG\r\n\n"
+            ">seq2\n"
+            + "A" * 150
+            + "\n>seq3 empty\n>seq4\nTT"
+        )
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "in.fa")
+            with open(path, "w", newline="") as f:
+                f.write(text)
+
+            expected = [
+                ("seq1", "first record", "ACGTACG"),
+                ("seq2", "", "A" * 150),
+                ("seq3", "empty", ""),
+                ("seq4", "", "TT"),
+            ]
+            # Tiny buffers split records, headers and line breaks across blocks
+            for buffer_size in (1, 3, 16, 1024):
+                records = [
+                    (r.id, r.description, r.seq)
+                    for r in FastaIO.parse(path, "fasta", buffer_size=buffer_size)
+                ]
+                self.assertEqual(records, expected)
+
+            out_path = os.path.join(tmp_dir, "out.fa")
+            count = FastaIO.write(
+                (FastaRecord(seq, id_, desc) for id_, desc, seq in expected),
+                out_path,
+                buffer_size=10,
+            )
+            self.assertEqual(count, 4)
+            with open(out_path) as f:
+                lines = f.read().split("\n")
+            self.assertEqual(lines[:3], [">seq1 first record", "ACGTACG", ">seq2"])
+            self.assertEqual([len(l) for l in lines[3:5]], [70, 70])
+            self.assertEqual(
+                [(r.id, r.description, r.seq) for r in FastaIO.parse(out_path)], expected
+            )
+
+    def test_fasta_io_gzip(self):
+        records = [
+            FastaRecord("ACGT" * 50000, f"seq{i}", "description") for i in range(5)
+        ]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "seqs.fa")
+            gz_path = os.path.join(tmp_dir, "seqs.fa.gz")
+            FastaIO.write(records, path)
+            self.assertEqual(FastaIO.write(records, gz_path, threads=3), 5)
+
+            # bgzip output is a gzip file made of blocks with the BC extra field and an EOF block
+            with open(path, "rb") as f, gzip.open(gz_path, "rb") as gz:
+                self.assertEqual(gz.read(), f.read())
+            with open(gz_path, "rb") as f:
+                data = f.read()
+            self.assertEqual(data[:4], b"\x1f\x8b\x08\x04")
+            self.assertEqual(data[12:14], b"BC")
+            self.assertTrue(data.endswith(bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")))
+
+            # Compressed files are read transparently
+            self.assertEqual(
+                [(r.id, r.seq) for r in FastaIO.parse(gz_path)],
+                [(r.id, r.seq) for r in records],
+            )
+            self.assertEqual(read_fasta(gz_path), read_fasta(path))
+            with open_fasta(gz_path) as f:
+                self.assertEqual(f.read(5), b">seq0")
+            with self.assertRaises(ValueError):
+                IndexedFasta(gz_path)
+
     def test_read_fasta(self):
         result_to_test1, result_to_test2 = read_fasta(
             "tests/fixtures/muscle_nt_test.fa"
@@ -42,6 +444,136 @@ class TestUtils(unittest.TestCase):
 
         self.assertEqual(result_to_test, expected_result)
 
+    def test_iter_fasta(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "genome.fa")
+            with open(path, "w") as f:
+                f.write(">chr1 first\nACGT\nAC\r\n\nGT\n>chr2\nTTTT\n>chr3\n")
+            self.assertEqual(
+                list(iter_fasta(path)),
+                [("chr1 first", "ACGTACGT"), ("chr2", "TTTT"), ("chr3", "")],
+            )
+            self.assertEqual(
+                read_fasta(path), (["chr1 first", "chr2", "chr3"], ["ACGTACGT", "TTTT", ""])
+            )
+
+            with open(path, "w") as f:
+                f.write(">chr1\n>chr2\nACGT\n")
+            with self.assertRaises(ValueError):
+                read_fasta(path)
+
+            with open(path, "w") as f:
+                f.write("ACGT\n>chr1\nACGT\n")
+            with self.assertRaises(ValueError):
+                next(iter_fasta(path))
+
+    def test_indexed_fasta(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "genome.fa")
+            with open(path, "w") as f:
+                f.write(">chr1 first\nACGTA\nCCGTA\nGG\n>chr2\nTTTT\n\n>chr3\n")
+
+            with IndexedFasta(path) as fasta:
+                self.assertEqual(list(fasta), ["chr1", "chr2", "chr3"])
+                self.assertEqual(fasta.length("chr1"), 12)
+                self.assertEqual(fasta.fetch("chr1", 3, 8), "TACCG")
+                self.assertEqual(fasta["chr1"][-3:], "AGG")
+                self.assertEqual(fasta["chr1"][5], "C")
+                self.assertEqual(str(fasta["chr2"]), "TTTT")
+                self.assertEqual(len(fasta["chr3"]), 0)
+                self.assertEqual(fasta.header("chr1"), "chr1 first")
+                self.assertEqual(fasta.raw("chr2"), b">chr2\nTTTT\n")
+                self.assertEqual(
+                    fasta.fetch_many("chr1", [3, 0, 10, 6], [8, 12, 20, 2]),
+                    ["TACCG", "ACGTACCGTAGG", "GG", ""],
+                )
+                self.assertEqual(fasta.fetch_many("chr3", [0], [5]), [""])
+
+                # Pickling only keeps the index, the file is mapped again
+                unpickled = pickle.loads(pickle.dumps(fasta))
+                self.assertEqual(unpickled.fetch("chr1", 3, 8), "TACCG")
+                unpickled.close()
+
+            # samtools faidx compatible index
+            with open(path + ".fai") as f:
+                self.assertEqual(f.readline(), "chr1\t12\t12\t5\t6\n")
+
+            # The saved index is reused
+            with IndexedFasta(path, key=lambda name: name.upper()) as fasta:
+                self.assertEqual(fasta.fetch("CHR2", 1), "TTT")
+
+            # Of several records with the same key, the first or last one is looked up
+            versions_path = os.path.join(tmp_dir, "versions.fa")
+            with open(versions_path, "w") as f:
+                f.write(">tx1.1\nAAAA\n>tx2.1\nCC\n>tx1.2\nGGGG\n")
+            for keep, seq in (("first", "AAAA"), ("last", "GGGG")):
+                with IndexedFasta(
+                    versions_path, save_index=False, key=lambda name: name.split(".")[0], keep=keep
+                ) as fasta:
+                    self.assertEqual(list(fasta), ["tx1", "tx2"])
+                    self.assertEqual(fasta.fetch("tx1"), seq)
+                    self.assertEqual(fasta.duplicates, 1)
+                    # All records remain accessible in file order
+                    self.assertEqual(
+                        [fasta.header(entry) for entry in fasta.entries()],
+                        ["tx1.1", "tx2.1", "tx1.2"],
+                    )
+                    self.assertEqual(fasta.raw(fasta.entries()[2]), b">tx1.2\nGGGG\n")
+
+            with open(path, "w") as f:
+                f.write(">chr1\nACG\nA\nACG\n")
+            with self.assertRaises(ValueError):
+                IndexedFasta(path, save_index=False)
+
+    def test_packed_sequences(self):
+        seq = "ACGTNNacgtRYKMacgTTGCA-AC" * 10 + "gattaca"
+        packed = PackedSequences([("chr1", seq), ("chr2", ""), ("chr1", "GGGG")])
+
+        self.assertEqual(list(packed), ["chr1", "chr2"])
+        self.assertEqual(packed.length("chr1"), len(seq))
+        self.assertEqual(str(packed["chr1"]), seq)
+        self.assertEqual(packed["chr1"][3:17], seq[3:17])
+        self.assertEqual(packed["chr1"][-4:], "taca")
+        self.assertEqual(str(packed["chr2"]), "")
+        self.assertEqual(packed.duplicates, 1)
+        last = PackedSequences([("chr1", seq), ("chr2", ""), ("chr1", "GGGG")], keep="last")
+        self.assertEqual(list(last), ["chr1", "chr2"])
+        self.assertEqual(str(last["chr1"]), "GGGG")
+        # Long stretches of A, C, G and T are stored with 2 bits per base
+        self.assertLess(PackedSequences([("chr1", "ACGGT" * 1000 + "NNNN")]).nbytes, 5000 / 3)
+
+        complement = str.maketrans("ACGTRYKMacgtrykm", "TGCAYRMKtgcayrmk")
+        self.assertEqual(
+            packed.fetch("chr1", 5, 40, reverse_complement=True),
+            seq[5:40][::-1].translate(complement),
+        )
+
+        starts = [0, 7, 100, len(seq) - 3, 50]
+        ends = [10, 7, 161, len(seq) + 5, 20]
+        self.assertEqual(
+            packed.fetch_many("chr1", starts, ends),
+            [seq[a:b] for a, b in zip(starts, ends)],
+        )
+        self.assertEqual(
+            packed.fetch_many("chr1", starts, ends, reverse_complement=True),
+            [seq[a:b][::-1].translate(complement) for a, b in zip(starts, ends)],
+        )
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            mapped = packed.memory_map(os.path.join(tmp_dir, "packed.bin"))
+            # Pickling a memory-mapped store only keeps the layout of the file
+            pickled = pickle.dumps(mapped)
+            self.assertLess(len(pickled), len(pickle.dumps(packed)))
+            unpickled = pickle.loads(pickled)
+            for store in (mapped, unpickled):
+                self.assertEqual(str(store["chr1"]), seq)
+                self.assertEqual(str(store["chr2"]), "")
+                self.assertEqual(
+                    store.fetch_many("chr1", starts, ends),
+                    packed.fetch_many("chr1", starts, ends),
+                )
+            del mapped, unpickled, store
+
     def test_n_colors(self):
         result_to_test = n_colors("A")
         expected_result = "\x1b[38;5;15m\x1b[48;5;9mA\x1b[0;0m"
@@ -129,6 +129,7 @@ validation) and code-defined tests (for functional, unit, and data quality check
 
 Total: 186 tests
 """
+import gzip
 import unittest
 import json
 import os
@@ -177,6 +178,7 @@ from gget.gget_virus import (
     filter_cached_metadata_for_unused_filters,
     _write_fasta_record,
     _stream_copy_fasta,
+    fetch_genbank_metadata,
     filter_sequences,
     save_command_summary,
     merge_metadata_csvs,
@@ -2861,6 +2863,77 @@ class TestVirus(unittest.TestCase, metaclass=from_json(virus_dict, virus)):
             self.assertIn(">ACC3", content)
             self.assertNotIn(">ACC2", content)
 
+    def test_stream_copy_fasta_filter_matches_parser(self):
+        """Test _stream_copy_fasta writes the same records with and without the index."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_path = os.path.join(tmpdir, "input.fasta")
+
+            # Duplicate accessions and sequence lines shorter than the output line length
+            with open(input_path, 'w') as f:
+                f.write(
+                    ">ACC1 first copy\nATCG\nATCG\nAT\n>ACC2\nGGGG\n"
+                    ">ACC1 second copy\n" + "A" * 80 + "\n" + "C" * 80 + "\n"
+                )
+            expected = (
+                ">ACC1 first copy\nATCGATCGAT\n"
+                ">ACC1 second copy\n" + ("A" * 80 + "C" * 80)[:70] + "\n"
+                + ("A" * 80 + "C" * 80)[70:140] + "\n" + ("A" * 80 + "C" * 80)[140:] + "\n"
+            )
+
+            for compressed in (False, True):
+                path = input_path
+                if compressed:
+                    # Compressed files are parsed instead of indexed
+                    path = input_path + ".gz"
+                    with open(input_path, 'rb') as f, gzip.open(path, 'wb') as gz:
+                        gz.write(f.read())
+                output_path = os.path.join(tmpdir, f"output_{compressed}.fasta")
+                count = _stream_copy_fasta(path, output_path, accession_set={"ACC1"})
+                self.assertEqual(count, 2)
+                with open(output_path) as f:
+                    self.assertEqual(f.read(), expected)
+
+    def test_fetch_genbank_metadata_delay_deprecated(self):
+        """Test the deprecated delay argument of fetch_genbank_metadata logs a warning."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            xml_path = os.path.join(tmpdir, "genbank.xml")
+            csv_path = os.path.join(tmpdir, "genbank.csv")
+            with self.assertLogs("gget.utils", level="WARNING") as logs:
+                with self.assertRaises(ValueError):
+                    fetch_genbank_metadata([], xml_path, csv_path, delay=0.5)
+            self.assertIn("'delay' argument deprecated!", logs.output[0])
+
+    def test_stream_copy_fasta_filter_irregular_lines(self):
+        """Test _stream_copy_fasta filters files that cannot be indexed."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_path = os.path.join(tmpdir, "input.fasta")
+            output_path = os.path.join(tmpdir, "output.fasta")
+
+            # Lines of ACC1 have different lengths
+            with open(input_path, 'w') as f:
+                f.write(">ACC1 first\nATCG\nATCGAT\nCG\n>ACC2\nGGGG\nAAAA\n")
+
+            count = _stream_copy_fasta(input_path, output_path, accession_set={"ACC1"})
+            self.assertEqual(count, 1)
+
+            with open(output_path) as f:
+                self.assertEqual(f.read(), ">ACC1 first\nATCGATCGATCG\n")
+
+    def test_stream_copy_fasta_gzip(self):
+        """Test _stream_copy_fasta reads and writes compressed FASTA files."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_path = os.path.join(tmpdir, "input.fasta.gz")
+            output_path = os.path.join(tmpdir, "output.fasta.gz")
+
+            with gzip.open(input_path, 'wt') as f:
+                f.write(">ACC1\nATCGATCG\n>ACC2\nGGGGAAAA\n>ACC3\nTTTTCCCC\n")
+
+            count = _stream_copy_fasta(input_path, output_path, accession_set={"ACC2"})
+            self.assertEqual(count, 1)
+
+            with gzip.open(output_path, 'rt') as f:
+                self.assertEqual(f.read(), ">ACC2\nGGGGAAAA\n")
+
     # =========================================================================
     # FILTER SEQUENCES TESTS
     # =========================================================================